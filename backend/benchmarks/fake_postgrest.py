@@ -0,0 +1,362 @@
+"""
+In-memory stand-in for the PostgREST API behind Supabase.
+
+FakePostgrest answers the HTTP requests issued by supabase-py's PostgREST
+client through an httpx transport, so main.py runs unmodified against it.
+It implements the subset of PostgREST the API uses: column selection with
+embedded resources, eq/neq/gt/gte/lt/lte/in/is/like/ilike/ov filters and
+or/and trees of them, order,
+limit/offset, insert/upsert/update/delete with return=representation,
+single-object responses, exact counts and rpc calls.
+
+Every request sleeps for a configurable latency first, which stands in for
+the network and database time of a real round trip.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import httpx
+
+REST_PREFIX = "/rest/v1/"
+
+# Foreign keys whose column name is not "<singular of referenced table>_id"
+FOREIGN_KEYS = {
+    ("put_aways", "good_receive_notes"): "grn_id",
+    ("quality_checks", "good_receive_notes"): "grn_id",
+    ("good_receive_note_items", "good_receive_notes"): "grn_id",
+    ("sale_invoice_items", "sale_invoices"): "invoice_id",
+}
+
+# Query parameters that are not column filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict", "or", "and"}
+
+
+def _singular(table: str) -> str:
+    if table.endswith("ies"):
+        return table[:-3] + "y"
+    if table.endswith("s"):
+        return table[:-1]
+    return table
+
+
+def _text(value: Any) -> str:
+    """Render a stored value the way it appears in a PostgREST filter"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _split_top_level(text: str, separator: str = ",") -> List[str]:
+    """Split on separator outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _parse_select(select: str) -> List[Tuple[str, Optional[str], Optional[str], Optional[list]]]:
+    """
+    Parse a select string into (name, alias, hint, children) fields.
+    children is None for plain columns and a nested field list for embeds.
+    """
+    select = re.sub(r"\s+", "", select or "*")
+    fields = []
+    for part in _split_top_level(select):
+        if not part:
+            continue
+        children = None
+        if part.endswith(")") and "(" in part:
+            head, inner = part.split("(", 1)
+            children = _parse_select(inner[:-1])
+        else:
+            head = part
+        alias = None
+        if ":" in head and "::" not in head:
+            alias, head = head.split(":", 1)
+        head = head.split("::", 1)[0]
+        hint = None
+        if "!" in head:
+            head, hint = head.split("!", 1)
+        fields.append((head, alias, hint, children))
+    return fields
+
+
+def _compare(stored: Any, operator: str, operand: str) -> bool:
+    if operator == "is":
+        if operand == "null":
+            return stored is None
+        return _text(stored) == operand
+    if operator == "eq":
+        return _text(stored) == operand
+    if operator == "neq":
+        return stored is not None and _text(stored) != operand
+    if operator == "in":
+        values = [v.strip('"') for v in _split_top_level(operand.strip("()"))]
+        return _text(stored) in values
+    if operator == "ov":
+        values = {v.strip('"') for v in _split_top_level(operand.strip("{}()"))}
+        return bool(values & {_text(v) for v in (stored or [])})
+    if operator in ("like", "ilike"):
+        if stored is None:
+            return False
+        pattern = "^" + re.escape(operand).replace(r"\*", ".*").replace("%", ".*") + "$"
+        flags = re.IGNORECASE if operator == "ilike" else 0
+        return re.match(pattern, str(stored), flags) is not None
+    if stored is None:
+        return False
+    try:
+        left, right = float(stored), float(operand)
+    except (TypeError, ValueError):
+        left, right = str(stored), operand
+    return {
+        "gt": left > right,
+        "gte": left >= right,
+        "lt": left < right,
+        "lte": left <= right,
+    }.get(operator, True)
+
+
+def _logic_tree(expression: str, conjunction: str) -> Callable[[dict], bool]:
+    """Predicate for an or=(...) / and=(...) filter such as or=(a.lt.1,and(a.eq.1,b.lt.2))"""
+    terms = []
+    for term in _split_top_level(expression.strip()[1:-1]):
+        negate = term.startswith("not.")
+        term = term[4:] if negate else term
+        if term.startswith(("and(", "or(")):
+            nested, inner = term.split("(", 1)
+            predicate = _logic_tree("(" + inner, nested)
+        else:
+            column, operator, operand = term.split(".", 2)
+            operand = operand[1:-1] if operand.startswith('"') and operand.endswith('"') else operand
+            predicate = (lambda c, o, v: lambda row: _compare(row.get(c), o, v))(column, operator, operand)
+        terms.append((predicate, negate))
+    combine = any if conjunction == "or" else all
+    return lambda row: combine(predicate(row) != negate for predicate, negate in terms)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakePostgrest:
+    """Thread-safe in-memory tables served over an httpx MockTransport"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.tables: Dict[str, Dict[str, dict]] = defaultdict(dict)
+        self.rpc_handlers: Dict[str, Callable[[dict], Any]] = {}
+        self.calls: Counter = Counter()
+        self._child_index: Dict[Tuple[str, str], Dict[str, List[dict]]] = {}
+        self._lock = threading.RLock()
+
+    # ---------- direct data access (no simulated latency) ----------
+
+    def add(self, table: str, **row) -> dict:
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now())
+        row.setdefault("updated_at", row["created_at"])
+        with self._lock:
+            self.tables[table][str(row["id"])] = row
+        return row
+
+    def rows(self, table: str) -> List[dict]:
+        with self._lock:
+            return list(self.tables[table].values())
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+    @property
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    # ---------- HTTP handling ----------
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        path = request.url.path
+        name = path[path.find(REST_PREFIX) + len(REST_PREFIX):] if REST_PREFIX in path else path.strip("/")
+        params = parse_qsl(request.url.query.decode(), keep_blank_values=True)
+        prefer = request.headers.get("prefer", "")
+        body = json.loads(request.content) if request.content else None
+
+        with self._lock:
+            self._child_index.clear()
+            if name.startswith("rpc/"):
+                function = name[len("rpc/"):]
+                self.calls["rpc." + function] += 1
+                handler = self.rpc_handlers.get(function)
+                return httpx.Response(200, json=handler(body or {}) if handler else None)
+
+            self.calls[name] += 1
+            method = request.method
+            if method in ("GET", "HEAD"):
+                rows = self._select(name, params)
+            elif method == "POST":
+                rows = self._insert(name, body, params, "resolution=merge-duplicates" in prefer)
+            elif method == "PATCH":
+                rows = self._update(name, body or {}, params)
+            elif method == "DELETE":
+                rows = self._delete(name, params)
+            else:
+                return httpx.Response(405)
+
+            select = dict(params).get("select")
+            if method != "GET" and select is None:
+                select = "*"
+            fields = _parse_select(select)
+            payload = [self._project(name, row, fields) for row in rows]
+
+        headers = {"content-range": f"0-{max(len(payload) - 1, 0)}/{len(payload) if 'count=' in prefer else '*'}"}
+        if "application/vnd.pgrst.object+json" in request.headers.get("accept", ""):
+            if len(payload) != 1:
+                return httpx.Response(406, json={
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "details": f"The result contains {len(payload)} rows",
+                    "hint": None,
+                })
+            return httpx.Response(200, json=payload[0], headers=headers)
+        if method == "HEAD" or "return=minimal" in prefer:
+            return httpx.Response(200 if method != "POST" else 201, headers=headers)
+        return httpx.Response(201 if method == "POST" else 200, json=payload, headers=headers)
+
+    # ---------- query evaluation ----------
+
+    def _filtered(self, table: str, params: List[Tuple[str, str]]) -> List[dict]:
+        filters, trees = [], []
+        for key, value in params:
+            if key in ("or", "and"):
+                trees.append(_logic_tree(value, key))
+                continue
+            if key in RESERVED_PARAMS or "." in key or "." not in value:
+                continue
+            negate = value.startswith("not.")
+            operator, operand = (value[4:] if negate else value).split(".", 1)
+            filters.append((key, operator, operand, negate))
+        rows = []
+        for row in self.tables[table].values():
+            if all(_compare(row.get(key), op, operand) != negate for key, op, operand, negate in filters) \
+                    and all(tree(row) for tree in trees):
+                rows.append(row)
+        return rows
+
+    def _select(self, table: str, params: List[Tuple[str, str]]) -> List[dict]:
+        rows = self._filtered(table, params)
+        options = dict(params)
+        for clause in reversed(options.get("order", "").split(",") if options.get("order") else []):
+            column, *modifiers = clause.split(".")
+            descending = "desc" in modifiers
+            rows.sort(key=lambda r: (r.get(column) is None, _text(r.get(column))), reverse=descending)
+        offset = int(options.get("offset", 0))
+        limit = options.get("limit")
+        rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+        return rows
+
+    def _insert(self, table: str, body: Any, params: List[Tuple[str, str]], merge: bool) -> List[dict]:
+        records = body if isinstance(body, list) else [body]
+        conflict = [c for c in dict(params).get("on_conflict", "id").split(",") if c]
+        created = []
+        for record in records:
+            record = dict(record)
+            existing = None
+            if merge:
+                key = tuple(_text(record.get(c)) for c in conflict)
+                existing = next(
+                    (r for r in self.tables[table].values() if tuple(_text(r.get(c)) for c in conflict) == key),
+                    None,
+                )
+            if existing is not None:
+                existing.update(record)
+                existing["updated_at"] = _now()
+                created.append(existing)
+                continue
+            record.setdefault("id", str(uuid.uuid4()))
+            record.setdefault("created_at", _now())
+            record.setdefault("updated_at", record["created_at"])
+            self.tables[table][str(record["id"])] = record
+            created.append(record)
+        return created
+
+    def _update(self, table: str, changes: dict, params: List[Tuple[str, str]]) -> List[dict]:
+        rows = self._filtered(table, params)
+        for row in rows:
+            row.update(changes)
+            row["updated_at"] = _now()
+        return rows
+
+    def _delete(self, table: str, params: List[Tuple[str, str]]) -> List[dict]:
+        rows = self._filtered(table, params)
+        for row in rows:
+            self.tables[table].pop(str(row["id"]), None)
+        return rows
+
+    # ---------- embedding ----------
+
+    def _many_to_one_column(self, table: str, row: dict, target: str, hint: Optional[str]) -> Optional[str]:
+        if hint:
+            if hint in row:
+                return hint
+            if hint.endswith("_fkey"):
+                column = hint[:-len("_fkey")]
+                if column.startswith(table + "_"):
+                    column = column[len(table) + 1:]
+                if column in row:
+                    return column
+        column = FOREIGN_KEYS.get((table, target)) or _singular(target) + "_id"
+        return column if column in row else None
+
+    def _embed(self, table: str, row: dict, target: str, hint: Optional[str], children: list) -> Any:
+        column = self._many_to_one_column(table, row, target, hint)
+        if column is not None:
+            parent = self.tables[target].get(_text(row.get(column)))
+            return self._project(target, parent, children) if parent else None
+        back_reference = FOREIGN_KEYS.get((target, table)) or _singular(table) + "_id"
+        return [self._project(target, child, children) for child in self._children(target, back_reference, row.get("id"))]
+
+    def _children(self, table: str, column: str, value: Any) -> List[dict]:
+        # Built once per request so embedding a one-to-many relation stays linear
+        index = self._child_index.get((table, column))
+        if index is None:
+            index = defaultdict(list)
+            for child in self.tables[table].values():
+                index[_text(child.get(column))].append(child)
+            self._child_index[(table, column)] = index
+        return index.get(_text(value), [])
+
+    def _project(self, table: str, row: dict, fields: list) -> dict:
+        result = {}
+        for name, alias, hint, children in fields:
+            if children is not None:
+                if hint in ("inner", "left"):
+                    hint = None
+                result[alias or name] = self._embed(table, row, name, hint, children)
+            elif name == "*":
+                result.update(row)
+            else:
+                result[alias or name] = row.get(name)
+        return result
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Benchmark key API flows against an in-memory PostgREST stand-in.
+
+main.py is imported unmodified; every Supabase client it creates talks to
+FakePostgrest, which adds a fixed latency per round trip. For each flow the
+harness records request latency and the number of PostgREST round trips
+(per table / rpc), then writes the results as JSON. Passing --baseline
+compares against an earlier run and exits non-zero when a flow needs more
+round trips; latency changes are reported but only fail with --fail-on-latency.
+
+Usage (from the backend directory):
+    python -m benchmarks.run_benchmarks --output benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+from .fake_postgrest import FakePostgrest
+
+JWT_SECRET = "benchmark-secret"
+ADMIN_ID = "00000000-0000-0000-0000-00000000a0a0"
+ITEMS_PER_DOCUMENT = 5
+
+
+def _configure_environment() -> None:
+    """main.py reads its configuration at import time"""
+    os.environ["SUPABASE_URL"] = "http://postgrest.benchmark"
+    os.environ["SUPABASE_INTERNAL_URL"] = "http://postgrest.benchmark"
+    os.environ["SUPABASE_SERVICE_KEY"] = "benchmark-service-key"
+    os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+    os.environ["DEBUG"] = "false"
+    os.environ.setdefault("BACKUP_DIR", tempfile.mkdtemp(prefix="versal-bench-"))
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+
+def _load_app(fake: FakePostgrest):
+    """Import main.py and point every Supabase client it creates at the fake"""
+    _configure_environment()
+    import main
+
+    main.logger.setLevel(logging.ERROR)
+    original_factory = main.get_supabase_client
+
+    def fake_client():
+        client = original_factory()
+        # The PostgREST session is a plain httpx.Client; swapping its
+        # transport keeps supabase-py's request building (and the call
+        # tracing hooks) intact.
+        client.postgrest.session._transport = fake.transport
+        return client
+
+    main.get_supabase_client = fake_client
+    main.supabase = fake_client()
+    return main
+
+
+def seed(fake: FakePostgrest, products: int) -> Dict[str, list]:
+    """Reference data shared by all flows"""
+    role = fake.add("roles", name="admin", permissions=["*"])
+    fake.add("profiles", id=ADMIN_ID, full_name="Benchmark Admin", username="bench", role="admin", role_id=role["id"])
+    tax = fake.add("taxes", name="GST 18%", rate=0.18, is_active=True)
+    unit = fake.add("units", name="Pieces", abbreviation="pcs")
+    category = fake.add("categories", name="General", is_active=True)
+    locations = [fake.add("locations", name=f"Bin {i:02d}", is_active=True) for i in range(8)]
+    fake.add("customers", id="customer-retail", name="Walk-in", customer_type="retail", credit_limit=0)
+    fake.add("suppliers", id="supplier-main", name="Main Supplier", is_active=True)
+
+    product_rows = []
+    for i in range(products):
+        product = fake.add(
+            "products",
+            name=f"Product {i:04d}",
+            sku_code=f"SKU-{i:04d}",
+            hsn_code="8471",
+            category_id=category["id"],
+            unit_id=unit["id"],
+            purchase_tax_id=tax["id"],
+            sale_tax_id=tax["id"],
+            purchase_tax_type="exclusive",
+            sale_tax_type="exclusive",
+            cost_price=100 + i,
+            selling_price=150 + i,
+            is_serialized=False,
+            reorder_point=10,
+        )
+        fake.add(
+            "stock_levels",
+            product_id=product["id"],
+            location_id=locations[i % len(locations)]["id"],
+            quantity_on_hand=50,
+            quantity_reserved=0,
+            quantity_available=50,
+        )
+        product_rows.append(product)
+    return {"products": product_rows, "locations": locations}
+
+
+def _document_lines(data: Dict[str, list], offset: int) -> List[dict]:
+    products = data["products"]
+    return [products[(offset + i) % len(products)] for i in range(ITEMS_PER_DOCUMENT)]
+
+
+def build_flows(fake: FakePostgrest, data: Dict[str, list]) -> Dict[str, Callable[[int], Tuple[str, str, dict]]]:
+    """Each flow returns (method, path, json body) for one iteration, seeding any state it consumes"""
+
+    def product_list(_: int):
+        return "GET", "/products", None
+
+    def stock_levels(_: int):
+        return "GET", "/inventory/stock-levels", None
+
+    def invoice_create(i: int):
+        lines = _document_lines(data, i)
+        items = [{
+            "productId": p["id"], "productName": p["name"], "skuCode": p["sku_code"], "hsnCode": p["hsn_code"],
+            "quantity": 2, "unitPrice": p["selling_price"], "discount": 0, "tax": 0.18 * 2 * p["selling_price"],
+            "saleTaxType": "exclusive", "unitAbbreviation": "pcs",
+        } for p in lines]
+        subtotal = sum(2 * p["selling_price"] for p in lines)
+        return "POST", "/sale-invoices", {
+            "invoiceNumber": f"INV-BENCH-{i:05d}", "customerId": "customer-retail", "isDirect": True,
+            "invoiceDate": "2026-10-18", "status": "draft", "paymentMethod": "cash",
+            "subtotal": subtotal, "taxAmount": round(subtotal * 0.18, 2), "discountAmount": 0,
+            "totalAmount": round(subtotal * 1.18, 2), "items": items,
+        }
+
+    def grn_create(i: int):
+        items = [{
+            "productId": p["id"], "productName": p["name"], "skuCode": p["sku_code"], "hsnCode": p["hsn_code"],
+            "orderedQuantity": 10, "receivedQuantity": 10, "unitCost": p["cost_price"],
+            "discount": 0, "unitAbbreviation": "pcs",
+        } for p in _document_lines(data, i)]
+        return "POST", "/good-receive-notes", {
+            "grnNumber": f"GRN-BENCH-{i:05d}", "supplierId": "supplier-main", "isDirect": True,
+            "receivedDate": "2026-10-18", "status": "draft", "items": items,
+        }
+
+    def put_away_complete(i: int):
+        put_away = fake.add("put_aways", put_away_number=f"PA-BENCH-{i:05d}", status="pending")
+        for n, p in enumerate(_document_lines(data, i)):
+            location = data["locations"][n % len(data["locations"])]
+            fake.add(
+                "put_away_items", put_away_id=put_away["id"], product_id=p["id"], product_name=p["name"],
+                quantity=10, placed_quantity=10, location_id=location["id"], location_name=location["name"],
+            )
+        return "PUT", f"/put-aways/{put_away['id']}", {"status": "completed"}
+
+    def pick_list_complete(i: int):
+        pick_list = fake.add("pick_lists", pick_list_number=f"PL-BENCH-{i:05d}", status="pending")
+        for n, p in enumerate(_document_lines(data, i)):
+            location = data["locations"][n % len(data["locations"])]
+            fake.add(
+                "pick_list_items", pick_list_id=pick_list["id"], product_id=p["id"], product_name=p["name"],
+                quantity=2, picked_quantity=2, location_id=location["id"], location_name=location["name"],
+            )
+        return "PUT", f"/pick-lists/{pick_list['id']}", {"status": "completed"}
+
+    return {
+        "product_list": product_list,
+        "stock_levels": stock_levels,
+        "invoice_create": invoice_create,
+        "grn_create": grn_create,
+        "put_away_complete": put_away_complete,
+        "pick_list_complete": pick_list_complete,
+    }
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(args) -> dict:
+    fake = FakePostgrest(latency_ms=args.latency_ms)
+    data = seed(fake, args.products)
+    main = _load_app(fake)
+
+    from fastapi.testclient import TestClient
+    from jose import jwt as jose_jwt
+
+    token = jose_jwt.encode({"sub": ADMIN_ID, "role": "authenticated"}, JWT_SECRET, algorithm="HS256")
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+    flows = build_flows(fake, data)
+    selected = args.flows or list(flows)
+    iteration = 0
+    for name in selected:
+        timings, round_trips, breakdown = [], [], {}
+        for n in range(args.warmup + args.iterations):
+            iteration += 1
+            method, path, body = flows[name](iteration)
+            fake.reset_calls()
+            started = time.perf_counter()
+            response = client.request(method, path, json=body, headers=headers)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise SystemExit(f"{name}: {method} {path} -> {response.status_code} {response.text[:300]}")
+            if n < args.warmup:
+                continue
+            timings.append(elapsed * 1000)
+            round_trips.append(sum(fake.calls.values()))
+            breakdown = dict(sorted(fake.calls.items()))
+        results[name] = {
+            "requests": len(timings),
+            "latency_ms": {
+                "mean": round(statistics.mean(timings), 2),
+                "p50": round(_percentile(timings, 50), 2),
+                "p95": round(_percentile(timings, 95), 2),
+                "max": round(max(timings), 2),
+            },
+            "round_trips": max(round_trips),
+            "round_trip_breakdown": breakdown,
+        }
+        print(f"{name:<20} p50 {results[name]['latency_ms']['p50']:>9.2f} ms   "
+              f"p95 {results[name]['latency_ms']['p95']:>9.2f} ms   round trips {results[name]['round_trips']:>4}")
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "latency_ms": args.latency_ms,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "products": args.products,
+            "items_per_document": ITEMS_PER_DOCUMENT,
+        },
+        "flows": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> Tuple[List[str], List[str]]:
+    """
+    Differences of current against baseline as (round-trip regressions, latency
+    regressions). Round trips are deterministic; p50 latency is noisy on a shared
+    machine, so it is only flagged beyond tolerance.
+    """
+    round_trips, latency = [], []
+    for name, result in current["flows"].items():
+        previous = baseline.get("flows", {}).get(name)
+        if not previous:
+            continue
+        if result["round_trips"] > previous["round_trips"]:
+            round_trips.append(f"{name}: round trips {previous['round_trips']} -> {result['round_trips']}")
+        before, after = previous["latency_ms"]["p50"], result["latency_ms"]["p50"]
+        if before and after > before * (1 + tolerance):
+            latency.append(f"{name}: p50 {before:.2f} ms -> {after:.2f} ms (+{(after / before - 1) * 100:.0f}%)")
+    return round_trips, latency
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Versal API flows against a local PostgREST stand-in")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Simulated latency per PostgREST round trip")
+    parser.add_argument("--iterations", type=int, default=20, help="Measured requests per flow")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per flow")
+    parser.add_argument("--products", type=int, default=200, help="Number of seeded products")
+    parser.add_argument("--flows", nargs="*", help="Subset of flows to run")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="p50 slowdown against the baseline that is reported (fraction)")
+    parser.add_argument("--fail-on-latency", action="store_true", help="Also exit non-zero when p50 is slower beyond --tolerance")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("latency_ms") != args.latency_ms:
+            print("Warning: baseline was recorded with a different --latency-ms; latency comparison is not meaningful")
+        round_trips, latency = compare(results, baseline, args.tolerance)
+        if latency:
+            print("Latency regressions against baseline" + ("" if args.fail_on_latency else " (not failing; see --fail-on-latency)") + ":")
+            for problem in latency:
+                print(f"  - {problem}")
+        if round_trips:
+            print("Round-trip regressions against baseline:")
+            for problem in round_trips:
+                print(f"  - {problem}")
+        if round_trips or (latency and args.fail_on_latency):
+            return 1
+        print("No round-trip regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
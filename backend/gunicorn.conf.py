@@ -0,0 +1,25 @@
+# Gunicorn settings for the Versal API container.
+#
+# Prometheus metrics are aggregated across workers through files in
+# PROMETHEUS_MULTIPROC_DIR. The directory is cleared when the master starts
+# (stale files would otherwise be summed forever) and a worker's live gauges
+# are removed when it exits.
+import os
+import shutil
+
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/versal-metrics")
+
+
+def on_starting(server):
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -11,19 +11,26 @@ import sys
 import time
 import json
 import threading
+import re
+import hashlib
+import select
+import ctypes
+import ctypes.util
+import collections
 from datetime import datetime
 from flask import Flask, render_template_string, Response, request, jsonify
 from flask_cors import CORS
-import queue
 
 app = Flask(__name__)
 CORS(app)
 
 # Global variables
 log_file_path = "logs/server.log"
-log_queue = queue.Queue()
+subscriber_buffer_size = 1000
 is_monitoring = False
 monitor_thread = None
+monitor_stop = threading.Event()
+
 
 # HTML template for the log monitor interface
 HTML_TEMPLATE = """
@@ -269,6 +276,7 @@ HTML_TEMPLATE = """
             <button id="startBtn" class="btn btn-success">Start Monitoring</button>
             <button id="stopBtn" class="btn btn-danger" style="display: none;">Stop Monitoring</button>
             <button id="clearBtn" class="btn btn-primary">Clear Logs</button>
+            <button id="olderBtn" class="btn btn-primary" style="display: none;">Load Older</button>
             <div id="status" class="status inactive">Inactive</div>
         </div>
     </div>
@@ -314,6 +322,8 @@ HTML_TEMPLATE = """
         const startBtn = document.getElementById('startBtn');
         const stopBtn = document.getElementById('stopBtn');
         const clearBtn = document.getElementById('clearBtn');
+        const olderBtn = document.getElementById('olderBtn');
+        let nextBefore = null;
         const status = document.getElementById('status');
         const logContent = document.getElementById('logContent');
         const filterInput = document.getElementById('filterInput');
@@ -324,6 +334,7 @@ HTML_TEMPLATE = """
         startBtn.addEventListener('click', startMonitoring);
         stopBtn.addEventListener('click', stopMonitoring);
         clearBtn.addEventListener('click', clearLogs);
+        olderBtn.addEventListener('click', loadOlderLogs);
         filterInput.addEventListener('input', filterLogs);
         logLevel.addEventListener('change', filterLogs);
         
@@ -344,6 +355,11 @@ HTML_TEMPLATE = """
                 addLogLine(data.line, data.timestamp);
             };
             
+            eventSource.addEventListener('dropped', function(event) {
+                const data = JSON.parse(event.data);
+                addLogLine(`[monitor] ${data.dropped} lines skipped: this viewer fell behind`, new Date().toISOString());
+            });
+            
             eventSource.onerror = function(event) {
                 console.error('SSE Error:', event);
                 stopMonitoring();
@@ -368,14 +384,18 @@ HTML_TEMPLATE = """
             }
         }
         
-        function addLogLine(line, timestamp) {
+        function addLogLine(line, timestamp, prepend = false) {
             const logLine = {
                 text: line,
                 timestamp: timestamp,
                 type: getLogType(line)
             };
             
-            logLines.push(logLine);
+            if (prepend) {
+                logLines.unshift(logLine);
+            } else {
+                logLines.push(logLine);
+            }
             stats.total++;
             
             if (logLine.type === 'debug') stats.debug++;
@@ -386,6 +406,14 @@ HTML_TEMPLATE = """
         }
         
         function getLogType(line) {
+            const jsonLevel = line.match(/^\{.*?"level": "([A-Z]+)"/);
+            if (jsonLevel) {
+                const level = jsonLevel[1];
+                if (level === 'DEBUG') return 'debug';
+                if (level === 'ERROR' || level === 'CRITICAL') return 'error';
+                if (level === 'WARNING') return 'warning';
+                return 'info';
+            }
             if (line.includes('[DEBUG]')) return 'debug';
             if (line.toLowerCase().includes('error')) return 'error';
             if (line.toLowerCase().includes('warning')) return 'warning';
@@ -408,9 +436,9 @@ HTML_TEMPLATE = """
         
         function displayLogs() {
             logContent.innerHTML = filteredLines.map(line => {
-                const timestamp = new Date(line.timestamp).toLocaleTimeString();
+                const timestamp = line.timestamp ? `[${new Date(line.timestamp).toLocaleTimeString()}]` : '';
                 return `<div class="log-line ${line.type}">
-                    <span class="timestamp">[${timestamp}]</span> ${escapeHtml(line.text)}
+                    <span class="timestamp">${timestamp}</span> ${escapeHtml(line.text)}
                 </div>`;
             }).join('');
             
@@ -440,6 +468,34 @@ HTML_TEMPLATE = """
             return div.innerHTML;
         }
         
+        function setNextBefore(value) {
+            nextBefore = value;
+            olderBtn.style.display = nextBefore === null || nextBefore === undefined ? 'none' : 'inline-block';
+        }
+        
+        function loadOlderLogs() {
+            if (nextBefore === null) return;
+            const keepScroll = autoScroll.checked;
+            autoScroll.checked = false;
+            fetch(`/api/logs?before=${nextBefore}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (data.logs) {
+                        // Newest first so each line is prepended ahead of the later ones
+                        data.logs.slice().reverse().forEach(log => {
+                            addLogLine(log.line, log.timestamp, true);
+                        });
+                    }
+                    setNextBefore(data.next_before);
+                })
+                .catch(error => {
+                    console.error('Error loading older logs:', error);
+                })
+                .finally(() => {
+                    autoScroll.checked = keepScroll;
+                });
+        }
+        
         // Load existing logs and start monitoring when page loads
         window.addEventListener('load', () => {
             // Load existing logs first
@@ -451,6 +507,7 @@ HTML_TEMPLATE = """
                             addLogLine(log.line, log.timestamp);
                         });
                     }
+                    setNextBefore(data.next_before);
                 })
                 .catch(error => {
                     console.error('Error loading existing logs:', error);
@@ -465,54 +522,575 @@ HTML_TEMPLATE = """
 </html>
 """
 
-def monitor_log_file():
-    """Monitor the log file and send updates to connected clients"""
-    global is_monitoring, log_queue
-    
-    if not os.path.exists(log_file_path):
-        print(f"Log file not found: {log_file_path}")
-        return
-    
-    with open(log_file_path, 'r') as f:
-        # Go to end of file
-        f.seek(0, 2)
-        
-        while is_monitoring:
-            line = f.readline()
-            if line:
-                # Send line to queue for SSE
-                log_queue.put({
-                    'line': line.strip(),
-                    'timestamp': datetime.now().isoformat()
-                })
-            else:
-                time.sleep(0.1)  # Small delay to prevent high CPU usage
+# ==================== BROADCASTER ====================
+
+class Subscription:
+    """Per-client ring buffer. When a slow client falls behind, the oldest lines are dropped."""
+
+    def __init__(self, maxlen):
+        self.buffer = collections.deque(maxlen=maxlen)
+        self.condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self.condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(item)
+            self.condition.notify()
+
+    def drain(self, timeout):
+        """Wait up to `timeout` seconds for lines and return everything buffered."""
+        with self.condition:
+            if not self.buffer:
+                self.condition.wait(timeout)
+            items = list(self.buffer)
+            self.buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        return items, dropped
+
+
+class LogBroadcaster:
+    """Fans every tailed line out to all connected /stream clients."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(subscriber_buffer_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, item):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(item)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+broadcaster = LogBroadcaster()
+
+
+# ==================== HISTORY ====================
+
+READ_BLOCK_SIZE = 64 * 1024
+DEFAULT_LOG_LIMIT = 100
+MAX_LOG_LIMIT = 1000
+
+# Leading timestamps as written by Python logging ("2026-10-18 09:15:02,123"),
+# gunicorn ("[2026-10-18 09:15:02 +0000]") and ISO-8601 writers.
+TIMESTAMP_PATTERN = re.compile(
+    r'^\[?(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}(?::\d{2})?)(?:[.,](\d{1,6}))?\s?(Z|[+-]\d{2}:?\d{2})?'
+)
+
+
+def parse_log_timestamp(line):
+    """Return the line's own timestamp as an ISO string, or None when it has none"""
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            value = record.get('timestamp') or record.get('ts') or record.get('time')
+            if value:
+                line = str(value)
+
+    match = TIMESTAMP_PATTERN.match(line)
+    if not match:
+        return None
+    day, clock, fraction, tz = match.groups()
+    text = f"{day}T{clock}"
+    if fraction:
+        text += "." + fraction.ljust(6, "0")
+    if tz:
+        text += "+00:00" if tz == "Z" else f"{tz[:3]}:{tz[-2:]}"
+    try:
+        return datetime.fromisoformat(text).isoformat()
+    except ValueError:
+        return None
+
+
+def read_lines_before(path, before=None, limit=DEFAULT_LOG_LIMIT):
+    """
+    Read up to `limit` non-empty lines that end at or before byte offset `before`
+    (end of file when None), newest last. Blocks are read backwards from the
+    offset, so the cost depends on the lines returned rather than the file size.
+    Returns (lines, size) where each line is (start_offset, text).
+    """
+    lines = []
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if before is None else max(0, min(before, size))
+
+        # Snap `end` back to a line boundary; this also leaves out a final line
+        # that is still being written.
+        if end > 0:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                probe_end = end
+                while probe_end > 0:
+                    probe_start = max(0, probe_end - READ_BLOCK_SIZE)
+                    f.seek(probe_start)
+                    idx = f.read(probe_end - probe_start).rfind(b"\n")
+                    if idx >= 0:
+                        end = probe_start + idx + 1
+                        break
+                    probe_end = probe_start
+                else:
+                    end = 0
+
+        buf, buf_start, line_end = b"", end, end
+        while len(lines) < limit and line_end > 0:
+            # line_end sits just after a newline; find the one before it
+            idx = buf.rfind(b"\n", 0, line_end - 1 - buf_start)
+            while idx < 0 and buf_start > 0:
+                read = min(READ_BLOCK_SIZE, buf_start)
+                buf_start -= read
+                f.seek(buf_start)
+                buf = f.read(read) + buf
+                idx = buf.rfind(b"\n", 0, line_end - 1 - buf_start)
+            line_start = buf_start + idx + 1 if idx >= 0 else 0
+            text = buf[line_start - buf_start:line_end - 1 - buf_start].decode('utf-8', errors='replace').strip()
+            if text:
+                lines.append((line_start, text))
+            buf = buf[:line_start - buf_start]
+            line_end = line_start
+
+    lines.reverse()
+    return lines, size
+
+
+# ==================== SEARCH INDEX ====================
+
+INDEX_DIR_NAME = ".index"
+HEAD_FINGERPRINT_BYTES = 256
+DEFAULT_SEARCH_LIMIT = 200
+MAX_SEARCH_RESULTS = 1000
+LEVEL_PATTERN = re.compile(r'\b(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL)\b')
+
+
+def detect_log_level(line):
+    """Level named by the line itself, or None for continuation and untagged lines"""
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict) and record.get('level'):
+            level = str(record['level']).upper()
+            return 'WARNING' if level == 'WARN' else level
+    match = LEVEL_PATTERN.search(line[:200])
+    if not match:
+        return None
+    return 'WARNING' if match.group(1) == 'WARN' else match.group(1)
+
+
+class LogIndex:
+    """
+    Sidecar index for one log file: for every minute, the byte range its lines
+    occupy and how many lines of each level it holds. Completed minutes are
+    appended to a JSON-lines file named after the file's inode, so a rotated
+    (renamed) file keeps its index. The minute in progress lives in memory and is
+    rebuilt from the file after a restart. Lines without a timestamp or level
+    (tracebacks, payload dumps) belong to the line they follow.
+    """
+
+    def __init__(self, path, inode):
+        self.path = path
+        self.inode = inode
+        self.lock = threading.Lock()
+        self.sidecar = os.path.join(os.path.dirname(os.path.abspath(path)), INDEX_DIR_NAME, f"{inode}.jsonl")
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.entries = []
+        self.current = None
+        self.indexed_to = 0
+        self.last_timestamp = None
+        self.last_level = None
+
+    def _file_head(self, length):
+        with open(self.path, 'rb') as f:
+            return hashlib.sha1(f.read(length)).hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.sidecar) as f:
+                header = json.loads(f.readline())
+                # Inode numbers are reused; the head of the file tells a new file from the old one
+                if self._file_head(header['head_len']) != header['head']:
+                    raise ValueError("sidecar belongs to a different file")
+                self.entries = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Discarding log index {self.sidecar}: {e}")
+            self.entries = []
+            self._remove_sidecar()
+            return
+        if self.entries:
+            last = self.entries[-1]
+            self.indexed_to = last['end']
+            self.last_timestamp = last['last_timestamp']
+            self.last_level = last['last_level']
+
+    def _remove_sidecar(self):
+        try:
+            os.remove(self.sidecar)
+        except FileNotFoundError:
+            pass
+
+    def _complete(self, entry):
+        self.entries.append(entry)
+        os.makedirs(os.path.dirname(self.sidecar), exist_ok=True)
+        is_new = not os.path.exists(self.sidecar)
+        with open(self.sidecar, 'a') as f:
+            if is_new:
+                head_len = min(HEAD_FINGERPRINT_BYTES, os.path.getsize(self.path))
+                f.write(json.dumps({'inode': self.inode, 'head': self._file_head(head_len), 'head_len': head_len}) + "\n")
+            f.write(json.dumps(entry) + "\n")
+
+    def _observe(self, start, end, text):
+        timestamp = parse_log_timestamp(text) or self.last_timestamp
+        level = detect_log_level(text) or self.last_level
+        minute = timestamp[:16] if timestamp else None
+        if self.current is None or minute != self.current['minute']:
+            if self.current is not None:
+                self._complete(self.current)
+            self.current = {
+                'minute': minute,
+                'start': start,
+                'end': end,
+                'levels': {},
+                'first_timestamp': timestamp,
+                'first_level': self.last_level,
+            }
+        self.current['end'] = end
+        if level:
+            self.current['levels'][level] = self.current['levels'].get(level, 0) + 1
+        self.current['last_timestamp'] = timestamp
+        self.current['last_level'] = level
+        self.last_timestamp = timestamp
+        self.last_level = level
+        self.indexed_to = end
+
+    def _catch_up(self, until=None):
+        """Index complete lines from indexed_to up to `until` (end of file when None)"""
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < self.indexed_to:
+                # Truncated in place: everything indexed so far is gone
+                self._reset()
+                self._remove_sidecar()
+            stop = size if until is None else min(until, size)
+            f.seek(self.indexed_to)
+            position = self.indexed_to
+            partial = b""
+            while position < stop:
+                block = f.read(min(READ_BLOCK_SIZE, stop - position))
+                if not block:
+                    break
+                position += len(block)
+                lines = (partial + block).split(b"\n")
+                partial = lines.pop()
+                for raw in lines:
+                    start = self.indexed_to
+                    text = raw.decode('utf-8', errors='replace').strip()
+                    if text:
+                        self._observe(start, start + len(raw) + 1, text)
+                    else:
+                        self.indexed_to = start + len(raw) + 1
+
+    def catch_up(self):
+        with self.lock:
+            self._catch_up()
+
+    def observe(self, start, end, text):
+        """Record a line the tailer has just read, filling any gap from the file first"""
+        with self.lock:
+            if start > self.indexed_to:
+                self._catch_up(until=start)
+            if start == self.indexed_to:
+                self._observe(start, end, text)
+
+    def reset(self):
+        with self.lock:
+            self._reset()
+            self._remove_sidecar()
+
+    def candidate_ranges(self, level=None, minute_from=None, minute_to=None):
+        """Byte ranges of the minutes that can hold matches, with the context needed to read them"""
+        with self.lock:
+            entries = self.entries + ([dict(self.current)] if self.current else [])
+        ranges = []
+        for entry in entries:
+            minute = entry['minute']
+            if (minute_from or minute_to) and minute is None:
+                continue
+            if minute_from and minute < minute_from:
+                continue
+            if minute_to and minute > minute_to:
+                continue
+            if level and not entry['levels'].get(level):
+                continue
+            ranges.append(entry)
+        return ranges
+
+
+_log_indexes = {}
+_log_indexes_lock = threading.Lock()
+
+
+def get_log_index(path, inode=None):
+    """Index for the file currently at `path`, shared by the tailer and searches"""
+    if inode is None:
+        inode = os.stat(path).st_ino
+    key = (os.path.dirname(os.path.abspath(path)), inode)
+    with _log_indexes_lock:
+        index = _log_indexes.get(key)
+        if index is None:
+            index = LogIndex(path, inode)
+            _log_indexes[key] = index
+        # After rotation the same inode is found under a new name
+        index.path = path
+        return index
+
+
+def log_files_for_search():
+    """The live log file and its uncompressed rotations, oldest first"""
+    directory = os.path.dirname(os.path.abspath(log_file_path))
+    base = os.path.basename(log_file_path)
+    if not os.path.isdir(directory):
+        return []
+    files = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if (name == base or name.startswith(base + ".")) and not name.endswith(".gz")
+        and os.path.isfile(os.path.join(directory, name))
+    ]
+    return sorted(files, key=os.path.getmtime)
+
+
+def search_logs(level=None, time_from=None, time_to=None, path=None, text=None, limit=DEFAULT_SEARCH_LIMIT):
+    """Matching lines in chronological order; only minutes the index says can match are read"""
+    results = []
+    scanned = 0
+    text = text.lower() if text else None
+    minute_from = time_from[:16] if time_from else None
+    minute_to = time_to[:16] if time_to else None
+
+    for file_path in log_files_for_search():
+        index = get_log_index(file_path)
+        index.catch_up()
+        with open(file_path, 'rb') as f:
+            for entry in index.candidate_ranges(level, minute_from, minute_to):
+                f.seek(entry['start'])
+                block = f.read(entry['end'] - entry['start'])
+                scanned += len(block)
+                offset = entry['start']
+                timestamp, line_level = entry['first_timestamp'], entry['first_level']
+                for raw in block.split(b"\n"):
+                    line_offset, offset = offset, offset + len(raw) + 1
+                    line = raw.decode('utf-8', errors='replace').strip()
+                    if not line:
+                        continue
+                    timestamp = parse_log_timestamp(line) or timestamp
+                    line_level = detect_log_level(line) or line_level
+                    if level and line_level != level:
+                        continue
+                    if time_from and (not timestamp or timestamp < time_from):
+                        continue
+                    if time_to and (not timestamp or timestamp > time_to):
+                        continue
+                    if path and path not in line:
+                        continue
+                    if text and text not in line.lower():
+                        continue
+                    results.append({
+                        'file': os.path.basename(file_path),
+                        'offset': line_offset,
+                        'line': line,
+                        'timestamp': timestamp,
+                        'level': line_level
+                    })
+                    if len(results) >= limit:
+                        return results, True, scanned
+    return results, False, scanned
+
+
+# ==================== FILE WATCHING ====================
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+POLL_INTERVAL = 1.0
+
+
+class FileWatcher:
+    """
+    Blocks until something changes in the directory holding the log file.
+    Uses inotify through libc on Linux; elsewhere it falls back to a slow poll.
+    The directory is watched rather than the file so rotation (rename + create)
+    and deletion are noticed as well as appends.
+    """
+
+    def __init__(self, path):
+        self.fd = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            directory = os.path.dirname(os.path.abspath(path))
+            if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            self.fd = fd
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling {path} every {POLL_INTERVAL}s")
+
+    def wait(self, timeout):
+        if self.fd is None:
+            time.sleep(min(timeout, POLL_INTERVAL))
+            return
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try:
+                # Only the wake-up matters; the tailer re-checks the file itself
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def monitor_log_file(stop):
+    """Tail the log file and publish each complete line to every subscriber"""
+    watcher = FileWatcher(log_file_path)
+    f = None
+    index = None
+    partial = b""
+    line_start = 0
+    # Only the file that is current at start-up is tailed from its end;
+    # a file that replaces it after rotation is read from the beginning.
+    seek_to_end = True
+    try:
+        while not stop.is_set():
+            if f is None:
+                if not os.path.exists(log_file_path):
+                    watcher.wait(1)
+                    continue
+                f = open(log_file_path, 'rb')
+                index = get_log_index(log_file_path, os.fstat(f.fileno()).st_ino)
+                if seek_to_end:
+                    # Lines before the tail position are indexed from the file instead
+                    index.catch_up()
+                    f.seek(0, 2)
+                    seek_to_end = False
+                line_start = f.tell()
+
+            chunk = f.read()
+            if chunk:
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()
+                for raw in lines:
+                    start, line_start = line_start, line_start + len(raw) + 1
+                    line = raw.decode('utf-8', errors='replace').strip()
+                    if line:
+                        broadcaster.publish({
+                            'line': line,
+                            'timestamp': parse_log_timestamp(line) or datetime.now().isoformat()
+                        })
+                        index.observe(start, line_start, line)
+                continue
+
+            try:
+                current = os.stat(log_file_path)
+            except FileNotFoundError:
+                current = None
+            opened = os.fstat(f.fileno())
+            if current is None or current.st_ino != opened.st_ino:
+                # Rotated or deleted: the old file has been drained above, follow the new one
+                f.close()
+                f = None
+                partial = b""
+                continue
+            if current.st_size < f.tell():
+                # Truncated in place (copytruncate or `> server.log`)
+                f.seek(0)
+                partial = b""
+                line_start = 0
+                index.reset()
+                continue
+
+            watcher.wait(1)
+    finally:
+        if f is not None:
+            f.close()
+        watcher.close()
+
+
+def ensure_monitoring():
+    """Start the tailer thread if it is not already running"""
+    global is_monitoring, monitor_thread, monitor_stop
+    if is_monitoring:
+        return False
+    # Each tailer gets its own stop event so a stop/start pair never leaves two running
+    monitor_stop = threading.Event()
+    is_monitoring = True
+    monitor_thread = threading.Thread(target=monitor_log_file, args=(monitor_stop,), daemon=True)
+    monitor_thread.start()
+    return True
+
 
 @app.route('/')
 def index():
     """Serve the log monitor interface"""
     # Auto-start monitoring when page loads
-    global is_monitoring, monitor_thread
-    if not is_monitoring:
-        is_monitoring = True
-        monitor_thread = threading.Thread(target=monitor_log_file, daemon=True)
-        monitor_thread.start()
-    
+    ensure_monitoring()
     return render_template_string(HTML_TEMPLATE)
 
 @app.route('/stream')
 def stream():
-    """Server-Sent Events endpoint for real-time log streaming"""
+    """Server-Sent Events endpoint; every connected client receives every line"""
+    subscription = broadcaster.subscribe()
+
     def generate():
-        while True:
-            try:
-                # Wait for new log entries
-                data = log_queue.get(timeout=1)
-                yield f"data: {json.dumps(data)}\n\n"
-            except queue.Empty:
-                # Send keepalive
-                yield f"data: {json.dumps({'keepalive': True})}\n\n"
-    
+        try:
+            while True:
+                items, dropped = subscription.drain(timeout=15)
+                if dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                for item in items:
+                    yield f"data: {json.dumps(item)}\n\n"
+                if not items and not dropped:
+                    # SSE comment; keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
     return Response(generate(), mimetype='text/event-stream')
 
 @app.route('/api/status')
@@ -521,21 +1099,15 @@ def get_status():
     return jsonify({
         'is_monitoring': is_monitoring,
         'log_file': log_file_path,
-        'log_file_exists': os.path.exists(log_file_path)
+        'log_file_exists': os.path.exists(log_file_path),
+        'subscribers': broadcaster.subscriber_count
     })
 
 @app.route('/api/start', methods=['POST'])
 def start_monitoring():
     """Start log monitoring"""
-    global is_monitoring, monitor_thread
-    
-    if is_monitoring:
+    if not ensure_monitoring():
         return jsonify({'status': 'already_monitoring'})
-    
-    is_monitoring = True
-    monitor_thread = threading.Thread(target=monitor_log_file, daemon=True)
-    monitor_thread.start()
-    
     return jsonify({'status': 'started'})
 
 @app.route('/api/stop', methods=['POST'])
@@ -544,31 +1116,78 @@ def stop_monitoring():
     global is_monitoring
     
     is_monitoring = False
+    monitor_stop.set()
     return jsonify({'status': 'stopped'})
 
 @app.route('/api/logs')
 def get_logs():
-    """Get recent logs"""
+    """
+    Get the last `limit` lines, or the lines before byte offset `before`.
+    Pass the returned `next_before` back as `before` to page further into history.
+    """
     if not os.path.exists(log_file_path):
         return jsonify({'logs': [], 'error': 'Log file not found'})
-    
+
     try:
-        with open(log_file_path, 'r') as f:
-            lines = f.readlines()
-            # Return last 100 lines with timestamps
-            recent_lines = lines[-100:] if len(lines) > 100 else lines
-            logs_with_timestamps = []
-            for line in recent_lines:
-                line = line.strip()
-                if line:
-                    logs_with_timestamps.append({
-                        'line': line,
-                        'timestamp': datetime.now().isoformat()
-                    })
-            return jsonify({'logs': logs_with_timestamps})
+        limit = min(max(int(request.args.get('limit', DEFAULT_LOG_LIMIT)), 1), MAX_LOG_LIMIT)
+        before = request.args.get('before')
+        before = int(before) if before not in (None, '') else None
+    except ValueError:
+        return jsonify({'logs': [], 'error': 'limit and before must be integers'}), 400
+
+    try:
+        lines, size = read_lines_before(log_file_path, before, limit)
+        logs = []
+        last_timestamp = None
+        for offset, line in lines:
+            # Continuation lines (tracebacks, multi-line payloads) take the time of the line they belong to
+            timestamp = parse_log_timestamp(line) or last_timestamp
+            last_timestamp = timestamp
+            logs.append({'line': line, 'timestamp': timestamp, 'offset': offset})
+        oldest = lines[0][0] if lines else 0
+        return jsonify({
+            'logs': logs,
+            'next_before': oldest if oldest > 0 else None,
+            'file_size': size
+        })
     except Exception as e:
         return jsonify({'logs': [], 'error': str(e)})
 
+@app.route('/api/search')
+def search():
+    """
+    Search the live log and its rotations by level, time range (`from`/`to`,
+    ISO timestamps compared as written in the log), request path and free text (`q`).
+    """
+    level = (request.args.get('level') or '').upper() or None
+    if level == 'WARN':
+        level = 'WARNING'
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_RESULTS)
+    except ValueError:
+        return jsonify({'results': [], 'error': 'limit must be an integer'}), 400
+
+    time_from = request.args.get('from') or None
+    time_to = request.args.get('to') or None
+    for value in (time_from, time_to):
+        if value and not parse_log_timestamp(value):
+            return jsonify({'results': [], 'error': f'Invalid timestamp: {value}'}), 400
+    time_from = parse_log_timestamp(time_from) if time_from else None
+    time_to = parse_log_timestamp(time_to) if time_to else None
+
+    try:
+        results, truncated, scanned = search_logs(
+            level=level,
+            time_from=time_from,
+            time_to=time_to,
+            path=request.args.get('path') or None,
+            text=request.args.get('q') or None,
+            limit=limit,
+        )
+    except Exception as e:
+        return jsonify({'results': [], 'error': str(e)})
+    return jsonify({'results': results, 'truncated': truncated, 'scanned_bytes': scanned})
+
 def main():
     """Main function"""
     import argparse
@@ -577,11 +1196,13 @@ def main():
     parser.add_argument('--port', type=int, default=5000, help='Port for the web interface')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind to')
     parser.add_argument('--log-file', default='logs/server.log', help='Log file to monitor')
+    parser.add_argument('--buffer-size', type=int, default=1000, help='Lines buffered per viewer before the oldest are dropped')
     
     args = parser.parse_args()
     
-    global log_file_path
+    global log_file_path, subscriber_buffer_size
     log_file_path = args.log_file
+    subscriber_buffer_size = args.buffer_size
     
     print(f"🔍 Starting Versal API Log Monitor")
     print(f"📁 Monitoring log file: {log_file_path}")
@@ -4,32 +4,130 @@ import os
 import json
 import random
 from datetime import datetime, timedelta, date
-from collections import Counter
+from collections import OrderedDict
+from contextlib import closing
 from supabase import create_client, Client
 import os
 import subprocess
+import re
+import shutil
+import tarfile
+import fcntl
+import tempfile
+import gzip
+import hashlib
+import hmac
+import base64
+import sqlite3
 from datetime import datetime
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from dotenv import load_dotenv
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import requests
 from jose import jwt as jose_jwt
 from jose.exceptions import JWTError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import httpx
 import uvicorn
 import sys
-from typing import Optional, List, Dict, Any
+import threading
+import time
+import atexit
+import logging
+import logging.handlers
+import queue
+import uuid
+from contextvars import ContextVar, copy_context
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter as PrometheusCounter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
 
 load_dotenv()  # Load environment variables from .env file
 
 # Check for DEBUG mode from environment variable
 DEBUG_MODE = os.getenv("DEBUG", "false").lower() == "true"
 
+# ==================== STRUCTURED LOGGING ====================
+# Records are handed to a bounded in-memory queue on the request path and
+# formatted/written as JSON lines by a single background listener thread.
+# Messages use lazy %-style arguments, so disabled levels cost one level check.
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Correlation id of the request being served ("-" outside a request)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Format a log record as a single JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id on the calling thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that defers formatting and never blocks the caller"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so the record can be passed as is
+        # and message interpolation/JSON encoding happen on the writer thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_log_stream_handler = logging.StreamHandler(sys.stdout)
+_log_stream_handler.setFormatter(JsonLogFormatter())
+_log_queue_handler = NonBlockingQueueHandler(_log_queue)
+_log_queue_handler.addFilter(RequestIdFilter())
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logger = logging.getLogger("versal")
+logger.setLevel(logging.DEBUG if DEBUG_MODE else logging.INFO)
+logger.addHandler(_log_queue_handler)
+logger.propagate = False
+
 if DEBUG_MODE:
-    print("🔧 DEBUG MODE ENABLED - Debug endpoints and features are active")
+    logger.info("🔧 DEBUG MODE ENABLED - Debug endpoints and features are active")
 else:
-    print("🚀 PRODUCTION MODE - Debug features are disabled")
+    logger.info("🚀 PRODUCTION MODE - Debug features are disabled")
 
 app = FastAPI(
     title="Versal API",
@@ -40,9 +138,9 @@ app = FastAPI(
 )
 
 def _create_serials_for_grn_item(product_id: str, serial_numbers: List[str], grn_item_id: str):
-    print(f"DEBUG: _create_serials_for_grn_item called with product_id: {product_id}, serial_numbers: {serial_numbers}, grn_item_id: {grn_item_id}")
+    logger.debug("_create_serials_for_grn_item called with product_id: %s, serial_numbers: %s, grn_item_id: %s", product_id, serial_numbers, grn_item_id)
     if not serial_numbers:
-        print("DEBUG: No serial numbers provided")
+        logger.debug("No serial numbers provided")
         return
     
     # Note: We don't need product info for inventory transactions anymore
@@ -61,10 +159,10 @@ def _create_serials_for_grn_item(product_id: str, serial_numbers: List[str], grn
             "status": "available",
             "grn_item_id": grn_item_id,
         })
-    print(f"DEBUG: Prepared {len(payload_rows)} serial rows to insert")
+    logger.debug("Prepared %s serial rows to insert", len(payload_rows))
     if payload_rows:
         result = supabase.table("product_serials").insert(payload_rows).execute()
-        print(f"DEBUG: Serial insert result: {result.data if result else 'No result'}")
+        logger.debug("Serial insert result: %s", result.data if result else 'No result')
         
         # Create inventory transaction for RECEIPT of serialized products
         # Since these are new serials being created, we create a single transaction for the batch
@@ -79,7 +177,7 @@ def _create_serials_for_grn_item(product_id: str, serial_numbers: List[str], grn
             None  # GRN doesn't have user context in this function
         )
     else:
-        print("DEBUG: No payload rows to insert")
+        logger.debug("No payload rows to insert")
 
 def _create_inventory_transaction_for_serial_status_change(
     product_id: str, 
@@ -130,7 +228,7 @@ def _create_inventory_transaction_for_serial_status_change(
             return
         
         if transaction_type is None:
-            print(f"Warning: No transaction type defined for status change {old_status} -> {new_status}")
+            logger.warning("No transaction type defined for status change %s -> %s", old_status, new_status)
             return
         
         # Create inventory transaction
@@ -145,10 +243,10 @@ def _create_inventory_transaction_for_serial_status_change(
         }
         
         supabase.table("inventory_transactions").insert(transaction_data).execute()
-        print(f"Created inventory transaction for serial {serial_number}: {old_status} -> {new_status}")
+        logger.debug("Created inventory transaction for serial %s: %s -> %s", serial_number, old_status, new_status)
         
     except Exception as e:
-        print(f"Warning: Failed to create inventory transaction for serial {serial_number}: {e}")
+        logger.warning("Failed to create inventory transaction for serial %s: %s", serial_number, e)
         # Don't fail the main operation if transaction creation fails
 
 def _reserve_or_sell_serials_for_invoice_item(product_id: str, serial_numbers: List[str], sale_invoice_item_id: str, finalize: bool = False, created_by: str = None):
@@ -225,6 +323,95 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# ==================== REQUEST METRICS ====================
+# Prometheus metrics per route template (e.g. /products/{product_id}), so the
+# label set stays bounded. Under gunicorn, PROMETHEUS_MULTIPROC_DIR points every
+# worker at a shared directory of mmap'd files and /metrics aggregates them;
+# without it the metrics cover the current process only.
+HTTP_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUESTS_TOTAL = PrometheusCounter(
+    "versal_http_requests_total",
+    "HTTP requests served, by route and status code",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "versal_http_request_duration_seconds",
+    "HTTP request latency, by route",
+    ["method", "route"],
+    buckets=HTTP_LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "versal_http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+
+def _route_label(request: Request) -> str:
+    """Route template the request matched, or a fixed label for unmatched paths"""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    """Tag every log line of a request with a correlation id, record metrics and Supabase calls, and log its outcome"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    token = request_id_var.set(request_id)
+    trace = SupabaseCallTrace()
+    trace_token = supabase_trace_var.set(trace)
+    in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(request.method)
+    in_progress.inc()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        if trace.calls:
+            response.headers["Server-Timing"] = trace.server_timing()
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        in_progress.dec()
+        route = _route_label(request)
+        HTTP_REQUESTS_TOTAL.labels(request.method, route, str(status_code)).inc()
+        HTTP_REQUEST_DURATION.labels(request.method, route).observe(elapsed)
+        logger.info(
+            "%s %s -> %s (%.1f ms)",
+            request.method, request.url.path, status_code, elapsed * 1000,
+        )
+        if trace.calls > SUPABASE_CALL_WARN_THRESHOLD:
+            logger.warning(
+                "%s %s made %d Supabase calls (%.1f ms): %s",
+                request.method, route, trace.calls, trace.seconds * 1000, trace.breakdown(),
+            )
+        supabase_trace_var.reset(trace_token)
+        request_id_var.reset(token)
+
+
+# /metrics exposes route names and traffic, so it is off unless a scrape token is set
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+@app.get("/metrics")
+def metrics(request: Request):
+    """Prometheus text exposition of the request metrics of all workers"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")  # Backward compat: treated as PUBLIC if INTERNAL not set
 SUPABASE_INTERNAL_URL = os.getenv("SUPABASE_INTERNAL_URL", SUPABASE_URL)
 SUPABASE_PUBLIC_URL = os.getenv("SUPABASE_PUBLIC_URL", SUPABASE_URL)
@@ -244,9 +431,85 @@ GITHUB_REPO = os.getenv("GITHUB_REPO")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 # Labels are now fully dynamic from GitHub; no static defaults injected
 
+# ==================== SUPABASE CALL TRACING ====================
+# Every PostgREST round trip (table or rpc) made while serving a request is
+# counted and timed per target, so N+1 loops show up in the logs and in the
+# Server-Timing response header instead of only as slow requests.
+SUPABASE_CALL_WARN_THRESHOLD = int(os.getenv("SUPABASE_CALL_WARN_THRESHOLD", "25"))
+SERVER_TIMING_MAX_TARGETS = 10
+
+
+class SupabaseCallTrace:
+    """Count and cumulative time of the PostgREST calls made by one request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.seconds = 0.0
+        self.targets: Dict[str, List[float]] = {}
+
+    def record(self, target: str, seconds: float) -> None:
+        # Dashboard sections record from several threads at once
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+            stats = self.targets.setdefault(target, [0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+
+    def _ranked(self):
+        return sorted(self.targets.items(), key=lambda item: item[1][1], reverse=True)
+
+    def breakdown(self) -> str:
+        return ", ".join(f"{target} x{int(count)} ({seconds * 1000:.1f} ms)" for target, (count, seconds) in self._ranked())
+
+    def server_timing(self) -> str:
+        entries = [f'db;dur={self.seconds * 1000:.1f};desc="x{self.calls}"']
+        for target, (count, seconds) in self._ranked()[:SERVER_TIMING_MAX_TARGETS]:
+            entries.append(f'db.{target};dur={seconds * 1000:.1f};desc="x{int(count)}"')
+        return ", ".join(entries)
+
+
+# Trace of the request being served (None outside a request, e.g. backup jobs)
+supabase_trace_var: ContextVar[Optional[SupabaseCallTrace]] = ContextVar("supabase_trace", default=None)
+
+
+def _postgrest_target(url: httpx.URL) -> str:
+    """Table name, or rpc.<function>, addressed by a PostgREST URL"""
+    path = url.path
+    marker = path.find("/rest/v1/")
+    name = path[marker + len("/rest/v1/"):] if marker >= 0 else path.strip("/")
+    if name.startswith("rpc/"):
+        return "rpc." + name[len("rpc/"):]
+    return name or "root"
+
+
+def _trace_postgrest_request(request: httpx.Request) -> None:
+    request.extensions["versal_started"] = time.perf_counter()
+
+
+def _trace_postgrest_response(response: httpx.Response) -> None:
+    trace = supabase_trace_var.get()
+    started = response.request.extensions.get("versal_started")
+    if trace is None or started is None:
+        return
+    # Include the body transfer; postgrest reads the already-buffered content
+    response.read()
+    trace.record(_postgrest_target(response.request.url), time.perf_counter() - started)
+
+
+def _install_supabase_tracing(client: Client) -> Client:
+    session = client.postgrest.session
+    hooks = session.event_hooks
+    session.event_hooks = {
+        "request": [*hooks.get("request", []), _trace_postgrest_request],
+        "response": [*hooks.get("response", []), _trace_postgrest_response],
+    }
+    return client
+
 def get_supabase_client():
     """Get a fresh Supabase client to avoid connection reuse issues"""
-    return create_client(SUPABASE_INTERNAL_URL, SUPABASE_SERVICE_KEY)
+    return _install_supabase_tracing(create_client(SUPABASE_INTERNAL_URL, SUPABASE_SERVICE_KEY))
 
 # Keep a global client for backward compatibility
 supabase: Client = get_supabase_client()
@@ -255,11 +518,6 @@ bearer_scheme = HTTPBearer()
 # Cache the JWK set
 _jwk_set = None
 
-def debug_log(message):
-    """Log message only if DEBUG mode is enabled"""
-    if DEBUG_MODE:
-        print(f"[DEBUG] {message}")
-
 def require_debug_mode():
     """Decorator to require DEBUG mode for endpoints"""
     def decorator(func):
@@ -273,6 +531,49 @@ def require_debug_mode():
         return wrapper
     return decorator
 
+# ==================== Versioned Response Cache ====================
+# Report payloads are cached per worker and keyed by a version counter in the
+# cache_versions table. Database triggers bump the counter on writes to the
+# underlying tables, so a cached payload stays valid exactly until the data
+# changes, across every gunicorn worker, at the cost of one primary-key read.
+
+# Bounded LRU: keys include caller input (e.g. asOf), so the size must not depend on it
+VERSIONED_CACHE_MAX_ENTRIES = int(os.getenv("VERSIONED_CACHE_MAX_ENTRIES", "256"))
+_versioned_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+_versioned_cache_lock = threading.Lock()
+
+def _get_cache_version(scope: str) -> Optional[int]:
+    """Return the current version for a cache scope, or None if it cannot be read."""
+    try:
+        res = supabase.table("cache_versions").select("version").eq("scope", scope).limit(1).execute()
+        return int(res.data[0]["version"]) if res.data else 0
+    except Exception as e:
+        logger.warning("Failed to read cache version for '%s': %s", scope, e)
+        return None
+
+def _cached_by_version(scope: str, key: str, compute):
+    """Return compute() for (scope, key), reusing the cached value while the scope version is unchanged."""
+    version = _get_cache_version(scope)
+    cache_key = (scope, key)
+    if version is not None:
+        with _versioned_cache_lock:
+            entry = _versioned_cache.get(cache_key)
+            if entry and entry["version"] == version:
+                _versioned_cache.move_to_end(cache_key)
+                return entry["value"]
+    value = compute()
+    if version is not None:
+        with _versioned_cache_lock:
+            # Entries from an older version of the scope can never be served again
+            stale = [k for k, e in _versioned_cache.items() if k[0] == scope and e["version"] < version]
+            for k in stale:
+                del _versioned_cache[k]
+            _versioned_cache[cache_key] = {"version": version, "value": value}
+            _versioned_cache.move_to_end(cache_key)
+            while len(_versioned_cache) > VERSIONED_CACHE_MAX_ENTRIES:
+                _versioned_cache.popitem(last=False)
+    return value
+
 """
 ===================== SERIAL INVENTORY ENDPOINTS =====================
 Note: verify_jwt is defined below; FastAPI evaluates dependencies at runtime,
@@ -309,19 +610,19 @@ def get_jwk_set():
     global _jwk_set
     if _jwk_set is None:
         try:
-            print(f"🔍 Fetching JWKS from: {SUPABASE_JWKS_URL}")
+            logger.info("🔍 Fetching JWKS from: %s", SUPABASE_JWKS_URL)
             resp = requests.get(SUPABASE_JWKS_URL, timeout=5)
             resp.raise_for_status()
             jwk_data = resp.json()
             # Ensure we return the keys array, not the entire response
             if isinstance(jwk_data, dict) and "keys" in jwk_data:
                 _jwk_set = jwk_data
-                print(f"✅ JWKS fetched successfully. Found {len(_jwk_set.get('keys', []))} keys")
+                logger.info("✅ JWKS fetched successfully. Found %s keys", len(_jwk_set.get('keys', [])))
             else:
                 _jwk_set = jwk_data
-                print(f"⚠️ JWKS response format unexpected: {type(jwk_data)}")
+                logger.warning("⚠️ JWKS response format unexpected: %s", type(jwk_data))
         except Exception as e:
-            print(f"❌ Failed to fetch JWKS from {SUPABASE_JWKS_URL}: {str(e)}")
+            logger.error("❌ Failed to fetch JWKS from %s: %s", SUPABASE_JWKS_URL, e)
             # If JWK fetch fails, return a minimal valid JWK set
             _jwk_set = {"keys": []}
     return _jwk_set
@@ -336,17 +637,17 @@ def verify_jwt(credentials: HTTPAuthorizationCredentials = Security(bearer_schem
     if SUPABASE_JWT_SECRET:
         try:
             payload = jose_jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], options={"verify_aud": False})
-            debug_log(f"✅ JWT verified successfully (HS256) for user: {payload.get('sub')}")
+            logger.debug("✅ JWT verified successfully (HS256) for user: %s", payload.get('sub'))
             return payload
         except JWTError as e:
-            debug_log(f"HS256 verification failed: {str(e)}, trying ES256 with JWKS...")
+            logger.debug("HS256 verification failed: %s, trying ES256 with JWKS...", e)
     
     # Fallback to ES256 with JWKS (for production/cloud Supabase)
     jwk_set = get_jwk_set()
     
     # Check if JWKS is available
     if not jwk_set or not jwk_set.get("keys") or len(jwk_set.get("keys", [])) == 0:
-        debug_log(f"⚠️ WARNING: JWKS set is empty or unavailable. JWKS URL: {SUPABASE_JWKS_URL}")
+        logger.warning("⚠️ JWKS set is empty or unavailable. JWKS URL: %s", SUPABASE_JWKS_URL)
         # Try to refresh JWKS
         global _jwk_set
         _jwk_set = None
@@ -366,10 +667,10 @@ def verify_jwt(credentials: HTTPAuthorizationCredentials = Security(bearer_schem
     try:
         # python-jose will automatically select the correct key from the set
         payload = jose_jwt.decode(token, jwk_set, algorithms=["ES256"], options={"verify_aud": False})
-        debug_log(f"✅ JWT verified successfully (ES256) for user: {payload.get('sub')}")
+        logger.debug("✅ JWT verified successfully (ES256) for user: %s", payload.get('sub'))
         return payload
     except JWTError as e:
-        debug_log(f"❌ JWT verification failed (ES256): {str(e)}")
+        logger.debug("❌ JWT verification failed (ES256): %s", e)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token: {str(e)}")
 
 def to_camel_case_category(category):
@@ -428,7 +729,7 @@ async def get_user_role_and_permissions(user_id: str, client: Client) -> Dict[st
             "permissions": permissions if isinstance(permissions, list) else []
         }
     except Exception as e:
-        print(f"Error fetching user role: {str(e)}")
+        logger.error("Error fetching user role: %s", e)
         return {"role": None, "permissions": []}
 
 def require_role(allowed_roles: List[str]):
@@ -467,7 +768,7 @@ def require_permission(required_permission: str):
             raise HTTPException(status_code=401, detail="Invalid token")
 
         try:
-            debug_log(f"Checking permission '{required_permission}' for user {user_id}")
+            logger.debug("Checking permission '%s' for user %s", required_permission, user_id)
             
             client = get_supabase_client()
             user_info = await get_user_role_and_permissions(user_id, client)
@@ -480,7 +781,7 @@ def require_permission(required_permission: str):
                  return payload
                  
             if required_permission not in user_permissions:
-                print(f"DEBUG: Permission DENIED. User {user_id} (Role: {user_role}) lacks '{required_permission}'. Available: {user_permissions}")
+                logger.debug("Permission DENIED. User %s (Role: %s) lacks '%s'. Available: %s", user_id, user_role, required_permission, user_permissions)
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN, 
                     detail=f"Forbidden: missing permission '{required_permission}'"
@@ -490,7 +791,7 @@ def require_permission(required_permission: str):
         except HTTPException:
             raise
         except Exception as e:
-            print(f"ERROR in require_permission: {str(e)}")
+            logger.error("ERROR in require_permission: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
                 detail=f"Error checking permissions: {str(e)}"
@@ -1000,18 +1301,27 @@ def upload_screenshot(file: UploadFile = File(...), payload=Depends(verify_jwt))
         raise HTTPException(status_code=500, detail=f"Failed to upload screenshot: {str(e)}")
 
 def to_camel_case_inventory_movement(movement):
+    # Product, location and user names come from the joins in GET /inventory/movements
+    product = movement.get("products") or {}
+    from_location = movement.get("from_location") or {}
+    to_location = movement.get("to_location") or {}
+    created_by_user = movement.get("created_by_user") or {}
     return {
         "id": movement.get("id"),
         "productId": movement.get("product_id"),
-        "productName": movement.get("product_name"),
-        "skuCode": movement.get("sku_code"),
+        "productName": product.get("name") or movement.get("product_name"),
+        "skuCode": product.get("sku_code") or movement.get("sku_code"),
         "type": movement.get("type"),
         "quantity": int(movement.get("quantity", 0)) if movement.get("quantity") is not None else 0,
         "previousStock": int(movement.get("previous_stock", 0)) if movement.get("previous_stock") is not None else 0,
         "newStock": int(movement.get("new_stock", 0)) if movement.get("new_stock") is not None else 0,
+        "fromLocationId": movement.get("from_location_id"),
+        "fromLocationName": from_location.get("name"),
+        "toLocationId": movement.get("to_location_id"),
+        "toLocationName": to_location.get("name"),
         "reference": movement.get("reference"),
         "notes": movement.get("notes"),
-        "createdBy": movement.get("created_by"),
+        "createdBy": created_by_user.get("full_name") or movement.get("created_by"),
         "createdAt": movement.get("created_at")
     }
 
@@ -1021,6 +1331,11 @@ def to_camel_case_location(location):
         "name": location.get("name"),
         "description": location.get("description"),
         "address": location.get("address"),
+        "zone": location.get("zone"),
+        "aisle": location.get("aisle"),
+        "bay": location.get("bay"),
+        "level": location.get("level"),
+        "capacity": location.get("capacity"),
         "isActive": location.get("is_active", True),
         "createdAt": location.get("created_at"),
         "updatedAt": location.get("updated_at")
@@ -1139,7 +1454,7 @@ def debug_inventory_transactions_schema():
 @app.get("/products")
 def get_products(payload=Depends(verify_jwt)):
     try:
-        debug_log("Products endpoint: Starting query with stock_levels...")
+        logger.debug("Products endpoint: Starting query with stock_levels...")
         # Query products with related category, unit, stock data, and tax information
         # Use specific relationship names to avoid conflicts
         products_data = supabase.table("products").select("""
@@ -1151,14 +1466,14 @@ def get_products(payload=Depends(verify_jwt)):
             sale_tax:taxes!products_sale_tax_id_fkey(id, name, rate)
         """).execute()
         
-        debug_log(f"Products endpoint: Query successful, got {len(products_data.data) if products_data.data else 0} products")
+        logger.debug("Products endpoint: Query successful, got %s products", len(products_data.data) if products_data.data else 0)
         
         if products_data.data:
             # Process the data to ensure stock_levels is always an array
             processed_data = []
             for product in products_data.data:
-                debug_log(f"Processing product {product.get('name', 'Unknown')}: stock_levels = {product.get('stock_levels')}")
-                debug_log(f"Product {product.get('name', 'Unknown')}: reorder_point = {product.get('reorder_point')} (type: {type(product.get('reorder_point'))})")
+                logger.debug("Processing product %s: stock_levels = %s", product.get('name', 'Unknown'), product.get('stock_levels'))
+                logger.debug("Product %s: reorder_point = %s (type: %s)", product.get('name', 'Unknown'), product.get('reorder_point'), type(product.get('reorder_point')))
                 # Convert stock_levels object to array if it's not already
                 if product.get('stock_levels') and not isinstance(product['stock_levels'], list):
                     product['stock_levels'] = [product['stock_levels']]
@@ -1166,22 +1481,22 @@ def get_products(payload=Depends(verify_jwt)):
                     product['stock_levels'] = []
                 processed_data.append(product)
             
-            debug_log(f"Products endpoint: Returning {len(processed_data)} processed products")
+            logger.debug("Products endpoint: Returning %s processed products", len(processed_data))
             return JSONResponse(content=processed_data)
         else:
-            debug_log("Products endpoint: No data returned from query")
+            logger.debug("Products endpoint: No data returned from query")
             return JSONResponse(content=[])
             
     except Exception as e:
-        debug_log(f"Exception in products endpoint: {str(e)}")
+        logger.debug("Exception in products endpoint: %s", e)
         # Fallback to basic query if join fails
         try:
-            debug_log("Products endpoint: Trying fallback query...")
+            logger.debug("Products endpoint: Trying fallback query...")
             products_data = supabase.table("products").select("*").execute()
-            debug_log(f"Fallback query returned {len(products_data.data) if products_data.data else 0} products")
+            logger.debug("Fallback query returned %s products", len(products_data.data) if products_data.data else 0)
             return JSONResponse(content=products_data.data or [])
         except Exception as fallback_error:
-            debug_log(f"Fallback query also failed: {str(fallback_error)}")
+            logger.debug("Fallback query also failed: %s", fallback_error)
             return JSONResponse(content=[])
 
 @app.post("/products")
@@ -1271,7 +1586,7 @@ def create_product(product: dict = Body(...), payload=Depends(require_permission
         
         # Handle initial stock quantity
         initial_quantity = product.get("initialQty", 0) or product.get("initial_quantity", 0)
-        debug_log(f"Create product: initial_quantity = {initial_quantity}, product_id = {created_product.get('id') if created_product else 'None'}")
+        logger.debug("Create product: initial_quantity = %s, product_id = %s", initial_quantity, created_product.get('id') if created_product else 'None')
         
         # Always create stock level record, even if initial_quantity is 0
         if created_product:
@@ -1284,11 +1599,11 @@ def create_product(product: dict = Body(...), payload=Depends(require_permission
                     "created_by": payload.get("sub")
                     # quantity_available is a generated column, so we don't set it
                 }
-                debug_log(f"Creating stock level with data: {stock_data}")
+                logger.debug("Creating stock level with data: %s", stock_data)
                 
                 # Create the stock level
                 stock_result = supabase.table("stock_levels").insert(stock_data).execute()
-                debug_log(f"Stock level created successfully for product {created_product['id']}")
+                logger.debug("Stock level created successfully for product %s", created_product['id'])
                 
                 # Create inventory transaction for audit trail only if there's initial quantity
                 if stock_result.data and len(stock_result.data) > 0 and initial_quantity > 0:
@@ -1305,26 +1620,26 @@ def create_product(product: dict = Body(...), payload=Depends(require_permission
                     
                     try:
                         supabase.table("inventory_transactions").insert(transaction_data).execute()
-                        debug_log(f"Created inventory transaction for initial stock")
+                        logger.debug("Created inventory transaction for initial stock")
                     except Exception as transaction_error:
-                        debug_log(f"Error creating inventory transaction: {str(transaction_error)}")
+                        logger.debug("Error creating inventory transaction: %s", transaction_error)
                         # Don't fail if transaction creation fails
                 else:
-                    debug_log(f"Stock level created for product {created_product['id']} with quantity: {initial_quantity}")
+                    logger.debug("Stock level created for product %s with quantity: %s", created_product['id'], initial_quantity)
                     
             except Exception as stock_error:
-                debug_log(f"Error creating stock level: {str(stock_error)}")
+                logger.debug("Error creating stock level: %s", stock_error)
                 # Check if it's a unique constraint violation (stock level already exists)
                 if "duplicate key value violates unique constraint" in str(stock_error) and "stock_levels_product_id_key" in str(stock_error):
-                    debug_log(f"Stock level already exists for product {created_product['id']}, skipping stock creation")
+                    logger.debug("Stock level already exists for product %s, skipping stock creation", created_product['id'])
                 else:
-                    debug_log(f"Unexpected error creating stock level: {str(stock_error)}")
+                    logger.debug("Unexpected error creating stock level: %s", stock_error)
                 # Don't fail the product creation if stock creation fails
         
         return JSONResponse(content=created_product)
         
     except Exception as e:
-        debug_log(f"Error creating product: {str(e)}")
+        logger.debug("Error creating product: %s", e)
         
         # Handle unique constraint violations
         if "duplicate key value violates unique constraint" in str(e):
@@ -1361,8 +1676,8 @@ def create_product(product: dict = Body(...), payload=Depends(require_permission
 @app.put("/products/{product_id}")
 def update_product(product_id: str, product: dict = Body(...), payload=Depends(require_permission("products_edit"))):
     try:
-        print(f"Update product {product_id}: Received data = {product}")
-        print(f"Update product {product_id}: reorderLevel value = {product.get('reorderLevel')} (type: {type(product.get('reorderLevel'))})")
+        logger.debug("Update product %s: Received data = %s", product_id, product)
+        logger.debug("Update product %s: reorderLevel value = %s (type: %s)", product_id, product.get('reorderLevel'), type(product.get('reorderLevel')))
         
         # Validate and trim input fields
         product_name = product.get("name", "").strip()
@@ -1442,12 +1757,12 @@ def update_product(product_id: str, product: dict = Body(...), payload=Depends(r
             "unit_conversions": product.get("unitConversions")
         }
         
-        print(f"Update product {product_id}: Saving data = {product_data}")
-        print(f"Update product {product_id}: reorder_point being saved = {product_data.get('reorder_point')} (type: {type(product_data.get('reorder_point'))})")
+        logger.debug("Update product %s: Saving data = %s", product_id, product_data)
+        logger.debug("Update product %s: reorder_point being saved = %s (type: %s)", product_id, product_data.get('reorder_point'), type(product_data.get('reorder_point')))
         data = supabase.table("products").update(product_data).eq("id", product_id).execute()
         updated_product = data.data[0] if data.data else {}
-        print(f"Update product {product_id}: Updated product = {updated_product}")
-        print(f"Update product {product_id}: reorder_point in response = {updated_product.get('reorder_point')} (type: {type(updated_product.get('reorder_point'))})")
+        logger.debug("Update product %s: Updated product = %s", product_id, updated_product)
+        logger.debug("Update product %s: reorder_point in response = %s (type: %s)", product_id, updated_product.get('reorder_point'), type(updated_product.get('reorder_point')))
         
         # Note: Stock level updates are disabled in edit mode
         # Stock quantities should be managed through the dedicated inventory module
@@ -1456,7 +1771,7 @@ def update_product(product_id: str, product: dict = Body(...), payload=Depends(r
         return JSONResponse(content=updated_product)
         
     except Exception as e:
-        print(f"Error updating product: {str(e)}")
+        logger.error("Error updating product: %s", e)
         
         # Handle unique constraint violations
         if "duplicate key value violates unique constraint" in str(e):
@@ -1496,7 +1811,7 @@ def delete_product(product_id: str, payload=Depends(require_permission("products
         data = supabase.table("products").delete().eq("id", product_id).execute()
         return JSONResponse(content={"message": "Product deleted successfully"})
     except Exception as e:
-        print(f"Error deleting product: {str(e)}")
+        logger.error("Error deleting product: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting product: {str(e)}"
@@ -1545,7 +1860,7 @@ def create_customer(customer: dict = Body(...), payload=Depends(require_permissi
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating customer: {str(e)}")
+        logger.error("Error creating customer: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating customer: {str(e)}"
@@ -1579,7 +1894,7 @@ def update_customer(customer_id: str, customer: dict = Body(...), payload=Depend
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating customer: {str(e)}")
+        logger.error("Error updating customer: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating customer: {str(e)}"
@@ -1598,44 +1913,77 @@ def get_customer_credit_balance(customer_id: str, payload=Depends(require_permis
         return JSONResponse(content={"creditBalance": 0})
     return JSONResponse(content={"creditBalance": data.data[0]["total_credit_balance"]})
 
+FREQUENT_ITEMS_DEFAULT_LIMIT = 5
+FREQUENT_ITEMS_MAX_LIMIT = 50
+
+def _record_customer_product_affinity(customer_id: str, order_date, items: List[dict]):
+    """
+    Fold a posted order's lines into customer_product_affinity.
+    `items` are snake_case line rows; repeated lines of one product count as a single order.
+    Failures are logged and swallowed so posting the document never fails on recommendations.
+    """
+    if not customer_id or not items:
+        return
+    per_product: Dict[str, dict] = {}
+    for item in items:
+        pid = item.get("product_id")
+        if not pid:
+            continue
+        entry = per_product.get(pid)
+        if entry is None:
+            per_product[pid] = {
+                "product_id": pid,
+                "quantity": float(item.get("quantity") or 0),
+                "unit_price": float(item.get("unit_price") or 0),
+                "tax": float(item.get("tax") or 0),
+                "sale_tax_type": item.get("sale_tax_type") or "exclusive",
+                "unit_abbreviation": item.get("unit_abbreviation") or "",
+            }
+        else:
+            entry["quantity"] += float(item.get("quantity") or 0)
+    if not per_product:
+        return
+    try:
+        supabase.rpc("record_customer_product_affinity", {
+            "p_customer_id": customer_id,
+            "p_order_date": str(order_date)[:10] if order_date else None,
+            "p_items": list(per_product.values()),
+        }).execute()
+    except Exception as e:
+        logger.warning("Failed to update customer product affinity for customer %s: %s", customer_id, e)
+
 @app.get("/customers/{customer_id}/frequent-items")
-def get_frequent_items(customer_id: str, payload=Depends(verify_jwt)):
-    """Analyze historical sales to find the most frequent products for a customer."""
+def get_frequent_items(customer_id: str, limit: int = FREQUENT_ITEMS_DEFAULT_LIMIT, payload=Depends(verify_jwt)):
+    """Return the customer's top products from the precomputed affinity model (recency-weighted)."""
+    limit = max(1, min(limit, FREQUENT_ITEMS_MAX_LIMIT))
     try:
         fresh_supabase = get_supabase_client()
-        # Fetch up to 100 historical items for this customer
-        data = fresh_supabase.table("sales_order_items") \
-            .select("*, products(*), sales_orders!inner(customer_id, order_date)") \
-            .eq("sales_orders.customer_id", customer_id) \
-            .order("sales_orders.order_date", desc=True) \
-            .limit(100) \
+        data = fresh_supabase.table("customer_product_affinity") \
+            .select("*, products(*)") \
+            .eq("customer_id", customer_id) \
+            .order("score", desc=True) \
+            .limit(limit) \
             .execute()
-            
-        if not data.data:
-            return JSONResponse(content=[])
-            
-        # Count product occurrences
-        product_counts = Counter([item["product_id"] for item in data.data])
-        # Get top 5 product IDs
-        top_product_ids = [pid for pid, _ in product_counts.most_common(5)]
-        
-        # Collect unique items for the top products using the most recent order data
+
         top_items = []
-        seen_products = set()
-        # Data is already sorted by date desc, so the first match for a pid is the most recent
-        for item in data.data:
-            pid = item["product_id"]
-            if pid in top_product_ids and pid not in seen_products:
-                transformed_item = to_camel_case_sales_order_item(item)
-                # Reset quantity and totals for template use
-                transformed_item["quantity"] = 1
-                # Discount might not carry over
-                transformed_item["discount"] = 0
-                top_items.append(transformed_item)
-                seen_products.add(pid)
-                if len(top_items) >= 5:
-                    break
-                    
+        for row in data.data or []:
+            # Shape each row like a sales order line so the dialogs can use it as a template
+            transformed_item = to_camel_case_sales_order_item({
+                "product_id": row.get("product_id"),
+                "products": row.get("products"),
+                "unit_price": row.get("last_unit_price"),
+                "tax": row.get("last_tax"),
+                "sale_tax_type": row.get("last_sale_tax_type"),
+                "unit_abbreviation": row.get("last_unit_abbreviation"),
+            })
+            # Reset quantity and totals for template use
+            transformed_item["quantity"] = 1
+            # Discount might not carry over
+            transformed_item["discount"] = 0
+            transformed_item["orderCount"] = row.get("order_count")
+            transformed_item["lastOrderedAt"] = row.get("last_ordered_at")
+            top_items.append(transformed_item)
+
         return JSONResponse(content=top_items)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch frequent items: {str(e)}")
@@ -1681,7 +2029,7 @@ def create_supplier(supplier: dict = Body(...), payload=Depends(require_permissi
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating supplier: {str(e)}")
+        logger.error("Error creating supplier: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating supplier: {str(e)}"
@@ -1713,7 +2061,7 @@ def update_supplier(supplier_id: str, supplier: dict = Body(...), payload=Depend
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating supplier: {str(e)}")
+        logger.error("Error updating supplier: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating supplier: {str(e)}"
@@ -1764,7 +2112,7 @@ def create_tax(tax: dict = Body(...), payload=Depends(require_permission("taxes_
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating tax: {str(e)}")
+        logger.error("Error creating tax: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating tax: {str(e)}"
@@ -1796,7 +2144,7 @@ def update_tax(tax_id: str, tax: dict = Body(...), payload=Depends(require_permi
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating tax: {str(e)}")
+        logger.error("Error updating tax: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating tax: {str(e)}"
@@ -1836,7 +2184,7 @@ def create_unit(unit: dict = Body(...), payload=Depends(require_permission("unit
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating unit: {str(e)}")
+        logger.error("Error creating unit: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating unit: {str(e)}"
@@ -1862,7 +2210,7 @@ def update_unit(unit_id: str, unit: dict = Body(...), payload=Depends(require_pe
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating unit: {str(e)}")
+        logger.error("Error updating unit: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating unit: {str(e)}"
@@ -1879,8 +2227,68 @@ def get_inventory(payload=Depends(require_permission("inventory_view"))):
     return JSONResponse(content=data.data)
 
 # Stock Levels endpoints
+def _parse_stock_as_of(as_of: str) -> str:
+    """A date means the end of that day; a datetime is taken as given"""
+    try:
+        if len(as_of) == 10:
+            return datetime.combine(date.fromisoformat(as_of), datetime.max.time()).isoformat()
+        return datetime.fromisoformat(as_of).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="asOf must be a date (YYYY-MM-DD) or an ISO datetime")
+
+def _get_stock_levels_as_of(as_of: str) -> dict:
+    """
+    Stock on hand at as_of: the nearest earlier snapshot plus the stock level
+    audit rows written after it, replayed by get_stock_levels_as_of in one
+    rpc. Serialized products are not included; their history is the status
+    of their product_serials rows, not quantity_on_hand.
+    """
+    result = supabase.rpc("get_stock_levels_as_of", {"p_as_of": _parse_stock_as_of(as_of)}).execute().data
+    if not result:
+        raise HTTPException(status_code=404, detail=f"No stock snapshot on or before {as_of}")
+    # Replay needs the ledger rows after the snapshot, which archived months no longer have
+    archived = (
+        supabase.table("inventory_transaction_archives").select("period_end")
+        .order("period_end", desc=True).limit(1).execute().data
+    )
+    if archived and (result.get("snapshot_taken_at") or "")[:10] < archived[0]["period_end"]:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Inventory transactions before {archived[0]['period_end']} are archived; stock as of {as_of} is not available",
+        )
+
+    stock_levels = [
+        {
+            "productId": row["product_id"],
+            "productName": row.get("product_name"),
+            "skuCode": row.get("sku_code"),
+            "locationId": row.get("location_id"),
+            "locationName": row.get("location_name"),
+            "quantity": row.get("quantity_on_hand") or 0,
+            "isSerialized": False,
+        }
+        for row in result.get("rows") or []
+    ]
+    stock_levels.sort(key=lambda level: (level["productName"] or "", level["locationName"] or ""))
+    return {
+        "asOf": as_of,
+        "snapshotId": result.get("snapshot_id"),
+        "snapshotTakenAt": result.get("snapshot_taken_at"),
+        "replayedTransactions": result.get("replayed") or 0,
+        "stockLevels": stock_levels,
+    }
+
 @app.get("/inventory/stock-levels")
-def get_stock_levels(payload=Depends(require_permission("inventory_stock_view"))):
+def get_stock_levels(asOf: Optional[str] = None, payload=Depends(require_permission("inventory_stock_view"))):
+    if asOf:
+        try:
+            return JSONResponse(content=_get_stock_levels_as_of(asOf))
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error("Error computing stock levels as of %s: %s", asOf, e)
+            raise HTTPException(status_code=500, detail=f"Failed to compute stock levels: {str(e)}")
+
     # Get all stock levels (non-serialized products)
     data = supabase.table("stock_levels").select(
         "*, products(name, sku_code, is_serialized), locations(name)"
@@ -1971,6 +2379,37 @@ def get_stock_levels(payload=Depends(require_permission("inventory_stock_view"))
     
     return JSONResponse(content=stock_levels)
 
+@app.get("/inventory/stock-snapshots")
+def get_stock_snapshots(payload=Depends(require_permission("inventory_stock_view"))):
+    try:
+        data = supabase.table("stock_snapshots").select("id, taken_at, line_count, created_by").order("taken_at", desc=True).execute()
+        return JSONResponse(content=[
+            {
+                "id": snapshot.get("id"),
+                "takenAt": snapshot.get("taken_at"),
+                "lineCount": snapshot.get("line_count") or 0,
+                "createdBy": snapshot.get("created_by"),
+            }
+            for snapshot in data.data or []
+        ])
+    except Exception as e:
+        logger.error("Error fetching stock snapshots: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch stock snapshots: {str(e)}")
+
+@app.post("/inventory/stock-snapshots")
+def create_stock_snapshot(payload=Depends(require_permission("inventory_stock_manage"))):
+    """Take a stock snapshot now (also taken nightly where pg_cron is available)."""
+    try:
+        result = supabase.rpc("take_stock_snapshot", {"p_created_by": payload.get("sub")}).execute().data or {}
+        return JSONResponse(content={
+            "id": result.get("id"),
+            "takenAt": result.get("taken_at"),
+            "lineCount": result.get("line_count") or 0,
+        })
+    except Exception as e:
+        logger.error("Error taking stock snapshot: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to take stock snapshot: {str(e)}")
+
 @app.post("/inventory/stock-levels")
 def create_stock_level(stock_level: dict = Body(...), payload=Depends(require_permission("inventory_stock_manage"))):
     product_id = stock_level.get("productId")
@@ -2094,15 +2533,15 @@ def create_stock_level(stock_level: dict = Body(...), payload=Depends(require_pe
             supabase.table("inventory_transactions").insert(transaction_data).execute()
         except Exception as e:
             # Log the error but don't fail the stock level creation
-            print(f"Failed to create inventory transaction: {e}")
+            logger.error("Failed to create inventory transaction: %s", e)
     
     return JSONResponse(content=data.data)
 
 @app.put("/inventory/stock-levels/{stock_level_id}")
 def update_stock_level(stock_level_id: str, stock_level: dict = Body(...), payload=Depends(require_permission("inventory_stock_manage"))):
     try:
-        print(f"Starting update_stock_level for ID: {stock_level_id}")
-        print(f"Received stock_level data: {stock_level}")
+        logger.debug("Starting update_stock_level for ID: %s", stock_level_id)
+        logger.debug("Received stock_level data: %s", stock_level)
         
         # Get current stock level to check product
         current_stock = supabase.table("stock_levels").select("product_id, products(is_serialized)").eq("id", stock_level_id).execute()
@@ -2155,12 +2594,12 @@ def update_stock_level(stock_level_id: str, stock_level: dict = Body(...), paylo
         
         # Remove None values to avoid overwriting with null
         mapped_data = {k: v for k, v in mapped_data.items() if v is not None}
-        print(f"Mapped data for update: {mapped_data}")
+        logger.debug("Mapped data for update: %s", mapped_data)
         
         # Update the stock level
-        print("Executing stock level update...")
-        print(f"Final mapped_data being sent: {mapped_data}")
-        print(f"Stock level ID: {stock_level_id}")
+        logger.debug("Executing stock level update...")
+        logger.debug("Final mapped_data being sent: %s", mapped_data)
+        logger.debug("Stock level ID: %s", stock_level_id)
         
         # Update the stock level
         data = supabase.table("stock_levels").update(mapped_data).eq("id", stock_level_id).execute()
@@ -2178,7 +2617,7 @@ def update_stock_level(stock_level_id: str, stock_level: dict = Body(...), paylo
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating stock level: {e}")
+        logger.error("Error updating stock level: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to update stock level: {str(e)}")
 
 @app.delete("/inventory/stock-levels/{stock_level_id}")
@@ -2186,43 +2625,83 @@ def delete_stock_level(stock_level_id: str, payload=Depends(require_permission("
     data = supabase.table("stock_levels").delete().eq("id", stock_level_id).execute()
     return JSONResponse(content=data.data)
 
+# ---------- Inventory ledger pagination ----------
+# The ledger endpoints page newest first with a keyset on (created_at, id):
+# the cursor is the last row of the previous page, so every page is one
+# index range scan no matter how deep the client scrolls.
+INVENTORY_LEDGER_PAGE_SIZE = 100
+INVENTORY_LEDGER_MAX_PAGE_SIZE = 500
+
+def _parse_ledger_time(value: str, name: str, end_of_day: bool = False) -> str:
+    """A date covers the whole day (start for dateFrom, end for dateTo); a datetime is taken as given"""
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            return datetime.combine(day, datetime.max.time() if end_of_day else datetime.min.time()).isoformat()
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a date (YYYY-MM-DD) or an ISO datetime")
+
+def _encode_ledger_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_ledger_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(row_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _ledger_page(query, dateFrom: Optional[str], dateTo: Optional[str], cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """Apply the time range and keyset to a ledger query and fetch one page plus its next cursor"""
+    if limit < 1 or limit > INVENTORY_LEDGER_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {INVENTORY_LEDGER_MAX_PAGE_SIZE}")
+    if dateFrom:
+        query = query.gte("created_at", _parse_ledger_time(dateFrom, "dateFrom"))
+    if dateTo:
+        query = query.lte("created_at", _parse_ledger_time(dateTo, "dateTo", end_of_day=True))
+    if cursor:
+        created_at, row_id = _decode_ledger_cursor(cursor)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})')
+    rows = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute().data or []
+    next_cursor = _encode_ledger_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
 # Inventory Movements endpoints
 @app.get("/inventory/movements")
-def get_inventory_movements(payload=Depends(require_permission("inventory_movements_view"))):
+def get_inventory_movements(
+    dateFrom: Optional[str] = None,
+    dateTo: Optional[str] = None,
+    productId: Optional[str] = None,
+    type: Optional[str] = None,
+    fromLocationId: Optional[str] = None,
+    toLocationId: Optional[str] = None,
+    reference: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = INVENTORY_LEDGER_PAGE_SIZE,
+    payload=Depends(require_permission("inventory_movements_view")),
+):
+    """One page of inventory movements, newest first. Pass nextCursor back as cursor for the next page."""
     # Join with products, locations, and profiles to get product names, SKU codes, location names, and user names
-    data = supabase.table("inventory_movements").select(
+    query = supabase.table("inventory_movements").select(
         "*, products(name, sku_code), from_location:from_location_id(name), to_location:to_location_id(name), created_by_user:created_by(full_name)"
-    ).execute()
-    
-    movements = []
-    for movement in data.data:
-        # Extract product info from the joined data
-        product = movement.get("products", {})
-        from_location = movement.get("from_location", {})
-        to_location = movement.get("to_location", {})
-        created_by_user = movement.get("created_by_user", {})
-        
-        movement_data = {
-            "id": movement.get("id"),
-            "productId": movement.get("product_id"),
-            "productName": product.get("name") if product else None,
-            "skuCode": product.get("sku_code") if product else None,
-            "type": movement.get("type"),
-            "quantity": int(movement.get("quantity", 0)) if movement.get("quantity") is not None else 0,
-            "previousStock": int(movement.get("previous_stock", 0)) if movement.get("previous_stock") is not None else 0,
-            "newStock": int(movement.get("new_stock", 0)) if movement.get("new_stock") is not None else 0,
-            "fromLocationId": movement.get("from_location_id"),
-            "fromLocationName": from_location.get("name") if from_location else None,
-            "toLocationId": movement.get("to_location_id"),
-            "toLocationName": to_location.get("name") if to_location else None,
-            "reference": movement.get("reference"),
-            "notes": movement.get("notes"),
-            "createdBy": created_by_user.get("full_name") if created_by_user else movement.get("created_by"),
-            "createdAt": movement.get("created_at")
-        }
-        movements.append(movement_data)
-    
-    return JSONResponse(content=movements)
+    )
+    if productId:
+        query = query.eq("product_id", productId)
+    if type:
+        query = query.eq("type", type)
+    if fromLocationId:
+        query = query.eq("from_location_id", fromLocationId)
+    if toLocationId:
+        query = query.eq("to_location_id", toLocationId)
+    if reference:
+        query = query.eq("reference", reference)
+    rows, next_cursor = _ledger_page(query, dateFrom, dateTo, cursor, limit)
+    return JSONResponse(content={
+        "items": [to_camel_case_inventory_movement(movement) for movement in rows],
+        "nextCursor": next_cursor,
+    })
 
 @app.post("/inventory/movements")
 def create_inventory_movement(movement: dict = Body(...), payload=Depends(require_permission("inventory_movements_create"))):
@@ -2249,39 +2728,246 @@ def create_inventory_movement(movement: dict = Body(...), payload=Depends(requir
             supabase.table("inventory_transactions").insert(transaction_data).execute()
         except Exception as e:
             # Log the error but don't fail the movement creation
-            print(f"Failed to create inventory transaction: {e}")
+            logger.error("Failed to create inventory transaction: %s", e)
     
     return JSONResponse(content=data.data)
 
+# ---------- Stock Transfers ----------
+
+STOCK_TRANSFER_SELECT = (
+    "*, from_location:from_location_id(name), to_location:to_location_id(name), "
+    "items:stock_transfer_items(*, products(name, sku_code))"
+)
+
+def to_camel_case_stock_transfer(transfer):
+    from_location = transfer.get("from_location") or {}
+    to_location = transfer.get("to_location") or {}
+    return {
+        "id": transfer.get("id"),
+        "transferNumber": transfer.get("transfer_number"),
+        "fromLocationId": transfer.get("from_location_id"),
+        "fromLocationName": from_location.get("name"),
+        "toLocationId": transfer.get("to_location_id"),
+        "toLocationName": to_location.get("name"),
+        "status": transfer.get("status"),
+        "notes": transfer.get("notes"),
+        "totalQuantity": transfer.get("total_quantity") or 0,
+        "items": [
+            {
+                "id": item.get("id"),
+                "productId": item.get("product_id"),
+                "productName": (item.get("products") or {}).get("name"),
+                "skuCode": (item.get("products") or {}).get("sku_code"),
+                "quantity": item.get("quantity") or 0,
+                "serialNumbers": item.get("serial_numbers") or [],
+            }
+            for item in transfer.get("items") or []
+        ],
+        "createdBy": transfer.get("created_by"),
+        "createdAt": transfer.get("created_at"),
+        "updatedAt": transfer.get("updated_at"),
+    }
+
+def _stock_transfer_lines(items: List[dict]) -> Tuple[List[dict], Dict[str, str]]:
+    """
+    Validate transfer items and merge them into one line per product, the
+    shape post_stock_transfer expects. Serialized products move the listed
+    serials, so their quantity is the serial count. Items may name the
+    batches (stockBatchId, quantity) to move; the rest of a line's batched
+    stock is chosen earliest expiry first. Also returns product names by id
+    for error messages.
+    """
+    lines: Dict[str, dict] = {}
+    for item in items:
+        product_id = item.get("productId")
+        if not product_id:
+            raise HTTPException(status_code=400, detail="Each item needs a productId")
+        serials = [s.strip() for s in item.get("serialNumbers") or [] if s and s.strip()]
+        line = lines.setdefault(product_id, {"product_id": product_id, "quantity": 0, "serial_numbers": [], "batches": []})
+        line["quantity"] += int(item.get("quantity") or 0)
+        line["serial_numbers"].extend(serials)
+        for batch in item.get("batches") or []:
+            if not batch.get("stockBatchId") or int(batch.get("quantity") or 0) <= 0:
+                raise HTTPException(status_code=400, detail="Each batch needs a stockBatchId and a positive quantity")
+            line["batches"].append({"stock_batch_id": batch["stockBatchId"], "quantity": int(batch["quantity"])})
+
+    products = supabase.table("products").select("id, name, is_serialized").in_("id", list(lines)).execute().data or []
+    products_by_id = {p["id"]: p for p in products}
+    for product_id, line in lines.items():
+        product = products_by_id.get(product_id)
+        if not product:
+            raise HTTPException(status_code=400, detail=f"Product {product_id} not found")
+        serials = line["serial_numbers"]
+        if product.get("is_serialized"):
+            if not serials:
+                raise HTTPException(status_code=400, detail=f"Serial numbers are required for {product['name']}")
+            if len(set(serials)) != len(serials):
+                raise HTTPException(status_code=400, detail=f"Duplicate serial numbers for {product['name']}")
+            if line["batches"]:
+                raise HTTPException(status_code=400, detail=f"{product['name']} is serialized, but batches were provided")
+            line["quantity"] = len(serials)
+        else:
+            if serials:
+                raise HTTPException(status_code=400, detail=f"{product['name']} is not serialized, but serial numbers were provided")
+            if line["quantity"] <= 0:
+                raise HTTPException(status_code=400, detail=f"Quantity for {product['name']} must be positive")
+            if sum(batch["quantity"] for batch in line["batches"]) > line["quantity"]:
+                raise HTTPException(status_code=400, detail=f"Batch quantities for {product['name']} exceed the quantity transferred")
+            line["serial_numbers"] = None
+    return list(lines.values()), {p["id"]: p["name"] for p in products}
+
+def _serial_transfer_problem(status: Optional[str]) -> str:
+    if not status:
+        return "not found"
+    return "at another location" if status == "available" else status
+
+def _stock_transfer_shortfall_message(message: str, details: Optional[str], names: Dict[str, str]) -> str:
+    """Readable form of the shortfalls post_stock_transfer reports"""
+    details = json.loads(details or "{}")
+    problems = [
+        f"{names.get(s['product_id'], s['product_id'])} (requested {s['requested']}, available {s['available']})"
+        for s in details.get("shortfalls") or []
+    ] + [
+        f"serial {s['serial_number']} ({_serial_transfer_problem(s.get('status'))})"
+        for s in details.get("serials") or []
+    ] + [
+        f"{names.get(b['product_id'], b['product_id'])} batch {b.get('batch_number') or b['stock_batch_id']} (requested {b['requested']}, available {b['available']})"
+        for b in details.get("batches") or []
+    ]
+    return f"{message}: {'; '.join(problems)}" if problems else message
+
+@app.get("/inventory/transfers")
+def get_stock_transfers(payload=Depends(require_permission("inventory_movements_view"))):
+    try:
+        data = supabase.table("stock_transfers").select(STOCK_TRANSFER_SELECT).order("created_at", desc=True).execute()
+        return JSONResponse(content=[to_camel_case_stock_transfer(t) for t in (data.data or [])])
+    except Exception as e:
+        logger.error("Error fetching stock transfers: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch stock transfers: {str(e)}")
+
+@app.get("/inventory/transfers/{transfer_id}")
+def get_stock_transfer(transfer_id: str, payload=Depends(require_permission("inventory_movements_view"))):
+    try:
+        data = supabase.table("stock_transfers").select(STOCK_TRANSFER_SELECT).eq("id", transfer_id).execute()
+        if not data.data:
+            raise HTTPException(status_code=404, detail="Stock transfer not found")
+        return JSONResponse(content=to_camel_case_stock_transfer(data.data[0]))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching stock transfer: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch stock transfer: {str(e)}")
+
+@app.post("/inventory/transfers")
+def create_stock_transfer(transfer: dict = Body(...), payload=Depends(require_permission("inventory_movements_create"))):
+    """
+    Move many products (and serials) between two locations in one request.
+    Validation of available stock, the paired stock_levels and stock_batches
+    updates and the movement / ledger rows all happen in post_stock_transfer,
+    inside a single database transaction.
+    """
+    try:
+        from_location_id = transfer.get("fromLocationId")
+        to_location_id = transfer.get("toLocationId")
+        if not from_location_id or not to_location_id:
+            raise HTTPException(status_code=400, detail="fromLocationId and toLocationId are required")
+        if from_location_id == to_location_id:
+            raise HTTPException(status_code=400, detail="Source and destination locations must differ")
+        if not transfer.get("items"):
+            raise HTTPException(status_code=400, detail="A transfer needs at least one item")
+
+        lines, product_names = _stock_transfer_lines(transfer["items"])
+        transfer_number = transfer.get("transferNumber") or f"TR-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        try:
+            result = supabase.rpc("post_stock_transfer", {
+                "p_transfer_number": transfer_number,
+                "p_from_location_id": from_location_id,
+                "p_to_location_id": to_location_id,
+                "p_items": lines,
+                "p_notes": transfer.get("notes"),
+                "p_created_by": payload.get("sub"),
+            }).execute()
+        except Exception as e:
+            code = getattr(e, "code", None)
+            if code == "PT409":
+                raise HTTPException(status_code=409, detail=_stock_transfer_shortfall_message(
+                    getattr(e, "message", None) or "Insufficient stock at the source location",
+                    getattr(e, "details", None),
+                    product_names,
+                ))
+            if code == "23505":
+                raise HTTPException(status_code=409, detail=f"Transfer number {transfer_number} already exists")
+            if code == "PT400":
+                raise HTTPException(status_code=400, detail=getattr(e, "message", None) or str(e))
+            raise
+
+        for line in lines:
+            _adjust_slotting_occupancy(line["product_id"], from_location_id, -line["quantity"])
+            _adjust_slotting_occupancy(line["product_id"], to_location_id, line["quantity"])
+
+        created = supabase.table("stock_transfers").select(STOCK_TRANSFER_SELECT).eq("id", (result.data or {}).get("id")).execute()
+        if not created.data:
+            return JSONResponse(content=result.data)
+        return JSONResponse(content=to_camel_case_stock_transfer(created.data[0]))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error creating stock transfer: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to create stock transfer: {str(e)}")
+
+INVENTORY_TRANSACTION_COLUMNS = (
+    "id, product_id, location_id, transaction_type, quantity_change, reference_type, reference_id, "
+    "notes, created_by, created_at, products(name, sku_code)"
+)
+
+def to_camel_case_inventory_transaction(transaction):
+    product = transaction.get("products") or {}
+    return {
+        "id": transaction.get("id"),
+        "productId": transaction.get("product_id"),
+        "productName": product.get("name"),
+        "skuCode": product.get("sku_code"),
+        "locationId": transaction.get("location_id"),
+        "transactionType": transaction.get("transaction_type"),
+        "quantityChange": int(transaction.get("quantity_change") or 0),
+        "referenceType": transaction.get("reference_type"),
+        "referenceId": transaction.get("reference_id"),
+        "notes": transaction.get("notes"),
+        "createdBy": transaction.get("created_by"),
+        "createdAt": transaction.get("created_at"),
+    }
+
 # Inventory Transactions endpoints (Automatic audit trail)
 @app.get("/inventory/transactions")
-def get_inventory_transactions(payload=Depends(require_permission("inventory_movements_view"))):
-    # Join with products to get product names and SKU codes
-    data = supabase.table("inventory_transactions").select(
-        "*, products(name, sku_code)"
-    ).execute()
-    
-    transactions = []
-    for transaction in data.data:
-        # Extract product info from the joined data
-        product = transaction.get("products", {})
-        
-        transaction_data = {
-            "id": transaction.get("id"),
-            "productId": transaction.get("product_id"),
-            "productName": product.get("name") if product else None,
-            "skuCode": product.get("sku_code") if product else None,
-            "transactionType": transaction.get("transaction_type"),
-            "quantityChange": int(transaction.get("quantity_change", 0)) if transaction.get("quantity_change") is not None else 0,
-            "referenceType": transaction.get("reference_type"),
-            "referenceId": transaction.get("reference_id"),
-            "notes": transaction.get("notes"),
-            "createdBy": transaction.get("created_by"),
-            "createdAt": transaction.get("created_at")
-        }
-        transactions.append(transaction_data)
-    
-    return JSONResponse(content=transactions)
+def get_inventory_transactions(
+    dateFrom: Optional[str] = None,
+    dateTo: Optional[str] = None,
+    productId: Optional[str] = None,
+    locationId: Optional[str] = None,
+    transactionType: Optional[str] = None,
+    referenceType: Optional[str] = None,
+    referenceId: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = INVENTORY_LEDGER_PAGE_SIZE,
+    payload=Depends(require_permission("inventory_movements_view")),
+):
+    """One page of inventory transactions, newest first. Pass nextCursor back as cursor for the next page."""
+    query = supabase.table("inventory_transactions").select(INVENTORY_TRANSACTION_COLUMNS)
+    if productId:
+        query = query.eq("product_id", productId)
+    if locationId:
+        query = query.eq("location_id", locationId)
+    if transactionType:
+        query = query.eq("transaction_type", transactionType)
+    if referenceType:
+        query = query.eq("reference_type", referenceType)
+    if referenceId:
+        query = query.eq("reference_id", referenceId)
+    rows, next_cursor = _ledger_page(query, dateFrom, dateTo, cursor, limit)
+    return JSONResponse(content={
+        "items": [to_camel_case_inventory_transaction(transaction) for transaction in rows],
+        "nextCursor": next_cursor,
+    })
 
 @app.post("/inventory/transactions")
 def create_inventory_transaction(transaction: dict = Body(...), payload=Depends(require_permission("inventory_movements_create"))):
@@ -2329,6 +3015,399 @@ def delete_location(location_id: str, payload=Depends(require_permission("invent
     data = supabase.table("locations").delete().eq("id", location_id).execute()
     return JSONResponse(content=data.data)
 
+# ==================== Cycle Counts ====================
+# A cycle count freezes the expected stock of one or more locations, takes
+# bulk scan uploads, and posts the variances as one batch of adjustments.
+# Variances are applied relative to current stock, so movements made while
+# the count was running are preserved.
+
+CYCLE_COUNT_LOOKUP_CHUNK = 200
+CYCLE_COUNT_UNKNOWN_CODES_LIMIT = 100
+CYCLE_COUNT_LINE_COLUMNS = [
+    "id", "cycle_count_id", "product_id", "location_id",
+    "expected_quantity", "counted_quantity", "expected_serials", "counted_serials",
+]
+
+def to_camel_case_cycle_count_line(line):
+    product = line.get("products") or {}
+    location = line.get("locations") or {}
+    expected = line.get("expected_quantity") or 0
+    counted = line.get("counted_quantity")
+    return {
+        "id": line.get("id"),
+        "productId": line.get("product_id"),
+        "productName": product.get("name"),
+        "skuCode": product.get("sku_code"),
+        "isSerialized": bool(product.get("is_serialized")),
+        "locationId": line.get("location_id"),
+        "locationName": location.get("name"),
+        "expectedQuantity": expected,
+        "countedQuantity": counted,
+        "variance": None if counted is None else counted - expected,
+        "missingSerials": sorted(set(line.get("expected_serials") or []) - set(line.get("counted_serials") or [])),
+        "unexpectedSerials": sorted(set(line.get("counted_serials") or []) - set(line.get("expected_serials") or [])),
+    }
+
+def to_camel_case_cycle_count(cc):
+    lines = cc.get("lines") or []
+    return {
+        "id": cc.get("id"),
+        "countNumber": cc.get("count_number"),
+        "status": cc.get("status"),
+        "locationIds": cc.get("location_ids") or [],
+        "notes": cc.get("notes"),
+        "summary": cc.get("summary"),
+        "lines": [to_camel_case_cycle_count_line(line) for line in lines],
+        "createdBy": cc.get("created_by"),
+        "postedBy": cc.get("posted_by"),
+        "postedAt": cc.get("posted_at"),
+        "createdAt": cc.get("created_at"),
+        "updatedAt": cc.get("updated_at"),
+    }
+
+CYCLE_COUNT_SELECT = "*, lines:cycle_count_lines(*, products(name, sku_code, is_serialized), locations(name))"
+
+def _get_open_cycle_count(cc_id: str) -> dict:
+    current = supabase.table("cycle_counts").select("id, count_number, status, location_ids").eq("id", cc_id).execute()
+    if not current.data:
+        raise HTTPException(status_code=404, detail="Cycle count not found")
+    if current.data[0]["status"] != "open":
+        raise HTTPException(status_code=400, detail=f"Cycle count is {current.data[0]['status']}")
+    return current.data[0]
+
+def _lookup_in_chunks(table: str, columns: str, column: str, values: List[str]) -> List[dict]:
+    """Rows whose column is in values, fetched in chunks to keep the query string short"""
+    rows = []
+    for start in range(0, len(values), CYCLE_COUNT_LOOKUP_CHUNK):
+        chunk = values[start:start + CYCLE_COUNT_LOOKUP_CHUNK]
+        rows.extend(supabase.table(table).select(columns).in_(column, chunk).execute().data or [])
+    return rows
+
+def _resolve_scan_codes(codes: List[str]) -> Tuple[Dict[str, str], Dict[str, dict]]:
+    """
+    Map scanned codes to products: barcode first, then SKU code, then serial
+    number. Returns (code -> product_id for barcodes/SKUs, serial -> serial row).
+    """
+    products: Dict[str, str] = {}
+    for row in _lookup_in_chunks("products", "id, barcode", "barcode", codes):
+        products[row["barcode"]] = row["id"]
+    remaining = [code for code in codes if code not in products]
+    for row in _lookup_in_chunks("products", "id, sku_code", "sku_code", remaining):
+        products[row["sku_code"]] = row["id"]
+    remaining = [code for code in remaining if code not in products]
+    serials = {row["serial_number"]: row for row in _lookup_in_chunks(
+        "product_serials", "product_id, serial_number, location_id", "serial_number", remaining
+    )}
+    return products, serials
+
+@app.get("/inventory/cycle-counts")
+def get_cycle_counts(payload=Depends(require_permission("inventory_stock_view"))):
+    try:
+        data = supabase.table("cycle_counts").select("*").order("created_at", desc=True).execute()
+        return JSONResponse(content=[to_camel_case_cycle_count(cc) for cc in (data.data or [])])
+    except Exception as e:
+        logger.error("Error fetching cycle counts: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch cycle counts: {str(e)}")
+
+@app.get("/inventory/cycle-counts/{cc_id}")
+def get_cycle_count(cc_id: str, payload=Depends(require_permission("inventory_stock_view"))):
+    try:
+        data = supabase.table("cycle_counts").select(CYCLE_COUNT_SELECT).eq("id", cc_id).execute()
+        if not data.data:
+            raise HTTPException(status_code=404, detail="Cycle count not found")
+        return JSONResponse(content=to_camel_case_cycle_count(data.data[0]))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching cycle count: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch cycle count: {str(e)}")
+
+@app.post("/inventory/cycle-counts")
+def create_cycle_count(cc: dict = Body(...), payload=Depends(require_permission("inventory_stock_manage"))):
+    """Start a cycle count: freeze the expected stock of the given locations."""
+    try:
+        location_ids = list(dict.fromkeys(cc.get("locationIds") or []))
+        if not location_ids:
+            raise HTTPException(status_code=400, detail="locationIds must list at least one location")
+
+        busy = supabase.table("cycle_counts").select("count_number, location_ids").eq("status", "open").ov(
+            "location_ids", location_ids
+        ).execute().data or []
+        if busy:
+            raise HTTPException(status_code=409, detail=f"Locations are already being counted in {', '.join(c['count_number'] for c in busy)}")
+
+        stock_rows = supabase.table("stock_levels").select(
+            "product_id, location_id, quantity_on_hand, products(is_serialized)"
+        ).in_("location_id", location_ids).execute().data or []
+        serial_rows = supabase.table("product_serials").select(
+            "product_id, location_id, serial_number"
+        ).in_("location_id", location_ids).eq("status", "available").execute().data or []
+
+        snapshot: Dict[tuple, dict] = {}
+        for row in stock_rows:
+            if not row.get("product_id") or (row.get("products") or {}).get("is_serialized"):
+                continue
+            line = snapshot.setdefault((row["product_id"], row["location_id"]), {"expected_quantity": 0, "expected_serials": None})
+            line["expected_quantity"] += row.get("quantity_on_hand") or 0
+        for serial in serial_rows:
+            line = snapshot.setdefault((serial["product_id"], serial["location_id"]), {"expected_quantity": 0, "expected_serials": []})
+            line["expected_serials"] = (line["expected_serials"] or []) + [serial["serial_number"]]
+            line["expected_quantity"] = len(line["expected_serials"])
+
+        result = supabase.table("cycle_counts").insert({
+            "count_number": cc.get("countNumber", f"CC-{datetime.now().strftime('%Y%m%d%H%M%S')}"),
+            "status": "open",
+            "location_ids": location_ids,
+            "notes": cc.get("notes"),
+            "created_by": payload.get("sub"),
+        }).execute()
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Failed to create cycle count")
+        cc_id = result.data[0]["id"]
+
+        if snapshot:
+            supabase.table("cycle_count_lines").insert([
+                {
+                    "cycle_count_id": cc_id,
+                    "product_id": product_id,
+                    "location_id": location_id,
+                    "expected_quantity": line["expected_quantity"],
+                    "counted_quantity": None,
+                    "expected_serials": line["expected_serials"],
+                    "counted_serials": None,
+                }
+                for (product_id, location_id), line in snapshot.items()
+            ]).execute()
+
+        created = supabase.table("cycle_counts").select(CYCLE_COUNT_SELECT).eq("id", cc_id).execute()
+        return JSONResponse(content=to_camel_case_cycle_count(created.data[0]) if created.data else result.data[0])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error creating cycle count: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to create cycle count: {str(e)}")
+
+@app.post("/inventory/cycle-counts/{cc_id}/scans")
+def upload_cycle_count_scans(cc_id: str, upload: dict = Body(...), payload=Depends(require_permission("inventory_stock_manage"))):
+    """
+    Record a batch of scans. Each scan is a barcode, SKU or serial number,
+    either a plain string or {code, locationId, quantity}; scans without a
+    location use the upload's locationId (or the count's only location).
+    mode "add" (default) adds to earlier uploads, "replace" recounts the
+    touched lines from this upload alone.
+    """
+    try:
+        cc = _get_open_cycle_count(cc_id)
+        mode = upload.get("mode", "add")
+        if mode not in ("add", "replace"):
+            raise HTTPException(status_code=400, detail="mode must be 'add' or 'replace'")
+        default_location = upload.get("locationId") or (cc["location_ids"][0] if len(cc["location_ids"]) == 1 else None)
+
+        reads = []
+        for scan in upload.get("scans") or []:
+            if isinstance(scan, str):
+                scan = {"code": scan}
+            code = str(scan.get("code") or "").strip()
+            location_id = scan.get("locationId") or default_location
+            if not code:
+                continue
+            if not location_id:
+                raise HTTPException(status_code=400, detail=f"Scan of '{code}' has no location; set locationId on the scan or the upload")
+            if location_id not in cc["location_ids"]:
+                raise HTTPException(status_code=400, detail=f"Scan of '{code}' is not in a location of this count")
+            reads.append((code, location_id, int(scan.get("quantity") or 1)))
+
+        products, serials = _resolve_scan_codes(list({code for code, _, _ in reads}))
+        counted: Dict[tuple, int] = {}
+        counted_serials: Dict[tuple, set] = {}
+        unknown: Dict[str, int] = {}
+        for code, location_id, quantity in reads:
+            if code in products:
+                key = (products[code], location_id)
+                counted[key] = counted.get(key, 0) + quantity
+            elif code in serials:
+                # A serial counts once however often it is scanned
+                counted_serials.setdefault((serials[code]["product_id"], location_id), set()).add(code)
+            else:
+                unknown[code] = unknown.get(code, 0) + quantity
+
+        lines = supabase.table("cycle_count_lines").select(", ".join(CYCLE_COUNT_LINE_COLUMNS)).eq("cycle_count_id", cc_id).execute().data or []
+        by_key = {(line["product_id"], line["location_id"]): line for line in lines}
+        changed, created = [], []
+        for key in set(counted) | set(counted_serials):
+            line = by_key.get(key)
+            if line is None:
+                line = {
+                    "cycle_count_id": cc_id, "product_id": key[0], "location_id": key[1],
+                    "expected_quantity": 0, "counted_quantity": None, "expected_serials": None, "counted_serials": None,
+                }
+                created.append(line)
+            else:
+                changed.append(line)
+            if key in counted_serials:
+                previous = set(line.get("counted_serials") or []) if mode == "add" else set()
+                line["counted_serials"] = sorted(previous | counted_serials[key])
+                line["counted_quantity"] = len(line["counted_serials"])
+            else:
+                previous = (line.get("counted_quantity") or 0) if mode == "add" else 0
+                line["counted_quantity"] = previous + counted[key]
+
+        if changed:
+            supabase.table("cycle_count_lines").upsert(changed, on_conflict="id").execute()
+        if created:
+            supabase.table("cycle_count_lines").insert(created).execute()
+
+        return JSONResponse(content={
+            "reads": len(reads),
+            "resolved": len(reads) - sum(1 for code, _, _ in reads if code in unknown),
+            "linesUpdated": len(changed),
+            "linesAdded": len(created),
+            "unknownCodes": [
+                {"code": code, "reads": count}
+                for code, count in sorted(unknown.items())[:CYCLE_COUNT_UNKNOWN_CODES_LIMIT]
+            ],
+            "unknownCodeCount": len(unknown),
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error uploading cycle count scans: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to upload scans: {str(e)}")
+
+@app.post("/inventory/cycle-counts/{cc_id}/post")
+def post_cycle_count(cc_id: str, options: dict = Body(default={}), payload=Depends(require_permission("inventory_stock_manage"))):
+    """
+    Post the variances of a cycle count as stock adjustments: one upsert of
+    the stock levels, one insert for new ones and one insert of inventory
+    transactions. Lines never scanned are skipped unless uncountedAsZero is
+    set. Serialized products are reported (missing / unexpected serials)
+    but not adjusted, since their stock follows product_serials.
+
+    The count is marked posted before any stock is touched, and only if it
+    is still open, so concurrent posts cannot apply the variances twice.
+    Shortages come out of the unbatched stock of the location first, then
+    out of its batches, earliest expiry first.
+    """
+    try:
+        cc = _get_open_cycle_count(cc_id)
+        uncounted_as_zero = bool(options.get("uncountedAsZero"))
+        lines = supabase.table("cycle_count_lines").select(
+            "*, products(name, is_serialized), locations(name)"
+        ).eq("cycle_count_id", cc_id).execute().data or []
+
+        adjustments, serial_discrepancies = [], []
+        for line in lines:
+            counted = line.get("counted_quantity")
+            if counted is None:
+                if not uncounted_as_zero:
+                    continue
+                counted = 0
+            variance = counted - (line.get("expected_quantity") or 0)
+            if (line.get("products") or {}).get("is_serialized"):
+                if variance or set(line.get("expected_serials") or []) != set(line.get("counted_serials") or []):
+                    serial_discrepancies.append(to_camel_case_cycle_count_line(line))
+                continue
+            if variance:
+                adjustments.append((line, counted, variance))
+
+        summary = {
+            "linesCounted": sum(1 for line in lines if line.get("counted_quantity") is not None),
+            "linesTotal": len(lines),
+            "adjustments": len(adjustments),
+            "netChange": sum(variance for _, _, variance in adjustments),
+            "serialDiscrepancies": len(serial_discrepancies),
+        }
+        claimed = supabase.table("cycle_counts").update({
+            "status": "posted",
+            "summary": summary,
+            "posted_by": payload.get("sub"),
+            "posted_at": datetime.now().isoformat(),
+        }).eq("id", cc_id).eq("status", "open").execute()
+        if not claimed.data:
+            raise HTTPException(status_code=409, detail=f"Cycle count {cc['count_number']} is no longer open")
+
+        try:
+            if adjustments:
+                _apply_cycle_count_adjustments(cc, adjustments, payload.get("sub"))
+        except Exception:
+            # Reopen the count so the variances can be posted again
+            supabase.table("cycle_counts").update({
+                "status": "open", "summary": None, "posted_by": None, "posted_at": None,
+            }).eq("id", cc_id).eq("status", "posted").execute()
+            raise
+
+        return JSONResponse(content={**summary, "serialDiscrepancyLines": serial_discrepancies})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error posting cycle count: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to post cycle count: {str(e)}")
+
+def _apply_cycle_count_adjustments(cc: dict, adjustments: List[tuple], created_by: Optional[str]):
+    """Write the (line, counted, variance) adjustments of a posted cycle count to stock levels, batches and the ledger"""
+    product_ids = list({line["product_id"] for line, _, _ in adjustments})
+    stock_rows = supabase.table("stock_levels").select(
+        "id, product_id, location_id, quantity_on_hand"
+    ).in_("product_id", product_ids).in_("location_id", cc["location_ids"]).execute().data or []
+    by_key = {(row["product_id"], row["location_id"]): row for row in stock_rows}
+
+    batches: Dict[tuple, List[dict]] = {}
+    if any(variance < 0 for _, _, variance in adjustments):
+        batch_rows = supabase.table("stock_batches").select(STOCK_BATCH_COLUMNS).in_(
+            "product_id", product_ids
+        ).in_("location_id", cc["location_ids"]).gt("quantity_on_hand", 0).execute().data or []
+        for batch in sorted(batch_rows, key=lambda b: (b.get("expiry_date") is None, b.get("expiry_date") or "", b.get("batch_number") or "")):
+            batches.setdefault((batch["product_id"], batch["location_id"]), []).append(batch)
+
+    changed, created, changed_batches, transactions = {}, [], {}, []
+    for line, counted, variance in adjustments:
+        key = (line["product_id"], line["location_id"])
+        row = by_key.get(key)
+        if row:
+            row["quantity_on_hand"] = max(0, (row.get("quantity_on_hand") or 0) + variance)
+            changed[row["id"]] = row
+            # Batches may not hold more than the location now has on hand
+            excess = sum(batch["quantity_on_hand"] for batch in batches.get(key, [])) - row["quantity_on_hand"]
+            for batch in batches.get(key, []):
+                if excess <= 0:
+                    break
+                take = min(excess, batch["quantity_on_hand"])
+                batch["quantity_on_hand"] -= take
+                excess -= take
+                changed_batches[batch["id"]] = batch
+        elif variance > 0:
+            by_key[key] = {"product_id": key[0], "location_id": key[1], "quantity_on_hand": variance, "created_by": created_by}
+            created.append(by_key[key])
+        transactions.append({
+            "product_id": key[0],
+            "location_id": key[1],
+            "transaction_type": "adjustment",
+            "quantity_change": variance,
+            "reference_type": "cycle_count",
+            "reference_id": cc["id"],
+            "notes": f"Cycle count {cc['count_number']} at {(line.get('locations') or {}).get('name') or key[1]}: expected {line.get('expected_quantity') or 0}, counted {counted}",
+            "created_by": created_by,
+        })
+
+    if changed:
+        supabase.table("stock_levels").upsert(list(changed.values()), on_conflict="id").execute()
+    if created:
+        supabase.table("stock_levels").insert(created).execute()
+    if changed_batches:
+        supabase.table("stock_batches").upsert(list(changed_batches.values()), on_conflict="id").execute()
+    supabase.table("inventory_transactions").insert(transactions).execute()
+    for line, _, variance in adjustments:
+        _adjust_slotting_occupancy(line["product_id"], line["location_id"], variance)
+
+@app.delete("/inventory/cycle-counts/{cc_id}")
+def cancel_cycle_count(cc_id: str, payload=Depends(require_permission("inventory_stock_manage"))):
+    """Cancel an open cycle count; nothing is posted."""
+    cc = _get_open_cycle_count(cc_id)
+    data = supabase.table("cycle_counts").update({"status": "cancelled"}).eq("id", cc_id).eq("status", "open").execute()
+    if not data.data:
+        raise HTTPException(status_code=409, detail=f"Cycle count {cc['count_number']} is no longer open")
+    return JSONResponse(content=data.data)
+
 @app.get("/categories")
 def get_categories(payload=Depends(verify_jwt)):
     data = supabase.table("categories").select("*").execute()
@@ -2375,7 +3454,7 @@ def create_category(category: dict = Body(...), payload=Depends(verify_jwt)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating category: {str(e)}")
+        logger.error("Error creating category: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating category: {str(e)}"
@@ -2419,7 +3498,7 @@ def update_category(category_id: str, category: dict = Body(...), payload=Depend
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating category: {str(e)}")
+        logger.error("Error updating category: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating category: {str(e)}"
@@ -2438,7 +3517,7 @@ def get_roles(payload=Depends(require_role(["admin"]))):
         roles_data = [to_camel_case_role(role) for role in res.data]
         return JSONResponse(content=roles_data)
     except Exception as e:
-        print(f"Error fetching roles: {str(e)}")
+        logger.error("Error fetching roles: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching roles: {str(e)}"
@@ -2659,7 +3738,7 @@ def get_users(payload=Depends(require_role(["admin"]))):
         # Get profiles data with joined roles
         profiles_data = supabase.table("profiles").select("id, username, full_name, is_active, role, role_id, created_at, updated_at, roles(name, permissions)").execute()
     except Exception as e:
-        print(f"Error fetching profiles: {str(e)}")
+        logger.error("Error fetching profiles: %s", e)
         return JSONResponse(content=[])
     
     users = []
@@ -2844,7 +3923,7 @@ def create_user(user: dict = Body(...), payload=Depends(require_role(["admin"]))
                                 is_active = (user.get("status") == "Active")
                                 supabase.table("profiles").update({"is_active": is_active}).eq("id", user_id).execute()
                             except Exception as e:
-                                print(f"Error updating status: {str(e)}")  # Debug log
+                                logger.error("Error updating status: %s", e)
                         
                         # Return user data
                         user_data = {
@@ -3337,7 +4416,7 @@ def get_system_settings(payload=Depends(require_permission("settings_view"))):
             # Return default settings only if no settings exist in database
             return JSONResponse(content=get_default_system_settings())
     except Exception as e:
-        print(f"Error fetching system settings: {str(e)}")
+        logger.error("Error fetching system settings: %s", e)
         # Return default settings on error
         return JSONResponse(content=get_default_system_settings())
 
@@ -3354,7 +4433,7 @@ def get_public_system_settings():
             # Return default public settings only if no public settings exist in database
             return JSONResponse(content=get_default_public_system_settings())
     except Exception as e:
-        print(f"Error fetching public system settings: {str(e)}")
+        logger.error("Error fetching public system settings: %s", e)
         # Return default public settings on error
         return JSONResponse(content=get_default_public_system_settings())
 
@@ -4262,7 +5341,7 @@ def get_purchase_order(purchase_order_id: str, payload=Depends(require_permissio
         
         return JSONResponse(content=purchase_order)
     except Exception as e:
-        print(f"ERROR fetching purchase order {purchase_order_id}: {str(e)}")
+        logger.error("ERROR fetching purchase order %s: %s", purchase_order_id, e)
         raise HTTPException(status_code=500, detail=f"Error fetching purchase order: {str(e)}")
 
 @app.get("/purchase-orders/{purchase_order_id}/items")
@@ -4349,18 +5428,18 @@ def update_purchase_order(purchase_order_id: str, purchase_order: dict = Body(..
     # Validate status transition
     validate_purchase_order_status_transition(current_status, operation="edit")
     
-    print(f"DEBUG: Received purchase order update request with status: {purchase_order.get('status')}")
+    logger.debug("Received purchase order update request with status: %s", purchase_order.get('status'))
     # Validate status value
     valid_statuses = ["draft", "pending", "approved", "received", "cancelled"]
     status = purchase_order.get("status")
-    print(f"DEBUG: Validating status '{status}' against valid_statuses: {valid_statuses}")
+    logger.debug("Validating status '%s' against valid_statuses: %s", status, valid_statuses)
     if status not in valid_statuses:
-        print(f"DEBUG: Invalid status '{status}' detected, raising HTTPException")
+        logger.debug("Invalid status '%s' detected, raising HTTPException", status)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid status '{status}'. Valid statuses are: {valid_statuses}"
         )
-    print(f"DEBUG: Status validation passed, proceeding with update")
+    logger.debug("Status validation passed, proceeding with update")
     
     # Map camelCase to snake_case
     purchase_order_data = {
@@ -4830,6 +5909,7 @@ def convert_quotation_to_order(quotation_id: str, payload=Depends(require_permis
                     "created_by": payload["sub"],
                 })
             supabase.table("sales_order_items").insert(so_items).execute()
+            _record_customer_product_affinity(created_so.get("customer_id"), created_so.get("order_date"), so_items)
 
         # Lock quotation as accepted
         supabase.table("sale_quotations").update({
@@ -4840,7 +5920,7 @@ def convert_quotation_to_order(quotation_id: str, payload=Depends(require_permis
         return JSONResponse(content=to_camel_case_sales_order(created_so))
 
     except Exception as e:
-        print(f"CONVERSION ERROR: {str(e)}")
+        logger.error("CONVERSION ERROR: %s", e)
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
 
 # ============================================================
@@ -4961,6 +6041,7 @@ def create_sales_order(sales_order: dict = Body(...), payload=Depends(require_pe
         # Insert all items
         if items_data:
             supabase.table("sales_order_items").insert(items_data).execute()
+            _record_customer_product_affinity(created_sales_order["customer_id"], created_sales_order.get("order_date"), items_data)
     
     return JSONResponse(content=created_sales_order)
 
@@ -5034,7 +6115,7 @@ def update_sales_order(sales_order_id: str, sales_order: dict = Body(...), paylo
         
         return JSONResponse(content=data.data[0])
     except Exception as e:
-        print(f"UPDATE SALES ORDER ERROR: {str(e)}")
+        logger.error("UPDATE SALES ORDER ERROR: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/sales-orders/{sales_order_id}")
@@ -5262,6 +6343,7 @@ def create_sale_invoice(sale_invoice: dict = Body(...), payload=Depends(require_
                 # Insert all sales order items
                 if so_items_data:
                     supabase.table("sales_order_items").insert(so_items_data).execute()
+                    _record_customer_product_affinity(created_sales_order["customer_id"], created_sales_order.get("order_date"), so_items_data)
         
         # Map camelCase to snake_case for sale invoice
         sale_invoice_data = {
@@ -5380,7 +6462,7 @@ def create_sale_invoice(sale_invoice: dict = Body(...), payload=Depends(require_
         
         return JSONResponse(content=created_sale_invoice)
     except Exception as e:
-        print(f"CREATE SALE INVOICE ERROR: {str(e)}")
+        logger.error("CREATE SALE INVOICE ERROR: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/sale-invoices/overdue")
@@ -5390,11 +6472,274 @@ def get_overdue_invoices(payload=Depends(require_permission("sale_invoices_view"
     data = supabase.table("sale_invoices").select("*").lt("due_date", today).in_("status", ["sent", "partial"]).execute()
     return JSONResponse(content=data.data)
 
-@app.put("/sale-invoices/{sale_invoice_id}")
-def update_sale_invoice(sale_invoice_id: str, sale_invoice: dict = Body(...), payload=Depends(require_permission("sale_invoices_edit"))):
-    # Get current sale invoice status for validation
-    current_invoice_data = supabase.table("sale_invoices").select("status").eq("id", sale_invoice_id).execute()
-    if not current_invoice_data.data:
+# ==================== Reports API ====================
+
+AGING_BUCKETS = ["0-30", "31-60", "61-90", "90+"]
+
+def _compute_receivables_aging(as_of: str) -> dict:
+    """Run the grouped aging query for one as-of date and shape it for the API."""
+    data = supabase.rpc("get_receivables_aging", {"p_as_of": as_of}).execute()
+    customers = []
+    totals = {bucket: 0.0 for bucket in AGING_BUCKETS}
+    for row in data.data or []:
+        buckets = {
+            "0-30": float(row.get("bucket_0_30") or 0),
+            "31-60": float(row.get("bucket_31_60") or 0),
+            "61-90": float(row.get("bucket_61_90") or 0),
+            "90+": float(row.get("bucket_90_plus") or 0),
+        }
+        for bucket, amount in buckets.items():
+            totals[bucket] += amount
+        customers.append({
+            "customerId": row.get("customer_id"),
+            "customerName": row.get("customer_name"),
+            "invoiceCount": row.get("invoice_count"),
+            "buckets": buckets,
+            "totalDue": float(row.get("total_due") or 0),
+            "oldestDueDate": row.get("oldest_due_date"),
+        })
+    return {
+        "asOf": as_of,
+        "buckets": AGING_BUCKETS,
+        "totals": {bucket: round(amount, 2) for bucket, amount in totals.items()},
+        "totalDue": round(sum(totals.values()), 2),
+        "customers": customers,
+    }
+
+@app.get("/reports/receivables-aging")
+def get_receivables_aging(asOf: Optional[str] = None, payload=Depends(require_permission("sale_invoices_view"))):
+    """Outstanding receivables per customer in 0-30/31-60/61-90/90+ days-overdue buckets."""
+    try:
+        as_of = date.fromisoformat(asOf).isoformat() if asOf else date.today().isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="asOf must be a date in YYYY-MM-DD format")
+    try:
+        report = _cached_by_version("receivables", as_of, lambda: _compute_receivables_aging(as_of))
+        return JSONResponse(content=report)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute receivables aging: {str(e)}")
+
+SUMMARY_GROUPINGS = ["total", "day", "product", "customer", "supplier"]
+
+def to_camel_case_rollup_summary(row):
+    """Convert a get_rollup_summary row from snake_case to camelCase"""
+    def _num(key):
+        return float(row.get(key) or 0)
+    return {
+        "key": row.get("group_key"),
+        "name": row.get("group_name"),
+        "sales": {
+            "amount": _num("sales_amount"),
+            "tax": _num("sales_tax"),
+            "quantity": _num("sales_quantity"),
+            "documents": int(row.get("sales_documents") or 0),
+        },
+        "returns": {
+            "amount": _num("return_amount"),
+            "tax": _num("return_tax"),
+            "quantity": _num("return_quantity"),
+            "documents": int(row.get("return_documents") or 0),
+        },
+        "purchases": {
+            "amount": _num("purchase_amount"),
+            "tax": _num("purchase_tax"),
+            "quantity": _num("purchase_quantity"),
+            "documents": int(row.get("purchase_documents") or 0),
+        },
+        "netSales": round(_num("sales_amount") - _num("return_amount"), 2),
+    }
+
+@app.get("/reports/summary")
+def get_reports_summary(
+    dateFrom: Optional[str] = None,
+    dateTo: Optional[str] = None,
+    groupBy: str = "total",
+    payload=Depends(require_permission("reports_view")),
+):
+    """
+    Sales, returns and purchase totals for a date range, summed from the daily rollups.
+    Defaults to year-to-date. groupBy: total | day | product | customer | supplier.
+    """
+    if groupBy not in SUMMARY_GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"groupBy must be one of: {', '.join(SUMMARY_GROUPINGS)}")
+    try:
+        today = date.today()
+        date_to = date.fromisoformat(dateTo) if dateTo else today
+        date_from = date.fromisoformat(dateFrom) if dateFrom else date(date_to.year, 1, 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="dateFrom and dateTo must be dates in YYYY-MM-DD format")
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="dateFrom must not be after dateTo")
+
+    try:
+        data = supabase.rpc("get_rollup_summary", {
+            "p_from": date_from.isoformat(),
+            "p_to": date_to.isoformat(),
+            "p_group_by": groupBy,
+        }).execute()
+        rows = [to_camel_case_rollup_summary(row) for row in data.data or []]
+        return JSONResponse(content={
+            "dateFrom": date_from.isoformat(),
+            "dateTo": date_to.isoformat(),
+            "groupBy": groupBy,
+            "rows": rows,
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute report summary: {str(e)}")
+
+# ==================== Dashboard API ====================
+
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "5"))
+DASHBOARD_LOW_STOCK_LIMIT = 6
+ACTIVE_SALES_ORDER_STATUSES = ["draft", "pending", "approved", "sent", "partial"]
+
+# Shared pool for fanning out the independent dashboard queries
+_dashboard_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dashboard")
+_dashboard_cache: Dict[str, Dict[str, Any]] = {}
+_dashboard_cache_lock = threading.Lock()
+_dashboard_key_locks: Dict[str, threading.Lock] = {}
+
+def _count_rows(table: str, column: str = None, values: List[str] = None, eq: Dict[str, Any] = None) -> int:
+    """Exact row count via PostgREST without transferring the rows."""
+    query = supabase.table(table).select("id", count="exact").limit(1)
+    if column and values:
+        query = query.in_(column, values)
+    for key, value in (eq or {}).items():
+        query = query.eq(key, value)
+    return query.execute().count or 0
+
+def _dashboard_inventory() -> dict:
+    data = supabase.rpc("get_inventory_kpis", {"p_low_stock_limit": DASHBOARD_LOW_STOCK_LIMIT}).execute().data or {}
+    return {
+        "totalProducts": int(data.get("total_products") or 0),
+        "inventoryValue": float(data.get("inventory_value") or 0),
+        "lowStockCount": int(data.get("low_stock_count") or 0),
+        "lowStock": [
+            {
+                "productId": item.get("product_id"),
+                "name": item.get("name"),
+                "current": float(item.get("current") or 0),
+                "minimum": float(item.get("minimum") or 0),
+            }
+            for item in data.get("low_stock") or []
+        ],
+    }
+
+def _dashboard_sales() -> dict:
+    """Today's and month-to-date sales/returns from the daily rollups (gross of tax)."""
+    today = date.today()
+    data = supabase.rpc("get_rollup_summary", {
+        "p_from": today.replace(day=1).isoformat(),
+        "p_to": today.isoformat(),
+        "p_group_by": "day",
+    }).execute()
+    sales = {"salesToday": 0.0, "salesTodayCount": 0, "salesThisMonth": 0.0, "returnsThisMonth": 0.0}
+    for row in data.data or []:
+        gross_sales = float(row.get("sales_amount") or 0) + float(row.get("sales_tax") or 0)
+        sales["salesThisMonth"] += gross_sales
+        sales["returnsThisMonth"] += float(row.get("return_amount") or 0) + float(row.get("return_tax") or 0)
+        if row.get("group_key") == today.isoformat():
+            sales["salesToday"] = gross_sales
+            sales["salesTodayCount"] = int(row.get("sales_documents") or 0)
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in sales.items()}
+
+def _dashboard_overdue() -> dict:
+    as_of = date.today().isoformat()
+    aging = _cached_by_version("receivables", as_of, lambda: _compute_receivables_aging(as_of))
+    return {
+        "overdueTotal": aging["totalDue"],
+        "overdueCustomers": len(aging["customers"]),
+        "overdueBuckets": aging["totals"],
+    }
+
+def _dashboard_recent_purchase_orders() -> list:
+    data = supabase.table("purchase_orders") \
+        .select("id, order_number, order_date, status, total_amount, suppliers(name)") \
+        .order("order_date", desc=True) \
+        .limit(3) \
+        .execute()
+    return [
+        {
+            "id": po.get("id"),
+            "orderNumber": po.get("order_number"),
+            "orderDate": po.get("order_date"),
+            "status": po.get("status"),
+            "totalAmount": float(po.get("total_amount") or 0),
+            "supplierName": (po.get("suppliers") or {}).get("name"),
+        }
+        for po in data.data or []
+    ]
+
+# Dashboard sections: (permission, key, task). Each task is one aggregate query.
+DASHBOARD_SECTIONS = [
+    ("inventory_view", "inventory", _dashboard_inventory),
+    ("sale_invoices_view", "sales", _dashboard_sales),
+    ("sale_invoices_view", "receivables", _dashboard_overdue),
+    ("sale_orders_view", "activeSalesOrders", lambda: _count_rows("sales_orders", "status", ACTIVE_SALES_ORDER_STATUSES)),
+    ("purchase_orders_view", "recentPurchaseOrders", _dashboard_recent_purchase_orders),
+    ("customers_view", "activeCustomers", lambda: _count_rows("customers", eq={"is_active": True})),
+    ("suppliers_view", "activeSuppliers", lambda: _count_rows("suppliers", eq={"is_active": True})),
+    ("grn_view", "pendingGrns", lambda: _count_rows("good_receive_notes", "status", ["draft"])),
+    ("quality_checks_view", "pendingQualityChecks", lambda: _count_rows("quality_checks", "status", ["pending", "in_progress"])),
+    ("put_aways_view", "pendingPutAways", lambda: _count_rows("put_aways", "status", ["pending", "in_progress"])),
+]
+
+def _compute_dashboard(permissions: List[str], is_admin: bool) -> dict:
+    """Run every section the caller may see concurrently; a failing section is reported as null."""
+    futures = {
+        key: _dashboard_executor.submit(copy_context().run, task)
+        for permission, key, task in DASHBOARD_SECTIONS
+        if is_admin or permission in permissions
+    }
+    result: Dict[str, Any] = {"generatedAt": datetime.now().isoformat()}
+    for key, future in futures.items():
+        try:
+            result[key] = future.result(timeout=30)
+        except Exception as e:
+            logger.warning("Dashboard section '%s' failed: %s", key, e)
+            result[key] = None
+    return result
+
+def _get_dashboard_cached(role_key: str, permissions: List[str], is_admin: bool) -> dict:
+    """
+    Per-role TTL cache. A per-key lock makes concurrent misses wait for the first
+    computation instead of each hitting the database.
+    """
+    with _dashboard_cache_lock:
+        entry = _dashboard_cache.get(role_key)
+        if entry and entry["expires"] > time.monotonic():
+            return entry["value"]
+        key_lock = _dashboard_key_locks.setdefault(role_key, threading.Lock())
+    with key_lock:
+        with _dashboard_cache_lock:
+            entry = _dashboard_cache.get(role_key)
+            if entry and entry["expires"] > time.monotonic():
+                return entry["value"]
+        value = _compute_dashboard(permissions, is_admin)
+        with _dashboard_cache_lock:
+            _dashboard_cache[role_key] = {"value": value, "expires": time.monotonic() + DASHBOARD_CACHE_TTL_SECONDS}
+        return value
+
+@app.get("/dashboard")
+async def get_dashboard(payload=Depends(require_permission("dashboard_view"))):
+    """All dashboard KPIs in one payload, limited to the sections the caller's role may view."""
+    if payload.get("role") == "service_role":
+        role_name, permissions = "service_role", ["*"]
+    else:
+        user_info = await get_user_role_and_permissions(payload.get("sub"), get_supabase_client())
+        role_name, permissions = user_info["role"] or "anonymous", user_info["permissions"]
+    is_admin = "*" in permissions or role_name == "admin"
+    try:
+        dashboard = await run_in_threadpool(_get_dashboard_cached, f"role:{role_name}", permissions, is_admin)
+        return JSONResponse(content=dashboard)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build dashboard: {str(e)}")
+
+@app.put("/sale-invoices/{sale_invoice_id}")
+def update_sale_invoice(sale_invoice_id: str, sale_invoice: dict = Body(...), payload=Depends(require_permission("sale_invoices_edit"))):
+    # Get current sale invoice status for validation
+    current_invoice_data = supabase.table("sale_invoices").select("status").eq("id", sale_invoice_id).execute()
+    if not current_invoice_data.data:
         raise HTTPException(status_code=404, detail="Sale invoice not found")
     
     current_status = current_invoice_data.data[0]["status"]
@@ -5663,7 +7008,7 @@ def get_good_receive_notes(payload=Depends(require_permission("grn_view"))):
         transformed_data = [to_camel_case_good_receive_note(grn) for grn in grn_data.data]
         return JSONResponse(content=transformed_data)
     except Exception as e:
-        print(f"ERROR fetching GRNs: {str(e)}")
+        logger.error("ERROR fetching GRNs: %s", e)
         raise HTTPException(status_code=500, detail=f"Error fetching GRNs: {str(e)}")
 
 @app.get("/good-receive-notes/{grn_id}")
@@ -5686,7 +7031,7 @@ def get_good_receive_note(grn_id: str, payload=Depends(require_permission("grn_v
         
         return JSONResponse(content=grn)
     except Exception as e:
-        print(f"ERROR fetching GRN {grn_id}: {str(e)}")
+        logger.error("ERROR fetching GRN %s: %s", grn_id, e)
         raise HTTPException(status_code=500, detail=f"Error fetching GRN: {str(e)}")
 
 @app.get("/good-receive-notes/{grn_id}/items")
@@ -5731,10 +7076,10 @@ def create_good_receive_note(good_receive_note: dict = Body(...), payload=Depend
                 if product_ids:
                     try:
                         if DEBUG_MODE:
-                            print(f"DEBUG: Direct GRN - Looking up tax data for product IDs: {product_ids}")
+                            logger.debug("Direct GRN - Looking up tax data for product IDs: %s", product_ids)
                         prod_res = supabase.table("products").select("id, purchase_tax_type, purchase_tax_id, taxes!purchase_tax_id(rate)").in_("id", product_ids).execute()
                         if DEBUG_MODE:
-                            print(f"DEBUG: Direct GRN - Product tax data query result: {prod_res.data}")
+                            logger.debug("Direct GRN - Product tax data query result: %s", prod_res.data)
                         for prod in prod_res.data:
                             # Extract rate from the taxes join
                             rate = 0.0
@@ -5745,12 +7090,12 @@ def create_good_receive_note(good_receive_note: dict = Body(...), payload=Depend
                                 "rate": rate,
                             }
                             if DEBUG_MODE:
-                                print(f"DEBUG: Direct GRN - Product {prod['id']} tax data: type={prod.get('purchase_tax_type')}, rate={rate}, tax_id={prod.get('purchase_tax_id')}")
+                                logger.debug("Direct GRN - Product %s tax data: type=%s, rate=%s, tax_id=%s", prod['id'], prod.get('purchase_tax_type'), rate, prod.get('purchase_tax_id'))
                         if DEBUG_MODE:
-                            print(f"DEBUG: Direct GRN - Final products_map: {products_map}")
+                            logger.debug("Direct GRN - Final products_map: %s", products_map)
                     except Exception as e:
                         if DEBUG_MODE:
-                            print(f"DEBUG: Direct GRN - Error fetching product tax data: {e}")
+                            logger.debug("Direct GRN - Error fetching product tax data: %s", e)
                         products_map = {}
                 processed_items = []
                 subtotal = 0.0
@@ -5764,7 +7109,7 @@ def create_good_receive_note(good_receive_note: dict = Body(...), payload=Depend
                     tax_type = it.get("purchaseTaxType") or prod.get("type") or "exclusive"
                     rate = float(prod.get("rate") or 0.0)
                     if DEBUG_MODE:
-                        print(f"DEBUG: Direct GRN - Item {it.get('productId')} tax calculation: prod_data={prod}, tax_type={tax_type}, rate={rate}")
+                        logger.debug("Direct GRN - Item %s tax calculation: prod_data=%s, tax_type=%s, rate=%s", it.get('productId'), prod, tax_type, rate)
                     line_subtotal = qty * unit_cost
                     amount_after_discount = line_subtotal - discount
                     if tax_type == "inclusive":
@@ -5781,7 +7126,7 @@ def create_good_receive_note(good_receive_note: dict = Body(...), payload=Depend
                         "total": round(line_total, 2),
                     }
                     if DEBUG_MODE:
-                        print(f"DEBUG: Direct GRN processed item: {processed_item}")
+                        logger.debug("Direct GRN processed item: %s", processed_item)
                     processed_items.append(processed_item)
                     subtotal += line_subtotal
                     discount_amount += discount
@@ -5798,7 +7143,7 @@ def create_good_receive_note(good_receive_note: dict = Body(...), payload=Depend
                     expected_delivery = (received_date + timedelta(days=7)).isoformat()
 
                 if DEBUG_MODE:
-                    print(f"DEBUG: Auto-generated PO totals - subtotal: {subtotal}, tax_amount: {tax_amount}, discount_amount: {discount_amount}, total_amount: {total_amount}")
+                    logger.debug("Auto-generated PO totals - subtotal: %s, tax_amount: %s, discount_amount: %s, total_amount: %s", subtotal, tax_amount, discount_amount, total_amount)
                 po_data = {
                     "order_number": po_number,
                     "supplier_id": supplier_id,
@@ -5914,7 +7259,7 @@ def create_good_receive_note(good_receive_note: dict = Body(...), payload=Depend
         _total_received_items = sum(int(item.get("receivedQuantity", 0)) for item in _processed_items_for_grn)
         
         if DEBUG_MODE:
-            print(f"DEBUG: GRN totals - _subtotal: {_subtotal}, _tax_amount: {_tax_amount}, _discount_amount: {_discount_amount}, _total_received_items: {_total_received_items}")
+            logger.debug("GRN totals - _subtotal: %s, _tax_amount: %s, _discount_amount: %s, _total_received_items: %s", _subtotal, _tax_amount, _discount_amount, _total_received_items)
         grn_data = {
         "grn_number": good_receive_note["grnNumber"],
             "purchase_order_id": purchase_order_id,
@@ -5946,13 +7291,13 @@ def create_good_receive_note(good_receive_note: dict = Body(...), payload=Depend
         if not created_grn:
             raise HTTPException(status_code=500, detail="Failed to create good receive note")
     except Exception as e:
-        print(f"Error creating GRN: {str(e)}")
+        logger.error("Error creating GRN: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to create good receive note: {str(e)}")
     
     # Insert items if they exist (use processed values with computed tax/total)
     items = _processed_items_for_grn
     if DEBUG_MODE:
-        print(f"DEBUG: Processed items for GRN creation: {items}")
+        logger.debug("Processed items for GRN creation: %s", items)
     if items and len(items) > 0:
         items_data = []
         for item in items:
@@ -5992,22 +7337,22 @@ def create_good_receive_note(good_receive_note: dict = Body(...), payload=Depend
                         try:
                             raw_item = items[idx]
                             serials = raw_item.get("serialNumbers") or []
-                            print(f"DEBUG: Processing GRN item {idx}, raw serials: {serials}")
+                            logger.debug("Processing GRN item %s, raw serials: %s", idx, serials)
                             # Accept string input: comma/newline separated
                             if isinstance(serials, str):
                                 serials = [s.strip() for s in serials.replace('\r', '\n').replace(',', '\n').split('\n') if s.strip()]
-                                print(f"DEBUG: Parsed string serials: {serials}")
+                                logger.debug("Parsed string serials: %s", serials)
                             if serials and raw_item.get("productId"):
-                                print(f"DEBUG: Creating serials for product {raw_item['productId']}: {serials}")
+                                logger.debug("Creating serials for product %s: %s", raw_item['productId'], serials)
                                 _create_serials_for_grn_item(raw_item["productId"], serials, inserted["id"])
                             else:
-                                print(f"DEBUG: No serials to create for item {idx}. Serials: {serials}, ProductId: {raw_item.get('productId')}")
+                                logger.debug("No serials to create for item %s. Serials: %s, ProductId: %s", idx, serials, raw_item.get('productId'))
                         except Exception as e:
                             # Do not fail entire GRN if serial insert fails; surface later via validation if needed
-                            print(f"DEBUG: Error creating serials for item {idx}: {str(e)}")
+                            logger.debug("Error creating serials for item %s: %s", idx, e)
                             pass
             except Exception as e:
-                print(f"Error inserting GRN items: {str(e)}")
+                logger.error("Error inserting GRN items: %s", e)
                 # If items fail to insert, we should still return the created GRN
                 # but log the error for debugging
     
@@ -6219,7 +7564,7 @@ def get_quality_checks(payload=Depends(require_permission("quality_checks_view")
         
         return JSONResponse(content=result)
     except Exception as e:
-        print(f"ERROR fetching quality checks: {str(e)}")
+        logger.error("ERROR fetching quality checks: %s", e)
         raise HTTPException(status_code=500, detail=f"Error fetching quality checks: {str(e)}")
 
 @app.get("/quality-checks/{qc_id}")
@@ -6252,7 +7597,7 @@ def get_quality_check(qc_id: str, payload=Depends(require_permission("grn_view")
     except HTTPException:
         raise
     except Exception as e:
-        print(f"ERROR fetching quality check {qc_id}: {str(e)}")
+        logger.error("ERROR fetching quality check %s: %s", qc_id, e)
         raise HTTPException(status_code=500, detail=f"Error fetching quality check: {str(e)}")
 
 @app.post("/quality-checks")
@@ -6350,7 +7695,7 @@ def create_quality_check(qc: dict = Body(...), payload=Depends(require_permissio
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating quality check: {str(e)}")
+        logger.error("Error creating quality check: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to create quality check: {str(e)}")
 
 @app.put("/quality-checks/{qc_id}")
@@ -6429,7 +7774,7 @@ def update_quality_check(qc_id: str, qc: dict = Body(...), payload=Depends(requi
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating quality check: {str(e)}")
+        logger.error("Error updating quality check: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to update quality check: {str(e)}")
 
 @app.delete("/quality-checks/{qc_id}")
@@ -6464,7 +7809,7 @@ def delete_quality_check(qc_id: str, payload=Depends(require_permission("quality
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error deleting quality check: {str(e)}")
+        logger.error("Error deleting quality check: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to delete quality check: {str(e)}")
 
 # ==================== End Quality Checks API ====================
@@ -6534,7 +7879,7 @@ def get_put_aways(payload=Depends(require_permission("put_aways_view"))):
         
         return JSONResponse(content=[to_camel_case_put_away(pa) for pa in (data.data or [])])
     except Exception as e:
-        print(f"Error fetching put aways: {str(e)}")
+        logger.error("Error fetching put aways: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch put aways: {str(e)}")
 
 @app.get("/put-aways/{pa_id}")
@@ -6560,9 +7905,190 @@ def get_put_away(pa_id: str, payload=Depends(require_permission("grn_view"))):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error fetching put away: {str(e)}")
+        logger.error("Error fetching put away: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch put away: {str(e)}")
 
+# ==================== Put-Away Slotting ====================
+# Suggested destinations for received goods. Occupancy per location is held in
+# memory per worker: loaded from stock_levels at most every
+# SLOTTING_OCCUPANCY_TTL_SECONDS and adjusted in place as put-aways and pick
+# lists complete, so consecutive receipts see each other's placements.
+
+SLOTTING_OCCUPANCY_TTL_SECONDS = float(os.getenv("SLOTTING_OCCUPANCY_TTL_SECONDS", "60"))
+
+_slotting_state: Dict[str, Any] = {"expires": 0.0, "locations": {}, "occupancy": {}, "stored": {}}
+_slotting_lock = threading.Lock()
+
+def _refresh_slotting_state(client: Client):
+    """Reload locations and occupancy when the in-memory copy has expired"""
+    with _slotting_lock:
+        if _slotting_state["expires"] > time.monotonic():
+            return
+    locations = client.table("locations").select("id, name, capacity, is_active").execute().data or []
+    stock_rows = client.table("stock_levels").select(
+        "product_id, location_id, quantity_on_hand"
+    ).gt("quantity_on_hand", 0).execute().data or []
+    occupancy: Dict[str, int] = {}
+    stored: Dict[tuple, int] = {}
+    for row in stock_rows:
+        if row.get("location_id"):
+            occupancy[row["location_id"]] = occupancy.get(row["location_id"], 0) + row["quantity_on_hand"]
+            key = (row["product_id"], row["location_id"])
+            stored[key] = stored.get(key, 0) + row["quantity_on_hand"]
+    with _slotting_lock:
+        _slotting_state.update({
+            "expires": time.monotonic() + SLOTTING_OCCUPANCY_TTL_SECONDS,
+            "locations": {loc["id"]: loc for loc in locations if loc.get("is_active", True) is not False},
+            "occupancy": occupancy,
+            "stored": stored,
+        })
+
+def _adjust_slotting_occupancy(product_id: str, location_id: Optional[str], delta: int):
+    """Apply a completed stock movement to the in-memory occupancy"""
+    if not location_id or not delta:
+        return
+    with _slotting_lock:
+        occupancy, stored = _slotting_state["occupancy"], _slotting_state["stored"]
+        occupancy[location_id] = max(0, occupancy.get(location_id, 0) + delta)
+        key = (product_id, location_id)
+        stored[key] = max(0, stored.get(key, 0) + delta)
+        if not stored[key]:
+            del stored[key]
+
+def _suggest_slots(client: Client, lines: List[dict]) -> List[Optional[dict]]:
+    """
+    Suggest a destination for each (product_id, quantity) line, largest first:
+    a location that already holds the product and has room, else the active
+    location with the least free capacity that still fits the line (locations
+    without a capacity last), else the location with the most free capacity.
+    Lines in the same request see each other's placements.
+    """
+    _refresh_slotting_state(client)
+    suggestions: List[Optional[dict]] = [None] * len(lines)
+    with _slotting_lock:
+        locations = list(_slotting_state["locations"].values())
+        occupancy = dict(_slotting_state["occupancy"])
+        stored = dict(_slotting_state["stored"])
+        if not locations:
+            return suggestions
+
+        def free(loc):
+            capacity = loc.get("capacity")
+            return None if capacity is None else capacity - occupancy.get(loc["id"], 0)
+
+        order = sorted(range(len(lines)), key=lambda i: -(lines[i].get("quantity") or 0))
+        for index in order:
+            product_id, quantity = lines[index].get("product_id"), lines[index].get("quantity") or 0
+            fitting = [loc for loc in locations if free(loc) is None or free(loc) >= quantity]
+            same_sku = [loc for loc in fitting if stored.get((product_id, loc["id"]), 0) > 0]
+            if same_sku:
+                slot, reason = max(same_sku, key=lambda loc: stored[(product_id, loc["id"])]), "affinity"
+            elif fitting:
+                slot, reason = min(fitting, key=lambda loc: (free(loc) is None, free(loc) or 0, loc.get("name") or "")), "capacity"
+            else:
+                slot, reason = max(locations, key=lambda loc: free(loc)), "overflow"
+            occupancy[slot["id"]] = occupancy.get(slot["id"], 0) + quantity
+            stored[(product_id, slot["id"])] = stored.get((product_id, slot["id"]), 0) + quantity
+            suggestions[index] = {
+                "location_id": slot["id"],
+                "location_name": slot.get("name"),
+                "reason": reason,
+                "free_capacity": free(slot),
+            }
+    return suggestions
+
+def _slot_unplaced(client: Client, rows: List[dict], quantity_key: str = "quantity") -> Dict[str, dict]:
+    """Suggested slots for the rows without a location, keyed by row id (or position when rows have no id yet)"""
+    unplaced = [
+        (row.get("id") or str(index), row)
+        for index, row in enumerate(rows)
+        if not row.get("location_id") and row.get("product_id") and (row.get(quantity_key) or 0) > 0
+    ]
+    if not unplaced:
+        return {}
+    suggestions = _suggest_slots(client, [{"product_id": row["product_id"], "quantity": row[quantity_key]} for _, row in unplaced])
+    return {key: slot for (key, _), slot in zip(unplaced, suggestions) if slot}
+
+def _place_unplaced_put_away_items(client: Client, pa_items: List[dict]):
+    """
+    Give the put-away lines being completed without a location their
+    suggested slot, on the rows in hand and on the stored items (one upsert),
+    so the document shows where the stock went.
+    """
+    slots = _slot_unplaced(client, pa_items, "placed_quantity")
+    changed = _merge_child_row_updates(
+        pa_items,
+        {row_id: {"location_id": slot["location_id"], "location_name": slot["location_name"]} for row_id, slot in slots.items()},
+        ["put_away_id", "product_id", "quantity", "location_id", "location_name"],
+    )
+    if changed:
+        client.table("put_away_items").upsert(changed, on_conflict="id").execute()
+
+@app.post("/put-aways/slotting")
+def suggest_put_away_slots(body: dict = Body(...), payload=Depends(require_permission("put_aways_create"))):
+    """Suggest destination locations for put-away lines ({items: [{productId, quantity}]})."""
+    try:
+        lines = [
+            {"product_id": item.get("productId"), "quantity": item.get("quantity") or 0}
+            for item in body.get("items", [])
+        ]
+        suggestions = _suggest_slots(get_supabase_client(), lines)
+        return JSONResponse(content=[
+            {
+                "locationId": slot["location_id"],
+                "locationName": slot["location_name"],
+                "reason": slot["reason"],
+                "freeCapacity": slot["free_capacity"],
+            } if slot else None
+            for slot in suggestions
+        ])
+    except Exception as e:
+        logger.error("Error suggesting put-away slots: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to suggest put-away locations: {str(e)}")
+
+STOCK_BATCH_COLUMNS = "id, product_id, location_id, batch_number, expiry_date, quantity_on_hand"
+
+def _batch_receipt(pai: dict, location_id: str, placed_qty: int) -> Optional[dict]:
+    """The stock batch a put-away line adds to, or None when the line is not batch-tracked"""
+    if not (pai.get("batch_number") or pai.get("expiry_date")):
+        return None
+    return {
+        "product_id": pai["product_id"],
+        "location_id": location_id,
+        "batch_number": pai.get("batch_number"),
+        "expiry_date": pai.get("expiry_date"),
+        "quantity_on_hand": placed_qty,
+    }
+
+def _receive_stock_batches(client: Client, receipts: List[dict]):
+    """
+    Add put-away quantities to their stock batches, keyed by product,
+    location, batch number and expiry date; batches seen for the first time
+    are created. One read, then at most one upsert and one insert.
+    """
+    def batch_key(row):
+        return (row["product_id"], row.get("location_id"), row.get("batch_number"), row.get("expiry_date"))
+
+    product_ids = list({receipt["product_id"] for receipt in receipts})
+    existing = client.table("stock_batches").select(STOCK_BATCH_COLUMNS).in_("product_id", product_ids).execute().data or []
+    batches = {batch_key(row): row for row in existing}
+
+    changed: Dict[str, dict] = {}
+    for receipt in receipts:
+        batch = batches.get(batch_key(receipt))
+        if batch is None:
+            batches[batch_key(receipt)] = dict(receipt)
+            continue
+        batch["quantity_on_hand"] = (batch.get("quantity_on_hand") or 0) + receipt["quantity_on_hand"]
+        if batch.get("id"):
+            changed[batch["id"]] = batch
+
+    created = [batch for batch in batches.values() if not batch.get("id")]
+    if changed:
+        client.table("stock_batches").upsert(list(changed.values()), on_conflict="id").execute()
+    if created:
+        client.table("stock_batches").insert(created).execute()
+
 @app.post("/put-aways")
 def create_put_away(pa: dict = Body(...), payload=Depends(require_permission("put_aways_create"))):
     """Create a put away from a quality check."""
@@ -6592,11 +8118,13 @@ def create_put_away(pa: dict = Body(...), payload=Depends(require_permission("pu
         
         pa_id = result.data[0]["id"]
         
-        # Insert items if provided
+        # Insert items (provided, or auto-populated from QC) in one request;
+        # lines without a location get a suggested slot
         items = pa.get("items", [])
+        item_records = []
         if items:
             for item in items:
-                item_record = {
+                item_records.append({
                     "put_away_id": pa_id,
                     "quality_check_item_id": item.get("qualityCheckItemId"),
                     "product_id": item.get("productId"),
@@ -6609,15 +8137,14 @@ def create_put_away(pa: dict = Body(...), payload=Depends(require_permission("pu
                     "batch_number": item.get("batchNumber"),
                     "expiry_date": item.get("expiryDate"),
                     "notes": item.get("notes"),
-                }
-                fresh_supabase.table("put_away_items").insert(item_record).execute()
+                })
         elif qc_id:
             # Auto-populate from QC passed items
             qc_items = fresh_supabase.table("quality_check_items").select("*").eq("qc_id", qc_id).execute()
             for qi in (qc_items.data or []):
                 passed = qi.get("passed_quantity", 0)
                 if passed > 0:
-                    item_record = {
+                    item_records.append({
                         "put_away_id": pa_id,
                         "quality_check_item_id": qi["id"],
                         "product_id": qi.get("product_id"),
@@ -6625,23 +8152,29 @@ def create_put_away(pa: dict = Body(...), payload=Depends(require_permission("pu
                         "sku_code": qi.get("sku_code"),
                         "quantity": passed,
                         "placed_quantity": 0,
-                    }
-                    fresh_supabase.table("put_away_items").insert(item_record).execute()
+                        "location_id": None,
+                        "location_name": None,
+                    })
+        if item_records:
+            for key, slot in _slot_unplaced(fresh_supabase, item_records).items():
+                item_records[int(key)]["location_id"] = slot["location_id"]
+                item_records[int(key)]["location_name"] = slot["location_name"]
+            fresh_supabase.table("put_away_items").insert(item_records).execute()
         
         # If status is completed on creation, increase stock
         status = pa.get("status", "pending")
         if status == "completed":
             pa_items = fresh_supabase.table("put_away_items").select("*").eq("put_away_id", pa_id).execute()
             for pai in (pa_items.data or []):
-                placed_qty = pai.get("placed_quantity", 0) or pai.get("quantity", 0)
+                pai["placed_quantity"] = pai.get("placed_quantity", 0) or pai.get("quantity", 0)
+            _place_unplaced_put_away_items(fresh_supabase, pa_items.data or [])
+            batch_receipts = []
+            for pai in (pa_items.data or []):
+                placed_qty = pai["placed_quantity"]
                 product_id = pai.get("product_id")
                 location_id = pai.get("location_id")
                 
                 if placed_qty > 0 and product_id:
-                    if not location_id:
-                        default_loc = fresh_supabase.table("locations").select("id").limit(1).execute()
-                        location_id = default_loc.data[0]["id"] if default_loc.data else None
-                    
                     if location_id:
                         existing = fresh_supabase.table("stock_levels").select("id, quantity_on_hand").eq("product_id", product_id).eq("location_id", location_id).execute()
                         if existing.data:
@@ -6649,17 +8182,21 @@ def create_put_away(pa: dict = Body(...), payload=Depends(require_permission("pu
                             fresh_supabase.table("stock_levels").update({"quantity_on_hand": new_qty}).eq("id", existing.data[0]["id"]).execute()
                         else:
                             fresh_supabase.table("stock_levels").insert({"product_id": product_id, "location_id": location_id, "quantity_on_hand": placed_qty}).execute()
+                        _adjust_slotting_occupancy(product_id, location_id, placed_qty)
+                        receipt = _batch_receipt(pai, location_id, placed_qty)
+                        if receipt:
+                            batch_receipts.append(receipt)
                         
                         try:
                             fresh_supabase.table("inventory_transactions").insert({
-                                "product_id": product_id, "transaction_type": "purchase",
+                                "product_id": product_id, "location_id": location_id, "transaction_type": "purchase",
                                 "quantity_change": placed_qty, "reference_type": "put_away",
                                 "reference_id": pa_id,
                                 "notes": f"Put Away {pa_id} completed - stock increased",
                                 "created_by": user_id,
                             }).execute()
                         except Exception as tx_err:
-                            print(f"Warning: Failed to record inventory transaction: {tx_err}")
+                            logger.warning("Failed to record inventory transaction: %s", tx_err)
                     
                     # Also update product current_stock
                     try:
@@ -6667,9 +8204,12 @@ def create_put_away(pa: dict = Body(...), payload=Depends(require_permission("pu
                         if prod.data:
                             cur = prod.data.get("current_stock", 0) or 0
                             fresh_supabase.table("products").update({"current_stock": cur + placed_qty}).eq("id", product_id).execute()
-                            print(f"Stock increased for product {product_id}: {cur} -> {cur + placed_qty}")
+                            logger.info("Stock increased for product %s: %s -> %s", product_id, cur, cur + placed_qty)
                     except Exception as stock_err:
-                        print(f"Warning: Failed to update product stock: {stock_err}")
+                        logger.warning("Failed to update product stock: %s", stock_err)
+
+            if batch_receipts:
+                _receive_stock_batches(fresh_supabase, batch_receipts)
         
         # Fetch and return the created record
         created = fresh_supabase.table("put_aways").select(
@@ -6680,7 +8220,7 @@ def create_put_away(pa: dict = Body(...), payload=Depends(require_permission("pu
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating put away: {str(e)}")
+        logger.error("Error creating put away: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to create put away: {str(e)}")
@@ -6740,17 +8280,15 @@ def update_put_away(pa_id: str, pa: dict = Body(...), payload=Depends(require_pe
         # If completing put away — increase stock
         if old_status != "completed" and new_status == "completed":
             pa_items = fresh_supabase.table("put_away_items").select("*").eq("put_away_id", pa_id).execute()
+            # Lines without a location go to their suggested slot
+            _place_unplaced_put_away_items(fresh_supabase, pa_items.data or [])
+            batch_receipts = []
             for pai in (pa_items.data or []):
                 placed_qty = pai.get("placed_quantity", 0)
                 product_id = pai.get("product_id")
                 location_id = pai.get("location_id")
                 
                 if placed_qty > 0 and product_id:
-                    # Use a default location if none specified
-                    if not location_id:
-                        default_loc = fresh_supabase.table("locations").select("id").limit(1).execute()
-                        location_id = default_loc.data[0]["id"] if default_loc.data else None
-                    
                     if location_id:
                         # Check existing stock level
                         existing = fresh_supabase.table("stock_levels").select("id, quantity_on_hand").eq("product_id", product_id).eq("location_id", location_id).execute()
@@ -6768,11 +8306,19 @@ def update_put_away(pa_id: str, pa: dict = Body(...), payload=Depends(require_pe
                                 "location_id": location_id,
                                 "quantity_on_hand": placed_qty,
                             }).execute()
+
+                        _adjust_slotting_occupancy(product_id, location_id, placed_qty)
+
+                        # Batch-tracked lines also feed the FEFO batch index
+                        receipt = _batch_receipt(pai, location_id, placed_qty)
+                        if receipt:
+                            batch_receipts.append(receipt)
                         
                         # Record inventory transaction
                         try:
                             fresh_supabase.table("inventory_transactions").insert({
                                 "product_id": product_id,
+                                "location_id": location_id,
                                 "transaction_type": "purchase",
                                 "quantity_change": placed_qty,
                                 "reference_type": "put_away",
@@ -6781,7 +8327,10 @@ def update_put_away(pa_id: str, pa: dict = Body(...), payload=Depends(require_pe
                                 "created_by": payload.get("sub"),
                             }).execute()
                         except Exception as tx_err:
-                            print(f"Warning: Failed to record inventory transaction: {tx_err}")
+                            logger.warning("Failed to record inventory transaction: %s", tx_err)
+
+            if batch_receipts:
+                _receive_stock_batches(fresh_supabase, batch_receipts)
             
             # Update GRN status to completed
             if grn_id:
@@ -6796,7 +8345,7 @@ def update_put_away(pa_id: str, pa: dict = Body(...), payload=Depends(require_pe
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating put away: {str(e)}")
+        logger.error("Error updating put away: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to update put away: {str(e)}")
@@ -6820,7 +8369,7 @@ def delete_put_away(pa_id: str, payload=Depends(require_permission("put_aways_de
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error deleting put away: {str(e)}")
+        logger.error("Error deleting put away: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to delete put away: {str(e)}")
 
 # ==================== End Put Away API ====================
@@ -6891,7 +8440,7 @@ def get_delivery_challans(payload=Depends(require_permission("delivery_challans_
 
         return JSONResponse(content=[to_camel_case_delivery_challan(dc) for dc in (data.data or [])])
     except Exception as e:
-        print(f"Error fetching delivery challans: {str(e)}")
+        logger.error("Error fetching delivery challans: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch delivery challans: {str(e)}")
 
 @app.get("/delivery-challans/{dc_id}")
@@ -6910,9 +8459,24 @@ def get_delivery_challan(dc_id: str, payload=Depends(require_permission("sale_in
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error fetching delivery challan: {str(e)}")
+        logger.error("Error fetching delivery challan: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch delivery challan: {str(e)}")
 
+def _merge_child_row_updates(current_rows: List[dict], updates: Dict[str, dict], columns: List[str]) -> List[dict]:
+    """
+    Apply per-row updates (keyed by id) to the current child rows of a document.
+    Returns the changed rows with the same full column set, ready for a single
+    upsert; ids that do not belong to the document are ignored.
+    """
+    merged = []
+    for row in current_rows:
+        changes = updates.get(row.get("id"))
+        if not changes:
+            continue
+        row.update(changes)
+        merged.append({column: row.get(column) for column in ["id", *columns]})
+    return merged
+
 @app.post("/delivery-challans")
 def create_delivery_challan(dc: dict = Body(...), payload=Depends(require_permission("delivery_challans_create"))):
     """Create a delivery challan (from invoice, SO, or standalone)."""
@@ -6942,11 +8506,12 @@ def create_delivery_challan(dc: dict = Body(...), payload=Depends(require_permis
 
         dc_id = result.data[0]["id"]
 
-        # Insert items if provided
+        # Insert items (provided, or auto-populated from the sale invoice) in one request
         items = dc.get("items", [])
+        item_records = []
         if items:
             for item in items:
-                item_record = {
+                item_records.append({
                     "delivery_challan_id": dc_id,
                     "product_id": item.get("productId"),
                     "product_name": item.get("productName"),
@@ -6955,15 +8520,13 @@ def create_delivery_challan(dc: dict = Body(...), payload=Depends(require_permis
                     "dispatched_quantity": item.get("dispatchedQuantity", 0),
                     "unit_price": item.get("unitPrice", 0),
                     "notes": item.get("notes"),
-                }
-                fresh_supabase.table("delivery_challan_items").insert(item_record).execute()
+                })
         elif dc.get("saleInvoiceId"):
-            # Auto-populate from sale invoice items
             si_items = fresh_supabase.table("sale_invoice_items").select(
                 "*, products(name, sku_code)"
             ).eq("invoice_id", dc.get("saleInvoiceId")).execute()
             for si in (si_items.data or []):
-                item_record = {
+                item_records.append({
                     "delivery_challan_id": dc_id,
                     "product_id": si.get("product_id"),
                     "product_name": si.get("product_name") or (si.get("products", {}).get("name") if si.get("products") else None),
@@ -6971,8 +8534,10 @@ def create_delivery_challan(dc: dict = Body(...), payload=Depends(require_permis
                     "quantity": si.get("quantity", 0),
                     "dispatched_quantity": 0,
                     "unit_price": si.get("unit_price", 0),
-                }
-                fresh_supabase.table("delivery_challan_items").insert(item_record).execute()
+                    "notes": None,
+                })
+        if item_records:
+            fresh_supabase.table("delivery_challan_items").insert(item_records).execute()
 
         # Return created record
         created = fresh_supabase.table("delivery_challans").select(
@@ -6983,7 +8548,7 @@ def create_delivery_challan(dc: dict = Body(...), payload=Depends(require_permis
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating delivery challan: {str(e)}")
+        logger.error("Error creating delivery challan: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to create delivery challan: {str(e)}")
@@ -7023,7 +8588,8 @@ def update_delivery_challan(dc_id: str, dc: dict = Body(...), payload=Depends(re
         if update_data:
             fresh_supabase.table("delivery_challans").update(update_data).eq("id", dc_id).execute()
 
-        # Update items
+        # Update items with a single upsert of the changed rows
+        item_updates = {}
         for item in dc.get("items", []):
             item_id = item.get("id")
             if item_id:
@@ -7033,7 +8599,15 @@ def update_delivery_challan(dc_id: str, dc: dict = Body(...), payload=Depends(re
                 if "notes" in item:
                     item_update["notes"] = item["notes"]
                 if item_update:
-                    fresh_supabase.table("delivery_challan_items").update(item_update).eq("id", item_id).execute()
+                    item_updates[item_id] = item_update
+        if item_updates:
+            current_items = fresh_supabase.table("delivery_challan_items").select("*").eq("delivery_challan_id", dc_id).execute()
+            changed = _merge_child_row_updates(
+                current_items.data or [], item_updates,
+                ["delivery_challan_id", "product_id", "quantity", "dispatched_quantity", "notes"],
+            )
+            if changed:
+                fresh_supabase.table("delivery_challan_items").upsert(changed, on_conflict="id").execute()
 
         updated = fresh_supabase.table("delivery_challans").select(
             "*, sale_invoices(invoice_number, status), sales_orders(order_number, status), customers(name, phone, shipping_address), items:delivery_challan_items(*)"
@@ -7043,7 +8617,7 @@ def update_delivery_challan(dc_id: str, dc: dict = Body(...), payload=Depends(re
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating delivery challan: {str(e)}")
+        logger.error("Error updating delivery challan: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to update delivery challan: {str(e)}")
@@ -7066,7 +8640,7 @@ def delete_delivery_challan(dc_id: str, payload=Depends(require_permission("sale
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error deleting delivery challan: {str(e)}")
+        logger.error("Error deleting delivery challan: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to delete delivery challan: {str(e)}")
 
 @app.post("/delivery-challans/{dc_id}/convert-to-invoice")
@@ -7169,6 +8743,9 @@ def convert_dc_to_invoice(dc_id: str, payload=Depends(require_permission("sale_i
             inv_item["sale_invoice_id"] = invoice_id
             fresh_supabase.table("sale_invoice_items").insert(inv_item).execute()
 
+        # DC invoices have no sales order behind them, so count them here
+        _record_customer_product_affinity(customer_id, invoice_data["invoice_date"], invoice_items)
+
         # Update DC: link to invoice + set status to invoiced
         fresh_supabase.table("delivery_challans").update({
             "sale_invoice_id": invoice_id,
@@ -7202,11 +8779,19 @@ def to_camel_case_pick_list_item(item):
         "pickedQuantity": item.get("picked_quantity", 0),
         "locationId": item.get("location_id"),
         "locationName": item.get("location_name"),
+        "pickSequence": item.get("pick_sequence"),
+        "stockBatchId": item.get("stock_batch_id"),
+        "batchNumber": item.get("batch_number"),
+        "expiryDate": item.get("expiry_date"),
         "notes": item.get("notes"),
         "createdAt": item.get("created_at"),
         "updatedAt": item.get("updated_at"),
     }
 
+def _pick_walk_order(item):
+    # Unsequenced items (created before pick paths existed) keep their stored order
+    return (item.get("pick_sequence") is None, item.get("pick_sequence") or 0)
+
 def to_camel_case_pick_list(pl):
     return {
         "id": pl.get("id"),
@@ -7225,13 +8810,43 @@ def to_camel_case_pick_list(pl):
         "pickDate": pl.get("pick_date"),
         "completedDate": pl.get("completed_date"),
         "notes": pl.get("notes"),
-        "items": [to_camel_case_pick_list_item(i) for i in pl.get("items", [])],
+        "pickType": pl.get("pick_type") or "single",
+        "items": [to_camel_case_pick_list_item(i) for i in sorted(pl.get("items") or [], key=_pick_walk_order)],
+        "allocations": [to_camel_case_pick_list_allocation(a) for a in (pl.get("allocations") or [])],
+        "deliveryChallans": _wave_delivery_challans(pl.get("allocations") or []),
         "createdBy": pl.get("created_by"),
         "createdAt": pl.get("created_at"),
         "updatedAt": pl.get("updated_at"),
     }
 
-PICK_LIST_SELECT = "*, delivery_challans(dc_number, status), assigned_user:profiles!pick_lists_assigned_to_fkey(full_name, username), items:pick_list_items(*)"
+def to_camel_case_pick_list_allocation(allocation):
+    return {
+        "id": allocation.get("id"),
+        "pickListItemId": allocation.get("pick_list_item_id"),
+        "deliveryChallanId": allocation.get("delivery_challan_id"),
+        "deliveryChallanItemId": allocation.get("delivery_challan_item_id"),
+        "quantity": allocation.get("quantity", 0),
+        "pickedQuantity": allocation.get("picked_quantity", 0),
+    }
+
+def _wave_delivery_challans(allocations: List[dict]) -> List[dict]:
+    """Distinct DCs served by a wave, in allocation order"""
+    seen: Dict[str, dict] = {}
+    for allocation in allocations:
+        dc_id = allocation.get("delivery_challan_id")
+        if dc_id and dc_id not in seen:
+            dc = allocation.get("delivery_challans") or {}
+            seen[dc_id] = {"id": dc_id, "dcNumber": dc.get("dc_number"), "status": dc.get("status")}
+    return list(seen.values())
+
+PICK_LIST_SELECT = (
+    "*, delivery_challans!pick_lists_delivery_challan_id_fkey(dc_number, status), "
+    "assigned_user:profiles!pick_lists_assigned_to_fkey(full_name, username), items:pick_list_items(*), "
+    "allocations:pick_list_allocations(*, delivery_challans(dc_number, status))"
+)
+
+# Pick lists that still hold their DCs; a DC on one of these cannot join a new wave
+OPEN_PICK_LIST_STATUSES = ["pending", "in_progress"]
 
 @app.get("/pick-lists")
 def get_pick_lists(payload=Depends(require_permission("pick_lists_view"))):
@@ -7241,7 +8856,7 @@ def get_pick_lists(payload=Depends(require_permission("pick_lists_view"))):
         data = fresh_supabase.table("pick_lists").select(PICK_LIST_SELECT).order("created_at", desc=True).execute()
         return JSONResponse(content=[to_camel_case_pick_list(pl) for pl in (data.data or [])])
     except Exception as e:
-        print(f"Error fetching pick lists: {str(e)}")
+        logger.error("Error fetching pick lists: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch pick lists: {str(e)}")
 
 @app.get("/pick-lists/{pl_id}")
@@ -7259,6 +8874,161 @@ def get_pick_list(pl_id: str, payload=Depends(require_permission("sale_invoices_
         raise HTTPException(status_code=500, detail=f"Failed to fetch pick list: {str(e)}")
 
 
+PICK_PATH_LOCATION_COLUMNS = "id, name, zone, aisle, bay, level"
+
+def _sequence_pick_path(item_records: List[dict], locations: Dict[str, dict]) -> List[dict]:
+    """
+    Order pick lines along the picker's walk and number them from 1.
+
+    Locations are walked zone by zone and aisle by aisle in S-shape: bays go
+    up in one visited aisle and down in the next, so the picker leaves each
+    aisle at the end where the next one starts. Aisles without a pick are
+    skipped and do not flip the direction. Within a bay, levels go bottom
+    to top. Lines whose location has no aisle follow in location-name order,
+    and lines without a location come last.
+    """
+    def position(record):
+        return locations.get(record.get("location_id") or "") or {}
+
+    placed = [r for r in item_records if position(r).get("aisle") is not None]
+    unplaced = [r for r in item_records if position(r).get("aisle") is None]
+
+    aisles = sorted({(position(r).get("zone") or "", position(r)["aisle"]) for r in placed})
+    descending = {aisle: index % 2 == 1 for index, aisle in enumerate(aisles)}
+
+    def walk_key(record):
+        loc = position(record)
+        aisle = (loc.get("zone") or "", loc["aisle"])
+        bay = loc.get("bay") or 0
+        return (aisle, -bay if descending[aisle] else bay, loc.get("level") or 0, record.get("product_name") or "")
+
+    ordered = sorted(placed, key=walk_key) + sorted(
+        unplaced,
+        key=lambda r: (not r.get("location_id"), position(r).get("name") or r.get("location_name") or "", r.get("product_name") or ""),
+    )
+    for sequence, record in enumerate(ordered, start=1):
+        record["pick_sequence"] = sequence
+    return ordered
+
+def _load_pick_sources(client: Client, product_ids: List[str]) -> Tuple[Dict[str, List[dict]], Dict[str, dict]]:
+    """
+    Stock that picks can draw from, per product, in first-expired-first-out
+    order: unexpired batches by expiry date (undated batches after dated
+    ones), then the unbatched stock of each location, fullest first.
+
+    Stock already allocated to the lines of open pick lists is reserved for
+    them and left out, so two pick lists never draw on the same units.
+
+    Also returns the locations involved (for pick path sequencing).
+    """
+    if not product_ids:
+        return {}, {}
+    stock_rows = client.table("stock_levels").select(
+        f"product_id, location_id, quantity_on_hand, locations({PICK_PATH_LOCATION_COLUMNS})"
+    ).in_("product_id", product_ids).execute().data or []
+    batch_rows = client.table("stock_batches").select(STOCK_BATCH_COLUMNS).in_(
+        "product_id", product_ids
+    ).gt("quantity_on_hand", 0).execute().data or []
+    open_lines = client.table("pick_list_items").select(
+        "product_id, location_id, stock_batch_id, quantity, picked_quantity, pick_lists!inner(status)"
+    ).in_("product_id", product_ids).in_("pick_lists.status", OPEN_PICK_LIST_STATUSES).execute().data or []
+    locations = {row["location_id"]: row["locations"] for row in stock_rows if row.get("locations")}
+
+    # Outstanding quantity of open pick lines, per batch and per unbatched location
+    reserved: Dict[Any, int] = {}
+    for line in open_lines:
+        if not line.get("location_id"):
+            continue
+        key = line.get("stock_batch_id") or (line["product_id"], line["location_id"])
+        reserved[key] = reserved.get(key, 0) + max(int(line.get("quantity") or 0), int(line.get("picked_quantity") or 0))
+
+    def source(product_id, location_id, remaining, batch=None):
+        return {
+            "product_id": product_id,
+            "location_id": location_id,
+            "location_name": (locations.get(location_id) or {}).get("name"),
+            "stock_batch_id": batch["id"] if batch else None,
+            "batch_number": batch.get("batch_number") if batch else None,
+            "expiry_date": batch.get("expiry_date") if batch else None,
+            "remaining": remaining,
+        }
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    sources: Dict[str, List[dict]] = {}
+    batched: Dict[tuple, int] = {}
+    for batch in sorted(batch_rows, key=lambda b: (b.get("expiry_date") is None, b.get("expiry_date") or "", b.get("batch_number") or "")):
+        key = (batch["product_id"], batch.get("location_id"))
+        batched[key] = batched.get(key, 0) + batch["quantity_on_hand"]
+        if batch.get("expiry_date") and batch["expiry_date"] < today:
+            continue
+        free = batch["quantity_on_hand"] - reserved.get(batch["id"], 0)
+        if free > 0:
+            sources.setdefault(batch["product_id"], []).append(
+                source(batch["product_id"], batch.get("location_id"), free, batch)
+            )
+
+    unbatched = []
+    for row in stock_rows:
+        key = (row["product_id"], row.get("location_id"))
+        loose = (row.get("quantity_on_hand") or 0) - batched.get(key, 0) - reserved.get(key, 0)
+        if loose > 0:
+            unbatched.append(source(row["product_id"], row.get("location_id"), loose))
+    for loose in sorted(unbatched, key=lambda src: -src["remaining"]):
+        sources.setdefault(loose["product_id"], []).append(loose)
+    return sources, locations
+
+def _draw_from_sources(sources: List[dict], quantity: int, location_id: Optional[str] = None):
+    """Yield (source, quantity) pairs covering quantity in source order; the source is None for any shortfall"""
+    for source in sources:
+        if quantity <= 0:
+            return
+        if source["remaining"] <= 0 or (location_id and source["location_id"] != location_id):
+            continue
+        take = min(quantity, source["remaining"])
+        source["remaining"] -= take
+        quantity -= take
+        yield source, take
+    if quantity > 0:
+        yield None, quantity
+
+def _allocate_pick_lines(item_records: List[dict], sources: Dict[str, List[dict]]) -> List[dict]:
+    """
+    Split pick lines over the stock they draw from (see _load_pick_sources),
+    one line per location and batch. A line that names a location only
+    draws from that location; stock it cannot find stays on the line as-is.
+    """
+    allocated = []
+    for record in item_records:
+        record = {**record, "stock_batch_id": None, "batch_number": None, "expiry_date": None}
+        quantity = int(record.get("quantity") or 0)
+        if quantity <= 0 or not record.get("product_id"):
+            allocated.append(record)
+            continue
+        picked = int(record.get("picked_quantity") or 0)
+        for source, take in _draw_from_sources(sources.get(record["product_id"], []), quantity, record.get("location_id")):
+            line = {**record, "quantity": take, "picked_quantity": min(picked, take)}
+            picked -= line["picked_quantity"]
+            if source:
+                line.update({column: source[column] for column in (
+                    "location_id", "stock_batch_id", "batch_number", "expiry_date",
+                )})
+                line["location_name"] = source["location_name"] or record.get("location_name")
+            allocated.append(line)
+    return allocated
+
+def _challans_on_open_pick_lists(client: Client, dc_ids: List[str]) -> set:
+    """
+    The delivery challans among dc_ids that are already on an open pick list,
+    either a single list or a wave. A DC may only be on one at a time.
+    """
+    busy = client.table("pick_lists").select("delivery_challan_id").in_(
+        "delivery_challan_id", dc_ids
+    ).in_("status", OPEN_PICK_LIST_STATUSES).execute().data or []
+    busy_in_waves = client.table("pick_list_allocations").select(
+        "delivery_challan_id, pick_lists!inner(status)"
+    ).in_("delivery_challan_id", dc_ids).in_("pick_lists.status", OPEN_PICK_LIST_STATUSES).execute().data or []
+    return {row["delivery_challan_id"] for row in busy + busy_in_waves}
+
 @app.post("/pick-lists")
 def create_pick_list(pl: dict = Body(...), payload=Depends(require_permission("pick_lists_create"))):
     """Create a pick list (from DC)."""
@@ -7266,6 +9036,10 @@ def create_pick_list(pl: dict = Body(...), payload=Depends(require_permission("p
         fresh_supabase = get_supabase_client()
         user_id = payload.get("sub")
 
+        dc_id = pl.get("deliveryChallanId")
+        if dc_id and pl.get("status", "pending") in OPEN_PICK_LIST_STATUSES and _challans_on_open_pick_lists(fresh_supabase, [dc_id]):
+            raise HTTPException(status_code=409, detail="Delivery challan is already on an open pick list")
+
         pl_record = {
             "pick_list_number": pl.get("pickListNumber", f"PL-{datetime.now().strftime('%Y%m%d%H%M%S')}"),
             "delivery_challan_id": pl.get("deliveryChallanId"),
@@ -7282,11 +9056,12 @@ def create_pick_list(pl: dict = Body(...), payload=Depends(require_permission("p
 
         pl_id = result.data[0]["id"]
 
-        # Insert items if provided
+        # Insert items (provided, or auto-populated from the DC) in one request
         items = pl.get("items", [])
+        item_records = []
         if items:
             for item in items:
-                fresh_supabase.table("pick_list_items").insert({
+                item_records.append({
                     "pick_list_id": pl_id,
                     "product_id": item.get("productId"),
                     "product_name": item.get("productName"),
@@ -7296,43 +9071,322 @@ def create_pick_list(pl: dict = Body(...), payload=Depends(require_permission("p
                     "location_id": item.get("locationId"),
                     "location_name": item.get("locationName"),
                     "notes": item.get("notes"),
-                }).execute()
+                })
         elif pl.get("deliveryChallanId"):
-            # Auto-populate from DC items
             dc_items = fresh_supabase.table("delivery_challan_items").select("*").eq("delivery_challan_id", pl.get("deliveryChallanId")).execute()
             for dci in (dc_items.data or []):
-                fresh_supabase.table("pick_list_items").insert({
+                item_records.append({
                     "pick_list_id": pl_id,
                     "product_id": dci.get("product_id"),
                     "product_name": dci.get("product_name"),
                     "sku_code": dci.get("sku_code"),
                     "quantity": dci.get("quantity", 0),
                     "picked_quantity": 0,
-                }).execute()
+                    "location_id": None,
+                    "location_name": None,
+                    "notes": None,
+                })
+        if item_records:
+            product_ids = list({r["product_id"] for r in item_records if r.get("product_id")})
+            sources, locations = _load_pick_sources(fresh_supabase, product_ids)
+            item_records = _allocate_pick_lines(item_records, sources)
+            # Named locations without stock of the line's product still need a position
+            missing = list({r["location_id"] for r in item_records if r.get("location_id")} - set(locations))
+            if missing:
+                rows = fresh_supabase.table("locations").select(PICK_PATH_LOCATION_COLUMNS).in_("id", missing).execute().data or []
+                locations.update({row["id"]: row for row in rows})
+            item_records = _sequence_pick_path(item_records, locations)
+            fresh_supabase.table("pick_list_items").insert(item_records).execute()
 
         created = fresh_supabase.table("pick_lists").select(PICK_LIST_SELECT).eq("id", pl_id).execute()
         return JSONResponse(content=to_camel_case_pick_list(created.data[0]) if created.data else result.data[0])
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating pick list: {str(e)}")
+        logger.error("Error creating pick list: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to create pick list: {str(e)}")
 
+def _plan_pick_wave(dc_lines: List[dict], sources: Dict[str, List[dict]]) -> List[dict]:
+    """
+    Consolidate DC lines into wave lines, one per product, location and batch.
+
+    Each product's demand is drawn from its stock in FEFO order (see
+    _load_pick_sources); demand beyond the available stock goes to a line
+    without a location. Every wave line carries the (DC, DC line, quantity)
+    allocations it serves.
+    """
+    lines: Dict[tuple, dict] = {}
+    for dc_line in dc_lines:
+        product_id = dc_line["product_id"]
+        for source, take in _draw_from_sources(sources.get(product_id, []), int(dc_line.get("quantity") or 0)):
+            key = (product_id, source["location_id"], source["stock_batch_id"]) if source else (product_id, None, None)
+            line = lines.get(key)
+            if line is None:
+                line = lines[key] = {
+                    "product_id": product_id,
+                    "product_name": dc_line.get("product_name"),
+                    "sku_code": dc_line.get("sku_code"),
+                    "location_id": source["location_id"] if source else None,
+                    "location_name": source["location_name"] if source else None,
+                    "stock_batch_id": source["stock_batch_id"] if source else None,
+                    "batch_number": source["batch_number"] if source else None,
+                    "expiry_date": source["expiry_date"] if source else None,
+                    "quantity": 0,
+                    "allocations": [],
+                }
+            line["quantity"] += take
+            line["allocations"].append({
+                "delivery_challan_id": dc_line["delivery_challan_id"],
+                "delivery_challan_item_id": dc_line["id"],
+                "quantity": take,
+            })
+
+    return list(lines.values())
+
+@app.post("/pick-lists/waves")
+def create_pick_wave(wave: dict = Body(...), payload=Depends(require_permission("pick_lists_create"))):
+    """Create one consolidated pick list (a wave) for several dispatch-ready delivery challans."""
+    try:
+        fresh_supabase = get_supabase_client()
+        dc_ids = list(dict.fromkeys(wave.get("deliveryChallanIds") or []))
+        if not dc_ids:
+            raise HTTPException(status_code=400, detail="deliveryChallanIds must list at least one delivery challan")
+
+        dcs = fresh_supabase.table("delivery_challans").select(
+            "id, dc_number, status, items:delivery_challan_items(id, product_id, product_name, sku_code, quantity)"
+        ).in_("id", dc_ids).execute().data or []
+        found = {dc["id"]: dc for dc in dcs}
+        missing = [dc_id for dc_id in dc_ids if dc_id not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Delivery challans not found: {', '.join(missing)}")
+        not_ready = [found[dc_id]["dc_number"] for dc_id in dc_ids if found[dc_id]["status"] != "draft"]
+        if not_ready:
+            raise HTTPException(status_code=400, detail=f"Delivery challans are not ready for dispatch: {', '.join(not_ready)}")
+
+        busy_ids = _challans_on_open_pick_lists(fresh_supabase, dc_ids)
+        if busy_ids:
+            numbers = [found[dc_id]["dc_number"] for dc_id in dc_ids if dc_id in busy_ids]
+            raise HTTPException(status_code=409, detail=f"Delivery challans already on an open pick list: {', '.join(numbers)}")
+
+        dc_lines = [
+            {**item, "delivery_challan_id": dc_id}
+            for dc_id in dc_ids
+            for item in (found[dc_id].get("items") or [])
+            if item.get("product_id") and (item.get("quantity") or 0) > 0
+        ]
+        if not dc_lines:
+            raise HTTPException(status_code=400, detail="The selected delivery challans have no lines to pick")
+
+        sources, locations = _load_pick_sources(fresh_supabase, list({line["product_id"] for line in dc_lines}))
+        plan = _sequence_pick_path(_plan_pick_wave(dc_lines, sources), locations)
+
+        result = fresh_supabase.table("pick_lists").insert({
+            "pick_list_number": wave.get("pickListNumber", f"WV-{datetime.now().strftime('%Y%m%d%H%M%S')}"),
+            "pick_type": "wave",
+            "assigned_to": wave.get("assignedTo"),
+            "status": "pending",
+            "pick_date": wave.get("pickDate", datetime.now().strftime("%Y-%m-%d")),
+            "notes": wave.get("notes"),
+            "created_by": payload.get("sub"),
+        }).execute()
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Failed to create pick wave")
+        pl_id = result.data[0]["id"]
+
+        inserted = fresh_supabase.table("pick_list_items").insert([
+            {
+                "pick_list_id": pl_id,
+                "product_id": line["product_id"],
+                "product_name": line["product_name"],
+                "sku_code": line["sku_code"],
+                "quantity": line["quantity"],
+                "picked_quantity": 0,
+                "location_id": line["location_id"],
+                "location_name": line["location_name"],
+                "pick_sequence": line["pick_sequence"],
+                "stock_batch_id": line["stock_batch_id"],
+                "batch_number": line["batch_number"],
+                "expiry_date": line["expiry_date"],
+                "notes": None,
+            }
+            for line in plan
+        ]).execute().data or []
+
+        # Inserted rows come back in request order
+        allocations = [
+            {**allocation, "pick_list_id": pl_id, "pick_list_item_id": item["id"]}
+            for line, item in zip(plan, inserted)
+            for allocation in line["allocations"]
+        ]
+        for sequence, allocation in enumerate(allocations, start=1):
+            allocation["sequence"] = sequence
+        if allocations:
+            fresh_supabase.table("pick_list_allocations").insert(allocations).execute()
+
+        created = fresh_supabase.table("pick_lists").select(PICK_LIST_SELECT).eq("id", pl_id).execute()
+        return JSONResponse(content=to_camel_case_pick_list(created.data[0]) if created.data else result.data[0])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error creating pick wave: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to create pick wave: {str(e)}")
+
+def _dispatch_wave(client: Client, pl_id: str, pl_items: List[dict]):
+    """
+    Spread each wave line's picked quantity over its allocations in plan
+    order, record the dispatched quantity on every DC line and dispatch, with
+    one update, the DCs that had anything picked. DCs with nothing picked
+    stay in draft and can go on a later pick list.
+    """
+    allocations = client.table("pick_list_allocations").select("*").eq("pick_list_id", pl_id).order("sequence").execute().data or []
+    if not allocations:
+        return
+
+    remaining = {item["id"]: int(item.get("picked_quantity") or 0) for item in pl_items}
+    dispatched: Dict[str, int] = {}
+    for allocation in allocations:
+        available = remaining.get(allocation["pick_list_item_id"], 0)
+        picked = min(int(allocation.get("quantity") or 0), available)
+        remaining[allocation["pick_list_item_id"]] = available - picked
+        allocation["picked_quantity"] = picked
+        dc_item_id = allocation["delivery_challan_item_id"]
+        dispatched[dc_item_id] = dispatched.get(dc_item_id, 0) + picked
+
+    client.table("pick_list_allocations").upsert([
+        {column: allocation.get(column) for column in [
+            "id", "pick_list_id", "pick_list_item_id", "delivery_challan_id",
+            "delivery_challan_item_id", "quantity", "picked_quantity", "sequence",
+        ]}
+        for allocation in allocations
+    ], on_conflict="id").execute()
+
+    dc_ids = list(dict.fromkeys(allocation["delivery_challan_id"] for allocation in allocations))
+    dc_items = client.table("delivery_challan_items").select("*").in_("delivery_challan_id", dc_ids).execute().data or []
+    changed = _merge_child_row_updates(
+        dc_items, {dc_item_id: {"dispatched_quantity": qty} for dc_item_id, qty in dispatched.items()},
+        ["delivery_challan_id", "product_id", "quantity", "dispatched_quantity", "notes"],
+    )
+    if changed:
+        client.table("delivery_challan_items").upsert(changed, on_conflict="id").execute()
+
+    covered = list(dict.fromkeys(
+        allocation["delivery_challan_id"] for allocation in allocations if allocation["picked_quantity"] > 0
+    ))
+    if covered:
+        client.table("delivery_challans").update({
+            "status": "dispatched",
+            "dispatch_date": datetime.now().isoformat(),
+        }).in_("id", covered).execute()
+
+def _deduct_picked_stock(client: Client, pl_items: List[dict], pl_id: str, created_by: Optional[str]):
+    """
+    Decrease stock for every picked line of a pick list: one read of the
+    affected stock levels, one upsert of the new quantities and one insert of
+    the inventory transactions, regardless of the number of lines.
+
+    Raises 409 before writing anything if a stock row or batch holds less
+    than is picked from it.
+    """
+    picked = [
+        pli for pli in pl_items
+        if (pli.get("picked_quantity", 0) or 0) > 0 and pli.get("product_id")
+    ]
+    if not picked:
+        return
+
+    product_ids = list({pli["product_id"] for pli in picked})
+    stock_rows = client.table("stock_levels").select(
+        "id, product_id, location_id, quantity_on_hand"
+    ).in_("product_id", product_ids).execute().data or []
+    by_location = {(row["product_id"], row.get("location_id")): row for row in stock_rows}
+    by_product: Dict[str, dict] = {}
+    for row in stock_rows:
+        fullest = by_product.get(row["product_id"])
+        if fullest is None or (row.get("quantity_on_hand") or 0) > (fullest.get("quantity_on_hand") or 0):
+            by_product[row["product_id"]] = row
+
+    # Lines allocated to a batch decrement that exact batch as well
+    batch_ids = list({pli["stock_batch_id"] for pli in picked if pli.get("stock_batch_id")})
+    batches = {}
+    if batch_ids:
+        batch_rows = client.table("stock_batches").select(STOCK_BATCH_COLUMNS).in_("id", batch_ids).execute().data or []
+        batches = {row["id"]: row for row in batch_rows}
+
+    changed: Dict[str, dict] = {}
+    transactions = []
+    moves = []
+    shortfalls = []
+    for pli in picked:
+        picked_qty = pli["picked_quantity"]
+        product_id = pli["product_id"]
+        location_id = pli.get("location_id")
+        # Lines without a location draw from the product's fullest stock row
+        row = by_location.get((product_id, location_id)) if location_id else by_product.get(product_id)
+        if row:
+            on_hand = row.get("quantity_on_hand", 0) or 0
+            if on_hand < picked_qty:
+                shortfalls.append(f"{pli.get('product_name') or product_id} at {pli.get('location_name') or 'any location'}: {on_hand} on hand, {picked_qty} picked")
+            row["quantity_on_hand"] = on_hand - picked_qty
+            changed[row["id"]] = row
+            moves.append((product_id, row.get("location_id"), -picked_qty))
+        batch = batches.get(pli.get("stock_batch_id"))
+        if batch:
+            on_hand = batch.get("quantity_on_hand") or 0
+            if on_hand < picked_qty:
+                shortfalls.append(f"{pli.get('product_name') or product_id} batch {batch.get('batch_number')}: {on_hand} on hand, {picked_qty} picked")
+            batch["quantity_on_hand"] = on_hand - picked_qty
+        transactions.append({
+            "product_id": product_id,
+            "location_id": row.get("location_id") if row else location_id,
+            "transaction_type": "sale",
+            "quantity_change": -picked_qty,
+            "reference_type": "pick_list",
+            "reference_id": pl_id,
+            "notes": "Pick List completed - stock decreased" + (f" (batch {batch['batch_number']})" if batch and batch.get("batch_number") else ""),
+            "created_by": created_by,
+        })
+
+    if shortfalls:
+        raise HTTPException(status_code=409, detail=f"Not enough stock to complete the pick list: {'; '.join(shortfalls)}")
+
+    for product_id, location_id, delta in moves:
+        _adjust_slotting_occupancy(product_id, location_id, delta)
+
+    if changed:
+        client.table("stock_levels").upsert([
+            {
+                "id": row["id"],
+                "product_id": row["product_id"],
+                "location_id": row.get("location_id"),
+                "quantity_on_hand": row["quantity_on_hand"],
+            }
+            for row in changed.values()
+        ], on_conflict="id").execute()
+    if batches:
+        client.table("stock_batches").upsert(list(batches.values()), on_conflict="id").execute()
+
+    # Record inventory transactions
+    try:
+        client.table("inventory_transactions").insert(transactions).execute()
+    except Exception as tx_err:
+        logger.warning("Failed to record inventory transactions: %s", tx_err)
+
 @app.put("/pick-lists/{pl_id}")
 def update_pick_list(pl_id: str, pl: dict = Body(...), payload=Depends(require_permission("pick_lists_edit"))):
     """Update a pick list. If completed, decrease stock and dispatch DC."""
     try:
         fresh_supabase = get_supabase_client()
 
-        current = fresh_supabase.table("pick_lists").select("id, status, delivery_challan_id").eq("id", pl_id).execute()
+        current = fresh_supabase.table("pick_lists").select("id, status, delivery_challan_id, pick_type").eq("id", pl_id).execute()
         if not current.data:
             raise HTTPException(status_code=404, detail="Pick list not found")
 
         old_status = current.data[0]["status"]
         new_status = pl.get("status", old_status)
         dc_id = current.data[0].get("delivery_challan_id")
+        is_wave = current.data[0].get("pick_type") == "wave"
 
         if old_status == "completed":
             raise HTTPException(status_code=403, detail="Cannot edit a completed pick list")
@@ -7348,10 +9402,8 @@ def update_pick_list(pl_id: str, pl: dict = Body(...), payload=Depends(require_p
         if new_status == "completed":
             update_data["completed_date"] = datetime.now().isoformat()
 
-        if update_data:
-            fresh_supabase.table("pick_lists").update(update_data).eq("id", pl_id).execute()
-
-        # Update items
+        # Update items with a single upsert of the changed rows
+        item_updates = {}
         for item in pl.get("items", []):
             item_id = item.get("id")
             if item_id:
@@ -7365,47 +9417,40 @@ def update_pick_list(pl_id: str, pl: dict = Body(...), payload=Depends(require_p
                 if "notes" in item:
                     item_update["notes"] = item["notes"]
                 if item_update:
-                    fresh_supabase.table("pick_list_items").update(item_update).eq("id", item_id).execute()
-
-        # If completing — decrease stock
-        if old_status != "completed" and new_status == "completed":
-            pl_items = fresh_supabase.table("pick_list_items").select("*").eq("pick_list_id", pl_id).execute()
-            for pli in (pl_items.data or []):
-                picked_qty = pli.get("picked_quantity", 0)
-                product_id = pli.get("product_id")
-                location_id = pli.get("location_id")
-
-                if picked_qty > 0 and product_id:
-                    if location_id:
-                        existing = fresh_supabase.table("stock_levels").select("id, quantity_on_hand").eq("product_id", product_id).eq("location_id", location_id).execute()
-                    else:
-                        existing = fresh_supabase.table("stock_levels").select("id, quantity_on_hand").eq("product_id", product_id).limit(1).execute()
-
-                    if existing.data:
-                        new_qty = max(0, (existing.data[0].get("quantity_on_hand", 0) or 0) - picked_qty)
-                        fresh_supabase.table("stock_levels").update({
-                            "quantity_on_hand": new_qty
-                        }).eq("id", existing.data[0]["id"]).execute()
+                    item_updates[item_id] = item_update
+
+        completing = old_status != "completed" and new_status == "completed"
+        pl_items = []
+        changed = []
+        if item_updates or completing:
+            pl_items = fresh_supabase.table("pick_list_items").select("*").eq("pick_list_id", pl_id).execute().data or []
+        if item_updates:
+            # A batch belongs to one location: moving a line off it drops the batch allocation
+            for row in pl_items:
+                update = item_updates.get(row["id"])
+                if update and row.get("stock_batch_id") and "location_id" in update and update["location_id"] != row.get("location_id"):
+                    update.update({"stock_batch_id": None, "batch_number": None, "expiry_date": None})
+            changed = _merge_child_row_updates(
+                pl_items, item_updates,
+                ["pick_list_id", "product_id", "quantity", "picked_quantity", "location_id", "location_name",
+                 "stock_batch_id", "batch_number", "expiry_date", "notes"],
+            )
 
-                    # Record inventory transaction
-                    try:
-                        fresh_supabase.table("inventory_transactions").insert({
-                            "product_id": product_id,
-                            "transaction_type": "sale",
-                            "quantity_change": -picked_qty,
-                            "reference_type": "pick_list",
-                            "reference_id": pl_id,
-                            "notes": f"Pick List completed - stock decreased",
-                            "created_by": payload.get("sub"),
-                        }).execute()
-                    except Exception as tx_err:
-                        print(f"Warning: Failed to record inventory transaction: {tx_err}")
-                    
-                    # Stock sync is handled by on_inventory_transaction trigger
-                    pass
+        # If completing — decrease stock for all lines in one batched pass;
+        # this checks the stock first, so a shortfall leaves the list as it was
+        if completing:
+            _deduct_picked_stock(fresh_supabase, pl_items, pl_id, payload.get("sub"))
 
-            # Update DC status to dispatched
-            if dc_id:
+        if update_data:
+            fresh_supabase.table("pick_lists").update(update_data).eq("id", pl_id).execute()
+        if changed:
+            fresh_supabase.table("pick_list_items").upsert(changed, on_conflict="id").execute()
+
+        if completing:
+            # Update DC status to dispatched (every DC the wave picked for)
+            if is_wave:
+                _dispatch_wave(fresh_supabase, pl_id, pl_items)
+            elif dc_id:
                 fresh_supabase.table("delivery_challans").update({
                     "status": "dispatched",
                     "dispatch_date": datetime.now().isoformat(),
@@ -7416,7 +9461,7 @@ def update_pick_list(pl_id: str, pl: dict = Body(...), payload=Depends(require_p
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating pick list: {str(e)}")
+        logger.error("Error updating pick list: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to update pick list: {str(e)}")
@@ -7669,7 +9714,7 @@ def update_return_dc(rdc_id: str, rdc: dict = Body(...), payload=Depends(require
                             "created_by": payload.get("sub"),
                         }).execute()
                     except Exception as tx_err:
-                        print(f"Warning: Failed to record inventory transaction: {tx_err}")
+                        logger.warning("Failed to record inventory transaction: %s", tx_err)
                     
                     # Stock sync is handled by on_inventory_transaction trigger
                     pass
@@ -7723,7 +9768,7 @@ def update_purchase_order_status_from_grns(purchase_order_id: str):
     - Otherwise keep or set status to 'approved' (do not override 'cancelled').
     """
     if DEBUG_MODE:
-        print(f"DEBUG: Updating PO status for purchase_order_id: {purchase_order_id}")
+        logger.debug("Updating PO status for purchase_order_id: %s", purchase_order_id)
     fresh = get_supabase_client()
     # Fetch PO status to avoid overriding cancelled
     po_res = fresh.table("purchase_orders").select("status").eq("id", purchase_order_id).execute()
@@ -7743,11 +9788,11 @@ def update_purchase_order_status_from_grns(purchase_order_id: str):
     grn_res = fresh.table("good_receive_notes").select("id, status").eq("purchase_order_id", purchase_order_id).execute()
     grn_ids = [g["id"] for g in (grn_res.data or []) if g.get("status") == "completed"]
     if DEBUG_MODE:
-        print(f"DEBUG: Found GRNs for PO {purchase_order_id}: {[(g['id'], g['status']) for g in (grn_res.data or [])]}")
-        print(f"DEBUG: Completed GRN IDs: {grn_ids}")
+        logger.debug("Found GRNs for PO %s: %s", purchase_order_id, [(g['id'], g['status']) for g in (grn_res.data or [])])
+        logger.debug("Completed GRN IDs: %s", grn_ids)
     if not grn_ids:
         if DEBUG_MODE:
-            print(f"DEBUG: No completed GRNs found for PO {purchase_order_id}")
+            logger.debug("No completed GRNs found for PO %s", purchase_order_id)
         if current_status == "received":
             fresh.table("purchase_orders").update({"status": "approved"}).eq("id", purchase_order_id).execute()
         return
@@ -7755,21 +9800,21 @@ def update_purchase_order_status_from_grns(purchase_order_id: str):
     items_res = fresh.table("good_receive_note_items").select("purchase_order_item_id, accepted_quantity, received_quantity, rejected_quantity, grn_id").in_("grn_id", grn_ids).execute()
     received_by_item = {}
     if DEBUG_MODE:
-        print(f"DEBUG: GRN items data: {items_res.data}")
+        logger.debug("GRN items data: %s", items_res.data)
     for row in items_res.data or []:
         poi = row.get("purchase_order_item_id")
         if not poi:
             if DEBUG_MODE:
-                print(f"DEBUG: Skipping GRN item with no purchase_order_item_id: {row}")
+                logger.debug("Skipping GRN item with no purchase_order_item_id: %s", row)
             continue
         acc = int(row.get("accepted_quantity") or 0)
         received_by_item[poi] = received_by_item.get(poi, 0) + acc
         if DEBUG_MODE:
-            print(f"DEBUG: PO Item {poi}: accepted_quantity={acc}, running_total={received_by_item[poi]}")
+            logger.debug("PO Item %s: accepted_quantity=%s, running_total=%s", poi, acc, received_by_item[poi])
     
     if DEBUG_MODE:
-        print(f"DEBUG: PO Items: {po_items}")
-        print(f"DEBUG: Received by item: {received_by_item}")
+        logger.debug("PO Items: %s", po_items)
+        logger.debug("Received by item: %s", received_by_item)
     
     # Determine completeness
     all_received = True
@@ -7777,22 +9822,22 @@ def update_purchase_order_status_from_grns(purchase_order_id: str):
         required = int(poi.get("quantity") or 0)
         got = int(received_by_item.get(poi.get("id"), 0))
         if DEBUG_MODE:
-            print(f"DEBUG: PO Item {poi.get('id')}: required={required}, received={got}, satisfied={got >= required}")
+            logger.debug("PO Item %s: required=%s, received=%s, satisfied=%s", poi.get('id'), required, got, got >= required)
         if got < required:
             all_received = False
             # Don't break here, continue logging all items for debugging
     # Update PO status accordingly
     if all_received and current_status != "received":
         if DEBUG_MODE:
-            print(f"DEBUG: All items received for PO {purchase_order_id}, updating status to 'received'")
+            logger.debug("All items received for PO %s, updating status to 'received'", purchase_order_id)
         fresh.table("purchase_orders").update({"status": "received"}).eq("id", purchase_order_id).execute()
     elif not all_received and current_status == "received":
         if DEBUG_MODE:
-            print(f"DEBUG: Not all items received for PO {purchase_order_id}, reverting status to 'approved'")
+            logger.debug("Not all items received for PO %s, reverting status to 'approved'", purchase_order_id)
         fresh.table("purchase_orders").update({"status": "approved"}).eq("id", purchase_order_id).execute()
     else:
         if DEBUG_MODE:
-            print(f"DEBUG: No status change needed for PO {purchase_order_id}. Current: {current_status}, All received: {all_received}")
+            logger.debug("No status change needed for PO %s. Current: %s, All received: %s", purchase_order_id, current_status, all_received)
 
 # Status validation functions for business logic
 def validate_grn_status_transition(current_status: str, new_status: str = None, operation: str = "edit"):
@@ -8133,7 +10178,7 @@ def get_available_sales_orders_for_invoice(payload=Depends(require_permission("s
 
 
 if __name__ == "__main__":
-    print(f"Starting server with DEBUG_MODE: {DEBUG_MODE}")
+    logger.info("Starting server with DEBUG_MODE: %s", DEBUG_MODE)
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=DEBUG_MODE)
 
 
@@ -8369,108 +10414,1185 @@ DB_HOST = os.getenv("DB_HOST", "supabase-db")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_NAME = os.getenv("DB_NAME", "postgres")
 
+# Full backups are written by pg_dump in directory format (one compressed file per
+# table), which is the only format pg_dump can produce with parallel workers.
+BACKUP_PARALLEL_JOBS = int(os.getenv("BACKUP_PARALLEL_JOBS", "4"))
+BACKUP_COMPRESSION_LEVEL = int(os.getenv("BACKUP_COMPRESSION_LEVEL", "6"))
+BACKUP_DIRECTORY_SUFFIX = ".dir"
+BACKUP_CUSTOM_SUFFIX = ".dump"
+BACKUP_LEGACY_SUFFIX = ".sql"
+BACKUP_INCREMENTAL_SUFFIX = ".inc"
+BACKUP_SUFFIXES = (BACKUP_DIRECTORY_SUFFIX, BACKUP_CUSTOM_SUFFIX, BACKUP_LEGACY_SUFFIX, BACKUP_INCREMENTAL_SUFFIX)
+
+# Incremental backups copy only the rows of high-volume tables written since the last
+# backup, keyed on a timestamp watermark column. Deletions are not captured; they are
+# only reflected by the next full backup.
+INCREMENTAL_BACKUP_TABLES = {
+    "inventory_transactions": "created_at",  # append-only
+    "sale_invoice_items": "updated_at",
+    "product_serials": "updated_at",
+    "good_receive_note_items": "updated_at",
+}
+# Restores upsert on the primary key; a partitioned table's key includes its partition column
+INCREMENTAL_CONFLICT_COLUMNS = {
+    "inventory_transactions": "id, created_at",
+}
+INCREMENTAL_BACKUP_MANIFEST = "manifest.json"
+INCREMENTAL_CHUNK_ROWS = int(os.getenv("INCREMENTAL_CHUNK_ROWS", "250000"))
+INCREMENTAL_WATERMARK_OVERLAP_SECONDS = int(os.getenv("INCREMENTAL_WATERMARK_OVERLAP_SECONDS", "300"))
+
+# Job state lives in JSON files under BACKUP_DIR so that every gunicorn worker
+# can report on a job started by any other worker.
+BACKUP_JOBS_DIR = os.path.join(BACKUP_DIR, ".jobs")
+_backup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+
+
+class _BackupJobLock:
+    """
+    Guards the check-then-create of a job across threads and gunicorn worker
+    processes: the critical section holds an flock on a file in BACKUP_JOBS_DIR.
+    """
+
+    def __init__(self):
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            os.makedirs(BACKUP_JOBS_DIR, exist_ok=True)
+            self._file = open(os.path.join(BACKUP_JOBS_DIR, ".lock"), "w")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        except Exception:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+        finally:
+            self._file = None
+            self._thread_lock.release()
+
+
+_backup_job_lock = _BackupJobLock()
+
+
+def _backup_db_uri() -> str:
+    db_password = os.environ.get("SUPABASE_DB_PASSWORD", "postgres")
+    return f"postgresql://{DB_USER}:{db_password}@{DB_HOST}:5432/{DB_NAME}"
+
+
+def _format_backup_size(size_bytes: int) -> str:
+    if size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.2f} KB"
+    return f"{size_bytes / (1024 * 1024):.2f} MB"
+
+
+def _backup_path(filename: str) -> str:
+    """Resolve a backup name inside BACKUP_DIR, rejecting anything that is not a backup."""
+    if (
+        os.path.basename(filename) != filename
+        or filename.startswith(".")
+        or not filename.endswith(BACKUP_SUFFIXES)
+    ):
+        raise HTTPException(status_code=404, detail="Backup not found")
+    filepath = os.path.join(BACKUP_DIR, filename)
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="Backup not found")
+    return filepath
+
+
+def _backup_size_bytes(filepath: str) -> int:
+    if not os.path.isdir(filepath):
+        return os.stat(filepath).st_size
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _dirs, files in os.walk(filepath)
+        for name in files
+    )
+
+
+def _write_backup_job(job: dict) -> None:
+    os.makedirs(BACKUP_JOBS_DIR, exist_ok=True)
+    job_path = os.path.join(BACKUP_JOBS_DIR, f"{job['id']}.json")
+    tmp_path = f"{job_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, job_path)
+
+
+def _read_backup_job(job_id: str) -> Optional[dict]:
+    if os.path.basename(job_id) != job_id:
+        return None
+    try:
+        with open(os.path.join(BACKUP_JOBS_DIR, f"{job_id}.json")) as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # A job whose worker process has gone away (restart, OOM) will never finish
+    if job.get("status") in ("queued", "running"):
+        try:
+            os.kill(job.get("pid"), 0)
+        except (OSError, TypeError):
+            job.update({
+                "status": "failed",
+                "error": "Backup worker exited before the job finished",
+                "finishedAt": datetime.utcnow().isoformat() + "Z",
+            })
+            _write_backup_job(job)
+    return job
+
+
+def _list_backup_jobs() -> List[dict]:
+    if not os.path.isdir(BACKUP_JOBS_DIR):
+        return []
+    jobs = []
+    for name in os.listdir(BACKUP_JOBS_DIR):
+        if name.endswith(".json"):
+            job_path = os.path.join(BACKUP_JOBS_DIR, name)
+            job = _read_backup_job(name[:-len(".json")])
+            if not job:
+                continue
+            # Finished jobs are only kept for status polling; the catalogue is the record
+            if (
+                job.get("status") in ("completed", "failed")
+                and time.time() - os.path.getmtime(job_path) > BACKUP_JOB_RETENTION_SECONDS
+            ):
+                os.remove(job_path)
+                continue
+            jobs.append(job)
+    return jobs
+
+
+def _update_backup_job(job: dict, **changes) -> None:
+    job.update(changes)
+    _write_backup_job(job)
+
+
+def _active_backup_job() -> Optional[dict]:
+    """Backups and restores are exclusive: only one job may touch the database at a time."""
+    for job in _list_backup_jobs():
+        if job.get("status") in ("queued", "running"):
+            return job
+    return None
+
+
+def _new_backup_job(job_type: str, filename: str, payload: dict, **extra) -> dict:
+    job = {
+        "id": f"{job_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}",
+        "type": job_type,
+        "filename": filename,
+        "status": "queued",
+        "progress": 0,
+        "pid": os.getpid(),
+        "createdBy": payload.get("sub"),
+        "startedAt": datetime.utcnow().isoformat() + "Z",
+        "finishedAt": None,
+        **extra,
+    }
+    _write_backup_job(job)
+    return job
+
+
+# The backup catalogue is a SQLite file next to the archives with one row per finished
+# backup, written when the backup completes. Listing reads it instead of walking and
+# stat-ing BACKUP_DIR, and restores check archives against the recorded file sizes.
+BACKUP_CATALOG_PATH = os.path.join(BACKUP_DIR, ".catalog.sqlite3")
+BACKUP_JOB_RETENTION_SECONDS = int(os.getenv("BACKUP_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+_backup_catalog_lock = threading.Lock()
+_backup_catalog_ready = False
+
+
+def _backup_catalog() -> sqlite3.Connection:
+    global _backup_catalog_ready
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    conn = sqlite3.connect(BACKUP_CATALOG_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if not _backup_catalog_ready:
+        with _backup_catalog_lock:
+            if not _backup_catalog_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS backups (
+                        name             TEXT PRIMARY KEY,
+                        kind             TEXT NOT NULL,
+                        format           TEXT NOT NULL,
+                        size_bytes       INTEGER NOT NULL,
+                        checksum         TEXT NOT NULL,
+                        files            TEXT NOT NULL,
+                        started_at       TEXT NOT NULL,
+                        finished_at      TEXT,
+                        duration_seconds REAL,
+                        coverage_from    TEXT,
+                        coverage_to      TEXT,
+                        row_count        INTEGER,
+                        tables           TEXT,
+                        created_by       TEXT
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_backups_started_at ON backups(started_at)")
+                conn.commit()
+                _backup_catalog_ready = True
+                # Hashing legacy archives can take minutes; never do it inside a request
+                _backup_executor.submit(_import_untracked_backups_in_background)
+    return conn
+
+
+def _backup_format(filepath: str) -> str:
+    if filepath.endswith(BACKUP_INCREMENTAL_SUFFIX):
+        return "copy"
+    if os.path.isdir(filepath):
+        return "directory"
+    return "custom" if filepath.endswith(BACKUP_CUSTOM_SUFFIX) else "plain"
+
+
+def _hash_backup_files(filepath: str) -> Dict[str, Dict[str, Any]]:
+    """sha256 and size of every file in an archive, keyed by path relative to BACKUP_DIR."""
+    if os.path.isdir(filepath):
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _dirs, names in os.walk(filepath)
+            for name in names
+        )
+    else:
+        paths = [filepath]
+
+    files = {}
+    for path in paths:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        files[os.path.relpath(path, BACKUP_DIR)] = {"sha256": digest.hexdigest(), "bytes": os.path.getsize(path)}
+    return files
+
+
+def _combined_checksum(files: Dict[str, Dict[str, Any]]) -> str:
+    # A single file keeps its own sha256 so it can be checked with sha256sum
+    if len(files) == 1:
+        return next(iter(files.values()))["sha256"]
+    return hashlib.sha256(
+        "\n".join(f"{path} {entry['sha256']}" for path, entry in sorted(files.items())).encode()
+    ).hexdigest()
+
+
+def _catalog_backup(
+    conn: sqlite3.Connection,
+    name: str,
+    kind: str,
+    started_at: str,
+    finished_at: Optional[str],
+    coverage_from: Optional[str] = None,
+    coverage_to: Optional[str] = None,
+    row_count: Optional[int] = None,
+    tables: Optional[List[str]] = None,
+    created_by: Optional[str] = None,
+) -> None:
+    filepath = os.path.join(BACKUP_DIR, name)
+    files = _hash_backup_files(filepath)
+    duration = None
+    if finished_at:
+        duration = (
+            datetime.fromisoformat(finished_at.rstrip("Z")) - datetime.fromisoformat(started_at.rstrip("Z"))
+        ).total_seconds()
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO backups (
+            name, kind, format, size_bytes, checksum, files, started_at, finished_at,
+            duration_seconds, coverage_from, coverage_to, row_count, tables, created_by
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            name, kind, _backup_format(filepath), sum(f["bytes"] for f in files.values()),
+            _combined_checksum(files), json.dumps(files), started_at, finished_at, duration,
+            coverage_from, coverage_to, row_count, json.dumps(tables) if tables is not None else None,
+            created_by,
+        ),
+    )
+
+
+def _catalog_untracked_backup(conn: sqlite3.Connection, name: str, jobs: Dict[str, dict]) -> bool:
+    """Catalogue one archive written before the catalogue existed; False for an interrupted increment."""
+    filepath = os.path.join(BACKUP_DIR, name)
+    if name.endswith(BACKUP_INCREMENTAL_SUFFIX):
+        manifest = _read_incremental_manifest(filepath)
+        if not manifest:
+            return False
+        _catalog_backup(
+            conn, name, "incremental", manifest["createdAt"], None,
+            coverage_from=manifest["since"], coverage_to=manifest["until"],
+            row_count=manifest["totalRows"], tables=sorted(manifest["tables"]),
+        )
+    elif jobs.get(name, {}).get("status") == "completed":
+        job = jobs[name]
+        _catalog_backup(
+            conn, name, "full", job["startedAt"], job.get("finishedAt"),
+            coverage_to=job.get("snapshotAt"), created_by=job.get("createdBy"),
+        )
+    else:
+        modified_at = datetime.utcfromtimestamp(os.stat(filepath).st_mtime).isoformat() + "Z"
+        _catalog_backup(conn, name, "full", modified_at, None)
+    return True
+
+
+def _backup_jobs_by_filename() -> Dict[str, dict]:
+    return {job.get("filename"): job for job in _list_backup_jobs() if job.get("type") == "backup"}
+
+
+def _import_untracked_backups(conn: sqlite3.Connection) -> None:
+    """Catalogue archives that predate the catalogue or were copied into BACKUP_DIR by hand."""
+    known = {row["name"] for row in conn.execute("SELECT name FROM backups")}
+    jobs = _backup_jobs_by_filename()
+    active = {name for name, job in jobs.items() if job.get("status") in ("queued", "running")}
+    for name in os.listdir(BACKUP_DIR):
+        if name.startswith(".") or not name.endswith(BACKUP_SUFFIXES) or name in known or name in active:
+            continue
+        if _catalog_untracked_backup(conn, name, jobs):
+            # Commit per archive so the catalogue is not write-locked while the next one is hashed
+            conn.commit()
+
+
+def _import_untracked_backups_in_background() -> None:
+    """Runs on the backup worker; only one gunicorn worker imports at a time, the others skip."""
+    with open(os.path.join(BACKUP_DIR, ".catalog-import.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        try:
+            with closing(_backup_catalog()) as conn:
+                _import_untracked_backups(conn)
+        except Exception as e:
+            logger.error("Failed to import untracked backups into the catalogue: %s", e)
+
+
+def _backup_file_sizes(filepath: str) -> Dict[str, int]:
+    """Size of every file in an archive, keyed like _hash_backup_files but without reading them."""
+    if os.path.isdir(filepath):
+        paths = [os.path.join(root, name) for root, _dirs, names in os.walk(filepath) for name in names]
+    else:
+        paths = [filepath]
+    return {os.path.relpath(path, BACKUP_DIR): os.path.getsize(path) for path in paths}
+
+
+def _verify_backup_integrity(name: str, verify_checksums: bool = False) -> None:
+    """Compare an archive with the file list and sizes recorded when it was written.
+
+    Rehashing a large archive takes as long as reading it, so checksums are only compared
+    when asked for. An archive the background import has not reached yet is catalogued
+    here; that hashes it once, and there is nothing older to compare it with.
+    """
+    with closing(_backup_catalog()) as conn:
+        row = conn.execute("SELECT files FROM backups WHERE name = ?", (name,)).fetchone()
+        if not row:
+            if not _catalog_untracked_backup(conn, name, _backup_jobs_by_filename()):
+                raise ValueError(f"Backup {name} is incomplete")
+            conn.commit()
+            return
+    expected = json.loads(row["files"])
+    filepath = os.path.join(BACKUP_DIR, name)
+    if verify_checksums:
+        actual = _hash_backup_files(filepath)
+    else:
+        actual = {path: {"bytes": size} for path, size in _backup_file_sizes(filepath).items()}
+        expected = {path: {"bytes": entry["bytes"]} for path, entry in expected.items()}
+    if actual != expected:
+        changed = sorted(
+            path for path in set(expected) | set(actual)
+            if expected.get(path) != actual.get(path)
+        )
+        raise ValueError(f"Backup {name} failed its integrity check: {', '.join(changed[:5])}")
+
+
+def _count_backup_tables(db_uri: str) -> int:
+    """Number of tables pg_dump will write data for, used as the progress denominator."""
+    try:
+        result = subprocess.run(
+            [
+                "psql", db_uri, "-At", "-c",
+                "SELECT count(*) FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relkind IN ('r', 'm') "
+                "AND n.nspname NOT IN ('pg_catalog', 'information_schema') "
+                "AND n.nspname NOT LIKE 'pg_toast%'",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        return int(result.stdout.strip() or 0)
+    except (subprocess.SubprocessError, ValueError) as e:
+        logger.warning("Could not count tables for backup progress: %s", e)
+        return 0
+
+
+def _run_backup_job(job: dict) -> None:
+    filepath = os.path.join(BACKUP_DIR, job["filename"])
+    db_uri = _backup_db_uri()
+    total_tables = _count_backup_tables(db_uri)
+    # pg_dump's snapshot is taken right after this, so it covers everything up to now
+    _update_backup_job(job, status="running", totalTables=total_tables, snapshotAt=_backup_db_now(db_uri))
+
+    # pg_dump --verbose reports each table as it is written; the serial path logs
+    # "dumping contents of table", parallel workers log "finished item ... TABLE DATA".
+    tables_done = 0
+    stderr_tail: List[str] = []
+    last_write = 0.0
+    try:
+        process = subprocess.Popen(
+            [
+                "pg_dump", db_uri,
+                "--format=directory",
+                f"--jobs={BACKUP_PARALLEL_JOBS}",
+                f"--compress={BACKUP_COMPRESSION_LEVEL}",
+                "--no-owner",
+                "--verbose",
+                "-f", filepath,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        for line in process.stderr:
+            stderr_tail = (stderr_tail + [line.rstrip()])[-20:]
+            if "dumping contents of table" in line or ("finished item" in line and "TABLE DATA" in line):
+                tables_done += 1
+                # Throttle job file writes; a dump can report thousands of tables
+                if time.monotonic() - last_write >= 1:
+                    progress = min(99, int(tables_done * 100 / total_tables)) if total_tables else None
+                    _update_backup_job(job, tablesDone=tables_done, progress=progress)
+                    last_write = time.monotonic()
+        return_code = process.wait()
+        if return_code != 0:
+            raise RuntimeError(f"pg_dump exited with status {return_code}: " + "\n".join(stderr_tail))
+
+        finished_at = datetime.utcnow().isoformat() + "Z"
+        with closing(_backup_catalog()) as conn:
+            _catalog_backup(
+                conn, job["filename"], "full", job["startedAt"], finished_at,
+                coverage_to=job["snapshotAt"], created_by=job.get("createdBy"),
+            )
+            conn.commit()
+        _update_backup_job(
+            job,
+            status="completed",
+            progress=100,
+            tablesDone=tables_done,
+            sizeBytes=_backup_size_bytes(filepath),
+            finishedAt=finished_at,
+        )
+    except Exception as e:
+        error_detail = f"pg_dump failed: {e}"
+        logger.error(error_detail)
+        if os.path.isdir(filepath):
+            shutil.rmtree(filepath, ignore_errors=True)
+        _update_backup_job(
+            job,
+            status="failed",
+            # Only expose internal error details in debug mode
+            error=error_detail if DEBUG_MODE else "Failed to create backup",
+            finishedAt=datetime.utcnow().isoformat() + "Z",
+        )
+
+
+def _psql_scalar(db_uri: str, sql: str, timeout: Optional[int] = 30) -> str:
+    result = subprocess.run(
+        ["psql", db_uri, "-At", "-v", "ON_ERROR_STOP=1", "-c", sql],
+        check=True,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    return result.stdout.strip()
+
+
+def _sql_literal(value: Optional[Any]) -> str:
+    return "NULL" if value is None else "'" + str(value).replace("'", "''") + "'"
+
+
+def _backup_db_now(db_uri: str) -> str:
+    """Database clock as an ISO UTC timestamp; watermarks must not depend on the API host's clock."""
+    return _psql_scalar(db_uri, "SELECT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.US\"Z\"')")
+
+
+def _read_incremental_manifest(dirpath: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(dirpath, INCREMENTAL_BACKUP_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _last_backup_watermark() -> Optional[str]:
+    """Point in time covered by the most recent full or incremental backup that still exists."""
+    with closing(_backup_catalog()) as conn:
+        row = conn.execute("SELECT MAX(coverage_to) AS watermark FROM backups").fetchone()
+    return row["watermark"]
+
+
+def _copy_table_increment(db_uri: str, table: str, column: str, since: Optional[str], until: str, dirpath: str) -> dict:
+    """
+    Stream one table's changed rows with COPY ... TO STDOUT into gzip chunk files.
+    Text-format COPY escapes embedded newlines, so every line is exactly one row and
+    chunks can be cut on line boundaries without parsing.
+    """
+    columns = _psql_scalar(
+        db_uri,
+        "SELECT string_agg(quote_ident(column_name), ',' ORDER BY ordinal_position) "
+        "FROM information_schema.columns "
+        f"WHERE table_schema = 'public' AND table_name = '{table}' AND is_generated = 'NEVER'",
+    ).split(",")
+    where = f"{column} <= '{until}'::timestamptz"
+    if since:
+        # Re-read a short overlap so rows committed late with an earlier timestamp are not lost;
+        # restores upsert by id, so the duplicates are harmless.
+        where += f" AND {column} > '{since}'::timestamptz - interval '{INCREMENTAL_WATERMARK_OVERLAP_SECONDS} seconds'"
+    sql = f"COPY (SELECT {', '.join(columns)} FROM public.{table} WHERE {where}) TO STDOUT"
+
+    chunks: List[dict] = []
+    out = None
+    chunk_rows = 0
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            ["psql", db_uri, "-v", "ON_ERROR_STOP=1", "-c", sql],
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+        )
+        try:
+            for line in process.stdout:
+                if out is None or chunk_rows >= INCREMENTAL_CHUNK_ROWS:
+                    if out is not None:
+                        out.close()
+                        chunks[-1]["rows"] = chunk_rows
+                    chunk_name = f"{table}.{len(chunks) + 1:05d}.copy.gz"
+                    out = gzip.open(os.path.join(dirpath, chunk_name), "wb", compresslevel=BACKUP_COMPRESSION_LEVEL)
+                    chunks.append({"file": chunk_name})
+                    chunk_rows = 0
+                out.write(line)
+                chunk_rows += 1
+        finally:
+            if out is not None:
+                out.close()
+                chunks[-1]["rows"] = chunk_rows
+        if process.wait() != 0:
+            stderr_file.seek(0)
+            raise RuntimeError(f"COPY {table} failed: {stderr_file.read().decode(errors='replace')}")
+
+    for chunk in chunks:
+        chunk["bytes"] = os.path.getsize(os.path.join(dirpath, chunk["file"]))
+    return {
+        "watermarkColumn": column,
+        "columns": columns,
+        "rows": sum(c["rows"] for c in chunks),
+        "bytes": sum(c["bytes"] for c in chunks),
+        "chunks": chunks,
+    }
+
+
+def _run_incremental_backup_job(job: dict) -> None:
+    dirpath = os.path.join(BACKUP_DIR, job["filename"])
+    db_uri = _backup_db_uri()
+    try:
+        os.makedirs(dirpath)
+        since = _last_backup_watermark()
+        until = _backup_db_now(db_uri)
+        _update_backup_job(job, status="running", since=since, snapshotAt=until, totalTables=len(INCREMENTAL_BACKUP_TABLES))
+
+        tables = {}
+        for table, column in INCREMENTAL_BACKUP_TABLES.items():
+            tables[table] = _copy_table_increment(db_uri, table, column, since, until, dirpath)
+            _update_backup_job(
+                job,
+                tablesDone=len(tables),
+                progress=min(99, int(len(tables) * 100 / len(INCREMENTAL_BACKUP_TABLES))),
+            )
+
+        # The manifest is written last: its presence marks the increment as complete
+        manifest = {
+            "version": 1,
+            "type": "incremental",
+            "format": "copy-text-gzip",
+            "since": since,
+            "until": until,
+            "overlapSeconds": INCREMENTAL_WATERMARK_OVERLAP_SECONDS if since else 0,
+            "createdAt": datetime.utcnow().isoformat() + "Z",
+            "totalRows": sum(t["rows"] for t in tables.values()),
+            "totalBytes": sum(t["bytes"] for t in tables.values()),
+            "tables": tables,
+        }
+        manifest_path = os.path.join(dirpath, INCREMENTAL_BACKUP_MANIFEST)
+        with open(f"{manifest_path}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+        finished_at = datetime.utcnow().isoformat() + "Z"
+        with closing(_backup_catalog()) as conn:
+            _catalog_backup(
+                conn, job["filename"], "incremental", job["startedAt"], finished_at,
+                coverage_from=since, coverage_to=until, row_count=manifest["totalRows"],
+                tables=sorted(tables), created_by=job.get("createdBy"),
+            )
+            conn.commit()
+        _update_backup_job(
+            job,
+            status="completed",
+            progress=100,
+            sizeBytes=manifest["totalBytes"],
+            finishedAt=finished_at,
+        )
+    except Exception as e:
+        error_detail = f"Incremental backup failed: {e}"
+        logger.error(error_detail)
+        shutil.rmtree(dirpath, ignore_errors=True)
+        _update_backup_job(
+            job,
+            status="failed",
+            # Only expose internal error details in debug mode
+            error=error_detail if DEBUG_MODE else "Failed to create backup",
+            finishedAt=datetime.utcnow().isoformat() + "Z",
+        )
+
+
+def to_camel_case_backup_job(job: dict) -> dict:
+    return {
+        "jobId": job["id"],
+        "type": job.get("type"),
+        "mode": job.get("mode"),
+        "filename": job.get("filename"),
+        "status": job.get("status"),
+        "phase": job.get("phase"),
+        "progress": job.get("progress"),
+        "tablesDone": job.get("tablesDone", 0),
+        "totalTables": job.get("totalTables"),
+        "itemsDone": job.get("itemsDone", 0),
+        "totalItems": job.get("totalItems"),
+        "tables": job.get("tables"),
+        "sizeBytes": job.get("sizeBytes"),
+        "since": job.get("since"),
+        "snapshotAt": job.get("snapshotAt"),
+        "error": job.get("error"),
+        "createdBy": job.get("createdBy"),
+        "startedAt": job.get("startedAt"),
+        "finishedAt": job.get("finishedAt"),
+    }
+
+
+def to_camel_case_backup_entry(row: sqlite3.Row) -> dict:
+    incremental = row["kind"] == "incremental"
+    is_directory = row["format"] in ("directory", "copy")
+    return {
+        "id": row["name"],
+        "name": row["name"],
+        "type": "Incremental" if incremental else "Database",
+        "kind": row["kind"],
+        "format": row["format"],
+        "size": _format_backup_size(row["size_bytes"]),
+        "sizeBytes": row["size_bytes"],
+        "checksum": row["checksum"],
+        "durationSeconds": row["duration_seconds"],
+        "rows": row["row_count"],
+        "coverageFrom": row["coverage_from"],
+        "coverageTo": row["coverage_to"],
+        "tables": json.loads(row["tables"]) if row["tables"] else None,
+        "createdBy": row["created_by"],
+        "createdAt": row["started_at"],
+        "finishedAt": row["finished_at"],
+        "status": "Completed",
+        "jobId": None,
+        "downloadName": f"{row['name']}.tar" if is_directory else row["name"],
+    }
+
+
 @app.get("/backups")
 def get_backups(payload=Depends(require_permission("backup_view"))):
-    if not os.path.exists(BACKUP_DIR):
-        os.makedirs(BACKUP_DIR)
-        
-    backups = []
-    for filename in os.listdir(BACKUP_DIR):
-        if filename.endswith(".sql"):
-            filepath = os.path.join(BACKUP_DIR, filename)
-            stat = os.stat(filepath)
-            
-            # Format size nicely
-            size_bytes = stat.st_size
-            if size_bytes < 1024 * 1024:
-                size_str = f"{size_bytes / 1024:.2f} KB"
-            else:
-                size_str = f"{size_bytes / (1024 * 1024):.2f} MB"
-                
-            backups.append({
-                "id": filename,
-                "name": filename,
-                "type": "Database",
-                "size": size_str,
-                "createdAt": datetime.fromtimestamp(stat.st_mtime).isoformat() + "Z",
-                "status": "Completed"
-            })
-            
-    # Sort backwards by date
+    backups = [
+        {
+            "id": job["filename"],
+            "name": job["filename"],
+            "type": "Incremental" if job.get("mode") == "incremental" else "Database",
+            "kind": job.get("mode", "full"),
+            "size": _format_backup_size(0),
+            "createdAt": job["startedAt"],
+            "status": "Running",
+            "jobId": job["id"],
+        }
+        for job in _list_backup_jobs()
+        if job.get("type") == "backup" and job.get("status") in ("queued", "running")
+    ]
     backups.sort(key=lambda x: x["createdAt"], reverse=True)
+
+    with closing(_backup_catalog()) as conn:
+        rows = conn.execute(
+            "SELECT name, kind, format, size_bytes, checksum, started_at, finished_at, duration_seconds, "
+            "coverage_from, coverage_to, row_count, tables, created_by "
+            "FROM backups ORDER BY started_at DESC"
+        ).fetchall()
+    backups.extend(to_camel_case_backup_entry(row) for row in rows)
     return JSONResponse(content=backups)
 
+
 @app.post("/backups/create")
-def create_backup(payload=Depends(require_permission("backup_create"))):
+def create_backup(mode: str = "full", payload=Depends(require_permission("backup_create"))):
+    if mode not in ("full", "incremental"):
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'incremental'")
     if not os.path.exists(BACKUP_DIR):
         os.makedirs(BACKUP_DIR)
-        
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"backup_{timestamp}.sql"
-    filepath = os.path.join(BACKUP_DIR, filename)
-    
-    # We need to construct the DB URI from the env variables
-    # The container api uses POSTGRES_USER=postgres and POSTGRES_PASSWORD=postgres usually
-    # It also might be using supabase-db:5432
-    # Let's try to infer it from the env vars supplied to the API container
-    
-    # Or rely on standard supabase-db connection from internal docker network
-    db_password = os.environ.get("SUPABASE_DB_PASSWORD", "postgres")
-    db_uri = f"postgresql://{DB_USER}:{db_password}@{DB_HOST}:5432/{DB_NAME}"
-    
-    try:
-        # Run pg_dump
-        process = subprocess.run(
-            ["pg_dump", db_uri, "-f", filepath, "--clean", "--if-exists", "--no-owner"],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        return JSONResponse(content={"success": True, "filename": filename})
-    except subprocess.CalledProcessError as e:
-        error_detail = f"pg_dump failed: {e.stderr}"
-        print(error_detail)
-        # Only expose internal error details in debug mode
-        detail = error_detail if DEBUG_MODE else "Failed to create backup"
-        raise HTTPException(status_code=500, detail=detail)
-        
+
+    with _backup_job_lock:
+        active = _active_backup_job()
+        if active:
+            raise HTTPException(status_code=409, detail=f"A {active.get('type')} is already in progress")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if mode == "incremental":
+            job = _new_backup_job("backup", f"incremental_{timestamp}{BACKUP_INCREMENTAL_SUFFIX}", payload, mode=mode)
+        else:
+            job = _new_backup_job("backup", f"backup_{timestamp}{BACKUP_DIRECTORY_SUFFIX}", payload, mode=mode)
+
+    _backup_executor.submit(_run_incremental_backup_job if mode == "incremental" else _run_backup_job, job)
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "jobId": job["id"], "filename": job["filename"], "status": job["status"]},
+    )
+
+
+@app.get("/backups/jobs/{job_id}")
+def get_backup_job(job_id: str, payload=Depends(require_permission("backup_view"))):
+    job = _read_backup_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Backup job not found")
+    return JSONResponse(content=to_camel_case_backup_job(job))
+
+
+def _stream_directory_as_tar(dirpath: str):
+    """Yield an uncompressed tar of a directory backup; its table files are already compressed."""
+    read_fd, write_fd = os.pipe()
+
+    def write_tar():
+        with os.fdopen(write_fd, "wb") as pipe_out:
+            try:
+                with tarfile.open(fileobj=pipe_out, mode="w|") as tar:
+                    tar.add(dirpath, arcname=os.path.basename(dirpath))
+            except BrokenPipeError:
+                pass  # client went away
+
+    writer = threading.Thread(target=write_tar, daemon=True)
+    writer.start()
+    with os.fdopen(read_fd, "rb") as pipe_in:
+        while True:
+            chunk = pipe_in.read(1024 * 1024)
+            if not chunk:
+                break
+            yield chunk
+    writer.join()
+
+
 @app.get("/backups/download/{filename}")
 def download_backup(filename: str, payload=Depends(require_permission("backup_view"))):
-    filepath = os.path.join(BACKUP_DIR, filename)
-    if not os.path.exists(filepath) or not filename.endswith(".sql"):
-        raise HTTPException(status_code=404, detail="Backup not found")
-        
-    return FileResponse(filepath, media_type="application/sql", filename=filename)
-    
-@app.post("/backups/restore/{filename}")
-def restore_backup(filename: str, payload=Depends(require_permission("backup_restore"))):
-    filepath = os.path.join(BACKUP_DIR, filename)
-    if not os.path.exists(filepath) or not filename.endswith(".sql"):
-        raise HTTPException(status_code=404, detail="Backup not found")
-        
-    db_password = os.environ.get("SUPABASE_DB_PASSWORD", "postgres")
-    db_uri = f"postgresql://{DB_USER}:{db_password}@{DB_HOST}:5432/{DB_NAME}"
-    
+    filepath = _backup_path(filename)
+    if os.path.isdir(filepath):
+        return StreamingResponse(
+            _stream_directory_as_tar(filepath),
+            media_type="application/x-tar",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.tar"'},
+        )
+    media_type = "application/octet-stream" if filename.endswith(BACKUP_CUSTOM_SUFFIX) else "application/sql"
+    return FileResponse(filepath, media_type=media_type, filename=filename)
+
+
+# Partitioned tables and the pattern of their partitions' qualified names
+PARTITIONED_BACKUP_TABLES = {
+    "public.inventory_transactions": r"public\.inventory_transactions_(y\d{4}m\d{2}|default)",
+}
+
+
+def _restore_toc_entries(filepath: str, tables: List[str]) -> List[str]:
+    """
+    Table of contents for pg_restore -L. With a table selection only the TABLE DATA
+    entries of those tables are kept, so the schema is left untouched.
+    """
+    result = subprocess.run(["pg_restore", "-l", filepath], check=True, capture_output=True, text=True)
+    entries = [line for line in result.stdout.splitlines() if line and not line.startswith(";")]
+    if not tables:
+        return entries
+
+    wanted = set(tables)
+    selected, found = [], set()
+    for line in entries:
+        # e.g. "4321; 0 16790 TABLE DATA public products postgres"
+        match = re.match(r"^\d+; \d+ \d+ TABLE DATA (\S+) (\S+) ", line)
+        if not match:
+            continue
+        name = f"{match.group(1)}.{match.group(2)}"
+        # A partitioned table's data is dumped one entry per partition
+        name = next(
+            (parent for parent, pattern in PARTITIONED_BACKUP_TABLES.items() if re.fullmatch(pattern, name)),
+            name,
+        )
+        if name in wanted:
+            selected.append(line)
+            found.add(name)
+    missing = sorted(wanted - found)
+    if missing:
+        raise ValueError(f"Tables not found in backup: {', '.join(missing)}")
+    return selected
+
+
+def _check_restore_selection(db_uri: str, tables: List[str]) -> None:
+    """
+    A table-selective restore empties the selected tables first. Refuse a selection
+    that leaves out a table with a foreign key into one of them: the TRUNCATE would
+    fail, or the restored rows would no longer match the rows that reference them.
+    """
+    selected = ", ".join(_sql_literal(name) for name in tables)
+    referencing = _psql_scalar(
+        db_uri,
+        "SELECT string_agg(DISTINCT format('%I.%I', n.nspname, r.relname), ', ') "
+        "FROM pg_constraint c "
+        "JOIN pg_class r ON r.oid = c.conrelid "
+        "JOIN pg_namespace n ON n.oid = r.relnamespace "
+        "WHERE c.contype = 'f' AND c.conparentid = 0 "
+        f"AND c.confrelid = ANY (ARRAY[{selected}]::regclass[]) "
+        f"AND NOT c.conrelid = ANY (ARRAY[{selected}]::regclass[])",
+    )
+    if referencing:
+        raise ValueError(f"Selected tables are referenced by tables not in the selection; also select: {referencing}")
+
+
+def _restore_incremental(job: dict, dirpath: str, db_uri: str, tables: List[str]) -> None:
+    """
+    Upsert every chunk of an incremental backup by primary key. Rows are replayed with
+    triggers off (session_replication_role = replica) because they already carry their
+    final values; stock and rollup triggers must not apply them a second time.
+    """
+    manifest = _read_incremental_manifest(dirpath)
+    if not manifest:
+        raise ValueError("Incremental backup has no manifest")
+    selected = {
+        name: entry for name, entry in manifest["tables"].items()
+        if not tables or f"public.{name}" in tables
+    }
+    missing = sorted(set(tables) - {f"public.{name}" for name in selected})
+    if missing:
+        raise ValueError(f"Tables not found in backup: {', '.join(missing)}")
+
+    chunks = [(name, entry, chunk) for name, entry in selected.items() for chunk in entry["chunks"]]
+    _update_backup_job(job, status="running", totalItems=len(chunks))
+    for index, (name, entry, chunk) in enumerate(chunks, start=1):
+        columns = ", ".join(entry["columns"])
+        updates = ", ".join(f"EXCLUDED.{c}" for c in entry["columns"])
+        script = "\n".join([
+            "SET session_replication_role = replica;",
+            "BEGIN;",
+            f"CREATE TEMP TABLE _incremental (LIKE public.{name}) ON COMMIT DROP;",
+            f"\\copy _incremental ({columns}) FROM PROGRAM 'gzip -dc {os.path.join(dirpath, chunk['file'])}'",
+            f"INSERT INTO public.{name} ({columns}) SELECT {columns} FROM _incremental "
+            f"ON CONFLICT ({INCREMENTAL_CONFLICT_COLUMNS.get(name, 'id')}) DO UPDATE SET ({columns}) = ROW({updates});",
+            "COMMIT;",
+        ])
+        subprocess.run(["psql", db_uri, "-v", "ON_ERROR_STOP=1"], input=script, check=True, capture_output=True, text=True)
+        _update_backup_job(job, itemsDone=index, progress=min(99, int(index * 100 / len(chunks))))
+
+
+def _run_restore_job(job: dict) -> None:
+    filepath = os.path.join(BACKUP_DIR, job["filename"])
+    db_uri = _backup_db_uri()
+    tables = job.get("tables") or []
+    list_path = os.path.join(BACKUP_JOBS_DIR, f"{job['id']}.list")
     try:
-        process = subprocess.run(
-            ["psql", db_uri, "-f", filepath],
-            check=True,
-            capture_output=True,
-            text=True
+        _update_backup_job(job, status="running", phase="verifying")
+        _verify_backup_integrity(job["filename"], verify_checksums=job.get("verifyChecksums", False))
+        job["phase"] = "restoring"
+
+        if filepath.endswith(BACKUP_INCREMENTAL_SUFFIX):
+            _restore_incremental(job, filepath, db_uri, tables)
+        elif not os.path.isdir(filepath) and filepath.endswith(BACKUP_LEGACY_SUFFIX):
+            # Plain SQL can only be replayed serially and has no item count to report
+            _update_backup_job(job, status="running", progress=None)
+            subprocess.run(["psql", db_uri, "-f", filepath], check=True, capture_output=True, text=True)
+        else:
+            entries = _restore_toc_entries(filepath, tables)
+            with open(list_path, "w") as f:
+                f.write("\n".join(entries) + "\n")
+            _update_backup_job(job, status="running", totalItems=len(entries))
+
+            loader = None
+            loader_stderr = None
+            if tables:
+                # Data-only restore of the selected tables into emptied tables; triggers
+                # are disabled so derived tables are not updated row by row. pg_restore
+                # writes SQL that psql runs after the TRUNCATE in one transaction, so a
+                # failed restore leaves the tables as they were (and runs serially).
+                _check_restore_selection(db_uri, tables)
+                quoted = ", ".join('"' + name.replace(".", '"."') + '"' for name in tables)
+                # ONLY cannot be used on a partitioned table, whose data lives in its partitions
+                only = "" if any(name in PARTITIONED_BACKUP_TABLES for name in tables) else "ONLY "
+                loader_stderr = tempfile.TemporaryFile()
+                loader = subprocess.Popen(
+                    ["psql", db_uri, "-q", "-v", "ON_ERROR_STOP=1", "--single-transaction", "-f", "-"],
+                    stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=loader_stderr,
+                )
+                loader.stdin.write(f"TRUNCATE {only}{quoted};\n".encode())
+                loader.stdin.flush()
+                command = ["pg_restore", "-f", "-", "--no-owner", "--verbose", "-L", list_path,
+                           "--data-only", "--disable-triggers", filepath]
+                stdout = loader.stdin
+            else:
+                command = ["pg_restore", "-d", db_uri, "--no-owner", f"--jobs={BACKUP_PARALLEL_JOBS}", "--verbose",
+                           "-L", list_path, "--clean", "--if-exists", filepath]
+                stdout = subprocess.DEVNULL
+
+            # Serial items log "processing item", parallel ones "finished item"
+            items_done = 0
+            stderr_tail: List[str] = []
+            last_write = 0.0
+            try:
+                process = subprocess.Popen(command, stdout=stdout, stderr=subprocess.PIPE, text=True)
+                for line in process.stderr:
+                    stderr_tail = (stderr_tail + [line.rstrip()])[-20:]
+                    if "processing item" in line or "finished item" in line:
+                        items_done += 1
+                        if time.monotonic() - last_write >= 1:
+                            progress = min(99, int(items_done * 100 / len(entries))) if entries else None
+                            _update_backup_job(job, itemsDone=items_done, progress=progress)
+                            last_write = time.monotonic()
+                return_code = process.wait()
+                if return_code != 0:
+                    raise RuntimeError(f"pg_restore exited with status {return_code}: " + "\n".join(stderr_tail))
+                if loader is not None:
+                    # End of input commits the transaction
+                    loader.stdin.close()
+                    if loader.wait() != 0:
+                        loader_stderr.seek(0)
+                        raise RuntimeError(f"psql exited with status {loader.returncode}: "
+                                           + loader_stderr.read().decode(errors="replace"))
+            finally:
+                if loader is not None:
+                    if loader.poll() is None:
+                        # Killing psql before its input ends rolls the transaction back
+                        loader.kill()
+                        loader.wait()
+                    loader_stderr.close()
+            job["itemsDone"] = items_done
+
+        _update_backup_job(job, status="completed", progress=100, finishedAt=datetime.utcnow().isoformat() + "Z")
+    except Exception as e:
+        if isinstance(e, subprocess.CalledProcessError):
+            error_detail = f"{e.cmd[0]} restore failed: {e.stderr}"
+        else:
+            error_detail = f"Restore failed: {e}"
+        logger.error(error_detail)
+        _update_backup_job(
+            job,
+            status="failed",
+            # Only expose internal error details in debug mode
+            error=error_detail if DEBUG_MODE or isinstance(e, ValueError) else "Failed to restore backup",
+            finishedAt=datetime.utcnow().isoformat() + "Z",
         )
-        return JSONResponse(content={"success": True, "message": "Database restored successfully"})
-    except subprocess.CalledProcessError as e:
-        error_detail = f"psql restore failed: {e.stderr}"
-        print(error_detail)
-        # Only expose internal error details in debug mode
-        detail = error_detail if DEBUG_MODE else "Failed to restore backup"
-        raise HTTPException(status_code=500, detail=detail)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+
+@app.post("/backups/restore/{filename}")
+def restore_backup(
+    filename: str,
+    body: Optional[Dict[str, Any]] = Body(None),
+    payload=Depends(require_permission("backup_restore")),
+):
+    filepath = _backup_path(filename)
+    tables = [t.strip() for t in (body or {}).get("tables") or [] if t and t.strip()]
+    if tables and not os.path.isdir(filepath) and filepath.endswith(BACKUP_LEGACY_SUFFIX):
+        raise HTTPException(status_code=400, detail="Table selection requires a directory or custom format backup")
+    if any(not re.match(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$", t) for t in tables):
+        raise HTTPException(status_code=400, detail="Invalid table name")
+    # Unqualified names refer to the public schema
+    tables = [t if "." in t else f"public.{t}" for t in tables]
+    # Sizes are always checked; rehashing every file is opt-in
+    verify_checksums = bool((body or {}).get("verifyChecksums"))
+
+    with _backup_job_lock:
+        active = _active_backup_job()
+        if active:
+            raise HTTPException(status_code=409, detail=f"A {active.get('type')} is already in progress")
+        job = _new_backup_job("restore", filename, payload, tables=tables, verifyChecksums=verify_checksums)
+
+    _backup_executor.submit(_run_restore_job, job)
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "jobId": job["id"], "filename": filename, "status": job["status"]},
+    )
+
 
 @app.delete("/backups/{filename}")
 def delete_backup(filename: str, payload=Depends(require_permission("backup_delete"))):
-    filepath = os.path.join(BACKUP_DIR, filename)
-    if not os.path.exists(filepath) or not filename.endswith(".sql"):
-        raise HTTPException(status_code=404, detail="Backup not found")
-        
-    os.remove(filepath)
+    filepath = _backup_path(filename)
+    if any(
+        job.get("filename") == filename and job.get("status") in ("queued", "running")
+        for job in _list_backup_jobs()
+    ):
+        raise HTTPException(status_code=409, detail="Backup is in use by a running job")
+
+    if os.path.isdir(filepath):
+        shutil.rmtree(filepath)
+    else:
+        os.remove(filepath)
+    with closing(_backup_catalog()) as conn:
+        conn.execute("DELETE FROM backups WHERE name = ?", (filename,))
+        conn.commit()
     return JSONResponse(content={"success": True})
+
+
+# ============================================================
+# Inventory Transaction Archival
+# ============================================================
+
+# inventory_transactions is partitioned by month. Months older than the retention
+# period are exported to gzip COPY files (one directory per month, laid out like an
+# incremental backup) and then replaced in the database by opening-balance rows at
+# the start of the next month; see archive_inventory_transaction_period().
+INVENTORY_ARCHIVE_DIR = os.getenv("INVENTORY_ARCHIVE_DIR", os.path.join(BACKUP_DIR, "inventory-archive"))
+INVENTORY_TRANSACTION_RETENTION_MONTHS = int(os.getenv("INVENTORY_TRANSACTION_RETENTION_MONTHS", "24"))
+
+
+def _inventory_periods_due(db_uri: str) -> List[Tuple[str, str]]:
+    """(period start, partition) of every month past the retention period, oldest first."""
+    rows = _psql_scalar(
+        db_uri,
+        "SELECT string_agg(period_start::text || ' ' || partition_name, ',' ORDER BY period_start) "
+        f"FROM public.inventory_transaction_periods_due({INVENTORY_TRANSACTION_RETENTION_MONTHS})",
+    )
+    return [tuple(row.split(" ", 1)) for row in rows.split(",") if row]
+
+
+def _archive_inventory_period(db_uri: str, period_start: str, partition: str, archived_by: Optional[str]) -> dict:
+    """
+    Export one month's partition, then archive it in the database. The database step
+    checks the partition still holds exactly the exported rows, so a back-dated write
+    that lands between the two fails the month instead of losing the row.
+    """
+    start = date.fromisoformat(period_start)
+    period_end = date(start.year + start.month // 12, start.month % 12 + 1, 1).isoformat()
+    dirpath = os.path.join(INVENTORY_ARCHIVE_DIR, partition)
+    # Files left by an attempt whose database step failed describe rows still in the table
+    shutil.rmtree(dirpath, ignore_errors=True)
+    os.makedirs(dirpath)
+    try:
+        entry = _copy_table_increment(db_uri, partition, "created_at", None, period_end, dirpath)
+        manifest = {
+            "version": 1,
+            "type": "inventory-archive",
+            "format": "copy-text-gzip",
+            "periodStart": period_start,
+            "periodEnd": period_end,
+            "createdAt": datetime.utcnow().isoformat() + "Z",
+            "totalRows": entry["rows"],
+            "totalBytes": entry["bytes"],
+            # Keyed by the parent table: replaying a chunk goes through inventory_transactions
+            "tables": {"inventory_transactions": entry},
+        }
+        manifest_path = os.path.join(dirpath, INCREMENTAL_BACKUP_MANIFEST)
+        with open(f"{manifest_path}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+        result = _psql_scalar(
+            db_uri,
+            "SELECT public.archive_inventory_transaction_period("
+            f"{_sql_literal(period_start)}, {entry['rows']}, {_sql_literal(dirpath)}, {entry['bytes']}, "
+            f"{_sql_literal(archived_by)}::uuid)::text",
+            timeout=None,
+        )
+        return {**json.loads(result), "bytes": entry["bytes"]}
+    except Exception:
+        shutil.rmtree(dirpath, ignore_errors=True)
+        raise
+
+
+def _run_inventory_archive_job(job: dict) -> None:
+    db_uri = _backup_db_uri()
+    try:
+        periods = _inventory_periods_due(db_uri)
+        _update_backup_job(job, status="running", totalItems=len(periods), tables=[partition for _, partition in periods])
+
+        archived_bytes = 0
+        for index, (period_start, partition) in enumerate(periods, start=1):
+            archived_bytes += _archive_inventory_period(db_uri, period_start, partition, job.get("createdBy"))["bytes"]
+            _update_backup_job(job, itemsDone=index, progress=min(99, int(index * 100 / len(periods))))
+
+        _update_backup_job(
+            job,
+            status="completed",
+            progress=100,
+            sizeBytes=archived_bytes,
+            finishedAt=datetime.utcnow().isoformat() + "Z",
+        )
+    except Exception as e:
+        if isinstance(e, subprocess.CalledProcessError):
+            error_detail = f"Inventory archive failed: {e.stderr}"
+        else:
+            error_detail = f"Inventory archive failed: {e}"
+        logger.error(error_detail)
+        _update_backup_job(
+            job,
+            status="failed",
+            # Only expose internal error details in debug mode
+            error=error_detail if DEBUG_MODE else "Failed to archive inventory transactions",
+            finishedAt=datetime.utcnow().isoformat() + "Z",
+        )
+
+
+@app.post("/inventory/transactions/archive")
+def archive_inventory_transactions(payload=Depends(require_permission("backup_create"))):
+    """
+    Archive every month of inventory transactions older than
+    INVENTORY_TRANSACTION_RETENTION_MONTHS. Runs on the backup worker; poll
+    GET /backups/jobs/{jobId} for progress.
+    """
+    with _backup_job_lock:
+        active = _active_backup_job()
+        if active:
+            raise HTTPException(status_code=409, detail=f"A {active.get('type')} is already in progress")
+        job = _new_backup_job("archive", os.path.basename(INVENTORY_ARCHIVE_DIR), payload)
+
+    _backup_executor.submit(_run_inventory_archive_job, job)
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "jobId": job["id"], "status": job["status"]},
+    )
+
+
+@app.get("/inventory/transactions/archives")
+def get_inventory_transaction_archives(payload=Depends(require_permission("inventory_movements_view"))):
+    try:
+        data = (
+            supabase.table("inventory_transaction_archives")
+            .select("id, period_start, period_end, row_count, quantity_total, opening_balance_rows, archive_bytes, archived_by, archived_at")
+            .order("period_start", desc=True)
+            .execute()
+        )
+        return JSONResponse(content=[
+            {
+                "id": archive.get("id"),
+                "periodStart": archive.get("period_start"),
+                "periodEnd": archive.get("period_end"),
+                "rows": archive.get("row_count") or 0,
+                "quantityTotal": archive.get("quantity_total") or 0,
+                "openingBalanceRows": archive.get("opening_balance_rows") or 0,
+                "archiveBytes": archive.get("archive_bytes"),
+                "archivedBy": archive.get("archived_by"),
+                "archivedAt": archive.get("archived_at"),
+            }
+            for archive in data.data or []
+        ])
+    except Exception as e:
+        logger.error("Error fetching inventory transaction archives: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch inventory transaction archives: {str(e)}")
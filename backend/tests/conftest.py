@@ -3,6 +3,7 @@ Pytest configuration for Versal backend tests
 """
 
 import os
+import tempfile
 import pytest
 from supabase import create_client, Client
 
@@ -24,4 +25,42 @@ def test_environment():
         "supabase_url": os.getenv("SUPABASE_URL"),
         "supabase_key": os.getenv("SUPABASE_SERVICE_KEY"),
         "is_test_env": bool(os.getenv("TEST_ENV", "false").lower() == "true")
-    } 
\ No newline at end of file
+    }
+
+@pytest.fixture(scope="session")
+def backend_main():
+    """The API module, importable without a database (main.py reads its configuration at import time)"""
+    os.environ.setdefault("SUPABASE_URL", "http://postgrest.test")
+    os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+    os.environ.setdefault("SUPABASE_JWT_SECRET", "test-jwt-secret")
+    os.environ.setdefault("BACKUP_DIR", tempfile.mkdtemp(prefix="versal-tests-"))
+    import main
+    return main
+
+@pytest.fixture
+def fake_postgrest():
+    """An in-memory PostgREST (see benchmarks/fake_postgrest.py)"""
+    from benchmarks.fake_postgrest import FakePostgrest
+    return FakePostgrest()
+
+@pytest.fixture
+def fake_client(backend_main, fake_postgrest):
+    """A Supabase client whose PostgREST requests go to fake_postgrest"""
+    client = backend_main.get_supabase_client()
+    client.postgrest.session._transport = fake_postgrest.transport
+    return client
+
+@pytest.fixture
+def pick_source():
+    """Factory for pick sources in the shape _load_pick_sources returns"""
+    def make(location_id, remaining, batch_id=None, expiry_date=None, product_id="p1"):
+        return {
+            "product_id": product_id,
+            "location_id": location_id,
+            "location_name": f"Bin {location_id}",
+            "stock_batch_id": batch_id,
+            "batch_number": batch_id and f"B-{batch_id}",
+            "expiry_date": expiry_date,
+            "remaining": remaining,
+        }
+    return make
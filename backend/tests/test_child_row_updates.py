@@ -0,0 +1,21 @@
+"""
+Tests for _merge_child_row_updates, the single-upsert update of a
+document's child rows.
+"""
+
+
+class TestMergeChildRowUpdates:
+    """Applying per-row updates to the child rows of a document"""
+
+    def test_returns_only_changed_rows_with_the_full_column_set(self, backend_main):
+        rows = [
+            {"id": "1", "pick_list_id": "pl", "quantity": 5, "picked_quantity": 0, "notes": None, "extra": "x"},
+            {"id": "2", "pick_list_id": "pl", "quantity": 3, "picked_quantity": 0, "notes": None},
+        ]
+        changed = backend_main._merge_child_row_updates(
+            rows, {"2": {"picked_quantity": 3}, "foreign": {"picked_quantity": 9}},
+            ["pick_list_id", "quantity", "picked_quantity", "notes"],
+        )
+        assert changed == [{"id": "2", "pick_list_id": "pl", "quantity": 3, "picked_quantity": 3, "notes": None}]
+        # The current rows are updated in place for later use in the request
+        assert rows[1]["picked_quantity"] == 3
@@ -0,0 +1,43 @@
+"""
+Tests for the keyset cursor of the inventory ledger endpoints.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+
+class TestLedgerCursor:
+    """Keyset cursor of the inventory ledger endpoints"""
+
+    def test_cursor_round_trip(self, backend_main):
+        row = {"created_at": "2026-10-18T09:30:00.123456+00:00", "id": "8f14e45f-ceea-467f-a0e6-4b1b0c8e9b6a"}
+        cursor = backend_main._encode_ledger_cursor(row)
+        assert "=" not in cursor
+        assert backend_main._decode_ledger_cursor(cursor) == (row["created_at"], row["id"])
+
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", "WyJ4IiwgInkiXQ"])
+    def test_invalid_cursor_is_a_bad_request(self, backend_main, cursor):
+        with pytest.raises(HTTPException) as error:
+            backend_main._decode_ledger_cursor(cursor)
+        assert error.value.status_code == 400
+
+    def test_pages_cover_every_row_once(self, backend_main, fake_postgrest, fake_client):
+        # Rows sharing a created_at are split across pages by id
+        stamps = ["2026-10-01T10:00:00+00:00"] * 4 + ["2026-10-02T10:00:00+00:00"] * 3
+        for stamp in stamps:
+            fake_postgrest.add("inventory_transactions", product_id="p1", quantity_change=1, created_at=stamp)
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = backend_main._ledger_page(
+                fake_client.table("inventory_transactions").select("*"), None, None, cursor, 3
+            )
+            seen.extend(rows)
+            if not cursor:
+                break
+
+        assert len(seen) == len(stamps)
+        assert len({row["id"] for row in seen}) == len(stamps)
+        assert [(row["created_at"], row["id"]) for row in seen] == sorted(
+            ((row["created_at"], row["id"]) for row in seen), reverse=True
+        )
@@ -0,0 +1,35 @@
+"""
+Tests for access to the Prometheus metrics endpoint.
+"""
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+
+def _request(authorization=None):
+    headers = [(b"authorization", authorization.encode())] if authorization else []
+    return Request({"type": "http", "method": "GET", "path": "/metrics", "headers": headers})
+
+
+class TestMetricsAccess:
+    """GET /metrics is only served to scrapers holding METRICS_TOKEN"""
+
+    def test_disabled_without_a_token(self, backend_main, monkeypatch):
+        monkeypatch.setattr(backend_main, "METRICS_TOKEN", None)
+        with pytest.raises(HTTPException) as exc:
+            backend_main.metrics(_request("Bearer anything"))
+        assert exc.value.status_code == 404
+
+    @pytest.mark.parametrize("authorization", [None, "Bearer wrong", "Basic s3cret"])
+    def test_rejects_a_missing_or_wrong_token(self, backend_main, monkeypatch, authorization):
+        monkeypatch.setattr(backend_main, "METRICS_TOKEN", "s3cret")
+        with pytest.raises(HTTPException) as exc:
+            backend_main.metrics(_request(authorization))
+        assert exc.value.status_code == 401
+
+    def test_serves_the_exposition_with_the_token(self, backend_main, monkeypatch):
+        monkeypatch.setattr(backend_main, "METRICS_TOKEN", "s3cret")
+        response = backend_main.metrics(_request("Bearer s3cret"))
+        assert response.status_code == 200
+        assert b"# HELP" in response.body
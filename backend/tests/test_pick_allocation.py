@@ -0,0 +1,132 @@
+"""
+Tests for first-expired-first-out pick allocation: _load_pick_sources,
+_draw_from_sources and _allocate_pick_lines.
+"""
+
+
+class TestDrawFromSources:
+    """Drawing a quantity from pick sources in order"""
+
+    def test_draws_in_source_order(self, backend_main, pick_source):
+        sources = [pick_source("A", 4), pick_source("B", 10)]
+        drawn = list(backend_main._draw_from_sources(sources, 6))
+        assert [(src["location_id"], take) for src, take in drawn] == [("A", 4), ("B", 2)]
+        assert [src["remaining"] for src in sources] == [0, 8]
+
+    def test_short_pick_yields_the_shortfall_without_a_source(self, backend_main, pick_source):
+        drawn = list(backend_main._draw_from_sources([pick_source("A", 3)], 5))
+        assert [(src and src["location_id"], take) for src, take in drawn] == [("A", 3), (None, 2)]
+
+    def test_pinned_location_skips_other_sources(self, backend_main, pick_source):
+        sources = [pick_source("A", 10), pick_source("B", 10)]
+        drawn = list(backend_main._draw_from_sources(sources, 3, location_id="B"))
+        assert [(src["location_id"], take) for src, take in drawn] == [("B", 3)]
+        assert sources[0]["remaining"] == 10
+
+
+class TestAllocatePickLines:
+    """Splitting pick list lines over the stock they draw from"""
+
+    def test_splits_a_line_by_batch_and_spreads_the_picked_quantity(self, backend_main, pick_source):
+        sources = {"p1": [pick_source("A", 4, "b1", "2026-11-01"), pick_source("B", 10)]}
+        lines = backend_main._allocate_pick_lines(
+            [{"product_id": "p1", "quantity": 6, "picked_quantity": 5, "location_id": None}], sources
+        )
+        assert [(line["location_id"], line["stock_batch_id"], line["quantity"], line["picked_quantity"]) for line in lines] == [
+            ("A", "b1", 4, 4),
+            ("B", None, 2, 1),
+        ]
+        assert lines[0]["batch_number"] == "B-b1"
+        assert lines[0]["expiry_date"] == "2026-11-01"
+
+    def test_location_pinned_line_keeps_its_location_when_short(self, backend_main, pick_source):
+        sources = {"p1": [pick_source("A", 10), pick_source("B", 2)]}
+        lines = backend_main._allocate_pick_lines(
+            [{"product_id": "p1", "quantity": 5, "location_id": "B", "location_name": "Front"}], sources
+        )
+        assert [(line["location_id"], line["quantity"]) for line in lines] == [("B", 2), ("B", 3)]
+        assert lines[1]["stock_batch_id"] is None
+        assert lines[1]["location_name"] == "Front"
+        assert sources["p1"][0]["remaining"] == 10
+
+    def test_lines_without_product_or_quantity_pass_through(self, backend_main, pick_source):
+        records = [{"product_id": None, "quantity": 3}, {"product_id": "p1", "quantity": 0}]
+        lines = backend_main._allocate_pick_lines(records, {"p1": [pick_source("A", 10)]})
+        assert [(line["product_id"], line["quantity"]) for line in lines] == [(None, 3), ("p1", 0)]
+
+
+class TestLoadPickSources:
+    """Stock that picks draw from, first-expired-first-out"""
+
+    def test_skips_expired_batches_and_orders_by_expiry(self, backend_main, fake_postgrest, fake_client):
+        location = fake_postgrest.add("locations", name="Bin A", aisle=1, bay=1)
+        fake_postgrest.add("stock_levels", product_id="p1", location_id=location["id"], quantity_on_hand=20)
+        for batch_number, expiry_date in [("LATE", "2099-06-01"), ("OLD", "2020-01-01"), ("EARLY", "2098-01-01")]:
+            fake_postgrest.add(
+                "stock_batches", product_id="p1", location_id=location["id"],
+                batch_number=batch_number, expiry_date=expiry_date, quantity_on_hand=5,
+            )
+
+        sources, locations = backend_main._load_pick_sources(fake_client, ["p1"])
+
+        # The expired batch is neither offered nor counted as unbatched stock
+        assert [(src["batch_number"], src["remaining"]) for src in sources["p1"]] == [
+            ("EARLY", 5), ("LATE", 5), (None, 5),
+        ]
+        assert locations[location["id"]]["name"] == "Bin A"
+
+    def test_leaves_out_stock_held_by_open_pick_lists(self, backend_main, fake_postgrest, fake_client):
+        location = fake_postgrest.add("locations", name="Bin A")
+        fake_postgrest.add("stock_levels", product_id="p1", location_id=location["id"], quantity_on_hand=12)
+        batch = fake_postgrest.add(
+            "stock_batches", product_id="p1", location_id=location["id"],
+            batch_number="B1", expiry_date="2099-01-01", quantity_on_hand=8,
+        )
+        pick_list = fake_postgrest.add("pick_lists", status="pending")
+        fake_postgrest.add(
+            "pick_list_items", pick_list_id=pick_list["id"], product_id="p1",
+            location_id=location["id"], stock_batch_id=batch["id"], quantity=6, picked_quantity=0,
+        )
+        fake_postgrest.add(
+            "pick_list_items", pick_list_id=pick_list["id"], product_id="p1",
+            location_id=location["id"], stock_batch_id=None, quantity=1, picked_quantity=0,
+        )
+
+        sources, _ = backend_main._load_pick_sources(fake_client, ["p1"])
+
+        assert [(src["batch_number"], src["remaining"]) for src in sources["p1"]] == [("B1", 2), (None, 3)]
+
+
+class TestPickLineLocationChange:
+    """Moving a batch-allocated pick line to another location"""
+
+    def test_drops_the_batch_so_completion_takes_stock_from_the_new_location(
+        self, backend_main, fake_postgrest, fake_client, monkeypatch,
+    ):
+        monkeypatch.setattr(backend_main, "get_supabase_client", lambda: fake_client)
+        old_bin = fake_postgrest.add("locations", name="Old")
+        new_bin = fake_postgrest.add("locations", name="New")
+        old_stock = fake_postgrest.add("stock_levels", product_id="p1", location_id=old_bin["id"], quantity_on_hand=10)
+        new_stock = fake_postgrest.add("stock_levels", product_id="p1", location_id=new_bin["id"], quantity_on_hand=10)
+        batch = fake_postgrest.add(
+            "stock_batches", product_id="p1", location_id=old_bin["id"],
+            batch_number="B1", expiry_date="2099-01-01", quantity_on_hand=10,
+        )
+        pick_list = fake_postgrest.add("pick_lists", status="pending")
+        line = fake_postgrest.add(
+            "pick_list_items", pick_list_id=pick_list["id"], product_id="p1", quantity=4, picked_quantity=0,
+            location_id=old_bin["id"], location_name="Old",
+            stock_batch_id=batch["id"], batch_number="B1", expiry_date="2099-01-01",
+        )
+
+        backend_main.update_pick_list(pick_list["id"], pl={
+            "status": "completed",
+            "items": [{"id": line["id"], "pickedQuantity": 4, "locationId": new_bin["id"], "locationName": "New"}],
+        }, payload={"sub": None})
+
+        stored = fake_postgrest.tables["pick_list_items"][line["id"]]
+        assert (stored["location_id"], stored["stock_batch_id"], stored["batch_number"]) == (new_bin["id"], None, None)
+        assert (old_stock["quantity_on_hand"], new_stock["quantity_on_hand"]) == (10, 6)
+        assert fake_postgrest.tables["stock_batches"][batch["id"]]["quantity_on_hand"] == 10
+        ledger = list(fake_postgrest.tables["inventory_transactions"].values())
+        assert [(row["location_id"], row["quantity_change"]) for row in ledger] == [(new_bin["id"], -4)]
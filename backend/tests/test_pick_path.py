@@ -0,0 +1,28 @@
+"""
+Tests for _sequence_pick_path, the S-shaped ordering of pick lines.
+"""
+
+
+class TestSequencePickPath:
+    """Ordering pick lines along the picker's walk"""
+
+    LOCATIONS = {
+        "a1-b1": {"name": "A1-01", "zone": "Z", "aisle": 1, "bay": 1, "level": 1},
+        "a1-b3": {"name": "A1-03", "zone": "Z", "aisle": 1, "bay": 3, "level": 1},
+        "a3-b1-l1": {"name": "A3-01-1", "zone": "Z", "aisle": 3, "bay": 1, "level": 1},
+        "a3-b1-l2": {"name": "A3-01-2", "zone": "Z", "aisle": 3, "bay": 1, "level": 2},
+        "a3-b4": {"name": "A3-04", "zone": "Z", "aisle": 3, "bay": 4, "level": 1},
+        "dock": {"name": "Dock", "zone": None, "aisle": None},
+    }
+
+    def test_walks_visited_aisles_in_s_shape(self, backend_main):
+        # Aisle 2 has no pick, so aisle 3 is still walked in the opposite direction to aisle 1
+        lines = [{"location_id": loc} for loc in ["a3-b1-l2", "a1-b3", "dock", "a3-b4", "a1-b1", "a3-b1-l1"]]
+        lines.append({"location_id": None, "location_name": None})
+
+        ordered = backend_main._sequence_pick_path(lines, self.LOCATIONS)
+
+        assert [line["location_id"] for line in ordered] == [
+            "a1-b1", "a1-b3", "a3-b4", "a3-b1-l1", "a3-b1-l2", "dock", None,
+        ]
+        assert [line["pick_sequence"] for line in ordered] == list(range(1, 8))
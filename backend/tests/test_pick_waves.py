@@ -0,0 +1,79 @@
+"""
+Tests for pick waves: _plan_pick_wave, which consolidates several delivery
+challans into one pick list, and the rule that a delivery challan is on at
+most one open pick list or wave.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+class TestPlanPickWave:
+    """Consolidating several delivery challans into one wave"""
+
+    def test_consolidates_demand_and_keeps_allocations(self, backend_main, pick_source):
+        dc_lines = [
+            {"id": "dci-1", "delivery_challan_id": "dc-1", "product_id": "p1", "quantity": 6},
+            {"id": "dci-2", "delivery_challan_id": "dc-2", "product_id": "p1", "quantity": 6},
+        ]
+        plan = backend_main._plan_pick_wave(dc_lines, {"p1": [pick_source("A", 10, "b1", "2026-12-01")]})
+
+        assert [(line["location_id"], line["stock_batch_id"], line["quantity"]) for line in plan] == [
+            ("A", "b1", 10),
+            (None, None, 2),
+        ]
+        assert plan[0]["allocations"] == [
+            {"delivery_challan_id": "dc-1", "delivery_challan_item_id": "dci-1", "quantity": 6},
+            {"delivery_challan_id": "dc-2", "delivery_challan_item_id": "dci-2", "quantity": 4},
+        ]
+        # The short pick is allocated to the DC line that could not be covered
+        assert plan[1]["allocations"] == [
+            {"delivery_challan_id": "dc-2", "delivery_challan_item_id": "dci-2", "quantity": 2},
+        ]
+
+    def test_products_without_stock_get_one_unlocated_line(self, backend_main):
+        dc_lines = [
+            {"id": "dci-1", "delivery_challan_id": "dc-1", "product_id": "p2", "quantity": 3},
+            {"id": "dci-2", "delivery_challan_id": "dc-2", "product_id": "p2", "quantity": 1},
+        ]
+        plan = backend_main._plan_pick_wave(dc_lines, {})
+        assert [(line["location_id"], line["quantity"], len(line["allocations"])) for line in plan] == [(None, 4, 2)]
+
+
+class TestOnePickListPerChallan:
+    """A delivery challan on an open wave or pick list cannot get another pick list"""
+
+    @pytest.fixture
+    def challan(self, backend_main, fake_postgrest, fake_client, monkeypatch):
+        monkeypatch.setattr(backend_main, "get_supabase_client", lambda: fake_client)
+        return fake_postgrest.add("delivery_challans", dc_number="DC-1", status="draft")
+
+    def create_pick_list(self, backend_main, challan):
+        return backend_main.create_pick_list(pl={"deliveryChallanId": challan["id"]}, payload={"sub": None})
+
+    def test_rejects_a_challan_on_an_open_wave(self, backend_main, fake_postgrest, challan):
+        wave = fake_postgrest.add("pick_lists", pick_type="wave", status="in_progress")
+        item = fake_postgrest.add("pick_list_items", pick_list_id=wave["id"], product_id="p1", quantity=1)
+        fake_postgrest.add(
+            "pick_list_allocations", pick_list_id=wave["id"], pick_list_item_id=item["id"],
+            delivery_challan_id=challan["id"], delivery_challan_item_id="dci-1", quantity=1,
+        )
+
+        with pytest.raises(HTTPException) as error:
+            self.create_pick_list(backend_main, challan)
+        assert error.value.status_code == 409
+        assert len(fake_postgrest.rows("pick_lists")) == 1
+
+    def test_rejects_a_challan_on_an_open_pick_list(self, backend_main, fake_postgrest, challan):
+        fake_postgrest.add("pick_lists", delivery_challan_id=challan["id"], status="pending")
+
+        with pytest.raises(HTTPException) as error:
+            self.create_pick_list(backend_main, challan)
+        assert error.value.status_code == 409
+
+    def test_a_completed_pick_list_does_not_block(self, backend_main, fake_postgrest, challan):
+        fake_postgrest.add("pick_lists", delivery_challan_id=challan["id"], status="completed")
+
+        response = self.create_pick_list(backend_main, challan)
+        assert response.status_code == 200
+        assert len(fake_postgrest.rows("pick_lists")) == 2
+
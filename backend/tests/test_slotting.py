@@ -0,0 +1,72 @@
+"""
+Tests for _suggest_slots, the put-away slot suggestions.
+"""
+
+import pytest
+
+
+class TestSuggestSlots:
+    """Put-away slot suggestions"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_slotting_state(self, backend_main):
+        backend_main._slotting_state["expires"] = 0.0
+        yield
+        backend_main._slotting_state["expires"] = 0.0
+
+    def test_prefers_affinity_then_tightest_fit(self, backend_main, fake_postgrest, fake_client):
+        holding = fake_postgrest.add("locations", name="Holding", capacity=200, is_active=True)
+        small = fake_postgrest.add("locations", name="Small", capacity=10, is_active=True)
+        large = fake_postgrest.add("locations", name="Large", capacity=50, is_active=True)
+        fake_postgrest.add("locations", name="Closed", capacity=500, is_active=False)
+        fake_postgrest.add("stock_levels", product_id="p1", location_id=holding["id"], quantity_on_hand=90)
+
+        suggestions = backend_main._suggest_slots(fake_client, [
+            {"product_id": "p2", "quantity": 8},
+            {"product_id": "p1", "quantity": 5},
+            {"product_id": "p3", "quantity": 20},
+        ])
+
+        assert [(s["location_id"], s["reason"]) for s in suggestions] == [
+            (small["id"], "capacity"),
+            (holding["id"], "affinity"),
+            (large["id"], "capacity"),
+        ]
+
+    def test_lines_see_earlier_placements_and_overflow(self, backend_main, fake_postgrest, fake_client):
+        first = fake_postgrest.add("locations", name="First", capacity=10, is_active=True)
+        second = fake_postgrest.add("locations", name="Second", capacity=12, is_active=True)
+
+        suggestions = backend_main._suggest_slots(fake_client, [
+            {"product_id": "p1", "quantity": 9},
+            {"product_id": "p2", "quantity": 10},
+            {"product_id": "p3", "quantity": 8},
+        ])
+
+        assert suggestions[1]["location_id"] == first["id"]
+        assert suggestions[0]["location_id"] == second["id"]
+        # Nothing fits 8 any more: the emptiest location takes the overflow
+        assert (suggestions[2]["location_id"], suggestions[2]["reason"], suggestions[2]["free_capacity"]) == (
+            second["id"], "overflow", -5,
+        )
+
+    def test_completed_put_away_lines_keep_their_suggested_slot(self, backend_main, fake_postgrest, fake_client):
+        bin_ = fake_postgrest.add("locations", name="Bin", capacity=50, is_active=True)
+        chosen = fake_postgrest.add("locations", name="Chosen", capacity=50, is_active=True)
+        put_away = fake_postgrest.add("put_aways", status="pending")
+        unplaced = fake_postgrest.add(
+            "put_away_items", put_away_id=put_away["id"], product_id="p1", quantity=5, placed_quantity=5,
+            location_id=None, location_name=None,
+        )
+        placed = fake_postgrest.add(
+            "put_away_items", put_away_id=put_away["id"], product_id="p2", quantity=5, placed_quantity=5,
+            location_id=chosen["id"], location_name="Chosen",
+        )
+        rows = [dict(unplaced), dict(placed)]
+
+        backend_main._place_unplaced_put_away_items(fake_client, rows)
+
+        stored = fake_postgrest.tables["put_away_items"]
+        assert (rows[0]["location_id"], stored[unplaced["id"]]["location_id"]) == (bin_["id"], bin_["id"])
+        assert stored[unplaced["id"]]["location_name"] == "Bin"
+        assert stored[placed["id"]]["location_id"] == chosen["id"]
@@ -1,36 +1,55 @@
 import { useState, useEffect } from "react";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table";
-import { getOverdueInvoices } from "@/lib/api";
+import { getReceivablesAging } from "@/lib/api";
 import { formatCurrency } from "@/lib/utils";
 import { useCurrencyStore } from "@/stores/currencyStore";
-import { SaleInvoice } from "@/types/sale-invoice";
+
+const AGING_BUCKETS = ["0-30", "31-60", "61-90", "90+"] as const;
+
+interface ReceivablesAgingCustomer {
+  customerId: string;
+  customerName: string | null;
+  invoiceCount: number;
+  buckets: Record<string, number>;
+  totalDue: number;
+  oldestDueDate: string | null;
+}
+
+interface ReceivablesAging {
+  asOf: string;
+  totals: Record<string, number>;
+  totalDue: number;
+  customers: ReceivablesAgingCustomer[];
+}
 
 export const OverdueInvoices = () => {
   const { currency } = useCurrencyStore();
-  const [overdueInvoices, setOverdueInvoices] = useState<SaleInvoice[]>([]);
+  const [aging, setAging] = useState<ReceivablesAging | null>(null);
   const [loading, setLoading] = useState(false);
 
   useEffect(() => {
-    loadOverdueInvoices();
+    loadAging();
   }, []);
 
-  const loadOverdueInvoices = async () => {
+  const loadAging = async () => {
     try {
       setLoading(true);
-      const data = await getOverdueInvoices();
-      setOverdueInvoices(data || []);
+      const data = await getReceivablesAging();
+      setAging(data || null);
     } catch (error) {
-      console.error("Error loading overdue invoices:", error);
+      console.error("Error loading receivables aging:", error);
     } finally {
       setLoading(false);
     }
   };
 
+  const customers = aging?.customers || [];
+
   return (
     <Card>
       <CardHeader>
-        <CardTitle>Overdue Invoices</CardTitle>
+        <CardTitle>Overdue Receivables</CardTitle>
       </CardHeader>
       <CardContent>
         {loading ? (
@@ -39,25 +58,40 @@ export const OverdueInvoices = () => {
           <Table>
             <TableHeader>
               <TableRow>
-                <TableHead>Invoice #</TableHead>
                 <TableHead>Customer</TableHead>
-                <TableHead>Due Date</TableHead>
-                <TableHead>Amount Due</TableHead>
+                {AGING_BUCKETS.map((bucket) => (
+                  <TableHead key={bucket} className="text-right">{bucket} days</TableHead>
+                ))}
+                <TableHead className="text-right">Total Due</TableHead>
               </TableRow>
             </TableHeader>
             <TableBody>
-              {overdueInvoices.length > 0 ? (
-                overdueInvoices.map((invoice) => (
-                  <TableRow key={invoice.id}>
-                    <TableCell>{invoice.invoiceNumber}</TableCell>
-                    <TableCell>{invoice.customer?.name}</TableCell>
-                    <TableCell>{invoice.dueDate ? new Date(invoice.dueDate).toLocaleDateString() : ""}</TableCell>
-                    <TableCell>{formatCurrency(invoice.amountDue || 0, currency)}</TableCell>
+              {customers.length > 0 ? (
+                <>
+                  {customers.map((customer) => (
+                    <TableRow key={customer.customerId}>
+                      <TableCell>{customer.customerName}</TableCell>
+                      {AGING_BUCKETS.map((bucket) => (
+                        <TableCell key={bucket} className="text-right">
+                          {formatCurrency(customer.buckets[bucket] || 0, currency)}
+                        </TableCell>
+                      ))}
+                      <TableCell className="text-right">{formatCurrency(customer.totalDue || 0, currency)}</TableCell>
+                    </TableRow>
+                  ))}
+                  <TableRow className="font-medium">
+                    <TableCell>Total</TableCell>
+                    {AGING_BUCKETS.map((bucket) => (
+                      <TableCell key={bucket} className="text-right">
+                        {formatCurrency(aging?.totals[bucket] || 0, currency)}
+                      </TableCell>
+                    ))}
+                    <TableCell className="text-right">{formatCurrency(aging?.totalDue || 0, currency)}</TableCell>
                   </TableRow>
-                ))
+                </>
               ) : (
                 <TableRow>
-                  <TableCell colSpan={4} className="text-center">
+                  <TableCell colSpan={AGING_BUCKETS.length + 2} className="text-center">
                     No overdue invoices
                   </TableCell>
                 </TableRow>
@@ -0,0 +1,336 @@
+import { useState, useEffect } from "react";
+import { format } from "date-fns";
+import {
+  Table, TableHeader, TableBody, TableRow,
+  TableHead, TableCell
+} from "@/components/ui/table";
+import {
+  Dialog, DialogContent, DialogHeader, DialogTitle, DialogFooter,
+} from "@/components/ui/dialog";
+import {
+  Select, SelectContent, SelectItem, SelectTrigger, SelectValue,
+} from "@/components/ui/select";
+import { Button } from "@/components/ui/button";
+import { Badge } from "@/components/ui/badge";
+import { Input } from "@/components/ui/input";
+import { Label } from "@/components/ui/label";
+import { Textarea } from "@/components/ui/textarea";
+import { Checkbox } from "@/components/ui/checkbox";
+import { Switch } from "@/components/ui/switch";
+import { Spinner } from "@/components/ui/spinner";
+import { toast } from "@/hooks/use-toast";
+import { ArrowLeft, Plus, Upload } from "lucide-react";
+import { type CycleCount, type InventoryLocation } from "@/types/inventory";
+import {
+  getCycleCounts, getCycleCount, createCycleCount, uploadCycleCountScans,
+  postCycleCount, cancelCycleCount, getLocations,
+} from "@/lib/api";
+
+interface CycleCountsTabProps {
+  canManage?: boolean;
+}
+
+const statusVariant = (status: string) =>
+  status === "posted" ? "default" : status === "cancelled" ? "destructive" : "secondary";
+
+export const CycleCountsTab = ({ canManage = true }: CycleCountsTabProps) => {
+  const [cycleCounts, setCycleCounts] = useState<CycleCount[]>([]);
+  const [locations, setLocations] = useState<InventoryLocation[]>([]);
+  const [selected, setSelected] = useState<CycleCount | null>(null);
+  const [loading, setLoading] = useState(true);
+  const [busy, setBusy] = useState(false);
+
+  const [createOpen, setCreateOpen] = useState(false);
+  const [countNumber, setCountNumber] = useState("");
+  const [locationIds, setLocationIds] = useState<string[]>([]);
+  const [notes, setNotes] = useState("");
+
+  const [scanText, setScanText] = useState("");
+  const [scanLocationId, setScanLocationId] = useState("");
+  const [replaceMode, setReplaceMode] = useState(false);
+  const [uncountedAsZero, setUncountedAsZero] = useState(false);
+
+  const fetchCycleCounts = async () => {
+    try {
+      setLoading(true);
+      const [counts, locs] = await Promise.all([getCycleCounts(), getLocations()]);
+      setCycleCounts(counts || []);
+      setLocations(locs || []);
+    } catch (error) {
+      console.error('Error fetching cycle counts:', error);
+      toast({ title: "Error", description: "Failed to load cycle counts", variant: "destructive" });
+      setCycleCounts([]);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const openCycleCount = async (id: string) => {
+    try {
+      const data = await getCycleCount(id);
+      setSelected(data);
+      setScanLocationId(data.locationIds.length === 1 ? data.locationIds[0] : "");
+    } catch (error) {
+      console.error('Error fetching cycle count:', error);
+      toast({ title: "Error", description: "Failed to load cycle count", variant: "destructive" });
+    }
+  };
+
+  useEffect(() => {
+    fetchCycleCounts();
+  }, []);
+
+  useEffect(() => {
+    setCountNumber(`CC-${Date.now().toString().slice(-8)}`);
+    setLocationIds([]);
+    setNotes("");
+  }, [createOpen]);
+
+  const locationName = (id: string) => locations.find((l) => l.id === id)?.name || id;
+
+  const handleCreate = async () => {
+    setBusy(true);
+    try {
+      const created = await createCycleCount({ countNumber, locationIds, notes });
+      setCreateOpen(false);
+      await fetchCycleCounts();
+      await openCycleCount(created.id);
+    } catch (error: any) {
+      toast({ title: "Error", description: error?.message || "Failed to start cycle count", variant: "destructive" });
+    } finally {
+      setBusy(false);
+    }
+  };
+
+  const handleUpload = async () => {
+    if (!selected) return;
+    const scans = scanText.split(/\r?\n/).map((code) => code.trim()).filter(Boolean);
+    if (scans.length === 0) return;
+    setBusy(true);
+    try {
+      const result = await uploadCycleCountScans(selected.id, {
+        scans,
+        locationId: scanLocationId || null,
+        mode: replaceMode ? "replace" : "add",
+      });
+      toast({
+        title: "Scans uploaded",
+        description: `${result.resolved} of ${result.reads} reads matched` +
+          (result.unknownCodeCount ? `, ${result.unknownCodeCount} unknown codes` : ""),
+      });
+      setScanText("");
+      await openCycleCount(selected.id);
+    } catch (error: any) {
+      toast({ title: "Error", description: error?.message || "Failed to upload scans", variant: "destructive" });
+    } finally {
+      setBusy(false);
+    }
+  };
+
+  const handlePost = async () => {
+    if (!selected) return;
+    setBusy(true);
+    try {
+      const result = await postCycleCount(selected.id, { uncountedAsZero });
+      toast({
+        title: "Cycle count posted",
+        description: `${result.adjustments} adjustments, net change ${result.netChange}`,
+      });
+      await fetchCycleCounts();
+      await openCycleCount(selected.id);
+    } catch (error: any) {
+      toast({ title: "Error", description: error?.message || "Failed to post cycle count", variant: "destructive" });
+    } finally {
+      setBusy(false);
+    }
+  };
+
+  const handleCancel = async () => {
+    if (!selected) return;
+    setBusy(true);
+    try {
+      await cancelCycleCount(selected.id);
+      setSelected(null);
+      await fetchCycleCounts();
+    } catch (error: any) {
+      toast({ title: "Error", description: error?.message || "Failed to cancel cycle count", variant: "destructive" });
+    } finally {
+      setBusy(false);
+    }
+  };
+
+  if (loading) {
+    return (
+      <div className="flex justify-center py-8">
+        <Spinner />
+      </div>
+    );
+  }
+
+  if (selected) {
+    const isOpen = selected.status === "open";
+    return (
+      <div className="space-y-4">
+        <div className="flex justify-between items-center">
+          <Button variant="ghost" onClick={() => setSelected(null)} className="flex items-center gap-1">
+            <ArrowLeft className="h-4 w-4" /> All counts
+          </Button>
+          <div className="flex items-center gap-2">
+            <span className="font-medium">{selected.countNumber}</span>
+            <Badge variant={statusVariant(selected.status)}>{selected.status}</Badge>
+          </div>
+        </div>
+
+        {isOpen && canManage && (
+          <div className="grid grid-cols-2 gap-4">
+            <div className="space-y-2">
+              <Label>Scans (one barcode, SKU or serial per line)</Label>
+              <Textarea value={scanText} onChange={(e) => setScanText(e.target.value)} rows={6} />
+            </div>
+            <div className="space-y-3">
+              <div>
+                <Label>Location</Label>
+                <Select value={scanLocationId} onValueChange={setScanLocationId}>
+                  <SelectTrigger><SelectValue placeholder="Select location" /></SelectTrigger>
+                  <SelectContent>
+                    {selected.locationIds.map((id) => (
+                      <SelectItem key={id} value={id}>{locationName(id)}</SelectItem>
+                    ))}
+                  </SelectContent>
+                </Select>
+              </div>
+              <div className="flex items-center gap-2">
+                <Switch checked={replaceMode} onCheckedChange={setReplaceMode} />
+                <Label>Replace earlier counts for scanned items</Label>
+              </div>
+              <Button onClick={handleUpload} disabled={busy || !scanText.trim()} className="flex items-center gap-1">
+                <Upload className="h-4 w-4" /> Upload Scans
+              </Button>
+            </div>
+          </div>
+        )}
+
+        <Table>
+          <TableHeader>
+            <TableRow>
+              <TableHead>Product</TableHead>
+              <TableHead>SKU</TableHead>
+              <TableHead>Location</TableHead>
+              <TableHead className="text-right">Expected</TableHead>
+              <TableHead className="text-right">Counted</TableHead>
+              <TableHead className="text-right">Variance</TableHead>
+              <TableHead>Serials</TableHead>
+            </TableRow>
+          </TableHeader>
+          <TableBody>
+            {selected.lines.length === 0 ? (
+              <TableRow><TableCell colSpan={7} className="text-center py-6 text-muted-foreground">No lines</TableCell></TableRow>
+            ) : selected.lines.map((line) => (
+              <TableRow key={line.id}>
+                <TableCell className="font-medium">{line.productName}</TableCell>
+                <TableCell>{line.skuCode}</TableCell>
+                <TableCell>{line.locationName}</TableCell>
+                <TableCell className="text-right">{line.expectedQuantity}</TableCell>
+                <TableCell className="text-right">{line.countedQuantity ?? "-"}</TableCell>
+                <TableCell className={`text-right ${line.variance ? "text-destructive font-medium" : ""}`}>
+                  {line.variance == null ? "-" : line.variance > 0 ? `+${line.variance}` : line.variance}
+                </TableCell>
+                <TableCell className="text-xs">
+                  {line.missingSerials.length > 0 && <div>Missing: {line.missingSerials.join(", ")}</div>}
+                  {line.unexpectedSerials.length > 0 && <div>Unexpected: {line.unexpectedSerials.join(", ")}</div>}
+                </TableCell>
+              </TableRow>
+            ))}
+          </TableBody>
+        </Table>
+
+        {isOpen && canManage && (
+          <div className="flex justify-end items-center gap-4">
+            <div className="flex items-center gap-2">
+              <Switch checked={uncountedAsZero} onCheckedChange={setUncountedAsZero} />
+              <Label>Treat uncounted lines as zero</Label>
+            </div>
+            <Button variant="outline" onClick={handleCancel} disabled={busy}>Cancel Count</Button>
+            <Button onClick={handlePost} disabled={busy}>Post Variances</Button>
+          </div>
+        )}
+      </div>
+    );
+  }
+
+  return (
+    <div className="space-y-4">
+      {canManage && (
+        <div className="flex justify-end">
+          <Button onClick={() => setCreateOpen(true)} className="flex items-center gap-1">
+            <Plus className="h-4 w-4" /> New Count
+          </Button>
+        </div>
+      )}
+
+      <Table>
+        <TableHeader>
+          <TableRow>
+            <TableHead>Count #</TableHead>
+            <TableHead>Locations</TableHead>
+            <TableHead className="text-right">Adjustments</TableHead>
+            <TableHead>Status</TableHead>
+            <TableHead>Created</TableHead>
+          </TableRow>
+        </TableHeader>
+        <TableBody>
+          {cycleCounts.length === 0 ? (
+            <TableRow><TableCell colSpan={5} className="text-center py-6 text-muted-foreground">No cycle counts</TableCell></TableRow>
+          ) : cycleCounts.map((cc) => (
+            <TableRow key={cc.id} className="cursor-pointer" onClick={() => openCycleCount(cc.id)}>
+              <TableCell className="font-medium">{cc.countNumber}</TableCell>
+              <TableCell>{cc.locationIds.map(locationName).join(", ")}</TableCell>
+              <TableCell className="text-right">{cc.summary?.adjustments ?? "-"}</TableCell>
+              <TableCell><Badge variant={statusVariant(cc.status)}>{cc.status}</Badge></TableCell>
+              <TableCell>{cc.createdAt ? format(new Date(cc.createdAt), "MMM d, yyyy") : "-"}</TableCell>
+            </TableRow>
+          ))}
+        </TableBody>
+      </Table>
+
+      <Dialog open={createOpen} onOpenChange={setCreateOpen}>
+        <DialogContent className="max-w-lg">
+          <DialogHeader>
+            <DialogTitle>Start Cycle Count</DialogTitle>
+          </DialogHeader>
+          <div className="space-y-4">
+            <div>
+              <Label>Count Number</Label>
+              <Input value={countNumber} onChange={(e) => setCountNumber(e.target.value)} />
+            </div>
+            <div>
+              <Label>Locations ({locationIds.length} selected)</Label>
+              <div className="max-h-60 overflow-y-auto space-y-2 mt-2">
+                {locations.filter((l) => l.isActive).map((l) => (
+                  <div key={l.id} className="flex items-center gap-2">
+                    <Checkbox
+                      checked={locationIds.includes(l.id)}
+                      onCheckedChange={(checked) => setLocationIds((prev) =>
+                        checked === true ? [...prev, l.id] : prev.filter((id) => id !== l.id))}
+                    />
+                    <span>{l.name}</span>
+                  </div>
+                ))}
+              </div>
+            </div>
+            <div>
+              <Label>Notes</Label>
+              <Textarea value={notes} onChange={(e) => setNotes(e.target.value)} rows={2} />
+            </div>
+          </div>
+          <DialogFooter>
+            <Button variant="outline" onClick={() => setCreateOpen(false)}>Cancel</Button>
+            <Button onClick={handleCreate} disabled={busy || locationIds.length === 0}>
+              {busy ? "Starting..." : "Start Count"}
+            </Button>
+          </DialogFooter>
+        </DialogContent>
+      </Dialog>
+    </div>
+  );
+};
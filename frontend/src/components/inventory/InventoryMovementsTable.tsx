@@ -6,9 +6,10 @@ import {
   TableHead, TableCell
 } from "@/components/ui/table";
 import { Input } from "@/components/ui/input";
+import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import { Search } from "lucide-react";
-import { type InventoryMovement } from "@/types/inventory";
+import { type InventoryMovement, type InventoryLedgerPage } from "@/types/inventory";
 import { getInventoryMovements } from "@/lib/api";
 import { toast } from "@/hooks/use-toast";
 import { Spinner } from "@/components/ui/spinner";
@@ -17,12 +18,19 @@ export const InventoryMovementsTable = () => {
   const [searchTerm, setSearchTerm] = useState("");
   const [movements, setMovements] = useState<InventoryMovement[]>([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   
-  const fetchMovements = async () => {
+  const fetchMovements = async (cursor: string | null = null) => {
     try {
-      setLoading(true);
-      const data = await getInventoryMovements();
-      setMovements(data || []);
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
+      const page: InventoryLedgerPage<InventoryMovement> = await getInventoryMovements({ cursor });
+      setMovements((prev) => (cursor ? [...prev, ...(page?.items || [])] : page?.items || []));
+      setNextCursor(page?.nextCursor || null);
     } catch (error) {
       console.error('Error fetching inventory movements:', error);
       toast({
@@ -33,6 +41,7 @@ export const InventoryMovementsTable = () => {
       setMovements([]);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -142,6 +151,13 @@ export const InventoryMovementsTable = () => {
           </TableBody>
         </Table>
       </div>
+      {nextCursor && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={() => fetchMovements(nextCursor)} disabled={loadingMore}>
+            {loadingMore ? "Loading..." : "Load more"}
+          </Button>
+        </div>
+      )}
     </div>
   );
 };
@@ -1,25 +1,43 @@
 import React, { useState, useEffect } from "react";
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table";
 import { Input } from "@/components/ui/input";
+import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { Spinner } from "@/components/ui/spinner";
 import { Search } from "lucide-react";
 import { getInventoryTransactions } from "@/lib/api";
-import { InventoryTransaction } from "@/types/inventory";
+import { InventoryTransaction, InventoryLedgerPage } from "@/types/inventory";
 import { useToast } from "@/hooks/use-toast";
 import { format } from "date-fns";
 
 export const InventoryTransactionsTable = () => {
   const [transactions, setTransactions] = useState<InventoryTransaction[]>([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [searchTerm, setSearchTerm] = useState("");
+  const [dateFrom, setDateFrom] = useState("");
+  const [dateTo, setDateTo] = useState("");
+  const [transactionType, setTransactionType] = useState("all");
   const { toast } = useToast();
 
-  const fetchTransactions = async () => {
+  // Filters run on the server; the search box narrows the rows already loaded
+  const fetchTransactions = async (cursor: string | null = null) => {
     try {
-      setLoading(true);
-      const data = await getInventoryTransactions();
-      setTransactions(data || []);
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
+      const page: InventoryLedgerPage<InventoryTransaction> = await getInventoryTransactions({
+        dateFrom,
+        dateTo,
+        transactionType: transactionType === "all" ? undefined : transactionType,
+        cursor,
+      });
+      setTransactions((prev) => (cursor ? [...prev, ...(page?.items || [])] : page?.items || []));
+      setNextCursor(page?.nextCursor || null);
     } catch (error) {
       console.error('Error fetching inventory transactions:', error);
       toast({
@@ -29,12 +47,13 @@ export const InventoryTransactionsTable = () => {
       });
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
   useEffect(() => {
     fetchTransactions();
-  }, []);
+  }, [dateFrom, dateTo, transactionType]);
 
   const filteredTransactions = transactions.filter(transaction => 
     (transaction.productName?.toLowerCase() || '').includes(searchTerm.toLowerCase()) ||
@@ -102,7 +121,7 @@ export const InventoryTransactionsTable = () => {
 
   return (
     <div className="space-y-4">
-      <div className="flex items-center gap-2">
+      <div className="flex flex-wrap items-center gap-2">
         <Search className="h-4 w-4 text-gray-400" />
         <Input
           placeholder="Search transactions..."
@@ -110,6 +129,19 @@ export const InventoryTransactionsTable = () => {
           onChange={(e) => setSearchTerm(e.target.value)}
           className="max-w-sm"
         />
+        <Input type="date" value={dateFrom} onChange={(e) => setDateFrom(e.target.value)} className="w-40" />
+        <span className="text-sm text-gray-500">to</span>
+        <Input type="date" value={dateTo} onChange={(e) => setDateTo(e.target.value)} className="w-40" />
+        <Select value={transactionType} onValueChange={setTransactionType}>
+          <SelectTrigger className="w-40"><SelectValue /></SelectTrigger>
+          <SelectContent>
+            <SelectItem value="all">All types</SelectItem>
+            <SelectItem value="purchase">Purchase</SelectItem>
+            <SelectItem value="sale">Sale</SelectItem>
+            <SelectItem value="adjustment">Adjustment</SelectItem>
+            <SelectItem value="transfer">Transfer</SelectItem>
+          </SelectContent>
+        </Select>
       </div>
       
       <div className="rounded-md border">
@@ -162,6 +194,13 @@ export const InventoryTransactionsTable = () => {
           </TableBody>
         </Table>
       </div>
+      {nextCursor && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={() => fetchTransactions(nextCursor)} disabled={loadingMore}>
+            {loadingMore ? "Loading..." : "Load more"}
+          </Button>
+        </div>
+      )}
     </div>
   );
 }; 
\ No newline at end of file
@@ -30,9 +30,23 @@ const formSchema = z.object({
   name: z.string().min(1, "Location name is required"),
   description: z.string().optional(),
   address: z.string().optional(),
+  zone: z.string().optional(),
+  aisle: z.string().regex(/^\d*$/, "Must be a whole number").optional(),
+  bay: z.string().regex(/^\d*$/, "Must be a whole number").optional(),
+  level: z.string().regex(/^\d*$/, "Must be a whole number").optional(),
+  capacity: z.string().regex(/^\d*$/, "Must be a whole number").optional(),
   isActive: z.boolean(),
 });
 
+const positionFields = [
+  { name: "zone", label: "Zone", placeholder: "e.g. A" },
+  { name: "aisle", label: "Aisle", placeholder: "1" },
+  { name: "bay", label: "Bay", placeholder: "1" },
+  { name: "level", label: "Level", placeholder: "0" },
+] as const;
+
+const toPosition = (value?: string) => (value ? parseInt(value, 10) : null);
+
 type FormValues = z.infer<typeof formSchema>;
 
 interface LocationDialogProps {
@@ -51,6 +65,11 @@ export function LocationDialog({ open, onOpenChange, location, onSuccess }: Loca
       name: location?.name || "",
       description: location?.description || "",
       address: location?.address || "",
+      zone: location?.zone || "",
+      aisle: location?.aisle?.toString() ?? "",
+      bay: location?.bay?.toString() ?? "",
+      level: location?.level?.toString() ?? "",
+      capacity: location?.capacity?.toString() ?? "",
       isActive: location?.isActive ?? true,
     },
   });
@@ -62,6 +81,11 @@ export function LocationDialog({ open, onOpenChange, location, onSuccess }: Loca
         name: location.name || "",
         description: location.description || "",
         address: location.address || "",
+        zone: location.zone || "",
+        aisle: location.aisle?.toString() ?? "",
+        bay: location.bay?.toString() ?? "",
+        level: location.level?.toString() ?? "",
+        capacity: location.capacity?.toString() ?? "",
         isActive: location.isActive ?? true,
       });
     } else {
@@ -69,6 +93,11 @@ export function LocationDialog({ open, onOpenChange, location, onSuccess }: Loca
         name: "",
         description: "",
         address: "",
+        zone: "",
+        aisle: "",
+        bay: "",
+        level: "",
+        capacity: "",
         isActive: true,
       });
     }
@@ -82,6 +111,11 @@ export function LocationDialog({ open, onOpenChange, location, onSuccess }: Loca
         name: data.name,
         description: data.description,
         address: data.address,
+        zone: data.zone || null,
+        aisle: toPosition(data.aisle),
+        bay: toPosition(data.bay),
+        level: toPosition(data.level),
+        capacity: toPosition(data.capacity),
         is_active: data.isActive,
       };
 
@@ -174,6 +208,42 @@ export function LocationDialog({ open, onOpenChange, location, onSuccess }: Loca
               )}
             />
 
+            <div className="grid grid-cols-4 gap-3">
+              {positionFields.map((position) => (
+                <FormField
+                  key={position.name}
+                  control={form.control}
+                  name={position.name}
+                  render={({ field }) => (
+                    <FormItem>
+                      <FormLabel>{position.label}</FormLabel>
+                      <FormControl>
+                        <Input placeholder={position.placeholder} {...field} />
+                      </FormControl>
+                      <FormMessage />
+                    </FormItem>
+                  )}
+                />
+              ))}
+            </div>
+            <p className="text-xs text-muted-foreground -mt-2">
+              Position in the warehouse. Pick lists are sequenced along the aisles in this order.
+            </p>
+
+            <FormField
+              control={form.control}
+              name="capacity"
+              render={({ field }) => (
+                <FormItem>
+                  <FormLabel>Capacity (Optional)</FormLabel>
+                  <FormControl>
+                    <Input placeholder="Maximum units; leave empty for unlimited" {...field} />
+                  </FormControl>
+                  <FormMessage />
+                </FormItem>
+              )}
+            />
+
             <FormField
               control={form.control}
               name="isActive"
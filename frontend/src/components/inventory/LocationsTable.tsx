@@ -132,6 +132,7 @@ export const LocationsTable = ({ onEdit, canEdit = true }: LocationsTableProps)
               <TableHead>Name</TableHead>
               <TableHead>Description</TableHead>
               <TableHead>Address</TableHead>
+              <TableHead>Position</TableHead>
               <TableHead>Status</TableHead>
               <TableHead>Last Updated</TableHead>
               <TableHead className="w-[100px]">Actions</TableHead>
@@ -144,6 +145,11 @@ export const LocationsTable = ({ onEdit, canEdit = true }: LocationsTableProps)
                   <TableCell className="font-medium">{location.name || 'N/A'}</TableCell>
                   <TableCell>{location.description || "-"}</TableCell>
                   <TableCell>{location.address || "-"}</TableCell>
+                  <TableCell>
+                    {location.aisle != null
+                      ? [location.zone, `Aisle ${location.aisle}`, location.bay != null && `Bay ${location.bay}`, location.level != null && `Level ${location.level}`].filter(Boolean).join(" · ")
+                      : "-"}
+                  </TableCell>
                   <TableCell>
                     {location.isActive ? (
                       <Badge className="bg-green-100 text-green-800">Active</Badge>
@@ -179,7 +185,7 @@ export const LocationsTable = ({ onEdit, canEdit = true }: LocationsTableProps)
               ))
             ) : (
               <TableRow>
-                <TableCell colSpan={6} className="text-center py-4">
+                <TableCell colSpan={7} className="text-center py-4">
                   {searchTerm ? "No locations found matching your search" : "No locations found"}
                 </TableCell>
               </TableRow>
@@ -0,0 +1,208 @@
+import { useState, useEffect } from "react";
+import {
+  Dialog, DialogContent, DialogHeader, DialogTitle, DialogFooter,
+} from "@/components/ui/dialog";
+import {
+  Select, SelectContent, SelectItem, SelectTrigger, SelectValue,
+} from "@/components/ui/select";
+import {
+  Table, TableBody, TableCell, TableHead, TableHeader, TableRow,
+} from "@/components/ui/table";
+import { Button } from "@/components/ui/button";
+import { Input } from "@/components/ui/input";
+import { Label } from "@/components/ui/label";
+import { Textarea } from "@/components/ui/textarea";
+import { Plus, Trash2 } from "lucide-react";
+import { toast } from "@/hooks/use-toast";
+import { type Product, type InventoryLocation } from "@/types/inventory";
+import { createStockTransfer, getLocations, getProducts } from "@/lib/api";
+
+interface StockTransferDialogProps {
+  open: boolean;
+  onOpenChange: (open: boolean) => void;
+  onSuccess?: () => void;
+}
+
+interface TransferRow {
+  productId: string;
+  quantity: number;
+  serials: string;
+}
+
+const emptyRow = (): TransferRow => ({ productId: "", quantity: 1, serials: "" });
+
+const parseSerials = (text: string) => text.split(/[\s,]+/).map((s) => s.trim()).filter(Boolean);
+
+export function StockTransferDialog({ open, onOpenChange, onSuccess }: StockTransferDialogProps) {
+  const [products, setProducts] = useState<Product[]>([]);
+  const [locations, setLocations] = useState<InventoryLocation[]>([]);
+  const [transferNumber, setTransferNumber] = useState("");
+  const [fromLocationId, setFromLocationId] = useState("");
+  const [toLocationId, setToLocationId] = useState("");
+  const [rows, setRows] = useState<TransferRow[]>([emptyRow()]);
+  const [notes, setNotes] = useState("");
+  const [error, setError] = useState("");
+  const [saving, setSaving] = useState(false);
+
+  useEffect(() => {
+    if (!open) return;
+    setTransferNumber(`TR-${Date.now().toString().slice(-8)}`);
+    setFromLocationId("");
+    setToLocationId("");
+    setRows([emptyRow()]);
+    setNotes("");
+    setError("");
+    Promise.all([getProducts(), getLocations()])
+      .then(([productsData, locationsData]) => {
+        setProducts(productsData || []);
+        setLocations((locationsData || []).filter((l: InventoryLocation) => l.isActive));
+      })
+      .catch((e) => {
+        console.error('Error fetching transfer data:', e);
+        toast({ title: "Error", description: "Failed to load products and locations", variant: "destructive" });
+      });
+  }, [open]);
+
+  const isSerialized = (productId: string) => !!products.find((p) => p.id === productId)?.is_serialized;
+
+  const updateRow = (index: number, changes: Partial<TransferRow>) => {
+    setRows((prev) => prev.map((row, i) => (i === index ? { ...row, ...changes } : row)));
+  };
+
+  const handleSubmit = async () => {
+    setSaving(true);
+    setError("");
+    try {
+      await createStockTransfer({
+        transferNumber,
+        fromLocationId,
+        toLocationId,
+        notes,
+        items: rows.filter((row) => row.productId).map((row) => (
+          isSerialized(row.productId)
+            ? { productId: row.productId, serialNumbers: parseSerials(row.serials) }
+            : { productId: row.productId, quantity: row.quantity }
+        )),
+      });
+      toast({ title: "Transfer posted", description: `${transferNumber} moved stock between locations` });
+      onOpenChange(false);
+      onSuccess?.();
+    } catch (e: any) {
+      console.error(e);
+      setError(e?.message || "Failed to post transfer");
+    } finally {
+      setSaving(false);
+    }
+  };
+
+  const canSubmit = fromLocationId && toLocationId && fromLocationId !== toLocationId && rows.some((row) => row.productId);
+
+  return (
+    <Dialog open={open} onOpenChange={onOpenChange}>
+      <DialogContent className="max-w-4xl max-h-[90vh] overflow-y-auto">
+        <DialogHeader>
+          <DialogTitle>Transfer Stock</DialogTitle>
+        </DialogHeader>
+
+        <div className="grid grid-cols-3 gap-4">
+          <div>
+            <Label>Transfer Number</Label>
+            <Input value={transferNumber} onChange={(e) => setTransferNumber(e.target.value)} />
+          </div>
+          <div>
+            <Label>From Location</Label>
+            <Select value={fromLocationId} onValueChange={setFromLocationId}>
+              <SelectTrigger><SelectValue placeholder="Select location" /></SelectTrigger>
+              <SelectContent>
+                {locations.map((l) => <SelectItem key={l.id} value={l.id}>{l.name}</SelectItem>)}
+              </SelectContent>
+            </Select>
+          </div>
+          <div>
+            <Label>To Location</Label>
+            <Select value={toLocationId} onValueChange={setToLocationId}>
+              <SelectTrigger><SelectValue placeholder="Select location" /></SelectTrigger>
+              <SelectContent>
+                {locations.filter((l) => l.id !== fromLocationId).map((l) => (
+                  <SelectItem key={l.id} value={l.id}>{l.name}</SelectItem>
+                ))}
+              </SelectContent>
+            </Select>
+          </div>
+        </div>
+
+        <Table>
+          <TableHeader>
+            <TableRow>
+              <TableHead>Product</TableHead>
+              <TableHead className="w-32">Quantity</TableHead>
+              <TableHead>Serial Numbers</TableHead>
+              <TableHead className="w-10" />
+            </TableRow>
+          </TableHeader>
+          <TableBody>
+            {rows.map((row, index) => (
+              <TableRow key={index}>
+                <TableCell>
+                  <Select value={row.productId} onValueChange={(productId) => updateRow(index, { productId, serials: "" })}>
+                    <SelectTrigger><SelectValue placeholder="Select product" /></SelectTrigger>
+                    <SelectContent>
+                      {products.map((p) => <SelectItem key={p.id} value={p.id}>{p.name} ({p.sku_code})</SelectItem>)}
+                    </SelectContent>
+                  </Select>
+                </TableCell>
+                <TableCell>
+                  {isSerialized(row.productId) ? (
+                    <span className="text-muted-foreground">{parseSerials(row.serials).length}</span>
+                  ) : (
+                    <Input
+                      type="number"
+                      min={1}
+                      value={row.quantity}
+                      onChange={(e) => updateRow(index, { quantity: parseInt(e.target.value) || 0 })}
+                    />
+                  )}
+                </TableCell>
+                <TableCell>
+                  {isSerialized(row.productId) && (
+                    <Textarea
+                      value={row.serials}
+                      onChange={(e) => updateRow(index, { serials: e.target.value })}
+                      placeholder="One serial per line"
+                      rows={2}
+                    />
+                  )}
+                </TableCell>
+                <TableCell>
+                  <Button
+                    variant="ghost"
+                    size="icon"
+                    onClick={() => setRows((prev) => prev.filter((_, i) => i !== index))}
+                    disabled={rows.length === 1}
+                  >
+                    <Trash2 className="h-4 w-4" />
+                  </Button>
+                </TableCell>
+              </TableRow>
+            ))}
+          </TableBody>
+        </Table>
+        <Button variant="outline" onClick={() => setRows((prev) => [...prev, emptyRow()])} className="flex items-center gap-1 w-fit">
+          <Plus className="h-4 w-4" /> Add Item
+        </Button>
+
+        <div>
+          <Label>Notes</Label>
+          <Textarea value={notes} onChange={(e) => setNotes(e.target.value)} rows={2} />
+        </div>
+
+        {error && <p className="text-sm text-destructive">{error}</p>}
+
+        <DialogFooter>
+          <Button variant="outline" onClick={() => onOpenChange(false)}>Cancel</Button>
+          <Button onClick={handleSubmit} disabled={saving || !canSubmit}>{saving ? "Posting..." : "Post Transfer"}</Button>
+        </DialogFooter>
+      </DialogContent>
+    </Dialog>
+  );
+}
@@ -85,7 +85,11 @@ export function PickListTable({ pickLists, loading, onView, onEdit, onDelete, ca
                         return (
                             <TableRow key={pl.id}>
                                 <TableCell className="font-medium">{pl.pickListNumber}</TableCell>
-                                <TableCell>{pl.deliveryChallan?.dcNumber || "—"}</TableCell>
+                                <TableCell>
+                                    {pl.pickType === "wave"
+                                        ? <span title={pl.deliveryChallans?.map((dc) => dc.dcNumber).join(", ")}>Wave ({pl.deliveryChallans?.length || 0} DCs)</span>
+                                        : pl.deliveryChallan?.dcNumber || "—"}
+                                </TableCell>
                                 <TableCell>{pl.assignedUser?.fullName || "Unassigned"}</TableCell>
                                 <TableCell>
                                     <div className="flex items-center gap-2 min-w-[120px]">
@@ -65,8 +65,17 @@ export function PickListView({ pickList: pl, onBack }: PickListViewProps) {
                         <CardTitle className="text-sm text-muted-foreground flex items-center gap-2"><ClipboardList className="h-4 w-4" /> DC</CardTitle>
                     </CardHeader>
                     <CardContent>
-                        <div className="text-lg font-bold">{pl.deliveryChallan?.dcNumber || "—"}</div>
-                        <p className="text-xs text-muted-foreground">{pl.deliveryChallan?.status || ""}</p>
+                        {pl.pickType === "wave" ? (
+                            <>
+                                <div className="text-lg font-bold">Wave ({pl.deliveryChallans?.length || 0} DCs)</div>
+                                <p className="text-xs text-muted-foreground truncate">{pl.deliveryChallans?.map((dc) => dc.dcNumber).join(", ")}</p>
+                            </>
+                        ) : (
+                            <>
+                                <div className="text-lg font-bold">{pl.deliveryChallan?.dcNumber || "—"}</div>
+                                <p className="text-xs text-muted-foreground">{pl.deliveryChallan?.status || ""}</p>
+                            </>
+                        )}
                     </CardContent>
                 </Card>
                 <Card>
@@ -112,20 +121,26 @@ export function PickListView({ pickList: pl, onBack }: PickListViewProps) {
                     <Table>
                         <TableHeader>
                             <TableRow>
+                                <TableHead className="w-12">#</TableHead>
                                 <TableHead>Product</TableHead>
                                 <TableHead>SKU</TableHead>
                                 <TableHead>Location</TableHead>
+                                <TableHead>Batch</TableHead>
+                                <TableHead>Expiry</TableHead>
                                 <TableHead className="text-right">Qty</TableHead>
                                 <TableHead className="text-right">Picked</TableHead>
                                 <TableHead>Notes</TableHead>
                             </TableRow>
                         </TableHeader>
                         <TableBody>
-                            {(pl.items || []).map((item) => (
+                            {(pl.items || []).map((item, idx) => (
                                 <TableRow key={item.id}>
+                                    <TableCell className="text-muted-foreground">{item.pickSequence ?? idx + 1}</TableCell>
                                     <TableCell className="font-medium">{item.productName || "—"}</TableCell>
                                     <TableCell>{item.skuCode || "—"}</TableCell>
                                     <TableCell>{item.locationName || "—"}</TableCell>
+                                    <TableCell>{item.batchNumber || "—"}</TableCell>
+                                    <TableCell>{item.expiryDate ? formatDate(item.expiryDate) : "—"}</TableCell>
                                     <TableCell className="text-right">{item.quantity}</TableCell>
                                     <TableCell className="text-right">
                                         <span className={item.pickedQuantity >= item.quantity ? "text-green-600 font-medium" : "text-orange-500"}>
@@ -0,0 +1,145 @@
+import { useState, useEffect } from "react";
+import {
+    Dialog, DialogContent, DialogHeader, DialogTitle, DialogFooter,
+} from "@/components/ui/dialog";
+import { Button } from "@/components/ui/button";
+import { Input } from "@/components/ui/input";
+import { Label } from "@/components/ui/label";
+import { Textarea } from "@/components/ui/textarea";
+import { Checkbox } from "@/components/ui/checkbox";
+import {
+    Select, SelectContent, SelectItem, SelectTrigger, SelectValue,
+} from "@/components/ui/select";
+import {
+    Table, TableBody, TableCell, TableHead, TableHeader, TableRow,
+} from "@/components/ui/table";
+
+interface PickWaveDialogProps {
+    open: boolean;
+    onOpenChange: (open: boolean) => void;
+    onSave: (data: any) => Promise<void>;
+    deliveryChallans?: any[];
+    users?: any[];
+}
+
+export function PickWaveDialog({ open, onOpenChange, onSave, deliveryChallans = [], users = [] }: PickWaveDialogProps) {
+    const [pickListNumber, setPickListNumber] = useState("");
+    const [selectedIds, setSelectedIds] = useState<string[]>([]);
+    const [assignedTo, setAssignedTo] = useState("");
+    const [pickDate, setPickDate] = useState(new Date().toISOString().split("T")[0]);
+    const [notes, setNotes] = useState("");
+    const [error, setError] = useState("");
+    const [saving, setSaving] = useState(false);
+
+    // Only DCs that have not been dispatched can join a wave
+    const readyDCs = deliveryChallans.filter((dc: any) => dc.status === "draft");
+
+    useEffect(() => {
+        setPickListNumber(`WV-${Date.now().toString().slice(-8)}`);
+        setSelectedIds([]);
+        setAssignedTo("");
+        setPickDate(new Date().toISOString().split("T")[0]);
+        setNotes("");
+        setError("");
+    }, [open]);
+
+    const toggleDC = (dcId: string, checked: boolean) => {
+        setSelectedIds((prev) => checked ? [...prev, dcId] : prev.filter((id) => id !== dcId));
+    };
+
+    const handleSubmit = async () => {
+        setSaving(true);
+        setError("");
+        try {
+            await onSave({
+                pickListNumber,
+                deliveryChallanIds: selectedIds,
+                assignedTo: assignedTo || null,
+                pickDate,
+                notes,
+            });
+            onOpenChange(false);
+        } catch (e: any) {
+            console.error(e);
+            setError(e?.message || "Failed to create wave");
+        } finally {
+            setSaving(false);
+        }
+    };
+
+    return (
+        <Dialog open={open} onOpenChange={onOpenChange}>
+            <DialogContent className="max-w-4xl max-h-[90vh] overflow-y-auto">
+                <DialogHeader>
+                    <DialogTitle>Create Pick Wave</DialogTitle>
+                </DialogHeader>
+
+                <div className="grid grid-cols-2 gap-4">
+                    <div>
+                        <Label>Wave Number</Label>
+                        <Input value={pickListNumber} onChange={(e) => setPickListNumber(e.target.value)} />
+                    </div>
+                    <div>
+                        <Label>Assigned To</Label>
+                        <Select value={assignedTo} onValueChange={setAssignedTo}>
+                            <SelectTrigger><SelectValue placeholder="Select user" /></SelectTrigger>
+                            <SelectContent>
+                                {users.map((u: any) => (
+                                    <SelectItem key={u.id} value={u.id}>{u.fullName || u.full_name || u.username}</SelectItem>
+                                ))}
+                            </SelectContent>
+                        </Select>
+                    </div>
+                    <div>
+                        <Label>Pick Date</Label>
+                        <Input type="date" value={pickDate} onChange={(e) => setPickDate(e.target.value)} />
+                    </div>
+                    <div className="col-span-2">
+                        <Label>Notes</Label>
+                        <Textarea value={notes} onChange={(e) => setNotes(e.target.value)} rows={2} />
+                    </div>
+                </div>
+
+                <div className="mt-4">
+                    <Label className="text-base font-semibold">Delivery Challans ({selectedIds.length} selected)</Label>
+                    <Table>
+                        <TableHeader>
+                            <TableRow>
+                                <TableHead className="w-10" />
+                                <TableHead>DC #</TableHead>
+                                <TableHead>Customer</TableHead>
+                                <TableHead className="text-right">Lines</TableHead>
+                                <TableHead className="text-right">Units</TableHead>
+                            </TableRow>
+                        </TableHeader>
+                        <TableBody>
+                            {readyDCs.length === 0 ? (
+                                <TableRow><TableCell colSpan={5} className="text-center py-6 text-muted-foreground">No delivery challans ready for dispatch</TableCell></TableRow>
+                            ) : readyDCs.map((dc: any) => (
+                                <TableRow key={dc.id}>
+                                    <TableCell>
+                                        <Checkbox
+                                            checked={selectedIds.includes(dc.id)}
+                                            onCheckedChange={(checked) => toggleDC(dc.id, checked === true)}
+                                        />
+                                    </TableCell>
+                                    <TableCell className="font-medium">{dc.dcNumber}</TableCell>
+                                    <TableCell>{dc.customer?.name || "No customer"}</TableCell>
+                                    <TableCell className="text-right">{dc.items?.length || 0}</TableCell>
+                                    <TableCell className="text-right">{dc.items?.reduce((s: number, i: any) => s + (i.quantity || 0), 0) || 0}</TableCell>
+                                </TableRow>
+                            ))}
+                        </TableBody>
+                    </Table>
+                </div>
+
+                {error && <p className="text-sm text-destructive">{error}</p>}
+
+                <DialogFooter>
+                    <Button variant="outline" onClick={() => onOpenChange(false)}>Cancel</Button>
+                    <Button onClick={handleSubmit} disabled={saving || selectedIds.length === 0}>{saving ? "Creating..." : "Create Wave"}</Button>
+                </DialogFooter>
+            </DialogContent>
+        </Dialog>
+    );
+}
@@ -27,7 +27,7 @@ import {
 } from "@/components/ui/table";
 import { type PutAway, type PutAwayItem } from "@/types/put-away";
 import { type QualityCheck } from "@/types/quality-check";
-import { getQualityChecks, getInventoryLocations, getUsers } from "@/lib/api";
+import { getQualityChecks, getInventoryLocations, getUsers, suggestPutAwaySlots } from "@/lib/api";
 
 interface PutAwayDialogProps {
     open: boolean;
@@ -110,6 +110,23 @@ export function PutAwayDialog({ open, onOpenChange, putAway, onSave }: PutAwayDi
         }
     };
 
+    // Prefill each line's location with the suggested slot; the user can still change it
+    const applySlotSuggestions = async (lines: any[]) => {
+        try {
+            const suggestions = await suggestPutAwaySlots(
+                lines.map((item) => ({ productId: item.productId, quantity: item.quantity }))
+            );
+            setItems((current) => current.map((item, idx) => {
+                const slot = suggestions?.[idx];
+                return slot && !item.locationId
+                    ? { ...item, locationId: slot.locationId, locationName: slot.locationName }
+                    : item;
+            }));
+        } catch (err) {
+            console.error("Failed to load location suggestions:", err);
+        }
+    };
+
     const handleQCSelect = (qcId: string) => {
         setQualityCheckId(qcId);
         const selectedQC = qualityChecks.find((qc) => qc.id === qcId);
@@ -131,6 +148,7 @@ export function PutAwayDialog({ open, onOpenChange, putAway, onSave }: PutAwayDi
                     notes: "",
                 }));
             setItems(qcItems);
+            if (qcItems.length > 0) applySlotSuggestions(qcItems);
         }
     };
 
@@ -262,8 +262,9 @@ export async function getCustomers() {
   return apiFetch('/customers');
 }
 
-export async function getFrequentItems(customerId: string) {
-  return apiFetch(`/customers/${customerId}/frequent-items`);
+export async function getFrequentItems(customerId: string, limit?: number) {
+  const query = limit ? `?limit=${limit}` : '';
+  return apiFetch(`/customers/${customerId}/frequent-items${query}`);
 }
 
 export async function createCustomer(customer: any) {
@@ -416,6 +417,18 @@ export async function getStockLevels() {
   return apiFetch('/inventory/stock-levels');
 }
 
+export async function getStockLevelsAsOf(asOf: string) {
+  return apiFetch(`/inventory/stock-levels?asOf=${encodeURIComponent(asOf)}`);
+}
+
+export async function getStockSnapshots() {
+  return apiFetch('/inventory/stock-snapshots');
+}
+
+export async function createStockSnapshot() {
+  return apiFetch('/inventory/stock-snapshots', { method: 'POST' });
+}
+
 export async function createStockLevel(stockLevel: any) {
   return apiFetch('/inventory/stock-levels', { method: 'POST', body: JSON.stringify(stockLevel) });
 }
@@ -438,8 +451,36 @@ export async function deleteStockLevel(id: string) {
 }
 
 // Inventory Transactions (Automatic audit trail)
-export async function getInventoryTransactions() {
-  return apiFetch('/inventory/transactions');
+export interface InventoryLedgerQuery {
+  dateFrom?: string;
+  dateTo?: string;
+  productId?: string;
+  cursor?: string | null;
+  limit?: number;
+  [filter: string]: string | number | null | undefined;
+}
+
+function ledgerQueryString(query: InventoryLedgerQuery = {}) {
+  const params = new URLSearchParams();
+  Object.entries(query).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== '') params.set(key, String(value));
+  });
+  const qs = params.toString();
+  return qs ? `?${qs}` : '';
+}
+
+// Returns one page: { items, nextCursor }. Pass nextCursor as cursor for the next page.
+export async function getInventoryTransactions(query?: InventoryLedgerQuery) {
+  return apiFetch(`/inventory/transactions${ledgerQueryString(query)}`);
+}
+
+// Archives months past the retention period on the backup worker; poll getBackupJob(jobId)
+export async function archiveInventoryTransactions() {
+  return apiFetch('/inventory/transactions/archive', { method: 'POST' });
+}
+
+export async function getInventoryTransactionArchives() {
+  return apiFetch('/inventory/transactions/archives');
 }
 // Serials API
 export async function lookupSerial(serial: string) {
@@ -461,8 +502,9 @@ export async function createInventoryTransaction(transaction: any) {
 }
 
 // Inventory Movements (Manual movements)
-export async function getInventoryMovements() {
-  return apiFetch('/inventory/movements');
+// Returns one page: { items, nextCursor }. Pass nextCursor as cursor for the next page.
+export async function getInventoryMovements(query?: InventoryLedgerQuery) {
+  return apiFetch(`/inventory/movements${ledgerQueryString(query)}`);
 }
 
 export async function fetchStockMovements(filters?: any) {
@@ -475,12 +517,19 @@ export async function getBackups() {
   return apiFetch('/backups');
 }
 
-export async function createBackup() {
-  return apiFetch('/backups/create', { method: 'POST' });
+export async function createBackup(mode: 'full' | 'incremental' = 'full') {
+  return apiFetch(`/backups/create?mode=${mode}`, { method: 'POST' });
 }
 
-export async function restoreBackup(filename: string) {
-  return apiFetch(`/backups/restore/${filename}`, { method: 'POST' });
+export async function getBackupJob(jobId: string) {
+  return apiFetch(`/backups/jobs/${jobId}`);
+}
+
+export async function restoreBackup(filename: string, tables?: string[]) {
+  return apiFetch(`/backups/restore/${filename}`, {
+    method: 'POST',
+    body: JSON.stringify({ tables: tables && tables.length ? tables : null }),
+  });
 }
 
 export async function deleteBackup(filename: string) {
@@ -521,6 +570,44 @@ export async function deleteLocation(id: string) {
   return apiFetch(`/inventory/locations/${id}`, { method: 'DELETE' });
 }
 
+// Stock Transfers API functions
+export async function getStockTransfers() {
+  return apiFetch('/inventory/transfers');
+}
+
+export async function getStockTransfer(id: string) {
+  return apiFetch(`/inventory/transfers/${id}`);
+}
+
+export async function createStockTransfer(transfer: any) {
+  return apiFetch('/inventory/transfers', { method: 'POST', body: JSON.stringify(transfer) });
+}
+
+// Cycle Counts API functions
+export async function getCycleCounts() {
+  return apiFetch('/inventory/cycle-counts');
+}
+
+export async function getCycleCount(id: string) {
+  return apiFetch(`/inventory/cycle-counts/${id}`);
+}
+
+export async function createCycleCount(cycleCount: any) {
+  return apiFetch('/inventory/cycle-counts', { method: 'POST', body: JSON.stringify(cycleCount) });
+}
+
+export async function uploadCycleCountScans(id: string, upload: any) {
+  return apiFetch(`/inventory/cycle-counts/${id}/scans`, { method: 'POST', body: JSON.stringify(upload) });
+}
+
+export async function postCycleCount(id: string, options: any = {}) {
+  return apiFetch(`/inventory/cycle-counts/${id}/post`, { method: 'POST', body: JSON.stringify(options) });
+}
+
+export async function cancelCycleCount(id: string) {
+  return apiFetch(`/inventory/cycle-counts/${id}`, { method: 'DELETE' });
+}
+
 // Products API functions
 export async function getProducts() {
   return apiFetch('/products');
@@ -827,6 +914,24 @@ export async function getOverdueInvoices() {
   return apiFetch('/sale-invoices/overdue');
 }
 
+export async function getDashboard() {
+  return apiFetch('/dashboard');
+}
+
+export async function getReceivablesAging(asOf?: string) {
+  const query = asOf ? `?asOf=${asOf}` : '';
+  return apiFetch(`/reports/receivables-aging${query}`);
+}
+
+export async function getReportsSummary(params: { dateFrom?: string; dateTo?: string; groupBy?: 'total' | 'day' | 'product' | 'customer' | 'supplier' } = {}) {
+  const query = new URLSearchParams();
+  if (params.dateFrom) query.set('dateFrom', params.dateFrom);
+  if (params.dateTo) query.set('dateTo', params.dateTo);
+  if (params.groupBy) query.set('groupBy', params.groupBy);
+  const qs = query.toString();
+  return apiFetch(`/reports/summary${qs ? `?${qs}` : ''}`);
+}
+
 // Customer Payments API functions
 export async function getCustomerPayments() {
   return apiFetch('/customer-payments');
@@ -1031,6 +1136,13 @@ export async function updatePutAway(id: string, putAway: any) {
   return result;
 }
 
+export async function suggestPutAwaySlots(items: { productId: string; quantity: number }[]) {
+  return apiFetch('/put-aways/slotting', {
+    method: 'POST',
+    body: JSON.stringify({ items }),
+  });
+}
+
 export async function deletePutAway(id: string) {
   return apiFetch(`/put-aways/${id}`, { method: 'DELETE' });
 }
@@ -1084,6 +1196,13 @@ export async function createPickList(pl: any) {
   });
 }
 
+export async function createPickWave(wave: any) {
+  return apiFetch('/pick-lists/waves', {
+    method: 'POST',
+    body: JSON.stringify(wave),
+  });
+}
+
 export async function updatePickList(id: string, pl: any) {
   return apiFetch(`/pick-lists/${id}`, {
     method: 'PUT',
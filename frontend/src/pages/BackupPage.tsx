@@ -19,6 +19,7 @@ import { PermissionGuard } from "@/components/ui/permission-guard";
 import { 
   getBackups, 
   createBackup, 
+  getBackupJob,
   restoreBackup, 
   deleteBackup,
   downloadBackup
@@ -37,12 +38,15 @@ import { Label } from "@/components/ui/label";
 const BackupPage = () => {
   const [backups, setBackups] = useState<any[]>([]);
   const [isBackingUp, setIsBackingUp] = useState(false);
+  const [backupProgress, setBackupProgress] = useState<number | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   
   // Restore state
   const [restoreDialogOpen, setRestoreDialogOpen] = useState(false);
   const [selectedBackup, setSelectedBackup] = useState('');
   const [restoreConfirmText, setRestoreConfirmText] = useState('');
+  const [restoreTables, setRestoreTables] = useState('');
+  const [restoreProgress, setRestoreProgress] = useState<number | null>(null);
   const [isRestoring, setIsRestoring] = useState(false);
 
   // Delete state
@@ -77,7 +81,7 @@ const BackupPage = () => {
     }
   }, [canViewBackups]);
 
-  const handleBackup = async () => {
+  const handleBackup = async (mode: 'full' | 'incremental' = 'full') => {
     if (!canCreateBackup) {
       toast({
         title: "Permission Denied",
@@ -88,27 +92,40 @@ const BackupPage = () => {
     }
     
     setIsBackingUp(true);
+    setBackupProgress(0);
     
     try {
-      const result = await createBackup();
+      const result = await createBackup(mode);
+      if (!result?.jobId) {
+        throw new Error(result?.detail || "Failed to start backup");
+      }
+      fetchBackups();
+
+      // The dump runs as a background job on the server; poll until it finishes
+      let job = result;
+      while (job.status === "queued" || job.status === "running") {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        job = await getBackupJob(result.jobId);
+        setBackupProgress(job.progress ?? null);
+      }
+      if (job.status !== "completed") {
+        throw new Error(job.error || "Failed to create backup");
+      }
+
       toast({
         title: "Success",
         description: "Backup completed successfully!"
       });
       fetchBackups();
-      
-      // Auto-download (Authenticated)
-      if (result.filename) {
-          handleDownload(result.filename);
-      }
-    } catch (error) {
+    } catch (error: any) {
        toast({
         title: "Error",
-        description: "Failed to create backup",
+        description: error.message || "Failed to create backup",
         variant: "destructive"
       });
     } finally {
       setIsBackingUp(false);
+      setBackupProgress(null);
     }
   };
 
@@ -134,6 +151,7 @@ const BackupPage = () => {
   const confirmRestore = (filename: string) => {
     setSelectedBackup(filename);
     setRestoreConfirmText('');
+    setRestoreTables('');
     setRestoreDialogOpen(true);
   };
 
@@ -149,8 +167,25 @@ const BackupPage = () => {
     }
 
     setIsRestoring(true);
+    setRestoreProgress(0);
     try {
-        await restoreBackup(selectedBackup);
+        const tables = restoreTables.split(',').map((t) => t.trim()).filter(Boolean);
+        const result = await restoreBackup(selectedBackup, tables);
+        if (!result?.jobId) {
+          throw new Error(result?.detail || "Failed to start restore");
+        }
+
+        // pg_restore runs as a background job on the server; poll until it finishes
+        let job = result;
+        while (job.status === "queued" || job.status === "running") {
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+          job = await getBackupJob(result.jobId);
+          setRestoreProgress(job.progress ?? null);
+        }
+        if (job.status !== "completed") {
+          throw new Error(job.error || "Restore failed");
+        }
+
         toast({ title: "Success", description: "System restored successfully!" });
         setRestoreDialogOpen(false);
     } catch (error: any) {
@@ -161,6 +196,7 @@ const BackupPage = () => {
         });
     } finally {
         setIsRestoring(false);
+        setRestoreProgress(null);
     }
   };
   
@@ -176,10 +212,10 @@ const BackupPage = () => {
     URL.revokeObjectURL(url);
   };
 
-  const handleDownload = async (filename: string) => {
+  const handleDownload = async (filename: string, downloadName?: string) => {
     try {
       const blob = await downloadBackup(filename);
-      downloadBlob(blob, filename);
+      downloadBlob(blob, downloadName || filename);
     } catch (error) {
        toast({
         title: "Download Failed",
@@ -223,20 +259,33 @@ const BackupPage = () => {
               {isBackingUp && (
                 <div className="space-y-2">
                   <div className="flex justify-between text-sm">
-                    <span>Running pg_dump...</span>
+                    <span>Running backup...</span>
+                    {backupProgress !== null && <span>{backupProgress}%</span>}
                   </div>
+                  {backupProgress !== null && <Progress value={backupProgress} />}
                 </div>
               )}
               
               {canCreateBackup ? (
-                <Button 
-                  onClick={handleBackup} 
-                  disabled={isBackingUp}
-                  className="w-full"
-                >
-                  <UploadCloud className="mr-2 h-4 w-4" />
-                  {isBackingUp ? "Creating Backup..." : "Create Backup"}
-                </Button>
+                <div className="space-y-2">
+                  <Button 
+                    onClick={() => handleBackup('full')} 
+                    disabled={isBackingUp}
+                    className="w-full"
+                  >
+                    <UploadCloud className="mr-2 h-4 w-4" />
+                    {isBackingUp ? "Creating Backup..." : "Create Backup"}
+                  </Button>
+                  <Button 
+                    variant="outline"
+                    onClick={() => handleBackup('incremental')} 
+                    disabled={isBackingUp}
+                    className="w-full"
+                  >
+                    <Clock className="mr-2 h-4 w-4" />
+                    Incremental Backup (changes since last backup)
+                  </Button>
+                </div>
               ) : (
                 <TooltipProvider>
                   <Tooltip>
@@ -308,14 +357,20 @@ const BackupPage = () => {
                       <td className="py-3 px-4">{backup.type}</td>
                       <td className="py-3 px-4">{backup.size}</td>
                       <td className="py-3 px-4">
-                        <span 
-                          className="inline-flex items-center gap-1 text-green-600"
-                        >
-                           <CheckCircle2 size={14} /> Completed
-                        </span>
+                        {backup.status === "Running" ? (
+                          <span className="inline-flex items-center gap-1 text-amber-600">
+                            <Clock size={14} /> Running
+                          </span>
+                        ) : (
+                          <span 
+                            className="inline-flex items-center gap-1 text-green-600"
+                          >
+                             <CheckCircle2 size={14} /> Completed
+                          </span>
+                        )}
                       </td>
                       <td className="py-3 px-4 text-right space-x-2">
-                        <Button variant="ghost" size="sm" onClick={() => handleDownload(backup.filename || backup.name)}>
+                        <Button variant="ghost" size="sm" onClick={() => handleDownload(backup.name, backup.downloadName)}>
                           <Download size={14} className="mr-1" /> Download
                         </Button>
                         <Button 
@@ -365,11 +420,24 @@ const BackupPage = () => {
                   placeholder="Type RESTORE"
                 />
               </div>
+              <div className="grid grid-cols-4 items-center gap-4">
+                <Label htmlFor="restore-tables" className="text-right">Tables</Label>
+                <Input
+                  id="restore-tables"
+                  value={restoreTables}
+                  onChange={(e) => setRestoreTables(e.target.value)}
+                  className="col-span-3"
+                  placeholder="Optional, e.g. products, customers"
+                />
+              </div>
+              {isRestoring && restoreProgress !== null && (
+                <Progress value={restoreProgress} />
+              )}
             </div>
             <DialogFooter>
               <Button variant="outline" onClick={() => setRestoreDialogOpen(false)}>Cancel</Button>
               <Button variant="destructive" onClick={handleRestore} disabled={restoreConfirmText !== 'RESTORE' || isRestoring}>
-                {isRestoring ? "Restoring..." : "Execute Restore"}
+                {isRestoring ? `Restoring...${restoreProgress !== null ? ` ${restoreProgress}%` : ""}` : "Execute Restore"}
               </Button>
             </DialogFooter>
           </DialogContent>
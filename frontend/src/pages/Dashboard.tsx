@@ -14,15 +14,7 @@ import {
 import { useAuth } from '@/hooks/useAuth';
 import { Spinner } from '@/components/ui/spinner';
 import { PermissionGuard } from '@/components/ui/permission-guard';
-import {
-  getProducts,
-  getPurchaseOrders,
-  getSalesOrders,
-  getSaleInvoices,
-  getCreditNotes,
-  getCustomers,
-  getSuppliers,
-} from '@/lib/api';
+import { getDashboard } from '@/lib/api';
 import { useCurrencyStore } from '@/stores/currencyStore';
 import { formatCurrency } from '@/lib/utils';
 
@@ -37,6 +29,7 @@ export default function Dashboard() {
   const [activeSalesOrders, setActiveSalesOrders] = useState(0);
   const [recentPurchaseOrders, setRecentPurchaseOrders] = useState<any[]>([]);
   const [lowStockList, setLowStockList] = useState<{ name: string; current: number; minimum: number }[]>([]);
+  const [lowStockCount, setLowStockCount] = useState(0);
   const [activeCustomers, setActiveCustomers] = useState(0);
   const [activeSuppliers, setActiveSuppliers] = useState(0);
   const [salesThisMonth, setSalesThisMonth] = useState(0);
@@ -46,89 +39,31 @@ export default function Dashboard() {
     const load = async () => {
       try {
         setIsLoadingData(true);
-        const [productsRes, soRes, poRes, siRes, cnRes, customersRes, suppliersRes] = await Promise.all([
-          getProducts().catch(() => []),
-          getSalesOrders().catch(() => []),
-          getPurchaseOrders().catch(() => []),
-          getSaleInvoices().catch(() => []),
-          getCreditNotes().catch(() => []),
-          getCustomers().catch(() => []),
-          getSuppliers().catch(() => []),
-        ]);
-
-        const products = Array.isArray(productsRes) ? productsRes : [];
-        setTotalProducts(products.length);
+        // One aggregated, server-cached payload instead of a list call per widget
+        const data = await getDashboard();
 
-        // Inventory valuation: sum(quantity_on_hand or quantity_available) * cost_price
-        const inventoryValue = products.reduce((sum: number, p: any) => {
-          const stockLevels = Array.isArray(p.stock_levels) ? p.stock_levels : [];
-          const quantity = stockLevels.reduce((q: number, lvl: any) => {
-            const qa = Number(lvl.quantity_available ?? 0);
-            const qh = Number(lvl.quantity_on_hand ?? 0);
-            return q + (Number.isFinite(qa) && qa > 0 ? qa : qh);
-          }, 0);
-          const cost = Number(p.cost_price ?? 0) || 0;
-          return sum + quantity * cost;
-        }, 0);
-        setTotalInventoryValue(inventoryValue);
+        setTotalProducts(data?.inventory?.totalProducts ?? 0);
+        setTotalInventoryValue(data?.inventory?.inventoryValue ?? 0);
+        setLowStockList(Array.isArray(data?.inventory?.lowStock) ? data.inventory.lowStock : []);
+        setLowStockCount(data?.inventory?.lowStockCount ?? 0);
 
-        const activeStatuses = new Set(['draft', 'pending', 'approved', 'sent', 'partial']);
-        const salesOrders = Array.isArray(soRes) ? soRes : [];
-        setActiveSalesOrders(salesOrders.filter((so: any) => activeStatuses.has(String(so.status || ''))).length);
+        setActiveSalesOrders(data?.activeSalesOrders ?? 0);
 
-        const purchaseOrders = Array.isArray(poRes) ? poRes : [];
-        const recentPOs = [...purchaseOrders]
-          .sort((a: any, b: any) => new Date(b.orderDate || 0).getTime() - new Date(a.orderDate || 0).getTime())
-          .slice(0, 3)
-          .map((po: any) => ({
+        const purchaseOrders = Array.isArray(data?.recentPurchaseOrders) ? data.recentPurchaseOrders : [];
+        setRecentPurchaseOrders(
+          purchaseOrders.map((po: any) => ({
             id: po.orderNumber,
-            supplier: po.supplier?.name || '—',
+            supplier: po.supplierName || '—',
             amount: formatCurrency(Number(po.totalAmount || 0), currency),
             status: po.status || '—',
-          }));
-        setRecentPurchaseOrders(recentPOs);
-
-        // Low stock detection from product minimums/reorder points
-        const lowStock = products
-          .map((p: any) => {
-            const stockLevels = Array.isArray(p.stock_levels) ? p.stock_levels : [];
-            const qty = stockLevels.reduce((q: number, lvl: any) => {
-              const qa = Number(lvl.quantity_available ?? 0);
-              const qh = Number(lvl.quantity_on_hand ?? 0);
-              return q + (Number.isFinite(qa) && qa > 0 ? qa : qh);
-            }, 0);
-            const threshold = Number(p.reorder_point ?? p.minimum_stock ?? 0) || 0;
-            return { name: p.name || 'Unnamed', current: qty, minimum: threshold };
-          })
-          .filter((i: any) => i.minimum > 0 && i.current <= i.minimum)
-          .sort((a: any, b: any) => a.current - b.current)
-          .slice(0, 6);
-        setLowStockList(lowStock);
-
-        setActiveCustomers(Array.isArray(customersRes) ? customersRes.filter((c: any) => c.isActive !== false).length : 0);
-        setActiveSuppliers(Array.isArray(suppliersRes) ? suppliersRes.filter((s: any) => s.isActive !== false).length : 0);
+          }))
+        );
 
-        // This month sales and returns
-        const now = new Date();
-        const monthStart = new Date(now.getFullYear(), now.getMonth(), 1);
-        const monthEnd = new Date(now.getFullYear(), now.getMonth() + 1, 0, 23, 59, 59, 999);
-        const salesInvoices = Array.isArray(siRes) ? siRes : [];
-        const monthlySales = salesInvoices
-          .filter((si: any) => {
-            const d = new Date(si.invoiceDate || si.createdAt || 0);
-            return d >= monthStart && d <= monthEnd && ['sent', 'partial', 'paid'].includes(String(si.status || ''));
-          })
-          .reduce((sum: number, si: any) => sum + Number(si.totalAmount || 0), 0);
-        setSalesThisMonth(monthlySales);
+        setActiveCustomers(data?.activeCustomers ?? 0);
+        setActiveSuppliers(data?.activeSuppliers ?? 0);
 
-        const creditNotes = Array.isArray(cnRes) ? cnRes : [];
-        const monthlyReturns = creditNotes
-          .filter((cn: any) => {
-            const d = new Date(cn.creditDate || cn.createdAt || 0);
-            return d >= monthStart && d <= monthEnd && String(cn.status || '') !== 'cancelled';
-          })
-          .reduce((sum: number, cn: any) => sum + Number(cn.totalAmount || 0), 0);
-        setReturnsThisMonth(monthlyReturns);
+        setSalesThisMonth(data?.sales?.salesThisMonth ?? 0);
+        setReturnsThisMonth(data?.sales?.returnsThisMonth ?? 0);
       } catch (e) {
         // Fail silently; UI will show zeros/empty
       } finally {
@@ -212,7 +147,7 @@ export default function Dashboard() {
             <AlertTriangle className="h-4 w-4 text-muted-foreground" />
           </CardHeader>
           <CardContent>
-            <div className="text-2xl font-bold">{isLoadingData ? '—' : lowStockList.length}</div>
+            <div className="text-2xl font-bold">{isLoadingData ? '—' : lowStockCount}</div>
             <p className="text-xs text-muted-foreground">Requires attention</p>
           </CardContent>
         </Card>
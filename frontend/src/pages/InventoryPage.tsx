@@ -3,7 +3,7 @@ import { useState } from "react";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Button } from "@/components/ui/button";
-import { Plus } from "lucide-react";
+import { ArrowLeftRight, Plus } from "lucide-react";
 import { StockLevelTable } from "@/components/inventory/StockLevelTable";
 import { StockLevelDialog } from "@/components/inventory/StockLevelDialog";
 import { InventoryMovementsTable } from "@/components/inventory/InventoryMovementsTable";
@@ -12,6 +12,8 @@ import { LocationsTable } from "@/components/inventory/LocationsTable";
 import { LocationDialog } from "@/components/inventory/LocationDialog";
 import { InventoryTransactionsTable } from "@/components/inventory/InventoryTransactionsTable";
 import { ProductSerialsTable } from "@/components/inventory/ProductSerialsTable";
+import { CycleCountsTab } from "@/components/inventory/CycleCountsTab";
+import { StockTransferDialog } from "@/components/inventory/StockTransferDialog";
 import { useAuth } from "@/hooks/useAuth";
 import { PermissionGuard } from "@/components/ui/permission-guard";
 
@@ -19,6 +21,7 @@ const InventoryPage = () => {
   const [activeTab, setActiveTab] = useState("stock-levels");
   const [stockLevelDialogOpen, setStockLevelDialogOpen] = useState(false);
   const [movementDialogOpen, setMovementDialogOpen] = useState(false);
+  const [transferDialogOpen, setTransferDialogOpen] = useState(false);
   const [locationDialogOpen, setLocationDialogOpen] = useState(false);
   const [editingStockLevel, setEditingStockLevel] = useState<any>(null);
   const [editingLocation, setEditingLocation] = useState<any>(null);
@@ -53,12 +56,13 @@ const InventoryPage = () => {
         </div>
 
         <Tabs value={activeTab} onValueChange={setActiveTab} className="space-y-4">
-          <TabsList className="grid w-full grid-cols-5">
+          <TabsList className="grid w-full grid-cols-6">
             <TabsTrigger value="stock-levels">Stock Levels</TabsTrigger>
             <TabsTrigger value="product-serials">Product Serials</TabsTrigger>
             <TabsTrigger value="movements">Movements</TabsTrigger>
             <TabsTrigger value="locations">Locations</TabsTrigger>
             <TabsTrigger value="transactions">Transactions</TabsTrigger>
+            <TabsTrigger value="cycle-counts">Cycle Counts</TabsTrigger>
           </TabsList>
 
           <TabsContent value="stock-levels" className="space-y-4">
@@ -130,12 +134,21 @@ const InventoryPage = () => {
                     </CardDescription>
                   </div>
                   {canCreateMovement && (
-                    <Button 
-                      onClick={() => setMovementDialogOpen(true)}
-                      className="flex items-center gap-1"
-                    >
-                      <Plus className="h-4 w-4" /> Record Movement
-                    </Button>
+                    <div className="flex gap-2">
+                      <Button
+                        variant="outline"
+                        onClick={() => setTransferDialogOpen(true)}
+                        className="flex items-center gap-1"
+                      >
+                        <ArrowLeftRight className="h-4 w-4" /> Transfer Stock
+                      </Button>
+                      <Button 
+                        onClick={() => setMovementDialogOpen(true)}
+                        className="flex items-center gap-1"
+                      >
+                        <Plus className="h-4 w-4" /> Record Movement
+                      </Button>
+                    </div>
                   )}
                 </div>
               </CardHeader>
@@ -154,6 +167,16 @@ const InventoryPage = () => {
                 }}
               />
             )}
+            {canCreateMovement && (
+              <StockTransferDialog
+                open={transferDialogOpen}
+                onOpenChange={setTransferDialogOpen}
+                onSuccess={() => {
+                  // Refresh the table
+                  window.location.reload();
+                }}
+              />
+            )}
           </TabsContent>
 
           <TabsContent value="locations" className="space-y-4">
@@ -210,6 +233,22 @@ const InventoryPage = () => {
               </CardContent>
             </Card>
           </TabsContent>
+
+          <TabsContent value="cycle-counts" className="space-y-4">
+            <Card>
+              <CardHeader>
+                <div>
+                  <CardTitle>Cycle Counts</CardTitle>
+                  <CardDescription>
+                    Count selected locations, upload scans in bulk and post the variances as stock adjustments
+                  </CardDescription>
+                </div>
+              </CardHeader>
+              <CardContent>
+                <CycleCountsTab canManage={canCreateStockLevel} />
+              </CardContent>
+            </Card>
+          </TabsContent>
         </Tabs>
       </div>
     </PermissionGuard>
@@ -6,9 +6,10 @@ import { PermissionGuard } from "@/components/ui/permission-guard";
 import { PickListTable } from "@/components/pick-list/PickListTable";
 import { PickListDialog } from "@/components/pick-list/PickListDialog";
 import { PickListView } from "@/components/pick-list/PickListView";
+import { PickWaveDialog } from "@/components/pick-list/PickWaveDialog";
 import { type PickList } from "@/types/pick-list";
 import {
-    getPickLists, createPickList, updatePickList, deletePickList,
+    getPickLists, createPickList, createPickWave, updatePickList, deletePickList,
     getDeliveryChallans, getUsers,
 } from "@/lib/api";
 import {
@@ -16,12 +17,13 @@ import {
     AlertDialogContent, AlertDialogDescription, AlertDialogFooter,
     AlertDialogHeader, AlertDialogTitle,
 } from "@/components/ui/alert-dialog";
-import { Plus } from "lucide-react";
+import { Layers, Plus } from "lucide-react";
 
 export default function PickListsPage() {
     const [pickLists, setPickLists] = useState<PickList[]>([]);
     const [loading, setLoading] = useState(true);
     const [dialogOpen, setDialogOpen] = useState(false);
+    const [waveDialogOpen, setWaveDialogOpen] = useState(false);
     const [editingPL, setEditingPL] = useState<PickList | null>(null);
     const [viewingPL, setViewingPL] = useState<PickList | null>(null);
     const [deleteId, setDeleteId] = useState<string | null>(null);
@@ -82,6 +84,13 @@ export default function PickListsPage() {
         fetchPLs();
     };
 
+    const handleCreateWave = async (data: any) => {
+        const wave = await createPickWave(data);
+        toast({ title: "Success", description: `Wave ${wave?.pickListNumber || ""} created for ${data.deliveryChallanIds.length} delivery challans` });
+        setWaveDialogOpen(false);
+        fetchPLs();
+    };
+
     const handleDelete = async () => {
         if (!deleteId) return;
         try {
@@ -112,9 +121,14 @@ export default function PickListsPage() {
                         <p className="text-muted-foreground">Pick items from storage for outbound delivery</p>
                     </div>
                     {canCreate && (
-                        <Button onClick={handleCreate}>
-                            <Plus className="h-4 w-4 mr-2" /> New Pick List
-                        </Button>
+                        <div className="flex gap-2">
+                            <Button variant="outline" onClick={() => setWaveDialogOpen(true)}>
+                                <Layers className="h-4 w-4 mr-2" /> New Wave
+                            </Button>
+                            <Button onClick={handleCreate}>
+                                <Plus className="h-4 w-4 mr-2" /> New Pick List
+                            </Button>
+                        </div>
                     )}
                 </div>
 
@@ -137,6 +151,14 @@ export default function PickListsPage() {
                     users={users}
                 />
 
+                <PickWaveDialog
+                    open={waveDialogOpen}
+                    onOpenChange={setWaveDialogOpen}
+                    onSave={handleCreateWave}
+                    deliveryChallans={deliveryChallans}
+                    users={users}
+                />
+
                 <AlertDialog open={!!deleteId} onOpenChange={(open) => !open && setDeleteId(null)}>
                     <AlertDialogContent>
                         <AlertDialogHeader>
@@ -19,6 +19,7 @@ export interface InventoryTransaction {
   productId: string;
   productName: string;
   skuCode: string;
+  locationId?: string | null;
   transactionType: "purchase" | "sale" | "adjustment" | "transfer";
   quantityChange: number;
   referenceType?: string;
@@ -28,16 +29,111 @@ export interface InventoryTransaction {
   createdAt: Date;
 }
 
+export interface InventoryLedgerPage<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+export interface InventoryTransactionArchive {
+  id: string;
+  periodStart: string;
+  periodEnd: string;
+  rows: number;
+  quantityTotal: number;
+  openingBalanceRows: number;
+  archiveBytes?: number | null;
+  archivedBy?: string | null;
+  archivedAt: string;
+}
+
 export interface InventoryLocation {
   id: string;
   name: string;
   description?: string;
   address?: string;
+  zone?: string;
+  aisle?: number;
+  bay?: number;
+  level?: number;
+  capacity?: number;
   isActive: boolean;
   createdAt: Date;
   updatedAt: Date;
 }
 
+export interface StockLevelAsOf {
+  productId: string;
+  productName?: string;
+  skuCode?: string;
+  locationId: string | null;
+  locationName?: string | null;
+  quantity: number;
+  isSerialized: boolean;
+}
+
+export interface StockLevelsAsOfResponse {
+  asOf: string;
+  snapshotId: string;
+  snapshotTakenAt: string;
+  replayedTransactions: number;
+  stockLevels: StockLevelAsOf[];
+}
+
+export interface StockTransferItem {
+  id: string;
+  productId: string;
+  productName?: string;
+  skuCode?: string;
+  quantity: number;
+  serialNumbers: string[];
+}
+
+export interface StockTransfer {
+  id: string;
+  transferNumber: string;
+  fromLocationId: string;
+  fromLocationName?: string;
+  toLocationId: string;
+  toLocationName?: string;
+  status: 'completed';
+  notes?: string;
+  totalQuantity: number;
+  items: StockTransferItem[];
+  createdBy?: string;
+  createdAt: string;
+  updatedAt: string;
+}
+
+export interface CycleCountLine {
+  id: string;
+  productId: string;
+  productName?: string;
+  skuCode?: string;
+  isSerialized: boolean;
+  locationId: string;
+  locationName?: string;
+  expectedQuantity: number;
+  countedQuantity: number | null;
+  variance: number | null;
+  missingSerials: string[];
+  unexpectedSerials: string[];
+}
+
+export interface CycleCount {
+  id: string;
+  countNumber: string;
+  status: 'open' | 'posted' | 'cancelled';
+  locationIds: string[];
+  notes?: string;
+  summary?: Record<string, any> | null;
+  lines: CycleCountLine[];
+  createdBy?: string;
+  postedBy?: string;
+  postedAt?: string;
+  createdAt: string;
+  updatedAt: string;
+}
+
 export interface StockLevel {
   id: string;
   productId: string;
@@ -8,11 +8,24 @@ export interface PickListItem {
     pickedQuantity: number;
     locationId?: string;
     locationName?: string;
+    pickSequence?: number;
+    stockBatchId?: string;
+    batchNumber?: string;
+    expiryDate?: string;
     notes?: string;
     createdAt: string;
     updatedAt: string;
 }
 
+export interface PickListAllocation {
+    id: string;
+    pickListItemId: string;
+    deliveryChallanId: string;
+    deliveryChallanItemId: string;
+    quantity: number;
+    pickedQuantity: number;
+}
+
 export interface PickList {
     id: string;
     pickListNumber: string;
@@ -24,7 +37,10 @@ export interface PickList {
     pickDate: string;
     completedDate?: string;
     notes?: string;
+    pickType: "single" | "wave";
     items: PickListItem[];
+    allocations?: PickListAllocation[];
+    deliveryChallans?: { id: string; dcNumber: string; status: string }[];
     createdBy?: string;
     createdAt: string;
     updatedAt: string;
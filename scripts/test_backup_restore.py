@@ -37,9 +37,23 @@ def test_backup_flow():
 
     print("🔍 Testing POST /backups/create...")
     resp = requests.post(f"{API_URL}/backups/create", headers=headers)
-    if resp.status_code == 200:
+    if resp.status_code == 202:
         data = resp.json()
         filename = data.get("filename")
+        job_id = data.get("jobId")
+        print(f"✅ Success: Started backup job {job_id}")
+
+        # Wait for the background dump to finish
+        print(f"🔍 Polling GET /backups/jobs/{job_id}...")
+        while True:
+            job = requests.get(f"{API_URL}/backups/jobs/{job_id}", headers=headers).json()
+            if job.get("status") not in ("queued", "running"):
+                break
+            print(f"   ... {job.get('status')} {job.get('progress')}%")
+            time.sleep(2)
+        if job.get("status") != "completed":
+            print(f"❌ Failed backup job: {job.get('error')}")
+            return
         print(f"✅ Success: Created backup {filename}")
         
         # Test download
@@ -0,0 +1,153 @@
+-- Customer Product Affinity Migration
+-- Precomputed per-customer "frequently bought" model used by
+-- GET /customers/{id}/frequent-items. Rows are upserted incrementally by the
+-- backend whenever a sales order (or a direct invoice) is posted, so the
+-- endpoint reads one indexed range instead of scanning sales_order_items.
+--
+-- Recency weighting: each order contributes 2^((order_date - epoch) / 90) to
+-- `score`, i.e. an exponentially decayed count with a 90-day half-life
+-- expressed relative to a fixed epoch. Because every row shares the same
+-- epoch, ordering by `score` ranks products exactly like a decayed count
+-- evaluated "today", without ever rescaling existing rows.
+
+-- ==================== MAIN TABLE ====================
+CREATE TABLE IF NOT EXISTS public.customer_product_affinity (
+  customer_id             UUID NOT NULL REFERENCES public.customers(id) ON DELETE CASCADE,
+  product_id              UUID NOT NULL REFERENCES public.products(id) ON DELETE CASCADE,
+  order_count             INTEGER NOT NULL DEFAULT 0,
+  total_quantity          NUMERIC(15, 4) NOT NULL DEFAULT 0,
+  score                   DOUBLE PRECISION NOT NULL DEFAULT 0,
+  last_ordered_at         DATE,
+  last_unit_price         NUMERIC(15, 4) NOT NULL DEFAULT 0,
+  last_tax                NUMERIC(15, 2) NOT NULL DEFAULT 0,
+  last_sale_tax_type      TEXT NOT NULL DEFAULT 'exclusive',
+  last_unit_abbreviation  TEXT NOT NULL DEFAULT '',
+  updated_at              TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (customer_id, product_id)
+);
+
+-- ==================== INDEXES ====================
+-- Serves "top N products for a customer" as a single index range scan
+CREATE INDEX IF NOT EXISTS idx_customer_product_affinity_rank
+  ON public.customer_product_affinity(customer_id, score DESC);
+
+-- ==================== WEIGHT FUNCTION ====================
+CREATE OR REPLACE FUNCTION public.customer_affinity_weight(p_order_date DATE)
+RETURNS DOUBLE PRECISION LANGUAGE sql IMMUTABLE AS $$
+  SELECT power(2::double precision, (COALESCE(p_order_date, CURRENT_DATE) - DATE '2024-01-01')::double precision / 90.0);
+$$;
+
+-- ==================== INCREMENTAL UPSERT ====================
+-- p_items: JSON array with one element per product, e.g.
+--   [{"product_id": "...", "quantity": 3, "unit_price": 10, "tax": 1.8,
+--     "sale_tax_type": "exclusive", "unit_abbreviation": "pcs"}]
+CREATE OR REPLACE FUNCTION public.record_customer_product_affinity(
+  p_customer_id UUID,
+  p_order_date  DATE,
+  p_items       JSONB
+)
+RETURNS VOID LANGUAGE plpgsql AS $$
+BEGIN
+  IF p_customer_id IS NULL OR p_items IS NULL OR jsonb_array_length(p_items) = 0 THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.customer_product_affinity AS a (
+    customer_id, product_id, order_count, total_quantity, score, last_ordered_at,
+    last_unit_price, last_tax, last_sale_tax_type, last_unit_abbreviation, updated_at
+  )
+  SELECT
+    p_customer_id,
+    (i->>'product_id')::uuid,
+    1,
+    COALESCE((i->>'quantity')::numeric, 0),
+    public.customer_affinity_weight(p_order_date),
+    COALESCE(p_order_date, CURRENT_DATE),
+    COALESCE((i->>'unit_price')::numeric, 0),
+    COALESCE((i->>'tax')::numeric, 0),
+    COALESCE(i->>'sale_tax_type', 'exclusive'),
+    COALESCE(i->>'unit_abbreviation', ''),
+    now()
+  FROM jsonb_array_elements(p_items) AS i
+  WHERE i->>'product_id' IS NOT NULL
+  ON CONFLICT (customer_id, product_id) DO UPDATE SET
+    order_count     = a.order_count + EXCLUDED.order_count,
+    total_quantity  = a.total_quantity + EXCLUDED.total_quantity,
+    score           = a.score + EXCLUDED.score,
+    last_ordered_at = GREATEST(a.last_ordered_at, EXCLUDED.last_ordered_at),
+    -- Only the most recent order refreshes the template line values
+    last_unit_price        = CASE WHEN EXCLUDED.last_ordered_at >= COALESCE(a.last_ordered_at, EXCLUDED.last_ordered_at) THEN EXCLUDED.last_unit_price ELSE a.last_unit_price END,
+    last_tax               = CASE WHEN EXCLUDED.last_ordered_at >= COALESCE(a.last_ordered_at, EXCLUDED.last_ordered_at) THEN EXCLUDED.last_tax ELSE a.last_tax END,
+    last_sale_tax_type     = CASE WHEN EXCLUDED.last_ordered_at >= COALESCE(a.last_ordered_at, EXCLUDED.last_ordered_at) THEN EXCLUDED.last_sale_tax_type ELSE a.last_sale_tax_type END,
+    last_unit_abbreviation = CASE WHEN EXCLUDED.last_ordered_at >= COALESCE(a.last_ordered_at, EXCLUDED.last_ordered_at) THEN EXCLUDED.last_unit_abbreviation ELSE a.last_unit_abbreviation END,
+    updated_at      = now();
+END;
+$$;
+
+-- ==================== BACKFILL FROM FULL ORDER HISTORY ====================
+-- Same sources as the incremental upsert: every sales order, plus invoices
+-- raised without a sales order (direct and delivery challan invoices), which
+-- would otherwise be missing from existing customers' history.
+WITH order_lines AS (
+  SELECT so.id AS document_id, so.customer_id, so.order_date, soi.product_id, soi.quantity,
+         soi.unit_price, soi.tax, soi.sale_tax_type, soi.unit_abbreviation, soi.created_at
+  FROM public.sales_order_items soi
+  JOIN public.sales_orders so ON so.id = soi.sales_order_id
+  UNION ALL
+  SELECT si.id, si.customer_id, si.invoice_date, sii.product_id, sii.quantity,
+         sii.unit_price, sii.tax, sii.sale_tax_type, sii.unit_abbreviation, sii.created_at
+  FROM public.sale_invoice_items sii
+  JOIN public.sale_invoices si ON si.id = sii.invoice_id
+  WHERE si.sales_order_id IS NULL
+)
+INSERT INTO public.customer_product_affinity (
+  customer_id, product_id, order_count, total_quantity, score, last_ordered_at,
+  last_unit_price, last_tax, last_sale_tax_type, last_unit_abbreviation
+)
+SELECT
+  agg.customer_id,
+  agg.product_id,
+  agg.order_count,
+  agg.total_quantity,
+  agg.score,
+  agg.last_ordered_at,
+  COALESCE(latest.unit_price, 0),
+  COALESCE(latest.tax, 0),
+  COALESCE(latest.sale_tax_type, 'exclusive'),
+  COALESCE(latest.unit_abbreviation, '')
+FROM (
+  SELECT
+    per_order.customer_id,
+    per_order.product_id,
+    COUNT(*)                                               AS order_count,
+    SUM(per_order.quantity)                                AS total_quantity,
+    SUM(public.customer_affinity_weight(per_order.order_date)) AS score,
+    MAX(per_order.order_date)                              AS last_ordered_at
+  FROM (
+    SELECT l.document_id, l.customer_id, l.product_id, l.order_date, SUM(l.quantity) AS quantity
+    FROM order_lines l
+    WHERE l.customer_id IS NOT NULL AND l.product_id IS NOT NULL
+    GROUP BY l.document_id, l.customer_id, l.product_id, l.order_date
+  ) AS per_order
+  GROUP BY per_order.customer_id, per_order.product_id
+) AS agg
+LEFT JOIN LATERAL (
+  SELECT l.unit_price, l.tax, l.sale_tax_type, l.unit_abbreviation
+  FROM order_lines l
+  WHERE l.customer_id = agg.customer_id AND l.product_id = agg.product_id
+  ORDER BY l.order_date DESC, l.created_at DESC
+  LIMIT 1
+) AS latest ON true
+ON CONFLICT (customer_id, product_id) DO NOTHING;
+
+-- ==================== RLS ====================
+ALTER TABLE public.customer_product_affinity ENABLE ROW LEVEL SECURITY;
+
+-- Allow authenticated users full access (app-layer permissions handle role checks)
+CREATE POLICY "Authenticated users can manage customer_product_affinity"
+  ON public.customer_product_affinity FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
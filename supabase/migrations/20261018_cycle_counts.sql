@@ -0,0 +1,70 @@
+-- Cycle Counts Migration
+-- A cycle count freezes the expected stock of a set of locations
+-- (cycle_count_lines), collects bulk scan uploads into counted quantities and
+-- posts the variances as one batch of stock adjustments.
+
+-- ==================== CYCLE COUNTS ====================
+CREATE TABLE IF NOT EXISTS public.cycle_counts (
+  id            UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  count_number  TEXT NOT NULL UNIQUE,
+  status        TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'posted', 'cancelled')),
+  location_ids  UUID[] NOT NULL,
+  notes         TEXT,
+  summary       JSONB,
+  created_by    UUID REFERENCES public.profiles(id),
+  posted_by     UUID REFERENCES public.profiles(id),
+  posted_at     TIMESTAMPTZ,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- ==================== CYCLE COUNT LINES ====================
+-- expected_* is the snapshot taken when the count started; counted_* is filled by scan uploads
+CREATE TABLE IF NOT EXISTS public.cycle_count_lines (
+  id                 UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  cycle_count_id     UUID NOT NULL REFERENCES public.cycle_counts(id) ON DELETE CASCADE,
+  product_id         UUID NOT NULL REFERENCES public.products(id),
+  location_id        UUID NOT NULL REFERENCES public.locations(id),
+  expected_quantity  INTEGER NOT NULL DEFAULT 0,
+  counted_quantity   INTEGER,
+  expected_serials   TEXT[],
+  counted_serials    TEXT[],
+  created_at         TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at         TIMESTAMPTZ NOT NULL DEFAULT now(),
+  UNIQUE (cycle_count_id, product_id, location_id)
+);
+
+-- ==================== INDEXES ====================
+CREATE INDEX IF NOT EXISTS idx_cycle_counts_status          ON public.cycle_counts(status);
+CREATE INDEX IF NOT EXISTS idx_cycle_counts_open_locations  ON public.cycle_counts USING GIN (location_ids) WHERE status = 'open';
+CREATE INDEX IF NOT EXISTS idx_product_serials_serial_number ON public.product_serials(serial_number);
+CREATE INDEX IF NOT EXISTS idx_products_barcode             ON public.products(barcode);
+
+-- ==================== TIMESTAMPS ====================
+DROP TRIGGER IF EXISTS set_cycle_counts_updated_at ON public.cycle_counts;
+CREATE TRIGGER set_cycle_counts_updated_at
+  BEFORE UPDATE ON public.cycle_counts
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+DROP TRIGGER IF EXISTS set_cycle_count_lines_updated_at ON public.cycle_count_lines;
+CREATE TRIGGER set_cycle_count_lines_updated_at
+  BEFORE UPDATE ON public.cycle_count_lines
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ==================== RLS ====================
+ALTER TABLE public.cycle_counts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.cycle_count_lines ENABLE ROW LEVEL SECURITY;
+
+-- Allow authenticated users full access (app-layer permissions handle role checks)
+CREATE POLICY "Authenticated users can manage cycle_counts"
+  ON public.cycle_counts FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+CREATE POLICY "Authenticated users can manage cycle_count_lines"
+  ON public.cycle_count_lines FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
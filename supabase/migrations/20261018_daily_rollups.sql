@@ -0,0 +1,501 @@
+-- Daily Rollups Migration
+-- Pre-aggregated daily sales / returns / purchase totals per product, customer
+-- and supplier (plus a company-wide 'total' row per day) for GET /reports/summary.
+--
+-- Rows are maintained incrementally by triggers:
+--   * document headers (sale_invoices, credit_notes, good_receive_notes) move
+--     their lines in or out of the rollup when they enter or leave a posted
+--     status, or when their date / party changes while posted;
+--   * line tables apply per-line deltas while their parent is posted.
+-- Posted statuses: invoices sent/partial/paid/overdue, credit notes
+-- approved/processed, GRNs partial/completed.
+
+-- ==================== ROLLUP TABLE ====================
+CREATE TABLE IF NOT EXISTS public.daily_rollups (
+  dimension           TEXT NOT NULL CHECK (dimension IN ('total', 'product', 'customer', 'supplier')),
+  bucket_date         DATE NOT NULL,
+  dimension_id        UUID NOT NULL,
+  sales_amount        NUMERIC(15, 2) NOT NULL DEFAULT 0,
+  sales_tax           NUMERIC(15, 2) NOT NULL DEFAULT 0,
+  sales_quantity      NUMERIC(15, 4) NOT NULL DEFAULT 0,
+  sales_documents     INTEGER NOT NULL DEFAULT 0,
+  return_amount       NUMERIC(15, 2) NOT NULL DEFAULT 0,
+  return_tax          NUMERIC(15, 2) NOT NULL DEFAULT 0,
+  return_quantity     NUMERIC(15, 4) NOT NULL DEFAULT 0,
+  return_documents    INTEGER NOT NULL DEFAULT 0,
+  purchase_amount     NUMERIC(15, 2) NOT NULL DEFAULT 0,
+  purchase_tax        NUMERIC(15, 2) NOT NULL DEFAULT 0,
+  purchase_quantity   NUMERIC(15, 4) NOT NULL DEFAULT 0,
+  purchase_documents  INTEGER NOT NULL DEFAULT 0,
+  updated_at          TIMESTAMPTZ NOT NULL DEFAULT now(),
+  -- Leading (dimension, bucket_date) makes every date-range query an index range scan
+  PRIMARY KEY (dimension, bucket_date, dimension_id)
+);
+
+-- ==================== APPLY A DELTA ====================
+-- p_kind: 'sales' | 'returns' | 'purchases'. Amounts are net of line discounts
+-- and of tax, which is reported separately (see rollup_net_amount). A NULL product / party skips that dimension;
+-- the 'total' dimension is keyed by the nil UUID.
+CREATE OR REPLACE FUNCTION public.apply_daily_rollup(
+  p_kind            TEXT,
+  p_date            DATE,
+  p_product_id      UUID,
+  p_party_dimension TEXT,
+  p_party_id        UUID,
+  p_amount          NUMERIC,
+  p_tax             NUMERIC,
+  p_quantity        NUMERIC,
+  p_documents       INTEGER
+)
+RETURNS VOID LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+  IF p_date IS NULL THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.daily_rollups AS r (
+    dimension, bucket_date, dimension_id,
+    sales_amount, sales_tax, sales_quantity, sales_documents,
+    return_amount, return_tax, return_quantity, return_documents,
+    purchase_amount, purchase_tax, purchase_quantity, purchase_documents
+  )
+  SELECT
+    d.dimension, p_date, d.dimension_id,
+    CASE WHEN p_kind = 'sales' THEN p_amount ELSE 0 END,
+    CASE WHEN p_kind = 'sales' THEN p_tax ELSE 0 END,
+    CASE WHEN p_kind = 'sales' THEN p_quantity ELSE 0 END,
+    CASE WHEN p_kind = 'sales' THEN p_documents ELSE 0 END,
+    CASE WHEN p_kind = 'returns' THEN p_amount ELSE 0 END,
+    CASE WHEN p_kind = 'returns' THEN p_tax ELSE 0 END,
+    CASE WHEN p_kind = 'returns' THEN p_quantity ELSE 0 END,
+    CASE WHEN p_kind = 'returns' THEN p_documents ELSE 0 END,
+    CASE WHEN p_kind = 'purchases' THEN p_amount ELSE 0 END,
+    CASE WHEN p_kind = 'purchases' THEN p_tax ELSE 0 END,
+    CASE WHEN p_kind = 'purchases' THEN p_quantity ELSE 0 END,
+    CASE WHEN p_kind = 'purchases' THEN p_documents ELSE 0 END
+  FROM (VALUES
+    ('total', '00000000-0000-0000-0000-000000000000'::uuid),
+    ('product', p_product_id),
+    (p_party_dimension, p_party_id)
+  ) AS d(dimension, dimension_id)
+  -- Header-level calls pass a NULL product, so document counts land on total and party rows only
+  WHERE d.dimension_id IS NOT NULL
+  ON CONFLICT (dimension, bucket_date, dimension_id) DO UPDATE SET
+    sales_amount       = r.sales_amount + EXCLUDED.sales_amount,
+    sales_tax          = r.sales_tax + EXCLUDED.sales_tax,
+    sales_quantity     = r.sales_quantity + EXCLUDED.sales_quantity,
+    sales_documents    = r.sales_documents + EXCLUDED.sales_documents,
+    return_amount      = r.return_amount + EXCLUDED.return_amount,
+    return_tax         = r.return_tax + EXCLUDED.return_tax,
+    return_quantity    = r.return_quantity + EXCLUDED.return_quantity,
+    return_documents   = r.return_documents + EXCLUDED.return_documents,
+    purchase_amount    = r.purchase_amount + EXCLUDED.purchase_amount,
+    purchase_tax       = r.purchase_tax + EXCLUDED.purchase_tax,
+    purchase_quantity  = r.purchase_quantity + EXCLUDED.purchase_quantity,
+    purchase_documents = r.purchase_documents + EXCLUDED.purchase_documents,
+    updated_at         = now();
+END;
+$$;
+
+-- ==================== LINE AMOUNTS ====================
+-- Line value before tax, as the document totals compute it: an inclusive
+-- line's price already contains its tax, an exclusive line's does not.
+CREATE OR REPLACE FUNCTION public.rollup_net_amount(p_gross NUMERIC, p_tax NUMERIC, p_tax_type TEXT)
+RETURNS NUMERIC LANGUAGE sql IMMUTABLE AS $$
+  SELECT p_gross - CASE WHEN p_tax_type = 'inclusive' THEN COALESCE(p_tax, 0) ELSE 0 END;
+$$;
+
+-- ==================== POSTED STATUS HELPERS ====================
+CREATE OR REPLACE FUNCTION public.rollup_invoice_posted(p_status TEXT)
+RETURNS BOOLEAN LANGUAGE sql IMMUTABLE AS $$
+  SELECT p_status IN ('sent', 'partial', 'paid', 'overdue');
+$$;
+
+CREATE OR REPLACE FUNCTION public.rollup_credit_note_posted(p_status TEXT)
+RETURNS BOOLEAN LANGUAGE sql IMMUTABLE AS $$
+  SELECT p_status IN ('approved', 'processed');
+$$;
+
+CREATE OR REPLACE FUNCTION public.rollup_grn_posted(p_status TEXT)
+RETURNS BOOLEAN LANGUAGE sql IMMUTABLE AS $$
+  SELECT p_status IN ('partial', 'completed');
+$$;
+
+-- ==================== SALE INVOICES ====================
+-- Moves every line of one invoice (and its document count) in or out of the rollup
+CREATE OR REPLACE FUNCTION public.rollup_sale_invoice(p_invoice_id UUID, p_date DATE, p_customer_id UUID, p_sign INTEGER)
+RETURNS VOID LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+  v_item RECORD;
+BEGIN
+  PERFORM public.apply_daily_rollup('sales', p_date, NULL, 'customer', p_customer_id, 0, 0, 0, p_sign);
+  FOR v_item IN
+    SELECT product_id, quantity, unit_price, COALESCE(discount, 0) AS discount, COALESCE(tax, 0) AS tax, sale_tax_type
+    FROM public.sale_invoice_items WHERE invoice_id = p_invoice_id
+  LOOP
+    PERFORM public.apply_daily_rollup(
+      'sales', p_date, v_item.product_id, 'customer', p_customer_id,
+      p_sign * public.rollup_net_amount(v_item.quantity * v_item.unit_price - v_item.discount, v_item.tax, v_item.sale_tax_type),
+      p_sign * v_item.tax, p_sign * v_item.quantity, 0
+    );
+  END LOOP;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_rollup_sale_invoices()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    -- Lines are inserted after the header; only the document count applies here
+    IF public.rollup_invoice_posted(NEW.status::text) THEN
+      PERFORM public.apply_daily_rollup('sales', NEW.invoice_date, NULL, 'customer', NEW.customer_id, 0, 0, 0, 1);
+    END IF;
+    RETURN NEW;
+  ELSIF TG_OP = 'UPDATE' THEN
+    IF public.rollup_invoice_posted(OLD.status::text) IS DISTINCT FROM public.rollup_invoice_posted(NEW.status::text)
+       OR (public.rollup_invoice_posted(NEW.status::text)
+           AND (OLD.invoice_date IS DISTINCT FROM NEW.invoice_date OR OLD.customer_id IS DISTINCT FROM NEW.customer_id)) THEN
+      IF public.rollup_invoice_posted(OLD.status::text) THEN
+        PERFORM public.rollup_sale_invoice(OLD.id, OLD.invoice_date, OLD.customer_id, -1);
+      END IF;
+      IF public.rollup_invoice_posted(NEW.status::text) THEN
+        PERFORM public.rollup_sale_invoice(NEW.id, NEW.invoice_date, NEW.customer_id, 1);
+      END IF;
+    END IF;
+    RETURN NEW;
+  ELSE
+    -- BEFORE DELETE: lines still exist; cascaded line deletes then find no parent
+    IF public.rollup_invoice_posted(OLD.status::text) THEN
+      PERFORM public.rollup_sale_invoice(OLD.id, OLD.invoice_date, OLD.customer_id, -1);
+    END IF;
+    RETURN OLD;
+  END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_rollup_sale_invoice_items()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+  v_parent RECORD;
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    SELECT status::text AS status, invoice_date, customer_id INTO v_parent FROM public.sale_invoices WHERE id = OLD.invoice_id;
+    IF FOUND AND public.rollup_invoice_posted(v_parent.status) THEN
+      PERFORM public.apply_daily_rollup(
+        'sales', v_parent.invoice_date, OLD.product_id, 'customer', v_parent.customer_id,
+        -public.rollup_net_amount(OLD.quantity * OLD.unit_price - COALESCE(OLD.discount, 0), OLD.tax, OLD.sale_tax_type),
+        -COALESCE(OLD.tax, 0), -OLD.quantity, 0
+      );
+    END IF;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    SELECT status::text AS status, invoice_date, customer_id INTO v_parent FROM public.sale_invoices WHERE id = NEW.invoice_id;
+    IF FOUND AND public.rollup_invoice_posted(v_parent.status) THEN
+      PERFORM public.apply_daily_rollup(
+        'sales', v_parent.invoice_date, NEW.product_id, 'customer', v_parent.customer_id,
+        public.rollup_net_amount(NEW.quantity * NEW.unit_price - COALESCE(NEW.discount, 0), NEW.tax, NEW.sale_tax_type),
+        COALESCE(NEW.tax, 0), NEW.quantity, 0
+      );
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_sale_invoices_rollup ON public.sale_invoices;
+CREATE TRIGGER trg_sale_invoices_rollup
+  AFTER INSERT OR UPDATE ON public.sale_invoices
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_sale_invoices();
+
+DROP TRIGGER IF EXISTS trg_sale_invoices_rollup_delete ON public.sale_invoices;
+CREATE TRIGGER trg_sale_invoices_rollup_delete
+  BEFORE DELETE ON public.sale_invoices
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_sale_invoices();
+
+DROP TRIGGER IF EXISTS trg_sale_invoice_items_rollup ON public.sale_invoice_items;
+CREATE TRIGGER trg_sale_invoice_items_rollup
+  AFTER INSERT OR UPDATE OR DELETE ON public.sale_invoice_items
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_sale_invoice_items();
+
+-- ==================== CREDIT NOTES (RETURNS) ====================
+CREATE OR REPLACE FUNCTION public.rollup_credit_note(p_credit_note_id UUID, p_date DATE, p_customer_id UUID, p_sign INTEGER)
+RETURNS VOID LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+  v_item RECORD;
+BEGIN
+  PERFORM public.apply_daily_rollup('returns', p_date, NULL, 'customer', p_customer_id, 0, 0, 0, p_sign);
+  FOR v_item IN
+    SELECT product_id, credit_quantity, unit_price, COALESCE(discount, 0) AS discount, COALESCE(tax, 0) AS tax, sale_tax_type
+    FROM public.credit_note_items WHERE credit_note_id = p_credit_note_id
+  LOOP
+    PERFORM public.apply_daily_rollup(
+      'returns', p_date, v_item.product_id, 'customer', p_customer_id,
+      p_sign * public.rollup_net_amount(v_item.credit_quantity * v_item.unit_price - v_item.discount, v_item.tax, v_item.sale_tax_type),
+      p_sign * v_item.tax, p_sign * v_item.credit_quantity, 0
+    );
+  END LOOP;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_rollup_credit_notes()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    IF public.rollup_credit_note_posted(NEW.status::text) THEN
+      PERFORM public.apply_daily_rollup('returns', NEW.credit_date, NULL, 'customer', NEW.customer_id, 0, 0, 0, 1);
+    END IF;
+    RETURN NEW;
+  ELSIF TG_OP = 'UPDATE' THEN
+    IF public.rollup_credit_note_posted(OLD.status::text) IS DISTINCT FROM public.rollup_credit_note_posted(NEW.status::text)
+       OR (public.rollup_credit_note_posted(NEW.status::text)
+           AND (OLD.credit_date IS DISTINCT FROM NEW.credit_date OR OLD.customer_id IS DISTINCT FROM NEW.customer_id)) THEN
+      IF public.rollup_credit_note_posted(OLD.status::text) THEN
+        PERFORM public.rollup_credit_note(OLD.id, OLD.credit_date, OLD.customer_id, -1);
+      END IF;
+      IF public.rollup_credit_note_posted(NEW.status::text) THEN
+        PERFORM public.rollup_credit_note(NEW.id, NEW.credit_date, NEW.customer_id, 1);
+      END IF;
+    END IF;
+    RETURN NEW;
+  ELSE
+    IF public.rollup_credit_note_posted(OLD.status::text) THEN
+      PERFORM public.rollup_credit_note(OLD.id, OLD.credit_date, OLD.customer_id, -1);
+    END IF;
+    RETURN OLD;
+  END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_rollup_credit_note_items()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+  v_parent RECORD;
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    SELECT status::text AS status, credit_date, customer_id INTO v_parent FROM public.credit_notes WHERE id = OLD.credit_note_id;
+    IF FOUND AND public.rollup_credit_note_posted(v_parent.status) THEN
+      PERFORM public.apply_daily_rollup(
+        'returns', v_parent.credit_date, OLD.product_id, 'customer', v_parent.customer_id,
+        -public.rollup_net_amount(OLD.credit_quantity * OLD.unit_price - COALESCE(OLD.discount, 0), OLD.tax, OLD.sale_tax_type),
+        -COALESCE(OLD.tax, 0), -OLD.credit_quantity, 0
+      );
+    END IF;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    SELECT status::text AS status, credit_date, customer_id INTO v_parent FROM public.credit_notes WHERE id = NEW.credit_note_id;
+    IF FOUND AND public.rollup_credit_note_posted(v_parent.status) THEN
+      PERFORM public.apply_daily_rollup(
+        'returns', v_parent.credit_date, NEW.product_id, 'customer', v_parent.customer_id,
+        public.rollup_net_amount(NEW.credit_quantity * NEW.unit_price - COALESCE(NEW.discount, 0), NEW.tax, NEW.sale_tax_type),
+        COALESCE(NEW.tax, 0), NEW.credit_quantity, 0
+      );
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_credit_notes_rollup ON public.credit_notes;
+CREATE TRIGGER trg_credit_notes_rollup
+  AFTER INSERT OR UPDATE ON public.credit_notes
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_credit_notes();
+
+DROP TRIGGER IF EXISTS trg_credit_notes_rollup_delete ON public.credit_notes;
+CREATE TRIGGER trg_credit_notes_rollup_delete
+  BEFORE DELETE ON public.credit_notes
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_credit_notes();
+
+DROP TRIGGER IF EXISTS trg_credit_note_items_rollup ON public.credit_note_items;
+CREATE TRIGGER trg_credit_note_items_rollup
+  AFTER INSERT OR UPDATE OR DELETE ON public.credit_note_items
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_credit_note_items();
+
+-- ==================== GOOD RECEIVE NOTES (PURCHASES) ====================
+-- Purchases count accepted quantity only (received - rejected)
+CREATE OR REPLACE FUNCTION public.rollup_grn(p_grn_id UUID, p_date DATE, p_supplier_id UUID, p_sign INTEGER)
+RETURNS VOID LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+  v_item RECORD;
+BEGIN
+  PERFORM public.apply_daily_rollup('purchases', p_date, NULL, 'supplier', p_supplier_id, 0, 0, 0, p_sign);
+  FOR v_item IN
+    SELECT product_id, (received_quantity - COALESCE(rejected_quantity, 0)) AS quantity, unit_cost,
+           COALESCE(discount, 0) AS discount, COALESCE(tax, 0) AS tax, purchase_tax_type
+    FROM public.good_receive_note_items WHERE grn_id = p_grn_id
+  LOOP
+    PERFORM public.apply_daily_rollup(
+      'purchases', p_date, v_item.product_id, 'supplier', p_supplier_id,
+      p_sign * public.rollup_net_amount(v_item.quantity * v_item.unit_cost - v_item.discount, v_item.tax, v_item.purchase_tax_type),
+      p_sign * v_item.tax, p_sign * v_item.quantity, 0
+    );
+  END LOOP;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_rollup_good_receive_notes()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    IF public.rollup_grn_posted(NEW.status::text) THEN
+      PERFORM public.apply_daily_rollup('purchases', NEW.received_date, NULL, 'supplier', NEW.supplier_id, 0, 0, 0, 1);
+    END IF;
+    RETURN NEW;
+  ELSIF TG_OP = 'UPDATE' THEN
+    IF public.rollup_grn_posted(OLD.status::text) IS DISTINCT FROM public.rollup_grn_posted(NEW.status::text)
+       OR (public.rollup_grn_posted(NEW.status::text)
+           AND (OLD.received_date IS DISTINCT FROM NEW.received_date OR OLD.supplier_id IS DISTINCT FROM NEW.supplier_id)) THEN
+      IF public.rollup_grn_posted(OLD.status::text) THEN
+        PERFORM public.rollup_grn(OLD.id, OLD.received_date, OLD.supplier_id, -1);
+      END IF;
+      IF public.rollup_grn_posted(NEW.status::text) THEN
+        PERFORM public.rollup_grn(NEW.id, NEW.received_date, NEW.supplier_id, 1);
+      END IF;
+    END IF;
+    RETURN NEW;
+  ELSE
+    IF public.rollup_grn_posted(OLD.status::text) THEN
+      PERFORM public.rollup_grn(OLD.id, OLD.received_date, OLD.supplier_id, -1);
+    END IF;
+    RETURN OLD;
+  END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_rollup_good_receive_note_items()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+  v_parent RECORD;
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    SELECT status::text AS status, received_date, supplier_id INTO v_parent FROM public.good_receive_notes WHERE id = OLD.grn_id;
+    IF FOUND AND public.rollup_grn_posted(v_parent.status) THEN
+      PERFORM public.apply_daily_rollup(
+        'purchases', v_parent.received_date, OLD.product_id, 'supplier', v_parent.supplier_id,
+        -public.rollup_net_amount((OLD.received_quantity - COALESCE(OLD.rejected_quantity, 0)) * OLD.unit_cost - COALESCE(OLD.discount, 0), OLD.tax, OLD.purchase_tax_type),
+        -COALESCE(OLD.tax, 0), -(OLD.received_quantity - COALESCE(OLD.rejected_quantity, 0)), 0
+      );
+    END IF;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    SELECT status::text AS status, received_date, supplier_id INTO v_parent FROM public.good_receive_notes WHERE id = NEW.grn_id;
+    IF FOUND AND public.rollup_grn_posted(v_parent.status) THEN
+      PERFORM public.apply_daily_rollup(
+        'purchases', v_parent.received_date, NEW.product_id, 'supplier', v_parent.supplier_id,
+        public.rollup_net_amount((NEW.received_quantity - COALESCE(NEW.rejected_quantity, 0)) * NEW.unit_cost - COALESCE(NEW.discount, 0), NEW.tax, NEW.purchase_tax_type),
+        COALESCE(NEW.tax, 0), NEW.received_quantity - COALESCE(NEW.rejected_quantity, 0), 0
+      );
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_good_receive_notes_rollup ON public.good_receive_notes;
+CREATE TRIGGER trg_good_receive_notes_rollup
+  AFTER INSERT OR UPDATE ON public.good_receive_notes
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_good_receive_notes();
+
+DROP TRIGGER IF EXISTS trg_good_receive_notes_rollup_delete ON public.good_receive_notes;
+CREATE TRIGGER trg_good_receive_notes_rollup_delete
+  BEFORE DELETE ON public.good_receive_notes
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_good_receive_notes();
+
+DROP TRIGGER IF EXISTS trg_good_receive_note_items_rollup ON public.good_receive_note_items;
+CREATE TRIGGER trg_good_receive_note_items_rollup
+  AFTER INSERT OR UPDATE OR DELETE ON public.good_receive_note_items
+  FOR EACH ROW EXECUTE FUNCTION public.trg_rollup_good_receive_note_items();
+
+-- ==================== FULL REBUILD ====================
+-- Recomputes every bucket from the documents. Used for the initial backfill
+-- and as a repair tool; normal operation never needs it.
+CREATE OR REPLACE FUNCTION public.rebuild_daily_rollups()
+RETURNS VOID LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+  v_doc RECORD;
+BEGIN
+  DELETE FROM public.daily_rollups;
+
+  FOR v_doc IN SELECT id, invoice_date, customer_id FROM public.sale_invoices WHERE public.rollup_invoice_posted(status::text) LOOP
+    PERFORM public.rollup_sale_invoice(v_doc.id, v_doc.invoice_date, v_doc.customer_id, 1);
+  END LOOP;
+
+  FOR v_doc IN SELECT id, credit_date, customer_id FROM public.credit_notes WHERE public.rollup_credit_note_posted(status::text) LOOP
+    PERFORM public.rollup_credit_note(v_doc.id, v_doc.credit_date, v_doc.customer_id, 1);
+  END LOOP;
+
+  FOR v_doc IN SELECT id, received_date, supplier_id FROM public.good_receive_notes WHERE public.rollup_grn_posted(status::text) LOOP
+    PERFORM public.rollup_grn(v_doc.id, v_doc.received_date, v_doc.supplier_id, 1);
+  END LOOP;
+END;
+$$;
+
+SELECT public.rebuild_daily_rollups();
+
+-- ==================== SUMMARY QUERY ====================
+-- p_group_by: 'total' (one row), 'day' (one row per day), or a dimension
+-- ('product' | 'customer' | 'supplier', one row per entity). Cost is
+-- proportional to the number of buckets in range, not documents.
+CREATE OR REPLACE FUNCTION public.get_rollup_summary(p_from DATE, p_to DATE, p_group_by TEXT DEFAULT 'total')
+RETURNS TABLE (
+  group_key           TEXT,
+  group_name          TEXT,
+  sales_amount        NUMERIC,
+  sales_tax           NUMERIC,
+  sales_quantity      NUMERIC,
+  sales_documents     BIGINT,
+  return_amount       NUMERIC,
+  return_tax          NUMERIC,
+  return_quantity     NUMERIC,
+  return_documents    BIGINT,
+  purchase_amount     NUMERIC,
+  purchase_tax        NUMERIC,
+  purchase_quantity   NUMERIC,
+  purchase_documents  BIGINT
+)
+LANGUAGE sql STABLE AS $$
+  WITH agg AS (
+    SELECT
+      CASE WHEN p_group_by = 'day' THEN r.bucket_date::text
+           WHEN p_group_by = 'total' THEN 'total'
+           ELSE r.dimension_id::text END AS group_key,
+      CASE WHEN p_group_by IN ('product', 'customer', 'supplier') THEN r.dimension_id END AS entity_id,
+      SUM(r.sales_amount)       AS sales_amount,
+      SUM(r.sales_tax)          AS sales_tax,
+      SUM(r.sales_quantity)     AS sales_quantity,
+      SUM(r.sales_documents)    AS sales_documents,
+      SUM(r.return_amount)      AS return_amount,
+      SUM(r.return_tax)         AS return_tax,
+      SUM(r.return_quantity)    AS return_quantity,
+      SUM(r.return_documents)   AS return_documents,
+      SUM(r.purchase_amount)    AS purchase_amount,
+      SUM(r.purchase_tax)       AS purchase_tax,
+      SUM(r.purchase_quantity)  AS purchase_quantity,
+      SUM(r.purchase_documents) AS purchase_documents
+    FROM public.daily_rollups r
+    WHERE r.dimension = CASE WHEN p_group_by IN ('day', 'total') THEN 'total' ELSE p_group_by END
+      AND r.bucket_date BETWEEN p_from AND p_to
+    GROUP BY 1, 2
+  )
+  SELECT
+    agg.group_key,
+    COALESCE(p.name, c.name, s.name),
+    agg.sales_amount, agg.sales_tax, agg.sales_quantity, agg.sales_documents,
+    agg.return_amount, agg.return_tax, agg.return_quantity, agg.return_documents,
+    agg.purchase_amount, agg.purchase_tax, agg.purchase_quantity, agg.purchase_documents
+  FROM agg
+  LEFT JOIN public.products  p ON p_group_by = 'product'  AND p.id = agg.entity_id
+  LEFT JOIN public.customers c ON p_group_by = 'customer' AND c.id = agg.entity_id
+  LEFT JOIN public.suppliers s ON p_group_by = 'supplier' AND s.id = agg.entity_id
+  ORDER BY agg.group_key;
+$$;
+
+-- ==================== RLS ====================
+ALTER TABLE public.daily_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Authenticated users can read daily_rollups"
+  ON public.daily_rollups FOR SELECT
+  TO authenticated
+  USING (true);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,44 @@
+-- Dashboard KPIs Migration
+-- Aggregate inventory figures for GET /dashboard, computed in one pass over
+-- products and stock_levels instead of shipping every product to the client.
+
+-- ==================== INDEXES ====================
+CREATE INDEX IF NOT EXISTS idx_stock_levels_product_id ON public.stock_levels(product_id);
+CREATE INDEX IF NOT EXISTS idx_sales_orders_status     ON public.sales_orders(status);
+CREATE INDEX IF NOT EXISTS idx_good_receive_notes_status ON public.good_receive_notes(status);
+
+-- ==================== INVENTORY KPIs ====================
+-- Low stock: on-hand quantity at or below reorder_point (minimum_stock when unset)
+CREATE OR REPLACE FUNCTION public.get_inventory_kpis(p_low_stock_limit INTEGER DEFAULT 6)
+RETURNS JSONB LANGUAGE sql STABLE AS $$
+  WITH per_product AS (
+    SELECT
+      p.id,
+      p.name,
+      COALESCE(p.cost_price, 0)                           AS cost_price,
+      COALESCE(p.reorder_point, p.minimum_stock, 0)       AS threshold,
+      COALESCE(SUM(sl.quantity_on_hand), 0)               AS on_hand
+    FROM public.products p
+    LEFT JOIN public.stock_levels sl ON sl.product_id = p.id
+    GROUP BY p.id, p.name, p.cost_price, p.reorder_point, p.minimum_stock
+  )
+  SELECT jsonb_build_object(
+    'total_products',  COUNT(*),
+    'inventory_value', COALESCE(SUM(on_hand * cost_price), 0),
+    'low_stock_count', COUNT(*) FILTER (WHERE threshold > 0 AND on_hand <= threshold),
+    'low_stock', COALESCE((
+      SELECT jsonb_agg(low ORDER BY low.current)
+      FROM (
+        SELECT id AS product_id, name, on_hand AS current, threshold AS minimum
+        FROM per_product
+        WHERE threshold > 0 AND on_hand <= threshold
+        ORDER BY on_hand
+        LIMIT p_low_stock_limit
+      ) AS low
+    ), '[]'::jsonb)
+  )
+  FROM per_product;
+$$;
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
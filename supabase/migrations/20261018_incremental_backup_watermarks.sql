@@ -0,0 +1,16 @@
+-- Incremental Backup Watermarks Migration
+-- Incremental backups copy rows of high-volume tables whose watermark column is
+-- newer than the previous backup. These indexes keep that range scan off a full
+-- table scan, and sale_invoice_items gets the updated_at trigger every other
+-- watermarked table already has, so edited lines are picked up.
+
+-- ==================== UPDATED_AT TRIGGER ====================
+DROP TRIGGER IF EXISTS update_sale_invoice_items_updated_at ON public.sale_invoice_items;
+CREATE TRIGGER update_sale_invoice_items_updated_at
+  BEFORE UPDATE ON public.sale_invoice_items
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ==================== WATERMARK INDEXES ====================
+CREATE INDEX IF NOT EXISTS idx_sale_invoice_items_updated_at      ON public.sale_invoice_items(updated_at);
+CREATE INDEX IF NOT EXISTS idx_product_serials_updated_at         ON public.product_serials(updated_at);
+CREATE INDEX IF NOT EXISTS idx_good_receive_note_items_updated_at ON public.good_receive_note_items(updated_at);
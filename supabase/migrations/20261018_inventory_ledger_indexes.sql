@@ -0,0 +1,54 @@
+-- Inventory Ledger Indexes Migration
+-- GET /inventory/transactions and GET /inventory/movements page newest first
+-- with a keyset on (created_at, id) plus optional product / type / reference
+-- filters. Each index below ends in (created_at DESC, id DESC), so a filtered
+-- page is one index range scan that stops after `limit` rows.
+
+-- ==================== INVENTORY TRANSACTIONS ====================
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_keyset
+  ON public.inventory_transactions(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_product_keyset
+  ON public.inventory_transactions(product_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_type_keyset
+  ON public.inventory_transactions(transaction_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_reference_keyset
+  ON public.inventory_transactions(reference_type, reference_id, created_at DESC, id DESC);
+
+-- Ledger pages filtered by location. location_id is added by a later
+-- migration (which also creates this index), so it is only built here on
+-- databases that already have the column.
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'public'
+      AND table_name = 'inventory_transactions'
+      AND column_name = 'location_id'
+  ) THEN
+    CREATE INDEX IF NOT EXISTS idx_inventory_transactions_location_keyset
+      ON public.inventory_transactions(location_id, created_at DESC, id DESC)
+      WHERE location_id IS NOT NULL;
+  END IF;
+END $$;
+
+-- ==================== INVENTORY MOVEMENTS ====================
+CREATE INDEX IF NOT EXISTS idx_inventory_movements_keyset
+  ON public.inventory_movements(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_movements_product_keyset
+  ON public.inventory_movements(product_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_movements_type_keyset
+  ON public.inventory_movements(type, created_at DESC, id DESC);
+
+-- ==================== SUPERSEDED INDEXES ====================
+-- Each is a leading prefix of a keyset index above; dropping them saves a
+-- write per index on the fastest-growing tables.
+DROP INDEX IF EXISTS public.idx_inventory_transactions_created_at;
+DROP INDEX IF EXISTS public.idx_inventory_transactions_product_id;
+DROP INDEX IF EXISTS public.idx_inventory_transactions_transaction_type;
+DROP INDEX IF EXISTS public.idx_inventory_transactions_reference_type;
+DROP INDEX IF EXISTS public.idx_inventory_movements_created_at;
+DROP INDEX IF EXISTS public.idx_inventory_movements_product_id;
+DROP INDEX IF EXISTS public.idx_inventory_movements_type;
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
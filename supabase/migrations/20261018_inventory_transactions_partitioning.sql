@@ -0,0 +1,291 @@
+-- Inventory Transactions Partitioning Migration
+-- inventory_transactions becomes a table partitioned by month on created_at.
+-- Each index is per partition, so hot queries (the current months) touch small
+-- indexes however many years of history accumulate, and a closed month can be
+-- archived by detaching its partition instead of deleting rows.
+--
+-- Archival (POST /inventory/transactions/archive) first exports a month to
+-- gzip COPY files next to the backups, then archive_inventory_transaction_period()
+-- carries the month's totals forward as opening-balance rows at the start of
+-- the next month and drops the partition, so SUM(quantity_change) per product,
+-- location and transaction type is the same before and after.
+
+-- ==================== LEDGER LOCATION ====================
+-- Also added by the stock snapshots migration; needed here so the copy below has it
+ALTER TABLE public.inventory_transactions
+  ADD COLUMN IF NOT EXISTS location_id UUID REFERENCES public.locations(id) ON DELETE SET NULL;
+
+-- ==================== ARCHIVE TABLE ====================
+CREATE TABLE IF NOT EXISTS public.inventory_transaction_archives (
+  id                    UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  period_start          DATE NOT NULL UNIQUE,
+  period_end            DATE NOT NULL,
+  row_count             BIGINT NOT NULL DEFAULT 0,
+  quantity_total        BIGINT NOT NULL DEFAULT 0,
+  opening_balance_rows  INTEGER NOT NULL DEFAULT 0,
+  archive_path          TEXT,
+  archive_bytes         BIGINT,
+  archived_by           UUID REFERENCES public.profiles(id),
+  archived_at           TIMESTAMPTZ NOT NULL DEFAULT now(),
+  created_at            TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at            TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- ==================== PARTITION MAINTENANCE ====================
+CREATE OR REPLACE FUNCTION public.inventory_transaction_partition_name(p_month DATE)
+RETURNS TEXT LANGUAGE sql STABLE AS $$
+  SELECT 'inventory_transactions_' || to_char(p_month, '"y"YYYY"m"MM');
+$$;
+
+-- Creates the monthly partitions from p_from's month through p_months_ahead
+-- months past the current one; returns how many were created. Rows that
+-- landed in the default partition for a new month are moved into it first.
+-- Months that were archived are never recreated.
+CREATE OR REPLACE FUNCTION public.ensure_inventory_transaction_partitions(
+  p_from         DATE DEFAULT NULL,
+  p_months_ahead INTEGER DEFAULT 3
+)
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+  v_month   DATE := date_trunc('month', COALESCE(p_from, CURRENT_DATE))::date;
+  v_last    DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => p_months_ahead))::date;
+  v_next    DATE;
+  v_name    TEXT;
+  v_created INTEGER := 0;
+BEGIN
+  WHILE v_month <= v_last LOOP
+    v_next := (v_month + interval '1 month')::date;
+    v_name := public.inventory_transaction_partition_name(v_month);
+
+    IF to_regclass('public.' || v_name) IS NULL
+       AND NOT EXISTS (SELECT 1 FROM public.inventory_transaction_archives a WHERE a.period_start = v_month) THEN
+      -- Hold writes to the default partition while its rows for this month move out
+      LOCK TABLE public.inventory_transactions_default IN EXCLUSIVE MODE;
+      EXECUTE format('CREATE TABLE public.%I (LIKE public.inventory_transactions INCLUDING DEFAULTS)', v_name);
+      EXECUTE format(
+        'WITH moved AS (DELETE FROM public.inventory_transactions_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+        'INSERT INTO public.%I SELECT * FROM moved',
+        v_month, v_next, v_name
+      );
+      EXECUTE format(
+        'ALTER TABLE public.inventory_transactions ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+        v_name, v_month, v_next
+      );
+      v_created := v_created + 1;
+    END IF;
+
+    v_month := v_next;
+  END LOOP;
+
+  RETURN v_created;
+END;
+$$;
+
+-- ==================== PARTITIONED TABLE ====================
+-- One-off conversion: the rows are copied into the partitioned table and the
+-- old heap is dropped. Skipped when the table is already partitioned.
+DO $$
+DECLARE
+  v_first DATE;
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.inventory_transactions'::regclass) THEN
+    RETURN;
+  END IF;
+
+  ALTER TABLE public.inventory_transactions RENAME TO inventory_transactions_unpartitioned;
+  ALTER TABLE public.inventory_transactions_unpartitioned
+    RENAME CONSTRAINT inventory_transactions_pkey TO inventory_transactions_unpartitioned_pkey;
+
+  -- The partition key must be part of the primary key
+  CREATE TABLE public.inventory_transactions (
+    id                UUID NOT NULL DEFAULT gen_random_uuid(),
+    product_id        UUID REFERENCES public.products(id) ON DELETE CASCADE,
+    location_id       UUID REFERENCES public.locations(id) ON DELETE SET NULL,
+    transaction_type  public.transaction_type NOT NULL,
+    quantity_change   INTEGER NOT NULL,
+    reference_type    TEXT,
+    reference_id      UUID,
+    notes             TEXT,
+    created_by        UUID REFERENCES public.profiles(id),
+    created_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+  ) PARTITION BY RANGE (created_at);
+
+  -- Catches rows outside every monthly partition (e.g. back-dated imports)
+  CREATE TABLE public.inventory_transactions_default
+    PARTITION OF public.inventory_transactions DEFAULT;
+
+  SELECT date_trunc('month', MIN(created_at))::date INTO v_first
+  FROM public.inventory_transactions_unpartitioned;
+  PERFORM public.ensure_inventory_transaction_partitions(COALESCE(v_first, CURRENT_DATE), 3);
+
+  INSERT INTO public.inventory_transactions (
+    id, product_id, location_id, transaction_type, quantity_change,
+    reference_type, reference_id, notes, created_by, created_at
+  )
+  SELECT
+    id, product_id, location_id, transaction_type, quantity_change,
+    reference_type, reference_id, notes, created_by, COALESCE(created_at, now())
+  FROM public.inventory_transactions_unpartitioned;
+
+  DROP TABLE public.inventory_transactions_unpartitioned;
+END $$;
+
+-- ==================== INDEXES ====================
+-- Created on the parent, so every partition (present and future) gets its own copy
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_keyset
+  ON public.inventory_transactions(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_product_keyset
+  ON public.inventory_transactions(product_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_type_keyset
+  ON public.inventory_transactions(transaction_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_reference_keyset
+  ON public.inventory_transactions(reference_type, reference_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_location_keyset
+  ON public.inventory_transactions(location_id, created_at DESC, id DESC)
+  WHERE location_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_reference_id
+  ON public.inventory_transactions(reference_id);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_stock_level_replay
+  ON public.inventory_transactions(created_at)
+  WHERE reference_type = 'stock_level';
+
+-- ==================== ARCHIVAL ====================
+-- Closed months older than the retention period, oldest first
+CREATE OR REPLACE FUNCTION public.inventory_transaction_periods_due(p_retention_months INTEGER)
+RETURNS TABLE (period_start DATE, partition_name TEXT) LANGUAGE sql STABLE AS $$
+  SELECT to_date(right(c.relname, 8), '"y"YYYY"m"MM'), c.relname::text
+  FROM pg_inherits i
+  JOIN pg_class c ON c.oid = i.inhrelid
+  WHERE i.inhparent = 'public.inventory_transactions'::regclass
+    AND c.relname ~ '^inventory_transactions_y[0-9]{4}m[0-9]{2}$'
+    AND to_date(right(c.relname, 8), '"y"YYYY"m"MM')
+        < (date_trunc('month', now()) - make_interval(months => GREATEST(p_retention_months, 1)))::date
+  ORDER BY 1;
+$$;
+
+-- Replaces one closed month with opening-balance rows and drops its partition.
+-- Called after the month has been exported: p_expected_rows is the exported
+-- row count, and the month is refused (PT409) if it no longer matches.
+-- Months are archived oldest first so each opening balance carries forward
+-- the one before it. A stock snapshot after the month is taken if none
+-- exists, so stock-as-of replay never needs the archived rows.
+CREATE OR REPLACE FUNCTION public.archive_inventory_transaction_period(
+  p_period_start  DATE,
+  p_expected_rows BIGINT,
+  p_archive_path  TEXT,
+  p_archive_bytes BIGINT,
+  p_archived_by   UUID DEFAULT NULL
+)
+RETURNS JSONB LANGUAGE plpgsql AS $$
+DECLARE
+  v_start     DATE := date_trunc('month', p_period_start)::date;
+  v_end       DATE := (date_trunc('month', p_period_start) + interval '1 month')::date;
+  v_partition TEXT := public.inventory_transaction_partition_name(p_period_start);
+  v_rows      BIGINT;
+  v_total     BIGINT;
+  v_opening   INTEGER;
+BEGIN
+  IF v_end > date_trunc('month', now())::date THEN
+    RAISE EXCEPTION 'Only closed periods can be archived' USING ERRCODE = 'PT400';
+  END IF;
+  IF to_regclass('public.' || v_partition) IS NULL THEN
+    RAISE EXCEPTION 'No inventory transaction partition for %', to_char(v_start, 'YYYY-MM') USING ERRCODE = 'PT404';
+  END IF;
+  IF EXISTS (
+    SELECT 1
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'public.inventory_transactions'::regclass
+      AND c.relname ~ '^inventory_transactions_y[0-9]{4}m[0-9]{2}$'
+      AND c.relname < v_partition
+  ) OR EXISTS (SELECT 1 FROM public.inventory_transactions_default WHERE created_at < v_end) THEN
+    RAISE EXCEPTION 'Older inventory transactions must be archived first' USING ERRCODE = 'PT409';
+  END IF;
+
+  -- Back-dated writes into the month wait until it is gone
+  EXECUTE format('LOCK TABLE public.%I IN EXCLUSIVE MODE', v_partition);
+  EXECUTE format('SELECT COUNT(*), COALESCE(SUM(quantity_change), 0) FROM public.%I', v_partition)
+  INTO v_rows, v_total;
+  IF v_rows <> p_expected_rows THEN
+    RAISE EXCEPTION 'Inventory transactions for % changed since they were exported', to_char(v_start, 'YYYY-MM')
+      USING ERRCODE = 'PT409',
+            DETAIL = format('exported %s rows, partition has %s', p_expected_rows, v_rows);
+  END IF;
+
+  PERFORM public.ensure_inventory_transaction_partitions(v_end, 0);
+  IF NOT EXISTS (SELECT 1 FROM public.stock_snapshots WHERE taken_at >= v_end) THEN
+    PERFORM public.take_stock_snapshot(p_archived_by);
+  END IF;
+
+  -- Carry the month forward; last month's opening rows are part of the sum
+  EXECUTE format(
+    'INSERT INTO public.inventory_transactions '
+    '(product_id, location_id, transaction_type, quantity_change, reference_type, notes, created_by, created_at) '
+    'SELECT product_id, location_id, transaction_type, SUM(quantity_change)::INTEGER, ''opening_balance'', %L, %L::uuid, %L::timestamptz '
+    'FROM public.%I '
+    'GROUP BY product_id, location_id, transaction_type '
+    'HAVING SUM(quantity_change) <> 0',
+    'Opening balance carried forward from ' || to_char(v_start, 'YYYY-MM'), p_archived_by, v_end, v_partition
+  );
+  GET DIAGNOSTICS v_opening = ROW_COUNT;
+
+  EXECUTE format('ALTER TABLE public.inventory_transactions DETACH PARTITION public.%I', v_partition);
+  EXECUTE format('DROP TABLE public.%I', v_partition);
+
+  INSERT INTO public.inventory_transaction_archives (
+    period_start, period_end, row_count, quantity_total, opening_balance_rows,
+    archive_path, archive_bytes, archived_by
+  ) VALUES (
+    v_start, v_end, v_rows, v_total, v_opening,
+    p_archive_path, p_archive_bytes, p_archived_by
+  );
+
+  RETURN jsonb_build_object(
+    'period_start', v_start,
+    'period_end', v_end,
+    'rows', v_rows,
+    'quantity_total', v_total,
+    'opening_balance_rows', v_opening
+  );
+END;
+$$;
+
+-- ==================== TIMESTAMPS ====================
+DROP TRIGGER IF EXISTS set_inventory_transaction_archives_updated_at ON public.inventory_transaction_archives;
+CREATE TRIGGER set_inventory_transaction_archives_updated_at
+  BEFORE UPDATE ON public.inventory_transaction_archives
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ==================== RLS ====================
+ALTER TABLE public.inventory_transactions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.inventory_transaction_archives ENABLE ROW LEVEL SECURITY;
+
+-- Same policy the unpartitioned table had
+DROP POLICY IF EXISTS "All authenticated users access" ON public.inventory_transactions;
+CREATE POLICY "All authenticated users access"
+  ON public.inventory_transactions
+  USING (auth.uid() IS NOT NULL);
+
+-- Allow authenticated users full access (app-layer permissions handle role checks)
+CREATE POLICY "Authenticated users can manage inventory_transaction_archives"
+  ON public.inventory_transaction_archives FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+GRANT ALL ON TABLE public.inventory_transactions TO anon;
+GRANT ALL ON TABLE public.inventory_transactions TO authenticated;
+GRANT ALL ON TABLE public.inventory_transactions TO service_role;
+
+-- ==================== SCHEDULE ====================
+-- Next months' partitions on the first of each month where pg_cron is
+-- available; rows for a missing month still land in the default partition.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('inventory-transaction-partitions', '0 1 1 * *', 'SELECT public.ensure_inventory_transaction_partitions()');
+  END IF;
+END $$;
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
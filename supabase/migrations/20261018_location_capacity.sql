@@ -0,0 +1,15 @@
+-- Location Capacity Migration
+-- Locations get a capacity in stock units. Put-away slotting compares it with
+-- the units on hand (stock_levels) to suggest where received goods should go.
+
+-- ==================== LOCATION CAPACITY ====================
+ALTER TABLE public.locations
+  ADD COLUMN IF NOT EXISTS capacity INTEGER CHECK (capacity IS NULL OR capacity >= 0);
+
+COMMENT ON COLUMN public.locations.capacity IS 'Maximum stock units the location holds; NULL means unlimited';
+
+-- ==================== INDEXES ====================
+CREATE INDEX IF NOT EXISTS idx_stock_levels_location_id ON public.stock_levels(location_id);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
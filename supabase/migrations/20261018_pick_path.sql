@@ -0,0 +1,21 @@
+-- Pick Path Migration
+-- Locations get a physical position (zone / aisle / bay / level). When a pick
+-- list is created its lines are numbered in walking order (S-shape through
+-- the aisles), so pickers follow pick_sequence instead of insertion order.
+
+-- ==================== LOCATION POSITION ====================
+ALTER TABLE public.locations
+  ADD COLUMN IF NOT EXISTS zone  TEXT,
+  ADD COLUMN IF NOT EXISTS aisle INTEGER,
+  ADD COLUMN IF NOT EXISTS bay   INTEGER,
+  ADD COLUMN IF NOT EXISTS level INTEGER;
+
+-- ==================== PICK SEQUENCE ====================
+ALTER TABLE public.pick_list_items
+  ADD COLUMN IF NOT EXISTS pick_sequence INTEGER;
+
+-- ==================== INDEXES ====================
+CREATE INDEX IF NOT EXISTS idx_pick_list_items_sequence ON public.pick_list_items(pick_list_id, pick_sequence);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
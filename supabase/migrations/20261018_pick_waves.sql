@@ -0,0 +1,51 @@
+-- Pick Waves Migration
+-- A wave is one pick list that serves several delivery challans. Its lines
+-- are consolidated per product and location; pick_list_allocations keeps
+-- which DC line each unit of a wave line belongs to, in plan order, so
+-- completing the wave can set dispatched quantities and dispatch the DCs it
+-- picked for in one pass.
+
+-- ==================== PICK LIST TYPE ====================
+ALTER TABLE public.pick_lists
+  ADD COLUMN IF NOT EXISTS pick_type TEXT NOT NULL DEFAULT 'single';
+
+ALTER TABLE public.pick_lists DROP CONSTRAINT IF EXISTS pick_lists_pick_type_check;
+ALTER TABLE public.pick_lists
+  ADD CONSTRAINT pick_lists_pick_type_check CHECK (pick_type IN ('single', 'wave'));
+
+-- ==================== ALLOCATIONS ====================
+CREATE TABLE IF NOT EXISTS public.pick_list_allocations (
+  id                        UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  pick_list_id              UUID NOT NULL REFERENCES public.pick_lists(id) ON DELETE CASCADE,
+  pick_list_item_id         UUID NOT NULL REFERENCES public.pick_list_items(id) ON DELETE CASCADE,
+  delivery_challan_id       UUID NOT NULL REFERENCES public.delivery_challans(id) ON DELETE RESTRICT,
+  delivery_challan_item_id  UUID NOT NULL REFERENCES public.delivery_challan_items(id) ON DELETE CASCADE,
+  quantity                  INTEGER NOT NULL DEFAULT 0,
+  picked_quantity           INTEGER NOT NULL DEFAULT 0,
+  sequence                  INTEGER NOT NULL DEFAULT 0,
+  created_at                TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at                TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- ==================== INDEXES ====================
+CREATE INDEX IF NOT EXISTS idx_pick_list_allocations_pick_list ON public.pick_list_allocations(pick_list_id, sequence);
+CREATE INDEX IF NOT EXISTS idx_pick_list_allocations_item      ON public.pick_list_allocations(pick_list_item_id);
+CREATE INDEX IF NOT EXISTS idx_pick_list_allocations_dc        ON public.pick_list_allocations(delivery_challan_id);
+
+-- ==================== TIMESTAMPS ====================
+DROP TRIGGER IF EXISTS set_pick_list_allocations_updated_at ON public.pick_list_allocations;
+CREATE TRIGGER set_pick_list_allocations_updated_at
+  BEFORE UPDATE ON public.pick_list_allocations
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ==================== RLS ====================
+ALTER TABLE public.pick_list_allocations ENABLE ROW LEVEL SECURITY;
+
+-- Allow authenticated users full access (app-layer permissions handle role checks)
+CREATE POLICY "Authenticated users can manage pick_list_allocations"
+  ON public.pick_list_allocations FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
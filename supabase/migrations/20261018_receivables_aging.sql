@@ -0,0 +1,124 @@
+-- Receivables Aging Migration
+-- Server-side 0-30 / 31-60 / 61-90 / 90+ aging for GET /reports/receivables-aging,
+-- plus a cache version counter that the backend uses to serve cached report
+-- payloads until the next invoice or payment change.
+
+-- ==================== CACHE VERSIONS ====================
+-- One row per cached scope. Statement-level triggers bump the version on any
+-- write to the underlying tables, so every API worker can validate its cached
+-- copy with a single primary-key lookup.
+CREATE TABLE IF NOT EXISTS public.cache_versions (
+  scope       TEXT PRIMARY KEY,
+  version     BIGINT NOT NULL DEFAULT 0,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION public.bump_cache_version()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER SET search_path TO 'public' AS $$
+DECLARE
+  v_scope TEXT;
+BEGIN
+  FOREACH v_scope IN ARRAY TG_ARGV LOOP
+    INSERT INTO public.cache_versions (scope, version, updated_at)
+    VALUES (v_scope, 1, now())
+    ON CONFLICT (scope) DO UPDATE
+      SET version = public.cache_versions.version + 1,
+          updated_at = now();
+  END LOOP;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_sale_invoices_receivables_cache ON public.sale_invoices;
+CREATE TRIGGER trg_sale_invoices_receivables_cache
+  AFTER INSERT OR UPDATE OR DELETE ON public.sale_invoices
+  FOR EACH STATEMENT EXECUTE FUNCTION public.bump_cache_version('receivables');
+
+DROP TRIGGER IF EXISTS trg_customer_payments_receivables_cache ON public.customer_payments;
+CREATE TRIGGER trg_customer_payments_receivables_cache
+  AFTER INSERT OR UPDATE OR DELETE ON public.customer_payments
+  FOR EACH STATEMENT EXECUTE FUNCTION public.bump_cache_version('receivables');
+
+INSERT INTO public.cache_versions (scope) VALUES ('receivables') ON CONFLICT (scope) DO NOTHING;
+
+-- ==================== INDEXES ====================
+-- Only open receivables are ever aged; keep the index to those rows
+CREATE INDEX IF NOT EXISTS idx_sale_invoices_open_receivables
+  ON public.sale_invoices(due_date, customer_id)
+  WHERE status IN ('sent', 'partial', 'overdue') AND amount_due > 0;
+
+-- Historical as-of dates rebuild each balance from the payments dated on or
+-- before the date, so invoices paid since then still age as they did then
+CREATE INDEX IF NOT EXISTS idx_customer_payments_invoice_date
+  ON public.customer_payments(invoice_id, payment_date);
+
+-- ==================== AGING FUNCTION ====================
+-- Days overdue are measured from due_date (invoice_date when no due date is set).
+-- For today (or later) amount_due, the outstanding balance maintained by
+-- customer payments, is used directly; for a past date the balance is
+-- total_amount less the payments made by then.
+CREATE OR REPLACE FUNCTION public.get_receivables_aging(p_as_of DATE DEFAULT CURRENT_DATE)
+RETURNS TABLE (
+  customer_id     UUID,
+  customer_name   TEXT,
+  invoice_count   BIGINT,
+  bucket_0_30     NUMERIC,
+  bucket_31_60    NUMERIC,
+  bucket_61_90    NUMERIC,
+  bucket_90_plus  NUMERIC,
+  total_due       NUMERIC,
+  oldest_due_date DATE
+)
+LANGUAGE plpgsql STABLE AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  WITH balances AS (
+    SELECT si.customer_id AS cust_id, COALESCE(si.due_date, si.invoice_date) AS due_on, si.amount_due AS balance
+    FROM public.sale_invoices si
+    WHERE p_as_of >= CURRENT_DATE
+      AND si.status IN ('sent', 'partial', 'overdue')
+      AND si.amount_due > 0
+      AND si.invoice_date <= p_as_of
+      AND COALESCE(si.due_date, si.invoice_date) < p_as_of
+    UNION ALL
+    SELECT si.customer_id, COALESCE(si.due_date, si.invoice_date),
+           COALESCE(si.total_amount, 0) - COALESCE((
+             SELECT SUM(cp.payment_amount)
+             FROM public.customer_payments cp
+             WHERE cp.invoice_id = si.id AND cp.payment_date <= p_as_of
+           ), 0)
+    FROM public.sale_invoices si
+    WHERE p_as_of < CURRENT_DATE
+      AND si.status NOT IN ('draft', 'cancelled')
+      AND si.invoice_date <= p_as_of
+      AND COALESCE(si.due_date, si.invoice_date) < p_as_of
+  )
+  SELECT
+    b.cust_id,
+    c.name,
+    COUNT(*),
+    COALESCE(SUM(b.balance) FILTER (WHERE p_as_of - b.due_on <= 30), 0),
+    COALESCE(SUM(b.balance) FILTER (WHERE p_as_of - b.due_on BETWEEN 31 AND 60), 0),
+    COALESCE(SUM(b.balance) FILTER (WHERE p_as_of - b.due_on BETWEEN 61 AND 90), 0),
+    COALESCE(SUM(b.balance) FILTER (WHERE p_as_of - b.due_on > 90), 0),
+    SUM(b.balance),
+    MIN(b.due_on)
+  FROM balances b
+  LEFT JOIN public.customers c ON c.id = b.cust_id
+  WHERE b.balance > 0
+  GROUP BY b.cust_id, c.name
+  ORDER BY SUM(b.balance) DESC;
+END;
+$$;
+
+-- ==================== RLS ====================
+ALTER TABLE public.cache_versions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Authenticated users can read cache_versions"
+  ON public.cache_versions FOR SELECT
+  TO authenticated
+  USING (true);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,51 @@
+-- Stock Batches Migration
+-- Batch-tracked stock per product and location, fed by put-away completion.
+-- Pick lists allocate from it first-expired-first-out: each pick line names
+-- the batch it draws from, and completing the pick decrements that batch.
+
+-- ==================== STOCK BATCHES ====================
+CREATE TABLE IF NOT EXISTS public.stock_batches (
+  id                UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  product_id        UUID NOT NULL REFERENCES public.products(id) ON DELETE CASCADE,
+  location_id       UUID NOT NULL REFERENCES public.locations(id) ON DELETE CASCADE,
+  batch_number      TEXT,
+  expiry_date       DATE,
+  quantity_on_hand  INTEGER NOT NULL DEFAULT 0 CHECK (quantity_on_hand >= 0),
+  created_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- One row per batch and location; undated or unnumbered batches still collapse into one row
+CREATE UNIQUE INDEX IF NOT EXISTS uq_stock_batches_batch
+  ON public.stock_batches(product_id, location_id, batch_number, expiry_date) NULLS NOT DISTINCT;
+
+-- ==================== PICK LINE BATCH ====================
+ALTER TABLE public.pick_list_items
+  ADD COLUMN IF NOT EXISTS stock_batch_id UUID REFERENCES public.stock_batches(id) ON DELETE SET NULL,
+  ADD COLUMN IF NOT EXISTS batch_number   TEXT,
+  ADD COLUMN IF NOT EXISTS expiry_date    DATE;
+
+-- ==================== INDEXES ====================
+-- FEFO lookup: a product's batches that still hold stock, earliest expiry first
+CREATE INDEX IF NOT EXISTS idx_stock_batches_fefo
+  ON public.stock_batches(product_id, expiry_date NULLS LAST, location_id)
+  WHERE quantity_on_hand > 0;
+CREATE INDEX IF NOT EXISTS idx_pick_list_items_stock_batch ON public.pick_list_items(stock_batch_id);
+
+-- ==================== TIMESTAMPS ====================
+DROP TRIGGER IF EXISTS set_stock_batches_updated_at ON public.stock_batches;
+CREATE TRIGGER set_stock_batches_updated_at
+  BEFORE UPDATE ON public.stock_batches
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ==================== RLS ====================
+ALTER TABLE public.stock_batches ENABLE ROW LEVEL SECURITY;
+
+-- Allow authenticated users full access (app-layer permissions handle role checks)
+CREATE POLICY "Authenticated users can manage stock_batches"
+  ON public.stock_batches FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
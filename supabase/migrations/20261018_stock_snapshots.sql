@@ -0,0 +1,236 @@
+-- Stock Snapshots Migration
+-- Point-in-time stock for GET /inventory/stock-levels?asOf=. Periodic
+-- snapshots copy stock_levels; a past stock figure is the nearest earlier
+-- snapshot plus the ledger rows written after it, so a month-end statement
+-- reads one snapshot and the recent activity instead of the whole ledger.
+--
+-- The replayed rows are the ones the stock level audit trigger writes
+-- (reference_type 'stock_level'): exactly one per change of a
+-- stock_levels.quantity_on_hand. The trigger now also records the location,
+-- covers inserted and deleted rows, and stamps clock_timestamp() so a row is
+-- ordered by when the change happened, not when its transaction began.
+
+-- ==================== LEDGER LOCATION ====================
+ALTER TABLE public.inventory_transactions
+  ADD COLUMN IF NOT EXISTS location_id UUID REFERENCES public.locations(id) ON DELETE SET NULL;
+
+-- Replay reads only the audit rows after a snapshot
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_stock_level_replay
+  ON public.inventory_transactions(created_at)
+  WHERE reference_type = 'stock_level';
+
+-- ==================== STOCK LEVEL AUDIT ====================
+CREATE OR REPLACE FUNCTION public.handle_stock_level_audit()
+RETURNS TRIGGER LANGUAGE plpgsql SET search_path TO 'public' AS $$
+DECLARE
+  quantity_change INTEGER;
+  v_row public.stock_levels%ROWTYPE;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    quantity_change := COALESCE(NEW.quantity_on_hand, 0);
+    v_row := NEW;
+  ELSIF TG_OP = 'UPDATE' THEN
+    quantity_change := COALESCE(NEW.quantity_on_hand, 0) - COALESCE(OLD.quantity_on_hand, 0);
+    v_row := NEW;
+  ELSE
+    quantity_change := -COALESCE(OLD.quantity_on_hand, 0);
+    v_row := OLD;
+  END IF;
+
+  -- Only create audit record if there's an actual change
+  -- Replay depends on every change having its audit row, so a failed insert
+  -- fails the stock write instead of being skipped
+  IF quantity_change != 0 THEN
+    INSERT INTO public.inventory_transactions (
+      product_id,
+      location_id,
+      transaction_type,
+      quantity_change,
+      reference_type,
+      reference_id,
+      notes,
+      created_by,
+      created_at
+    ) VALUES (
+      v_row.product_id,
+      v_row.location_id,
+      'adjustment',
+      quantity_change,
+      'stock_level',
+      v_row.id,
+      CASE
+        WHEN TG_OP = 'INSERT' THEN 'Stock level created'
+        WHEN TG_OP = 'DELETE' THEN 'Stock level deleted'
+        WHEN quantity_change > 0 THEN 'Stock level increased'
+        ELSE 'Stock level decreased'
+      END,
+      COALESCE(v_row.created_by, (SELECT id FROM public.profiles WHERE role_id = (SELECT id FROM public.roles WHERE name = 'admin' LIMIT 1) LIMIT 1)),
+      clock_timestamp()
+    );
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS on_stock_level_audit ON public.stock_levels;
+CREATE TRIGGER on_stock_level_audit
+  AFTER INSERT OR UPDATE OF quantity_on_hand OR DELETE ON public.stock_levels
+  FOR EACH ROW EXECUTE FUNCTION public.handle_stock_level_audit();
+
+-- ==================== SNAPSHOT TABLES ====================
+CREATE TABLE IF NOT EXISTS public.stock_snapshots (
+  id          UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  taken_at    TIMESTAMPTZ NOT NULL,
+  line_count  INTEGER NOT NULL DEFAULT 0,
+  created_by  UUID REFERENCES public.profiles(id),
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.stock_snapshot_lines (
+  id                 UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  snapshot_id        UUID NOT NULL REFERENCES public.stock_snapshots(id) ON DELETE CASCADE,
+  product_id         UUID NOT NULL REFERENCES public.products(id) ON DELETE CASCADE,
+  location_id        UUID REFERENCES public.locations(id) ON DELETE SET NULL,
+  quantity_on_hand   INTEGER NOT NULL DEFAULT 0,
+  quantity_reserved  INTEGER NOT NULL DEFAULT 0
+);
+
+-- ==================== INDEXES ====================
+CREATE INDEX IF NOT EXISTS idx_stock_snapshots_taken_at ON public.stock_snapshots(taken_at DESC);
+CREATE INDEX IF NOT EXISTS idx_stock_snapshot_lines_snapshot ON public.stock_snapshot_lines(snapshot_id);
+
+-- ==================== TAKE A SNAPSHOT ====================
+-- The SHARE lock waits for in-flight stock writes and holds new ones for the
+-- duration of the copy, so every audit row stamped before taken_at is in the
+-- snapshot and every row stamped after it is not.
+CREATE OR REPLACE FUNCTION public.take_stock_snapshot(p_created_by UUID DEFAULT NULL)
+RETURNS JSONB LANGUAGE plpgsql AS $$
+DECLARE
+  v_snapshot_id UUID;
+  v_taken_at    TIMESTAMPTZ;
+  v_lines       INTEGER;
+BEGIN
+  LOCK TABLE public.stock_levels IN SHARE MODE;
+  v_taken_at := clock_timestamp();
+
+  INSERT INTO public.stock_snapshots (taken_at, created_by)
+  VALUES (v_taken_at, p_created_by)
+  RETURNING id INTO v_snapshot_id;
+
+  INSERT INTO public.stock_snapshot_lines (snapshot_id, product_id, location_id, quantity_on_hand, quantity_reserved)
+  SELECT v_snapshot_id, s.product_id, s.location_id, COALESCE(s.quantity_on_hand, 0), COALESCE(s.quantity_reserved, 0)
+  FROM public.stock_levels s
+  WHERE s.product_id IS NOT NULL;
+  GET DIAGNOSTICS v_lines = ROW_COUNT;
+
+  UPDATE public.stock_snapshots SET line_count = v_lines WHERE id = v_snapshot_id;
+
+  RETURN jsonb_build_object('id', v_snapshot_id, 'taken_at', v_taken_at, 'line_count', v_lines);
+END;
+$$;
+
+-- ==================== STOCK AS OF ====================
+-- Nearest snapshot at or before p_as_of plus the audit rows after it.
+-- Serialized products are left out. Returns NULL when no snapshot is that
+-- old, otherwise
+--   {"snapshot_id", "snapshot_taken_at", "replayed",
+--    "rows": [{product_id, product_name, sku_code, location_id, location_name, quantity_on_hand}]}
+CREATE OR REPLACE FUNCTION public.get_stock_levels_as_of(p_as_of TIMESTAMPTZ)
+RETURNS JSONB LANGUAGE plpgsql STABLE AS $$
+DECLARE
+  v_snapshot public.stock_snapshots%ROWTYPE;
+  v_replayed INTEGER;
+  v_rows     JSONB;
+BEGIN
+  SELECT * INTO v_snapshot
+  FROM public.stock_snapshots
+  WHERE taken_at <= p_as_of
+  ORDER BY taken_at DESC
+  LIMIT 1;
+
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  SELECT COUNT(*) INTO v_replayed
+  FROM public.inventory_transactions t
+  WHERE t.reference_type = 'stock_level'
+    AND t.created_at > v_snapshot.taken_at
+    AND t.created_at <= p_as_of;
+
+  SELECT COALESCE(jsonb_agg(jsonb_build_object(
+    'product_id', q.product_id,
+    'product_name', p.name,
+    'sku_code', p.sku_code,
+    'location_id', q.location_id,
+    'location_name', loc.name,
+    'quantity_on_hand', q.quantity_on_hand
+  )), '[]'::jsonb)
+  INTO v_rows
+  FROM (
+    SELECT product_id, location_id, SUM(quantity)::INTEGER AS quantity_on_hand
+    FROM (
+      SELECT l.product_id, l.location_id, l.quantity_on_hand AS quantity
+      FROM public.stock_snapshot_lines l
+      WHERE l.snapshot_id = v_snapshot.id
+      UNION ALL
+      SELECT t.product_id, t.location_id, t.quantity_change
+      FROM public.inventory_transactions t
+      WHERE t.reference_type = 'stock_level'
+        AND t.created_at > v_snapshot.taken_at
+        AND t.created_at <= p_as_of
+        AND t.product_id IS NOT NULL
+    ) AS movements
+    GROUP BY product_id, location_id
+  ) AS q
+  JOIN public.products p ON p.id = q.product_id AND NOT COALESCE(p.is_serialized, false)
+  LEFT JOIN public.locations loc ON loc.id = q.location_id
+  WHERE q.quantity_on_hand <> 0;
+
+  RETURN jsonb_build_object(
+    'snapshot_id', v_snapshot.id,
+    'snapshot_taken_at', v_snapshot.taken_at,
+    'replayed', v_replayed,
+    'rows', v_rows
+  );
+END;
+$$;
+
+-- ==================== TIMESTAMPS ====================
+DROP TRIGGER IF EXISTS set_stock_snapshots_updated_at ON public.stock_snapshots;
+CREATE TRIGGER set_stock_snapshots_updated_at
+  BEFORE UPDATE ON public.stock_snapshots
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ==================== RLS ====================
+ALTER TABLE public.stock_snapshots ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.stock_snapshot_lines ENABLE ROW LEVEL SECURITY;
+
+-- Allow authenticated users full access (app-layer permissions handle role checks)
+CREATE POLICY "Authenticated users can manage stock_snapshots"
+  ON public.stock_snapshots FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+CREATE POLICY "Authenticated users can manage stock_snapshot_lines"
+  ON public.stock_snapshot_lines FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+-- ==================== SCHEDULE ====================
+-- Nightly snapshot where pg_cron is available; otherwise call
+-- POST /inventory/stock-snapshots from an external scheduler.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('nightly-stock-snapshot', '5 0 * * *', 'SELECT public.take_stock_snapshot()');
+  END IF;
+END $$;
+
+-- History starts here: the first snapshot is the baseline for asOf queries
+SELECT public.take_stock_snapshot();
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,307 @@
+-- Stock Transfers Migration
+-- A transfer document moves many products (and serials) from one location to
+-- another. post_stock_transfer() runs the whole transfer in one transaction:
+-- it locks the source rows, validates available quantity and serial status in
+-- bulk, then applies the paired decrements / increments (stock levels and
+-- batches) and writes the movement and ledger rows. Nothing is applied if any
+-- line falls short.
+
+-- ==================== MAIN TABLES ====================
+CREATE TABLE IF NOT EXISTS public.stock_transfers (
+  id                UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  transfer_number   TEXT NOT NULL UNIQUE,
+  from_location_id  UUID NOT NULL REFERENCES public.locations(id),
+  to_location_id    UUID NOT NULL REFERENCES public.locations(id),
+  status            TEXT NOT NULL DEFAULT 'completed',
+  notes             TEXT,
+  total_quantity    INTEGER NOT NULL DEFAULT 0,
+  created_by        UUID REFERENCES public.profiles(id),
+  created_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+  CONSTRAINT stock_transfers_status_check CHECK (status IN ('completed')),
+  CONSTRAINT stock_transfers_locations_check CHECK (from_location_id <> to_location_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.stock_transfer_items (
+  id                UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  stock_transfer_id UUID NOT NULL REFERENCES public.stock_transfers(id) ON DELETE CASCADE,
+  product_id        UUID NOT NULL REFERENCES public.products(id),
+  quantity          INTEGER NOT NULL CHECK (quantity > 0),
+  serial_numbers    TEXT[],
+  created_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- ==================== INDEXES ====================
+CREATE INDEX IF NOT EXISTS idx_stock_transfers_created_at    ON public.stock_transfers(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_stock_transfers_from_location ON public.stock_transfers(from_location_id);
+CREATE INDEX IF NOT EXISTS idx_stock_transfers_to_location   ON public.stock_transfers(to_location_id);
+CREATE INDEX IF NOT EXISTS idx_stock_transfer_items_transfer ON public.stock_transfer_items(stock_transfer_id);
+CREATE INDEX IF NOT EXISTS idx_product_serials_product_serial ON public.product_serials(product_id, serial_number);
+
+-- ==================== TRANSFER FUNCTION ====================
+-- p_items: JSON array with one element per product, e.g.
+--   [{"product_id": "...", "quantity": 5},
+--    {"product_id": "...", "quantity": 8,
+--     "batches": [{"stock_batch_id": "...", "quantity": 3}]},
+--    {"product_id": "...", "quantity": 2, "serial_numbers": ["SN1", "SN2"]}]
+-- Non-serialized products move quantity_on_hand; serialized products move
+-- their serial rows (the product_serials trigger keeps the counters in sync).
+-- Batch-tracked stock moves with them: the batches a line names first, then
+-- the product's other batches at the source, earliest expiry first; whatever
+-- the batches do not cover is unbatched stock. Moved batches keep their
+-- number and expiry at the destination.
+-- Shortfalls raise SQLSTATE PT409 (HTTP 409 through PostgREST) with the
+-- offending lines as JSON in DETAIL.
+CREATE OR REPLACE FUNCTION public.post_stock_transfer(
+  p_transfer_number  TEXT,
+  p_from_location_id UUID,
+  p_to_location_id   UUID,
+  p_items            JSONB,
+  p_notes            TEXT,
+  p_created_by       UUID
+)
+RETURNS JSONB LANGUAGE plpgsql AS $$
+DECLARE
+  v_transfer_id UUID;
+  v_shortfalls  JSONB;
+  v_serials     JSONB;
+  v_batches     JSONB;
+  v_named       JSONB;
+  v_moves       JSONB;
+  v_note        TEXT;
+BEGIN
+  IF p_items IS NULL OR jsonb_array_length(p_items) = 0 THEN
+    RAISE EXCEPTION 'A transfer needs at least one item' USING ERRCODE = 'PT400';
+  END IF;
+  IF p_from_location_id = p_to_location_id THEN
+    RAISE EXCEPTION 'Source and destination locations must differ' USING ERRCODE = 'PT400';
+  END IF;
+
+  -- Lock the source rows in a fixed order so concurrent transfers cannot deadlock
+  PERFORM 1
+  FROM public.stock_levels s
+  WHERE s.location_id = p_from_location_id
+    AND s.product_id IN (SELECT (i->>'product_id')::uuid FROM jsonb_array_elements(p_items) AS i)
+  ORDER BY s.product_id
+  FOR UPDATE;
+
+  PERFORM 1
+  FROM public.product_serials ps
+  JOIN jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER, serial_numbers TEXT[])
+    ON ps.product_id = l.product_id AND ps.serial_number = ANY (l.serial_numbers)
+  ORDER BY ps.id
+  FOR UPDATE OF ps;
+
+  PERFORM 1
+  FROM public.stock_batches b
+  WHERE b.location_id = p_from_location_id
+    AND b.product_id IN (SELECT (i->>'product_id')::uuid FROM jsonb_array_elements(p_items) AS i)
+  ORDER BY b.id
+  FOR UPDATE;
+
+  -- Batches named by the caller, one row per product and batch
+  SELECT jsonb_agg(jsonb_build_object('product_id', n.product_id, 'stock_batch_id', n.stock_batch_id, 'quantity', n.quantity))
+  INTO v_named
+  FROM (
+    SELECT (i->>'product_id')::uuid AS product_id, (b->>'stock_batch_id')::uuid AS stock_batch_id, SUM((b->>'quantity')::int) AS quantity
+    FROM jsonb_array_elements(p_items) AS i
+    CROSS JOIN LATERAL jsonb_array_elements(COALESCE(i->'batches', '[]'::jsonb)) AS b
+    GROUP BY 1, 2
+  ) n;
+  v_named := COALESCE(v_named, '[]'::jsonb);
+
+  IF EXISTS (
+    SELECT 1
+    FROM jsonb_array_elements(p_items) AS i
+    WHERE (SELECT COALESCE(SUM((b->>'quantity')::int), 0) FROM jsonb_array_elements(COALESCE(i->'batches', '[]'::jsonb)) AS b)
+          > (i->>'quantity')::int
+  ) THEN
+    RAISE EXCEPTION 'Batch quantities exceed the line quantity' USING ERRCODE = 'PT400';
+  END IF;
+
+  -- ---------- bulk validation ----------
+  SELECT jsonb_agg(jsonb_build_object(
+    'product_id', l.product_id,
+    'requested', l.quantity,
+    'available', COALESCE(s.quantity_available, 0)
+  ))
+  INTO v_shortfalls
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER, serial_numbers TEXT[])
+  JOIN public.products p ON p.id = l.product_id AND NOT COALESCE(p.is_serialized, false)
+  LEFT JOIN public.stock_levels s ON s.product_id = l.product_id AND s.location_id = p_from_location_id
+  WHERE COALESCE(s.quantity_available, 0) < l.quantity;
+
+  SELECT jsonb_agg(jsonb_build_object(
+    'product_id', l.product_id,
+    'serial_number', sn.serial_number,
+    'status', ps.status,
+    'location_id', ps.location_id
+  ))
+  INTO v_serials
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER, serial_numbers TEXT[])
+  CROSS JOIN LATERAL unnest(l.serial_numbers) AS sn(serial_number)
+  LEFT JOIN public.product_serials ps ON ps.product_id = l.product_id AND ps.serial_number = sn.serial_number
+  WHERE ps.id IS NULL
+     OR ps.status <> 'available'
+     OR ps.location_id IS DISTINCT FROM p_from_location_id;
+
+  SELECT jsonb_agg(jsonb_build_object(
+    'product_id', n.product_id,
+    'stock_batch_id', n.stock_batch_id,
+    'batch_number', b.batch_number,
+    'requested', n.quantity,
+    'available', COALESCE(b.quantity_on_hand, 0)
+  ))
+  INTO v_batches
+  FROM jsonb_to_recordset(v_named) AS n(product_id UUID, stock_batch_id UUID, quantity INTEGER)
+  LEFT JOIN public.stock_batches b
+    ON b.id = n.stock_batch_id AND b.product_id = n.product_id AND b.location_id = p_from_location_id
+  WHERE COALESCE(b.quantity_on_hand, 0) < n.quantity;
+
+  IF v_shortfalls IS NOT NULL OR v_serials IS NOT NULL OR v_batches IS NOT NULL THEN
+    RAISE EXCEPTION 'Insufficient stock at the source location' USING
+      ERRCODE = 'PT409',
+      DETAIL = jsonb_build_object(
+        'shortfalls', COALESCE(v_shortfalls, '[]'::jsonb),
+        'serials', COALESCE(v_serials, '[]'::jsonb),
+        'batches', COALESCE(v_batches, '[]'::jsonb)
+      )::text;
+  END IF;
+
+  -- ---------- batch allocation: named batches, then earliest expiry first ----------
+  WITH remaining AS (
+    SELECT l.product_id, l.quantity - COALESCE(SUM(n.quantity), 0) AS quantity
+    FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER)
+    JOIN public.products p ON p.id = l.product_id AND NOT COALESCE(p.is_serialized, false)
+    LEFT JOIN jsonb_to_recordset(v_named) AS n(product_id UUID, stock_batch_id UUID, quantity INTEGER)
+      ON n.product_id = l.product_id
+    GROUP BY l.product_id, l.quantity
+  ),
+  fefo AS (
+    SELECT b.id, b.product_id, b.quantity_on_hand,
+           SUM(b.quantity_on_hand) OVER (
+             PARTITION BY b.product_id
+             ORDER BY b.expiry_date NULLS LAST, b.batch_number NULLS LAST, b.id
+           ) - b.quantity_on_hand AS drawn_before
+    FROM public.stock_batches b
+    JOIN remaining r ON r.product_id = b.product_id AND r.quantity > 0
+    WHERE b.location_id = p_from_location_id
+      AND b.quantity_on_hand > 0
+      AND b.id NOT IN (SELECT n.stock_batch_id FROM jsonb_to_recordset(v_named) AS n(stock_batch_id UUID))
+  )
+  SELECT jsonb_agg(jsonb_build_object('stock_batch_id', m.stock_batch_id, 'quantity', m.quantity))
+  INTO v_moves
+  FROM (
+    SELECT n.stock_batch_id, n.quantity
+    FROM jsonb_to_recordset(v_named) AS n(stock_batch_id UUID, quantity INTEGER)
+    UNION ALL
+    SELECT f.id, LEAST(f.quantity_on_hand, r.quantity - f.drawn_before)
+    FROM fefo f
+    JOIN remaining r ON r.product_id = f.product_id
+    WHERE r.quantity > f.drawn_before
+  ) m;
+  v_moves := COALESCE(v_moves, '[]'::jsonb);
+
+  -- ---------- document ----------
+  INSERT INTO public.stock_transfers (transfer_number, from_location_id, to_location_id, notes, total_quantity, created_by)
+  SELECT p_transfer_number, p_from_location_id, p_to_location_id, p_notes, COALESCE(SUM(l.quantity), 0), p_created_by
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER)
+  RETURNING id INTO v_transfer_id;
+
+  INSERT INTO public.stock_transfer_items (stock_transfer_id, product_id, quantity, serial_numbers)
+  SELECT v_transfer_id, l.product_id, l.quantity, l.serial_numbers
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER, serial_numbers TEXT[]);
+
+  v_note := 'Transfer ' || p_transfer_number;
+
+  -- Movements record the source stock before the rows change
+  INSERT INTO public.inventory_movements (
+    product_id, type, quantity, previous_stock, new_stock,
+    from_location_id, to_location_id, reference, notes, created_by
+  )
+  SELECT
+    l.product_id, 'transfer', l.quantity,
+    COALESCE(CASE WHEN p.is_serialized THEN s.serialized_available ELSE s.quantity_on_hand END, 0),
+    COALESCE(CASE WHEN p.is_serialized THEN s.serialized_available ELSE s.quantity_on_hand END, 0) - l.quantity,
+    p_from_location_id, p_to_location_id, p_transfer_number, p_notes, p_created_by
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER)
+  JOIN public.products p ON p.id = l.product_id
+  LEFT JOIN public.stock_levels s ON s.product_id = l.product_id AND s.location_id = p_from_location_id;
+
+  -- ---------- paired decrement / increment ----------
+  UPDATE public.stock_levels s
+  SET quantity_on_hand = s.quantity_on_hand - l.quantity,
+      last_updated = now()
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER)
+  JOIN public.products p ON p.id = l.product_id AND NOT COALESCE(p.is_serialized, false)
+  WHERE s.product_id = l.product_id AND s.location_id = p_from_location_id;
+
+  INSERT INTO public.stock_levels AS s (product_id, location_id, quantity_on_hand, created_by, last_updated)
+  SELECT l.product_id, p_to_location_id, l.quantity, p_created_by, now()
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER)
+  JOIN public.products p ON p.id = l.product_id AND NOT COALESCE(p.is_serialized, false)
+  ON CONFLICT (product_id, location_id) DO UPDATE SET
+    quantity_on_hand = s.quantity_on_hand + EXCLUDED.quantity_on_hand,
+    last_updated = now();
+
+  INSERT INTO public.stock_batches AS d (product_id, location_id, batch_number, expiry_date, quantity_on_hand)
+  SELECT b.product_id, p_to_location_id, b.batch_number, b.expiry_date, m.quantity
+  FROM jsonb_to_recordset(v_moves) AS m(stock_batch_id UUID, quantity INTEGER)
+  JOIN public.stock_batches b ON b.id = m.stock_batch_id
+  ON CONFLICT (product_id, location_id, batch_number, expiry_date) DO UPDATE SET
+    quantity_on_hand = d.quantity_on_hand + EXCLUDED.quantity_on_hand;
+
+  UPDATE public.stock_batches b
+  SET quantity_on_hand = b.quantity_on_hand - m.quantity
+  FROM jsonb_to_recordset(v_moves) AS m(stock_batch_id UUID, quantity INTEGER)
+  WHERE b.id = m.stock_batch_id;
+
+  UPDATE public.product_serials ps
+  SET location_id = p_to_location_id,
+      updated_at = now()
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, serial_numbers TEXT[])
+  WHERE ps.product_id = l.product_id AND ps.serial_number = ANY (l.serial_numbers);
+
+  -- ---------- ledger: one row out of the source, one into the destination ----------
+  INSERT INTO public.inventory_transactions (product_id, location_id, transaction_type, quantity_change, reference_type, reference_id, notes, created_by)
+  SELECT l.product_id, side.location_id, 'transfer', side.sign * l.quantity, 'stock_transfer', v_transfer_id, v_note || side.label, p_created_by
+  FROM jsonb_to_recordset(p_items) AS l(product_id UUID, quantity INTEGER)
+  CROSS JOIN (VALUES (-1, ' (out)', p_from_location_id), (1, ' (in)', p_to_location_id)) AS side(sign, label, location_id);
+
+  RETURN jsonb_build_object(
+    'id', v_transfer_id,
+    'lines', jsonb_array_length(p_items),
+    'quantity', (SELECT COALESCE(SUM((i->>'quantity')::int), 0) FROM jsonb_array_elements(p_items) AS i)
+  );
+END;
+$$;
+
+-- ==================== TIMESTAMPS ====================
+DROP TRIGGER IF EXISTS set_stock_transfers_updated_at ON public.stock_transfers;
+CREATE TRIGGER set_stock_transfers_updated_at
+  BEFORE UPDATE ON public.stock_transfers
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+DROP TRIGGER IF EXISTS set_stock_transfer_items_updated_at ON public.stock_transfer_items;
+CREATE TRIGGER set_stock_transfer_items_updated_at
+  BEFORE UPDATE ON public.stock_transfer_items
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ==================== RLS ====================
+ALTER TABLE public.stock_transfers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.stock_transfer_items ENABLE ROW LEVEL SECURITY;
+
+-- Allow authenticated users full access (app-layer permissions handle role checks)
+CREATE POLICY "Authenticated users can manage stock_transfers"
+  ON public.stock_transfers FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+CREATE POLICY "Authenticated users can manage stock_transfer_items"
+  ON public.stock_transfer_items FOR ALL
+  TO authenticated
+  USING (true) WITH CHECK (true);
+
+-- ==================== NOTIFY POSTGREST TO RELOAD SCHEMA CACHE ====================
+NOTIFY pgrst, 'reload schema';